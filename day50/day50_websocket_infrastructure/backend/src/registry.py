@@ -0,0 +1,242 @@
+"""Connection registry and token cache shared by the Socket.IO workers.
+
+With a single process the registry keeps rooms and stats in dicts. When
+REDIS_URL is set every worker points at the same Redis, so room membership
+and connection counts are global while each worker still owns its sockets.
+"""
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+STAT_FIELDS = ('total_connections', 'current_connections', 'total_messages', 'failed_authentications')
+
+
+def _text(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class LocalRegistry:
+    """In-process registry used for a single worker and in tests"""
+
+    def __init__(self):
+        self.stats = {name: 0 for name in STAT_FIELDS}
+        self.rooms = {}
+        self.usernames = {}
+
+    def incr_stat(self, name, amount=1):
+        self.stats[name] += amount
+
+    def get_stats(self):
+        return dict(self.stats)
+
+    def add_connection(self, sid, username):
+        self.usernames[sid] = username
+        self.stats['total_connections'] += 1
+        self.stats['current_connections'] += 1
+
+    def remove_connection(self, sid, rooms):
+        for room in rooms:
+            self.leave_room(room, sid)
+        if self.usernames.pop(sid, None) is not None:
+            self.stats['current_connections'] -= 1
+
+    def join_room(self, room, sid):
+        self.rooms.setdefault(room, set()).add(sid)
+        return len(self.rooms[room])
+
+    def leave_room(self, room, sid):
+        if room in self.rooms:
+            self.rooms[room].discard(sid)
+            if not self.rooms[room]:
+                del self.rooms[room]
+
+    def room_size(self, room):
+        return len(self.rooms.get(room, ()))
+
+    def room_sizes(self):
+        return {room: len(members) for room, members in self.rooms.items()}
+
+    def room_members(self, room):
+        return [
+            {'socket_id': sid, 'username': self.usernames[sid]}
+            for sid in self.rooms.get(room, ()) if sid in self.usernames
+        ]
+
+    def heartbeat(self):
+        return 0
+
+    def is_leader(self, role, ttl=None):
+        return True
+
+
+class RedisRegistry:
+    """Registry backed by Redis so every worker sees the same rooms and counts.
+
+    Each worker records the sockets it owns under its own id and refreshes a
+    heartbeat key with a TTL. heartbeat() also sweeps workers whose heartbeat
+    has expired, removing their sockets from the connection hash and rooms,
+    so a crashed worker does not leave members or counts behind.
+    """
+
+    def __init__(self, client, prefix='ws', worker_id=None, heartbeat_ttl=15):
+        self.redis = client
+        self.prefix = prefix
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.heartbeat_ttl = heartbeat_ttl
+
+    def _key(self, *parts):
+        return ':'.join((self.prefix,) + parts)
+
+    def incr_stat(self, name, amount=1):
+        self.redis.hincrby(self._key('stats'), name, amount)
+
+    def get_stats(self):
+        pipe = self.redis.pipeline()
+        pipe.hgetall(self._key('stats'))
+        pipe.hlen(self._key('conn'))
+        raw, current = pipe.execute()
+        stats = {name: 0 for name in STAT_FIELDS}
+        for name, value in raw.items():
+            stats[_text(name)] = int(value)
+        # Derived from the live connection hash so swept workers drop out of it
+        stats['current_connections'] = current
+        return stats
+
+    def add_connection(self, sid, username):
+        pipe = self.redis.pipeline()
+        pipe.hset(self._key('conn'), sid, username)
+        pipe.sadd(self._key('worker', self.worker_id, 'sids'), sid)
+        pipe.hincrby(self._key('stats'), 'total_connections', 1)
+        pipe.execute()
+
+    def remove_connection(self, sid, rooms):
+        pipe = self.redis.pipeline()
+        for room in rooms:
+            pipe.srem(self._key('room', room), sid)
+        pipe.hdel(self._key('conn'), sid)
+        pipe.srem(self._key('worker', self.worker_id, 'sids'), sid)
+        pipe.execute()
+        self._prune_rooms(rooms)
+
+    def _prune_rooms(self, rooms):
+        for room in rooms:
+            if not self.redis.scard(self._key('room', room)):
+                self.redis.srem(self._key('rooms'), room)
+
+    def join_room(self, room, sid):
+        pipe = self.redis.pipeline()
+        pipe.sadd(self._key('room', room), sid)
+        pipe.sadd(self._key('rooms'), room)
+        pipe.scard(self._key('room', room))
+        return pipe.execute()[-1]
+
+    def leave_room(self, room, sid):
+        self.redis.srem(self._key('room', room), sid)
+        self._prune_rooms([room])
+
+    def room_size(self, room):
+        return self.redis.scard(self._key('room', room))
+
+    def room_sizes(self):
+        rooms = [_text(r) for r in self.redis.smembers(self._key('rooms'))]
+        pipe = self.redis.pipeline()
+        for room in rooms:
+            pipe.scard(self._key('room', room))
+        return dict(zip(rooms, pipe.execute()))
+
+    def room_members(self, room):
+        sids = [_text(s) for s in self.redis.smembers(self._key('room', room))]
+        if not sids:
+            return []
+        names = self.redis.hmget(self._key('conn'), sids)
+        return [
+            {'socket_id': sid, 'username': _text(name)}
+            for sid, name in zip(sids, names) if name is not None
+        ]
+
+    def heartbeat(self):
+        """Refresh this worker's liveness key and sweep workers that stopped refreshing"""
+        pipe = self.redis.pipeline()
+        pipe.set(self._key('worker', self.worker_id), 1, ex=self.heartbeat_ttl)
+        pipe.sadd(self._key('workers'), self.worker_id)
+        pipe.execute()
+        return self.sweep()
+
+    def sweep(self):
+        """Remove the sockets of every worker whose heartbeat has expired; returns how many"""
+        removed = 0
+        for worker_id in map(_text, self.redis.smembers(self._key('workers'))):
+            if worker_id == self.worker_id or self.redis.exists(self._key('worker', worker_id)):
+                continue
+            sids_key = self._key('worker', worker_id, 'sids')
+            sids = [_text(s) for s in self.redis.smembers(sids_key)]
+            rooms = [_text(r) for r in self.redis.smembers(self._key('rooms'))]
+            pipe = self.redis.pipeline()
+            if sids:
+                for room in rooms:
+                    pipe.srem(self._key('room', room), *sids)
+                pipe.hdel(self._key('conn'), *sids)
+            pipe.delete(sids_key)
+            pipe.srem(self._key('workers'), worker_id)
+            pipe.execute()
+            self._prune_rooms(rooms)
+            removed += len(sids)
+        return removed
+
+    def is_leader(self, role, ttl=None):
+        """Hold (or take over) a role for ttl seconds; only one live worker holds it"""
+        key = self._key('leader', role)
+        ttl = ttl or self.heartbeat_ttl
+        if self.redis.set(key, self.worker_id, nx=True, ex=ttl):
+            return True
+        if _text(self.redis.get(key)) == self.worker_id:
+            self.redis.expire(key, ttl)
+            return True
+        return False
+
+
+class TokenCache:
+    """Caches verified JWT payloads until the token's own expiry"""
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token):
+        with self.lock:
+            entry = self.entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            payload, expires_at = entry
+            if expires_at <= time.time():
+                del self.entries[token]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(token)
+            self.hits += 1
+            return payload
+
+    def put(self, token, payload):
+        expires_at = payload.get('exp')
+        if not expires_at:
+            return
+        with self.lock:
+            self.entries[token] = (payload, float(expires_at))
+            self.entries.move_to_end(token)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+
+def create_registry(redis_url=None):
+    """Pick the Redis-backed registry when a URL is configured"""
+    if not redis_url:
+        return LocalRegistry()
+    import redis
+    return RedisRegistry(redis.Redis.from_url(redis_url))
@@ -6,6 +6,7 @@ import logging
 from datetime import datetime, timedelta
 import os
 from functools import wraps
+from registry import create_registry, TokenCache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -15,26 +16,30 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = 'dev-secret-key-change-in-production'
 CORS(app, resources={r"/*": {"origins": "*"}})
 
+# Set REDIS_URL to run several workers: it becomes the Socket.IO message queue for
+# cross-process room fan-out and the shared store for rooms and stats
+REDIS_URL = os.environ.get('REDIS_URL')
+STATS_BROADCAST_INTERVAL = float(os.environ.get('STATS_BROADCAST_INTERVAL', '2'))
+
 # Initialize SocketIO with engineio settings
 socketio = SocketIO(
     app,
     cors_allowed_origins="*",
     async_mode='eventlet',
+    message_queue=REDIS_URL,
     ping_timeout=60,
     ping_interval=25,
     logger=True,
     engineio_logger=True
 )
 
-# Connection registry
+# Sockets owned by this worker; rooms and stats live in the shared registry
 active_connections = {}
-room_members = {}
-connection_stats = {
-    'total_connections': 0,
-    'current_connections': 0,
-    'total_messages': 0,
-    'failed_authentications': 0
-}
+registry = create_registry(REDIS_URL)
+token_cache = TokenCache()
+
+# Background maintenance (heartbeat, sweep, stats) starts with the first connection
+maintenance_state = {'task_started': False, 'last_stats': None}
 
 # JWT helper functions
 def generate_token(user_id, username):
@@ -52,12 +57,16 @@ def generate_token(user_id, username):
     return str(token)
 
 def verify_token(token):
-    """Verify JWT token"""
+    """Verify JWT token, reusing the cached payload until the token expires"""
     try:
         if not token:
             logger.error("Token is None or empty")
             return None
+        payload = token_cache.get(token)
+        if payload is not None:
+            return payload
         payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
+        token_cache.put(token, payload)
         return payload
     except jwt.ExpiredSignatureError as e:
         logger.error(f"Token expired: {str(e)}")
@@ -69,6 +78,39 @@ def verify_token(token):
         logger.error(f"Token verification error: {type(e).__name__}: {str(e)}")
         return None
 
+def ensure_maintenance_task():
+    """Start this worker's registry maintenance loop once"""
+    if not maintenance_state['task_started']:
+        maintenance_state['task_started'] = True
+        socketio.start_background_task(registry_maintenance)
+
+def registry_maintenance():
+    """Keep this worker's registry entries alive and broadcast stats from one worker.
+
+    Every worker heartbeats (sweeping workers that died); only the worker
+    holding the stats leader role emits stats_update, at most once per
+    interval and only when the shared stats changed. With a message queue the
+    emit reaches the clients of every worker, so each client gets one copy.
+    """
+    while True:
+        socketio.sleep(STATS_BROADCAST_INTERVAL)
+        try:
+            swept = registry.heartbeat()
+            if swept:
+                logger.info(f"Removed {swept} connections left by dead workers")
+            if not registry.is_leader('stats'):
+                continue
+            stats = registry.get_stats()
+            update = {
+                'active_connections': stats['current_connections'],
+                'total_connections': stats['total_connections']
+            }
+            if update != maintenance_state['last_stats']:
+                maintenance_state['last_stats'] = update
+                socketio.emit('stats_update', update)
+        except Exception as e:
+            logger.error(f"Registry maintenance error: {str(e)}")
+
 # Authentication decorator for socket events
 def authenticated_only(f):
     @wraps(f)
@@ -118,10 +160,12 @@ def login():
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
     """Get connection statistics"""
+    stats = registry.get_stats()
     return jsonify({
-        'stats': connection_stats,
-        'active_connections': len(active_connections),
-        'rooms': {room: len(members) for room, members in room_members.items()}
+        'stats': stats,
+        'active_connections': stats['current_connections'],
+        'worker_connections': len(active_connections),
+        'rooms': registry.room_sizes()
     })
 
 @app.route('/health', methods=['GET'])
@@ -171,7 +215,7 @@ def handle_connect(auth=None):
         
         if not token:
             logger.warning(f"Connection attempt without token from {request.sid}, auth received: {auth}")
-            connection_stats['failed_authentications'] += 1
+            registry.incr_stat('failed_authentications')
             return False
         
         # Sanitize token (remove whitespace, handle string encoding)
@@ -186,7 +230,7 @@ def handle_connect(auth=None):
         payload = verify_token(token)
         if not payload:
             logger.warning(f"Invalid token for connection {request.sid}. Token preview: {token[:50] if token else 'None'}...")
-            connection_stats['failed_authentications'] += 1
+            registry.incr_stat('failed_authentications')
             return False
         
         logger.info(f"Token verified successfully for {request.sid}, user: {payload.get('username', 'unknown')}")
@@ -199,8 +243,7 @@ def handle_connect(auth=None):
             'rooms': set()
         }
         
-        connection_stats['total_connections'] += 1
-        connection_stats['current_connections'] = len(active_connections)
+        registry.add_connection(request.sid, payload['username'])
         
         logger.info(f"Client connected: {request.sid} - User: {payload['username']}")
         
@@ -212,11 +255,7 @@ def handle_connect(auth=None):
             'message': 'Successfully connected to WebSocket server'
         })
         
-        # Broadcast stats update
-        socketio.emit('stats_update', {
-            'active_connections': len(active_connections),
-            'total_connections': connection_stats['total_connections']
-        })
+        ensure_maintenance_task()
         
         return True
         
@@ -232,25 +271,12 @@ def handle_disconnect():
             user_info = active_connections[request.sid]
             username = user_info['username']
             
-            # Leave all rooms
-            for room in user_info['rooms']:
-                if room in room_members:
-                    room_members[room].discard(request.sid)
-                    if len(room_members[room]) == 0:
-                        del room_members[room]
-            
-            # Remove from active connections
+            # Leave all rooms and remove from active connections
+            registry.remove_connection(request.sid, user_info['rooms'])
             del active_connections[request.sid]
-            connection_stats['current_connections'] = len(active_connections)
             
             logger.info(f"Client disconnected: {request.sid} - User: {username}")
             
-            # Broadcast stats update
-            socketio.emit('stats_update', {
-                'active_connections': len(active_connections),
-                'total_connections': connection_stats['total_connections']
-            })
-            
     except Exception as e:
         logger.error(f"Disconnection error: {str(e)}")
 
@@ -273,9 +299,7 @@ def handle_join_room(*args):
         join_room(room)
         
         # Update room members
-        if room not in room_members:
-            room_members[room] = set()
-        room_members[room].add(request.sid)
+        members_count = registry.join_room(room, request.sid)
         
         # Update user's room list
         active_connections[request.sid]['rooms'].add(room)
@@ -288,19 +312,13 @@ def handle_join_room(*args):
             'room': room,
             'user_id': user_info['user_id'],
             'username': user_info['username'],
-            'members_count': len(room_members[room])
+            'members_count': members_count
         }, room=room)
         
         # Send current room member list to joiner
         emit('room_members', {
             'room': room,
-            'members': [
-                {
-                    'socket_id': sid,
-                    'username': active_connections[sid]['username']
-                }
-                for sid in room_members[room] if sid in active_connections
-            ]
+            'members': registry.room_members(room)
         })
         
     except Exception as e:
@@ -326,10 +344,7 @@ def handle_leave_room(*args):
         leave_room(room)
         
         # Update room members
-        if room in room_members:
-            room_members[room].discard(request.sid)
-            if len(room_members[room]) == 0:
-                del room_members[room]
+        registry.leave_room(room, request.sid)
         
         # Update user's room list
         if request.sid in active_connections:
@@ -380,8 +395,8 @@ def handle_send_message(*args):
         logger.info(f"Broadcasting message to room {room}: {message_data}")
         emit('message', message_data, room=room)
         
-        connection_stats['total_messages'] += 1
-        logger.info(f"Message sent to room {room} by {user_info['username']}, room members: {len(room_members.get(room, set()))}")
+        registry.incr_stat('total_messages')
+        logger.info(f"Message sent to room {room} by {user_info['username']}, room members: {registry.room_size(room)}")
         
     except Exception as e:
         logger.error(f"Send message error: {str(e)}")
@@ -3,7 +3,8 @@ import sys
 import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-from server import app, socketio, generate_token, verify_token
+from server import app, socketio, generate_token, verify_token, token_cache
+from registry import LocalRegistry, RedisRegistry
 import socketio as sio_client
 
 @pytest.fixture
@@ -53,5 +54,82 @@ def test_invalid_login(client):
     response = client.post('/api/auth/login', json={})
     assert response.status_code == 401
 
+def test_verified_token_is_cached():
+    """Second verification of the same token is served from the cache"""
+    token = generate_token('user_456', 'cacheduser')
+    hits = token_cache.hits
+    assert verify_token(token)['username'] == 'cacheduser'
+    assert verify_token(token)['username'] == 'cacheduser'
+    assert token_cache.hits == hits + 1
+
+def test_socket_connect_updates_shared_stats():
+    """Connections are counted in the registry and stats are not broadcast per connect"""
+    token = generate_token('user_789', 'socketuser')
+    ws = socketio.test_client(app, auth={'token': token})
+    assert ws.is_connected()
+    received = [packet['name'] for packet in ws.get_received()]
+    assert 'connected' in received
+    assert 'stats_update' not in received
+    
+    response = app.test_client().get('/api/stats')
+    assert response.get_json()['active_connections'] >= 1
+    ws.disconnect()
+
+@pytest.mark.parametrize('make_registry', [
+    LocalRegistry,
+    lambda: RedisRegistry(pytest.importorskip('fakeredis').FakeRedis()),
+])
+def test_registry_rooms_and_stats(make_registry):
+    """Room membership and counts behave the same in both registry backends"""
+    registry = make_registry()
+    registry.add_connection('sid-1', 'alice')
+    registry.add_connection('sid-2', 'bob')
+    assert registry.join_room('general', 'sid-1') == 1
+    assert registry.join_room('general', 'sid-2') == 2
+    assert sorted(m['username'] for m in registry.room_members('general')) == ['alice', 'bob']
+    
+    registry.remove_connection('sid-1', {'general'})
+    assert registry.room_sizes() == {'general': 1}
+    registry.leave_room('general', 'sid-2')
+    assert registry.room_sizes() == {}
+    
+    stats = registry.get_stats()
+    assert stats['total_connections'] == 2
+    assert stats['current_connections'] == 1
+
+def test_redis_registry_sweeps_dead_workers():
+    """Sockets of a worker whose heartbeat expired are removed from rooms and counts"""
+    fakeredis = pytest.importorskip('fakeredis')
+    client = fakeredis.FakeRedis()
+    dead = RedisRegistry(client, worker_id='dead', heartbeat_ttl=15)
+    live = RedisRegistry(client, worker_id='live', heartbeat_ttl=15)
+    dead.heartbeat()
+    dead.add_connection('sid-1', 'alice')
+    dead.join_room('general', 'sid-1')
+    live.add_connection('sid-2', 'bob')
+    live.join_room('general', 'sid-2')
+
+    assert live.heartbeat() == 0
+    client.delete('ws:worker:dead')
+
+    assert live.heartbeat() == 1
+    assert [m['username'] for m in live.room_members('general')] == ['bob']
+    assert live.get_stats()['current_connections'] == 1
+    assert live.get_stats()['total_connections'] == 2
+
+def test_redis_registry_elects_one_stats_leader():
+    """Only one worker holds the stats role until its lease lapses"""
+    fakeredis = pytest.importorskip('fakeredis')
+    client = fakeredis.FakeRedis()
+    first = RedisRegistry(client, worker_id='first')
+    second = RedisRegistry(client, worker_id='second')
+    assert first.is_leader('stats')
+    assert not second.is_leader('stats')
+    assert first.is_leader('stats')
+
+    client.delete('ws:leader:stats')
+    assert second.is_leader('stats')
+    assert not first.is_leader('stats')
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
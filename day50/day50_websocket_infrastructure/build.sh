@@ -44,7 +44,7 @@ else
 fi
 
 pip install --upgrade pip
-pip install -r requirements.txt
+pip install -r requirements-test.txt
 
 echo "Running backend tests..."
 pytest tests/ -v
@@ -40,6 +40,7 @@ async def lifespan(app: FastAPI):
     
     # Cleanup
     logger.info("Shutting down Real-time API system")
+    offline_queue.close()
 
 app = FastAPI(title="Real-time API Design", lifespan=lifespan)
 
@@ -112,6 +113,7 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
             event_type = data.get("type")
             payload = data.get("payload", {})
             version = data.get("version", 0)
+            remote_hlc = data.get("hlc")
             
             # Create event
             event = Event(
@@ -122,20 +124,24 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
             )
             
             # Check for conflicts
-            conflict = sync_engine.detect_conflict(event)
+            conflict = sync_engine.detect_conflict(event, remote_hlc=remote_hlc)
             conflict_detected = conflict is not None
             if conflict:
                 resolved_event = sync_engine.resolve_conflict(event, conflict)
                 event = resolved_event
             
-            # Update client state
-            sync_engine.update_state(client_id, event)
-            
-            # Broadcast to all clients
-            await event_manager.broadcast_event(event, exclude_client=client_id)
+            if conflict is not None and event is conflict:
+                # The existing write won: leave it (and its owner and stamp) untouched
+                hlc = sync_engine.get_entity_hlc(event)
+            else:
+                # Update client state
+                hlc = sync_engine.update_state(client_id, event, remote_hlc=remote_hlc)
+                
+                # Broadcast to all clients
+                await event_manager.broadcast_event(event, exclude_client=client_id)
             
             # Send acknowledgment with conflict information
-            ack_msg = message_formatter.format_acknowledgment(event, conflict_detected=conflict_detected)
+            ack_msg = message_formatter.format_acknowledgment(event, conflict_detected=conflict_detected, hlc=hlc)
             await websocket.send_json(ack_msg)
             # Count acknowledgment as an event sent
             event_manager.increment_events_sent()
@@ -170,3 +176,8 @@ async def get_client_state(client_id: str):
     """Get current synchronized state for a client"""
     state = sync_engine.get_client_state(client_id)
     return {"client_id": client_id, "state": state}
+
+@app.get("/api/sync/delta")
+async def get_sync_delta(since: int = 0):
+    """Get entities changed after the given HLC; clients pass back the returned hlc next time"""
+    return sync_engine.get_changes_since(since)
@@ -1,4 +1,4 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from datetime import datetime
 from .models import Event
 
@@ -21,7 +21,7 @@ class MessageFormatter:
             }
         }
     
-    def format_acknowledgment(self, event: Event, conflict_detected: bool = False) -> Dict[str, Any]:
+    def format_acknowledgment(self, event: Event, conflict_detected: bool = False, hlc: Optional[int] = None) -> Dict[str, Any]:
         """Format acknowledgment message"""
         return {
             "type": "ack",
@@ -29,7 +29,8 @@ class MessageFormatter:
             "timestamp": datetime.utcnow().isoformat(),
             "status": "received",
             "version": event.version,
-            "conflict_detected": conflict_detected
+            "conflict_detected": conflict_detected,
+            "hlc": hlc
         }
     
     def validate_message(self, message: Dict[str, Any]) -> bool:
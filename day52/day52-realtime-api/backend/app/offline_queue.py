@@ -1,55 +1,213 @@
 import asyncio
-from typing import List, Dict
+import json
+import os
+from collections import deque
+from typing import List, Dict, Optional
 from datetime import datetime, timedelta
 import logging
 from .models import Event
 
 logger = logging.getLogger(__name__)
 
+SEGMENT_SUFFIX = ".log"
+CURSOR_FILE = "cursors.json"
+
+
+class Segment:
+    """One append-only file of the offline log, named after its first sequence number"""
+
+    def __init__(self, path: str, first_seq: int):
+        self.path = path
+        self.first_seq = first_seq
+        self.last_seq = first_seq - 1
+        self.last_timestamp: Optional[datetime] = None
+        self.size = os.path.getsize(path) if os.path.exists(path) else 0
+
+    def read(self, after_seq: int = 0):
+        """Yield records with seq > after_seq in sequence order"""
+        if self.size == 0:
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record["seq"] > after_seq:
+                    yield record
+
+
 class OfflineQueue:
-    def __init__(self, max_age_minutes: int = 60):
-        self.queues: Dict[str, List[Event]] = {}
+    """Segmented append-only event log with a per-client delivery cursor.
+
+    Events are appended in sequence order to segment files under ``data_dir``.
+    Each client only keeps a cursor (last delivered seq) and a pending counter,
+    so memory does not grow with the number of queued events. Replay after a
+    reconnect is a sequential read from the cursor, and retention drops whole
+    segments once every record in them is older than ``max_age``.
+    """
+
+    def __init__(
+        self,
+        max_age_minutes: int = 60,
+        data_dir: Optional[str] = None,
+        segment_max_bytes: int = 4 * 1024 * 1024,
+        max_backlog_per_client: int = 1000,
+        fsync: bool = False,
+    ):
         self.max_age = timedelta(minutes=max_age_minutes)
-    
+        self.data_dir = data_dir or os.getenv("OFFLINE_QUEUE_DIR", "data/offline_queue")
+        self.segment_max_bytes = segment_max_bytes
+        self.max_backlog = max_backlog_per_client
+        self.fsync = fsync
+
+        self.segments: List[Segment] = []
+        self.cursors: Dict[str, int] = {}
+        self.pending: Dict[str, int] = {}
+        self.next_seq = 1
+        self._active = None
+
+        os.makedirs(self.data_dir, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        """Rebuild segment metadata, cursors and pending counters from disk"""
+        cursor_path = os.path.join(self.data_dir, CURSOR_FILE)
+        if os.path.exists(cursor_path):
+            with open(cursor_path, "r", encoding="utf-8") as f:
+                self.cursors = {k: int(v) for k, v in json.load(f).items()}
+
+        names = sorted(n for n in os.listdir(self.data_dir) if n.endswith(SEGMENT_SUFFIX))
+        for name in names:
+            segment = Segment(os.path.join(self.data_dir, name), int(name[:-len(SEGMENT_SUFFIX)]))
+            if segment.size == 0:
+                os.remove(segment.path)
+                continue
+            for record in segment.read():
+                segment.last_seq = record["seq"]
+                segment.last_timestamp = datetime.fromisoformat(record["event"]["timestamp"])
+                client_id = record["client_id"]
+                if record["seq"] > self.cursors.get(client_id, 0):
+                    self.pending[client_id] = self.pending.get(client_id, 0) + 1
+            self.segments.append(segment)
+            self.next_seq = max(self.next_seq, segment.last_seq + 1)
+
+        if self.segments:
+            logger.info(
+                f"Loaded offline log: {len(self.segments)} segments, "
+                f"next seq {self.next_seq}, {len(self.pending)} clients with backlog"
+            )
+
+    def _roll_segment(self):
+        if self._active:
+            self._active.close()
+        path = os.path.join(self.data_dir, f"{self.next_seq:020d}{SEGMENT_SUFFIX}")
+        self.segments.append(Segment(path, self.next_seq))
+        self._active = open(path, "a", encoding="utf-8")
+
+    def _append(self, client_id: str, event: Event) -> int:
+        if not self.segments or self._active is None or self.segments[-1].size >= self.segment_max_bytes:
+            self._roll_segment()
+
+        seq = self.next_seq
+        line = json.dumps({
+            "seq": seq,
+            "client_id": client_id,
+            "event": event.model_dump(mode="json"),
+        }) + "\n"
+        self._active.write(line)
+        self._active.flush()
+        if self.fsync:
+            os.fsync(self._active.fileno())
+
+        segment = self.segments[-1]
+        segment.last_seq = seq
+        segment.last_timestamp = event.timestamp
+        segment.size += len(line)
+        self.next_seq += 1
+        return seq
+
+    def _save_cursors(self):
+        cursor_path = os.path.join(self.data_dir, CURSOR_FILE)
+        tmp_path = cursor_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.cursors, f)
+        os.replace(tmp_path, cursor_path)
+
     async def enqueue_event(self, client_id: str, event: Event):
-        """Add event to client's offline queue"""
-        if client_id not in self.queues:
-            self.queues[client_id] = []
-        
-        self.queues[client_id].append(event)
+        """Append event to the log for an offline client"""
+        self._append(client_id, event)
+        self.pending[client_id] = self.pending.get(client_id, 0) + 1
         logger.debug(f"Queued event for offline client {client_id}")
-    
+
     async def get_pending_events(self, client_id: str) -> List[Event]:
-        """Get and clear pending events for a client"""
-        if client_id not in self.queues:
+        """Replay events after the client's cursor and advance it to the log head"""
+        if not self.pending.get(client_id):
             return []
-        
-        events = self.queues[client_id]
-        self.queues[client_id] = []
-        
+
+        cursor = self.cursors.get(client_id, 0)
+        # Only the newest max_backlog events are kept for a client that fell far behind
+        events = deque(maxlen=self.max_backlog)
+        for segment in self.segments:
+            if segment.last_seq <= cursor:
+                continue
+            for record in segment.read(cursor):
+                if record["client_id"] == client_id:
+                    events.append(record["event"])
+
+        dropped = self.pending[client_id] - len(events)
+        if dropped > 0:
+            logger.warning(f"Dropped {dropped} events over backlog cap for {client_id}")
+
+        self.cursors[client_id] = self.next_seq - 1
+        del self.pending[client_id]
+        self._save_cursors()
+
         logger.info(f"Retrieved {len(events)} pending events for {client_id}")
-        return events
-    
+        return [Event(**e) for e in events]
+
     async def get_queue_size(self) -> int:
-        """Get total number of queued events"""
-        return sum(len(queue) for queue in self.queues.values())
-    
+        """Get total number of queued events (capped per client)"""
+        return sum(min(n, self.max_backlog) for n in self.pending.values())
+
+    def expire_segments(self, now: Optional[datetime] = None) -> int:
+        """Drop whole segments whose newest event is older than max_age"""
+        now = now or datetime.utcnow()
+        expired = 0
+        while self.segments:
+            segment = self.segments[0]
+            if segment.last_timestamp and now - segment.last_timestamp < self.max_age:
+                break
+            for record in segment.read(0):
+                client_id = record["client_id"]
+                if record["seq"] > self.cursors.get(client_id, 0) and self.pending.get(client_id):
+                    self.pending[client_id] -= 1
+                    if not self.pending[client_id]:
+                        del self.pending[client_id]
+            if len(self.segments) == 1:
+                # Next append opens a fresh active segment
+                self.close()
+            os.remove(segment.path)
+            self.segments.pop(0)
+            expired += 1
+
+        if expired:
+            # Cursors older than the log tail carry no information any more
+            tail = self.segments[0].first_seq if self.segments else self.next_seq
+            self.cursors = {c: s for c, s in self.cursors.items() if s >= tail or c in self.pending}
+            self._save_cursors()
+            logger.info(f"Expired {expired} offline log segments")
+        return expired
+
+    def close(self):
+        if self._active:
+            self._active.close()
+            self._active = None
+
     async def process_queue(self):
-        """Background task to clean old events"""
+        """Background task to drop expired segments"""
         while True:
             try:
                 await asyncio.sleep(60)  # Check every minute
-                
-                now = datetime.utcnow()
-                for client_id, events in list(self.queues.items()):
-                    # Remove events older than max_age
-                    self.queues[client_id] = [
-                        e for e in events
-                        if now - e.timestamp < self.max_age
-                    ]
-                    
-                    if not self.queues[client_id]:
-                        del self.queues[client_id]
-                        
+                self.expire_segments()
             except Exception as e:
                 logger.error(f"Error processing offline queue: {e}")
@@ -1,67 +1,136 @@
-from typing import Dict, Optional
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set
 from datetime import datetime
+import time
 import logging
 from .models import Event
 
 logger = logging.getLogger(__name__)
 
+LOGICAL_BITS = 16
+LOGICAL_MASK = (1 << LOGICAL_BITS) - 1
+# Client timestamps further ahead of the server's wall clock than this are clamped
+MAX_DRIFT_MS = 60_000
+
+
+class HybridLogicalClock:
+    """Hybrid logical clock packed into one int: wall-clock ms << 16 | logical counter"""
+
+    def __init__(self):
+        self.last = 0
+
+    @staticmethod
+    def pack(wall_ms: int, logical: int) -> int:
+        return (wall_ms << LOGICAL_BITS) | logical
+
+    @staticmethod
+    def unpack(hlc: int):
+        return hlc >> LOGICAL_BITS, hlc & LOGICAL_MASK
+
+    def now(self) -> int:
+        """Timestamp a local event"""
+        wall_ms = int(time.time() * 1000)
+        last_wall, last_logical = self.unpack(self.last)
+        if wall_ms > last_wall:
+            self.last = self.pack(wall_ms, 0)
+        else:
+            self.last = self.pack(last_wall, last_logical + 1)
+        return self.last
+
+    @staticmethod
+    def validate(remote) -> Optional[int]:
+        """A client-supplied HLC as an int, or None if it is not a usable timestamp"""
+        if isinstance(remote, bool) or not isinstance(remote, int) or remote <= 0:
+            return None
+        return remote
+
+    def update(self, remote) -> int:
+        """Merge a timestamp received from a client, keeping the clock monotonic.
+
+        Invalid values are ignored and values more than MAX_DRIFT_MS ahead of
+        the local wall clock are clamped, so one client cannot drag the server
+        clock into the future.
+        """
+        remote = self.validate(remote)
+        if remote is not None:
+            ceiling = self.pack(int(time.time() * 1000) + MAX_DRIFT_MS, 0)
+            if remote > ceiling:
+                logger.warning(f"Clamping client HLC {remote} that is more than {MAX_DRIFT_MS}ms ahead")
+                remote = ceiling
+            if remote > self.last:
+                self.last = remote
+        return self.now()
+
+
 class SyncEngine:
     def __init__(self):
-        self.client_states: Dict[str, Dict] = {}
+        # entity_id -> latest accepted write; kept in HLC order so delta sync reads from the tail
+        self.entities: "OrderedDict[str, Dict]" = OrderedDict()
+        self.client_entities: Dict[str, Set[str]] = {}
         self.version_vectors: Dict[str, int] = {}
+        self.clock = HybridLogicalClock()
         self.conflict_count = 0
         self.resolved_count = 0
-    
-    def update_state(self, client_id: str, event: Event):
-        """Update client state with new event"""
-        if client_id not in self.client_states:
-            self.client_states[client_id] = {}
-        
+
+    def update_state(self, client_id: str, event: Event, remote_hlc: Optional[int] = None) -> int:
+        """Record event as the latest write for its entity and return its HLC stamp"""
+        entity_id = event.payload.get("entity_id", "default")
+        hlc = self.clock.update(remote_hlc)
+
         # Update version vector
         self.version_vectors[client_id] = event.version
-        
-        # Update state
-        entity_id = event.payload.get("entity_id", "default")
-        self.client_states[client_id][entity_id] = {
+
+        previous = self.entities.pop(entity_id, None)
+        if previous and previous["owner"] != client_id:
+            self.client_entities[previous["owner"]].discard(entity_id)
+        self.entities[entity_id] = {
             "data": event.payload,
             "version": event.version,
-            "timestamp": event.timestamp
+            "timestamp": event.timestamp,
+            "owner": client_id,
+            "hlc": hlc
         }
-        
+        self.client_entities.setdefault(client_id, set()).add(entity_id)
+
         logger.debug(f"Updated state for {client_id}: version {event.version}")
-    
-    def detect_conflict(self, event: Event) -> Optional[Event]:
-        """Detect if event conflicts with existing state"""
+        return hlc
+
+    def detect_conflict(self, event: Event, remote_hlc=None) -> Optional[Event]:
+        """Detect if event conflicts with the latest write for its entity.
+
+        remote_hlc is the last HLC the client synced to; a write from another
+        client stamped after it is one this client has not seen.
+        """
         entity_id = event.payload.get("entity_id", "default")
-        
-        # Check all clients for conflicts (including same client for version conflicts)
-        for client_id, state in self.client_states.items():
-            if entity_id in state:
-                existing = state[entity_id]
-                
-                # Version conflict detected: existing version >= new version
-                # This catches: outdated versions, duplicate versions, or same client sending same version
-                if existing["version"] >= event.version:
-                    self.conflict_count += 1
-                    logger.warning(
-                        f"Conflict detected: entity {entity_id}, "
-                        f"existing v{existing['version']} vs new v{event.version} "
-                        f"(client: {client_id} vs {event.client_id})"
-                    )
-                    return Event(
-                        type=event.type,
-                        payload=existing["data"],
-                        client_id=client_id,
-                        version=existing["version"],
-                        timestamp=existing["timestamp"]
-                    )
-        
+        existing = self.entities.get(entity_id)
+        if not existing:
+            return None
+
+        # Version conflict detected: existing version >= new version
+        # This catches: outdated versions, duplicate versions, or same client sending same version
+        remote_hlc = self.clock.validate(remote_hlc)
+        concurrent = remote_hlc is not None and existing["owner"] != event.client_id and existing["hlc"] > remote_hlc
+        if existing["version"] >= event.version or concurrent:
+            self.conflict_count += 1
+            logger.warning(
+                f"Conflict detected: entity {entity_id}, "
+                f"existing v{existing['version']} vs new v{event.version} "
+                f"(client: {existing['owner']} vs {event.client_id})"
+            )
+            return Event(
+                type=event.type,
+                payload=existing["data"],
+                client_id=existing["owner"],
+                version=existing["version"],
+                timestamp=existing["timestamp"]
+            )
+
         return None
-    
+
     def resolve_conflict(self, new_event: Event, existing_event: Event) -> Event:
         """Resolve conflict using last-write-wins strategy"""
         self.resolved_count += 1
-        
+
         # Last write wins based on timestamp
         if new_event.timestamp > existing_event.timestamp:
             logger.info("Conflict resolved: accepting newer event")
@@ -71,13 +140,32 @@ class SyncEngine:
         else:
             logger.info("Conflict resolved: keeping existing event")
             return existing_event
-    
+
+    def get_entity_hlc(self, event: Event) -> Optional[int]:
+        """HLC of the latest accepted write for the event's entity"""
+        existing = self.entities.get(event.payload.get("entity_id", "default"))
+        return existing["hlc"] if existing else None
+
     def get_client_state(self, client_id: str) -> Dict:
-        """Get current state for a client"""
-        return self.client_states.get(client_id, {})
-    
+        """Get current state of the entities last written by a client"""
+        return {
+            entity_id: {k: self.entities[entity_id][k] for k in ("data", "version", "timestamp")}
+            for entity_id in self.client_entities.get(client_id, ())
+        }
+
+    def get_changes_since(self, since: int = 0) -> Dict:
+        """Delta sync: entities whose latest write is newer than the client's HLC"""
+        changes: List[Dict] = []
+        for entity_id in reversed(self.entities):
+            entry = self.entities[entity_id]
+            if entry["hlc"] <= since:
+                break
+            changes.append({"entity_id": entity_id, **entry})
+        changes.reverse()
+        return {"since": since, "hlc": self.clock.last, "changes": changes}
+
     def get_conflict_count(self) -> int:
         return self.conflict_count
-    
+
     def get_resolved_count(self) -> int:
         return self.resolved_count
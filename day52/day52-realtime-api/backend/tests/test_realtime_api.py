@@ -1,10 +1,14 @@
 import pytest
 import asyncio
+import time
+from datetime import datetime, timedelta
 from fastapi.testclient import TestClient
 from fastapi.websockets import WebSocket
 from httpx import AsyncClient, ASGITransport
 from app.main import app
 from app.models import Event, EventType
+from app.offline_queue import OfflineQueue
+from app.sync_engine import SyncEngine, HybridLogicalClock, MAX_DRIFT_MS
 
 @pytest.fixture
 def client():
@@ -45,3 +49,106 @@ def test_root_endpoint(client):
     response = client.get("/")
     assert response.status_code == 200
     assert response.json()["service"] == "Real-time API Design"
+
+@pytest.mark.asyncio
+async def test_offline_queue_replays_from_cursor(tmp_path):
+    queue = OfflineQueue(data_dir=str(tmp_path), segment_max_bytes=200)
+    for i in range(5):
+        await queue.enqueue_event("client-a", Event(type=EventType.MESSAGE_SENT, payload={"n": i}, client_id="server"))
+    await queue.enqueue_event("client-b", Event(type=EventType.MESSAGE_SENT, payload={"n": 99}, client_id="server"))
+    assert await queue.get_queue_size() == 6
+    assert len(queue.segments) > 1
+
+    events = await queue.get_pending_events("client-a")
+    assert [e.payload["n"] for e in events] == [0, 1, 2, 3, 4]
+    assert await queue.get_pending_events("client-a") == []
+    queue.close()
+
+    # Cursors and undelivered events survive a restart
+    reopened = OfflineQueue(data_dir=str(tmp_path), segment_max_bytes=200)
+    assert await reopened.get_pending_events("client-a") == []
+    events = await reopened.get_pending_events("client-b")
+    assert [e.payload["n"] for e in events] == [99]
+    reopened.close()
+
+@pytest.mark.asyncio
+async def test_offline_queue_caps_backlog_and_expires_segments(tmp_path):
+    queue = OfflineQueue(data_dir=str(tmp_path), segment_max_bytes=200, max_backlog_per_client=3)
+    for i in range(10):
+        await queue.enqueue_event("client-a", Event(type=EventType.MESSAGE_SENT, payload={"n": i}, client_id="server"))
+    assert await queue.get_queue_size() == 3
+
+    events = await queue.get_pending_events("client-a")
+    assert [e.payload["n"] for e in events] == [7, 8, 9]
+
+    await queue.enqueue_event("client-b", Event(type=EventType.MESSAGE_SENT, payload={}, client_id="server"))
+    assert queue.expire_segments(now=datetime.utcnow() + timedelta(hours=2)) > 0
+    assert queue.segments == []
+    assert await queue.get_queue_size() == 0
+    assert await queue.get_pending_events("client-b") == []
+    queue.close()
+
+def test_sync_engine_entity_index_and_delta():
+    engine = SyncEngine()
+    first = Event(type=EventType.USER_UPDATED, payload={"entity_id": "user-1"}, client_id="a", version=1)
+    assert engine.detect_conflict(first) is None
+    hlc_1 = engine.update_state("a", first)
+
+    stale = Event(type=EventType.USER_UPDATED, payload={"entity_id": "user-1"}, client_id="b", version=1)
+    conflict = engine.detect_conflict(stale)
+    assert conflict is not None and conflict.client_id == "a"
+
+    newer = Event(type=EventType.USER_UPDATED, payload={"entity_id": "user-1", "name": "x"}, client_id="b", version=2)
+    hlc_2 = engine.update_state("b", newer)
+    other = Event(type=EventType.USER_UPDATED, payload={"entity_id": "user-2"}, client_id="a", version=1)
+    hlc_3 = engine.update_state("a", other)
+    assert hlc_1 < hlc_2 < hlc_3
+
+    # Ownership moved to b, so a only holds user-2
+    assert set(engine.get_client_state("a")) == {"user-2"}
+    assert set(engine.get_client_state("b")) == {"user-1"}
+
+    delta = engine.get_changes_since(hlc_1)
+    assert [c["entity_id"] for c in delta["changes"]] == ["user-1", "user-2"]
+    assert engine.get_changes_since(hlc_3)["changes"] == []
+
+def test_hlc_ignores_invalid_and_clamps_future_client_clocks():
+    engine = SyncEngine()
+    event = Event(type=EventType.USER_UPDATED, payload={"entity_id": "user-1"}, client_id="a", version=1)
+    before = engine.update_state("a", event, remote_hlc="not-a-clock")
+    assert before > 0
+
+    far_future = HybridLogicalClock.pack(int(time.time() * 1000) + 10 * MAX_DRIFT_MS, 0)
+    event = Event(type=EventType.USER_UPDATED, payload={"entity_id": "user-1"}, client_id="a", version=2)
+    stamped = engine.update_state("a", event, remote_hlc=far_future)
+    wall_ms, _ = HybridLogicalClock.unpack(stamped)
+    assert wall_ms <= time.time() * 1000 + MAX_DRIFT_MS
+
+def test_sync_engine_flags_writes_concurrent_with_unseen_hlc():
+    engine = SyncEngine()
+    synced = engine.clock.now()
+    engine.update_state("a", Event(type=EventType.USER_UPDATED, payload={"entity_id": "user-1"}, client_id="a", version=1))
+
+    # b has a higher version but never saw a's write
+    unseen = Event(type=EventType.USER_UPDATED, payload={"entity_id": "user-1"}, client_id="b", version=2)
+    assert engine.detect_conflict(unseen, remote_hlc=synced) is not None
+    assert engine.detect_conflict(unseen, remote_hlc=engine.clock.last) is None
+
+def test_losing_write_keeps_existing_owner_and_stamp(monkeypatch, tmp_path):
+    monkeypatch.setattr(SyncEngine, "resolve_conflict", lambda self, new_event, existing_event: existing_event)
+    # The app's queue would otherwise be created under the working directory
+    monkeypatch.setenv("OFFLINE_QUEUE_DIR", str(tmp_path / "offline_queue"))
+    with TestClient(app) as client:
+        with client.websocket_connect("/ws/writer-a") as ws_a:
+            ws_a.send_json({"type": "user.updated", "payload": {"entity_id": "contested"}, "version": 5})
+            first = ws_a.receive_json()
+        with client.websocket_connect("/ws/writer-b") as ws_b:
+            ws_b.send_json({"type": "user.updated", "payload": {"entity_id": "contested"}, "version": 1})
+            ack = ws_b.receive_json()
+
+        assert ack["conflict_detected"] is True
+        assert ack["hlc"] == first["hlc"]
+        assert "contested" in client.get("/api/state/writer-a").json()["state"]
+        assert client.get("/api/state/writer-b").json()["state"] == {}
+        delta = client.get("/api/sync/delta", params={"since": first["hlc"]}).json()
+        assert delta["changes"] == []
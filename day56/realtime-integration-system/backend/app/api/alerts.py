@@ -21,5 +21,6 @@ async def create_alert(request: AlertRequest):
         "message": request.message,
         "source": request.source
     })
+    await integration_hub.record_alert("api", alert)
     
     return alert
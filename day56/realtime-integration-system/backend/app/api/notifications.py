@@ -24,5 +24,6 @@ async def send_notification(request: NotificationRequest):
         "message": request.message,
         "recipient": request.recipient
     })
+    await integration_hub.record_notification("api", result)
     
     return result
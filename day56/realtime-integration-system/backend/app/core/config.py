@@ -16,6 +16,7 @@ class Settings(BaseSettings):
     WS_HEARTBEAT_INTERVAL: int = 30
     WS_MESSAGE_BATCH_SIZE: int = 10
     WS_MESSAGE_BATCH_TIMEOUT: float = 0.05
+    BATCH_MAX_CONCURRENCY: int = 4
     
     # Circuit Breaker
     CB_FAILURE_THRESHOLD: int = 5
@@ -1,13 +1,18 @@
 from typing import Dict, List
 from datetime import datetime
+import bisect
 import statistics
 
+# Upper bounds for histogram buckets; the last bucket catches everything above
+DEFAULT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, float("inf"))
+
 class MetricsCollector:
     """Collect and aggregate system metrics"""
     
     def __init__(self):
         self.counters: Dict[str, int] = {}
         self.latencies: Dict[str, List[float]] = {}
+        self.histograms: Dict[str, Dict] = {}
     
     def increment_counter(self, name: str, value: int = 1):
         """Increment a counter metric"""
@@ -25,6 +30,20 @@ class MetricsCollector:
         if len(self.latencies[operation]) > 1000:
             self.latencies[operation] = self.latencies[operation][-1000:]
     
+    def observe(self, name: str, value: float, buckets: tuple = DEFAULT_BUCKETS):
+        """Record a value into a fixed-bucket histogram"""
+        if name not in self.histograms:
+            self.histograms[name] = {
+                "buckets": buckets,
+                "counts": [0] * len(buckets),
+                "sum": 0.0,
+                "count": 0
+            }
+        histogram = self.histograms[name]
+        histogram["counts"][bisect.bisect_left(histogram["buckets"], value)] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+    
     def get_average_latency(self, operation: str) -> float:
         """Get average latency for operation"""
         if operation not in self.latencies or not self.latencies[operation]:
@@ -44,7 +63,8 @@ class MetricsCollector:
         """Get metrics summary"""
         summary = {
             "counters": self.counters.copy(),
-            "latencies": {}
+            "latencies": {},
+            "histograms": {}
         }
         
         for operation in self.latencies:
@@ -56,4 +76,14 @@ class MetricsCollector:
                     "p99": round(self.get_percentile(operation, 99), 2)
                 }
         
+        for name, histogram in self.histograms.items():
+            summary["histograms"][name] = {
+                "buckets": {
+                    ("+Inf" if bound == float("inf") else str(bound)): count
+                    for bound, count in zip(histogram["buckets"], histogram["counts"])
+                },
+                "sum": round(histogram["sum"], 2),
+                "count": histogram["count"]
+            }
+        
         return summary
@@ -66,6 +66,7 @@ app.include_router(alerts.router, prefix="/api/alerts", tags=["alerts"])
 async def websocket_endpoint(websocket: WebSocket, client_id: str):
     """WebSocket connection handler with recovery support"""
     await ws_manager.connect(client_id, websocket)
+    integration_hub.register_client(client_id)
     
     try:
         while True:
@@ -76,6 +77,7 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
     except Exception as e:
         logger.error("WebSocket error", client_id=client_id, error=str(e))
     finally:
+        integration_hub.unregister_client(client_id)
         await ws_manager.disconnect(client_id)
 
 @app.get("/")
@@ -1,5 +1,5 @@
 import asyncio
-from typing import Dict, Any
+from typing import Dict, Any, List
 import structlog
 from datetime import datetime
 from app.core.metrics import MetricsCollector
@@ -44,3 +44,29 @@ class AlertDispatcher:
         except Exception as e:
             logger.error("Alert dispatch failed", error=str(e))
             raise
+    
+    async def dispatch_alerts(self, alerts_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Dispatch a batch of alerts in one pass"""
+        start_time = datetime.now()
+        priority_map = {"critical": 0, "high": 1, "medium": 2, "low": 3, "info": 4}
+        alerts = []
+        
+        for index, alert_data in enumerate(alerts_data):
+            severity = alert_data.get("severity", "info")
+            created_at = datetime.now()
+            alert = {
+                "alert_id": f"alert_{created_at.timestamp()}_{index}",
+                "severity": severity,
+                "message": alert_data.get("message", ""),
+                "created_at": created_at.isoformat(),
+                "status": "active"
+            }
+            self.alert_queue.put_nowait((priority_map.get(severity, 4), created_at.timestamp(), alert))
+            self.metrics.increment_counter(f"alerts_{severity}")
+            alerts.append(alert)
+        
+        latency = (datetime.now() - start_time).total_seconds() * 1000
+        self.metrics.record_latency("alert_dispatch", latency)
+        self.metrics.increment_counter("alerts_created", len(alerts))
+        
+        return alerts
@@ -73,10 +73,10 @@ class IntegrationHub:
                 })
             
             elif message_type == "create_alert":
-                await self._handle_create_alert(client_id, data)
+                await self.enqueue_message("alert", client_id, data)
             
             elif message_type == "send_notification":
-                await self._handle_send_notification(client_id, data)
+                await self.enqueue_message("notification", client_id, data)
             
             elif message_type == "sync_state":
                 await self._handle_state_sync(client_id, data)
@@ -97,70 +97,6 @@ class IntegrationHub:
                 "message": "Failed to process message"
             })
     
-    async def _handle_create_alert(self, client_id: str, data: Dict[str, Any]):
-        """Create and dispatch alert"""
-        cb = self.circuit_breakers["alerts"]
-        
-        try:
-            # Try to dispatch alert even if circuit breaker is open (for demo purposes)
-            # In production, you might want to queue it
-            alert = await self.alert_dispatcher.dispatch_alert(
-                data.get("alert_data", {})
-            )
-            
-            # Record success for circuit breaker
-            cb.record_success()
-            
-            # Send confirmation to the client that created it
-            await self.ws_manager.send_to_client(client_id, {
-                "type": "alert_created",
-                "alert": alert
-            })
-            
-            # Also broadcast to all connected clients
-            await self.ws_manager.broadcast({
-                "type": "alert_created",
-                "alert": alert
-            }, exclude=[client_id])  # Exclude sender to avoid duplicate
-            
-            self.metrics.increment_counter("alerts_created")
-            
-        except Exception as e:
-            logger.error("Failed to create alert", error=str(e))
-            cb.record_failure()
-            # Send error to client
-            await self.ws_manager.send_to_client(client_id, {
-                "type": "error",
-                "message": f"Failed to create alert: {str(e)}"
-            })
-    
-    async def _handle_send_notification(self, client_id: str, data: Dict[str, Any]):
-        """Send notification through engine"""
-        cb = self.circuit_breakers["notifications"]
-        
-        if cb.is_open():
-            logger.warning("Notification circuit breaker open, using fallback")
-            # Fallback: store in state for retry
-            await self.state_manager.queue_notification(data)
-            return
-        
-        try:
-            result = await cb.call(
-                self.notification_engine.send_notification,
-                data.get("notification_data", {})
-            )
-            
-            await self.ws_manager.send_to_client(client_id, {
-                "type": "notification_sent",
-                "result": result
-            })
-            
-            self.metrics.increment_counter("notifications_sent")
-            
-        except Exception as e:
-            logger.error("Failed to send notification", error=str(e))
-            cb.record_failure()
-    
     async def _handle_state_sync(self, client_id: str, data: Dict[str, Any]):
         """Sync state after reconnection"""
         last_version = data.get("last_version", 0)
@@ -195,46 +131,127 @@ class IntegrationHub:
         
         await self.ws_manager.send_to_client(client_id, status)
     
+    async def enqueue_message(self, message_type: str, client_id: str, data: Dict[str, Any]):
+        """Queue a message for batched, typed dispatch"""
+        await self.message_queue.put((message_type, client_id, data))
+    
     async def _batch_processor(self):
         """Process messages in batches for efficiency"""
+        loop = asyncio.get_running_loop()
         batch = []
-        last_flush = datetime.now()
+        first_enqueued = None
         
         while self.running:
             try:
-                # Wait for message or timeout
+                # Wait for a message, but never past the current batch's flush deadline
+                timeout = settings.WS_MESSAGE_BATCH_TIMEOUT
+                if first_enqueued is not None:
+                    timeout = max(first_enqueued + settings.WS_MESSAGE_BATCH_TIMEOUT - loop.time(), 0)
                 try:
-                    message = await asyncio.wait_for(
-                        self.message_queue.get(),
-                        timeout=settings.WS_MESSAGE_BATCH_TIMEOUT
-                    )
+                    message = await asyncio.wait_for(self.message_queue.get(), timeout=timeout)
+                    if not batch:
+                        first_enqueued = loop.time()
                     batch.append(message)
+                    # Drain whatever is already waiting without another timed wait
+                    while len(batch) < settings.WS_MESSAGE_BATCH_SIZE and not self.message_queue.empty():
+                        batch.append(self.message_queue.get_nowait())
                 except asyncio.TimeoutError:
                     pass
                 
-                # Flush batch if full or timeout
-                should_flush = (
+                should_flush = batch and (
                     len(batch) >= settings.WS_MESSAGE_BATCH_SIZE or
-                    (datetime.now() - last_flush).total_seconds() > settings.WS_MESSAGE_BATCH_TIMEOUT
+                    loop.time() - first_enqueued >= settings.WS_MESSAGE_BATCH_TIMEOUT
                 )
                 
-                if should_flush and batch:
+                if should_flush:
+                    self.metrics.observe("batch_size", len(batch))
+                    self.metrics.observe("batch_flush_latency_ms", (loop.time() - first_enqueued) * 1000)
                     await self._process_batch(batch)
-                    batch.clear()
-                    last_flush = datetime.now()
+                    batch = []
+                    first_enqueued = None
                     
             except Exception as e:
                 logger.error("Batch processor error", error=str(e))
     
     async def _process_batch(self, batch: List):
-        """Process a batch of messages"""
+        """Group a batch by message type and run one bulk handler per type"""
+        handlers = {
+            "alert": ("alerts", self._bulk_create_alerts),
+            "notification": ("notifications", self._bulk_send_notifications),
+        }
+        groups: Dict[str, List] = {}
         for message_type, client_id, data in batch:
-            try:
-                if message_type == "alert":
-                    await self._handle_create_alert(client_id, data)
-                # Add other message types
-            except Exception as e:
-                logger.error("Batch message error", error=str(e))
+            groups.setdefault(message_type, []).append((client_id, data))
+        
+        semaphore = asyncio.Semaphore(settings.BATCH_MAX_CONCURRENCY)
+        
+        async def run(message_type: str, messages: List):
+            if message_type not in handlers:
+                logger.warning("No batch handler for message type", message_type=message_type)
+                return
+            service, handler = handlers[message_type]
+            cb = self.circuit_breakers[service]
+            if cb.is_open():
+                # Skip dispatch for the whole group instead of failing message by message
+                logger.warning("Circuit breaker open, skipping batch", service=service, size=len(messages))
+                self.metrics.increment_counter(f"batch_skipped_{service}", len(messages))
+                if service == "notifications":
+                    for _, data in messages:
+                        await self.state_manager.queue_notification(data)
+                else:
+                    await self._send_batch_error(messages, f"{service} unavailable, try again later")
+                return
+            
+            async with semaphore:
+                start = asyncio.get_running_loop().time()
+                try:
+                    await handler(messages)
+                    cb.record_success()
+                except Exception as e:
+                    logger.error("Batch handler error", message_type=message_type, error=str(e))
+                    cb.record_failure()
+                    await self._send_batch_error(messages, f"Failed to process {message_type}: {str(e)}")
+                finally:
+                    elapsed = (asyncio.get_running_loop().time() - start) * 1000
+                    self.metrics.observe(f"batch_handler_ms_{message_type}", elapsed)
+        
+        await asyncio.gather(*(run(t, msgs) for t, msgs in groups.items()))
+    
+    async def _send_batch_error(self, messages: List, error: str):
+        """Tell each client with a message in a failed group that it was not processed"""
+        await asyncio.gather(*(
+            self.ws_manager.send_to_client(client_id, {"type": "error", "message": error})
+            for client_id in {client_id for client_id, _ in messages}
+        ))
+    
+    async def _bulk_create_alerts(self, messages: List):
+        """Create all alerts of a batch at once and fan them out concurrently"""
+        alerts = await self.alert_dispatcher.dispatch_alerts(
+            [data.get("alert_data", {}) for _, data in messages]
+        )
+        for (client_id, _), alert in zip(messages, alerts):
+            await self.record_alert(client_id, alert)
+        # Every client, including the sender, receives each alert exactly once
+        await asyncio.gather(*(
+            self.ws_manager.broadcast({"type": "alert_created", "alert": alert})
+            for alert in alerts
+        ))
+    
+    async def _bulk_send_notifications(self, messages: List):
+        """Send all notifications of a batch with one engine call"""
+        results = await self.notification_engine.send_notifications(
+            [data.get("notification_data", {}) for _, data in messages]
+        )
+        for (client_id, _), result in zip(messages, results):
+            await self.record_notification(client_id, result)
+        await asyncio.gather(*(
+            self.ws_manager.send_to_client(client_id, {
+                "type": "notification_sent",
+                "result": result
+            })
+            for (client_id, _), result in zip(messages, results)
+        ))
+        self.metrics.increment_counter("notifications_sent", len(results))
     
     async def _health_monitor(self):
         """Monitor system health"""
@@ -262,19 +279,49 @@ class IntegrationHub:
                 logger.error("Health monitor error", error=str(e))
     
     async def _state_sync_loop(self):
-        """Periodically sync state across connections"""
+        """Push state deltas to the clients that are behind whenever state changes"""
         while self.running:
             try:
-                await asyncio.sleep(30)
-                
-                # Get current state version
-                version = await self.state_manager.get_current_version()
-                
-                # Broadcast version to all clients
-                await self.ws_manager.broadcast({
-                    "type": "version_check",
-                    "version": version
-                })
-                
+                await self.state_manager.wait_for_change()
+
+                # Coalesce a burst of changes into one push per client
+                await asyncio.sleep(settings.WS_MESSAGE_BATCH_TIMEOUT)
+
+                behind = [
+                    client_id for client_id in self.state_manager.clients_behind()
+                    if client_id in self.ws_manager.connections
+                ]
+                if behind:
+                    await asyncio.gather(
+                        *(self._push_delta(client_id) for client_id in behind),
+                        return_exceptions=True
+                    )
+                    self.metrics.increment_counter("state_pushes", len(behind))
+
             except Exception as e:
                 logger.error("State sync loop error", error=str(e))
+
+    async def _push_delta(self, client_id: str):
+        """Send a client the changes since its last known version"""
+        from_version = self.state_manager.client_versions.get(client_id, 0)
+        delta = await self.state_manager.get_delta(client_id, from_version)
+        await self.ws_manager.send_to_client(client_id, {
+            "type": "state_sync",
+            "delta": delta,
+            "current_version": delta["version"]
+        })
+
+    async def record_alert(self, client_id: str, alert: Dict[str, Any]):
+        """Add a created alert to the state delta log"""
+        await self.state_manager.add_state_change(client_id, {f"alert:{alert['alert_id']}": alert})
+
+    async def record_notification(self, client_id: str, result: Dict[str, Any]):
+        """Add a sent notification to the state delta log"""
+        await self.state_manager.add_state_change(client_id, {f"notification:{result['notification_id']}": result})
+
+    def register_client(self, client_id: str):
+        """Start tracking a newly connected client for state pushes"""
+        self.state_manager.register_client(client_id)
+
+    def unregister_client(self, client_id: str):
+        self.state_manager.unregister_client(client_id)
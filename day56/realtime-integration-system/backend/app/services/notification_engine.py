@@ -1,5 +1,5 @@
 import asyncio
-from typing import Dict, Any
+from typing import Dict, Any, List
 import structlog
 from datetime import datetime
 from app.core.metrics import MetricsCollector
@@ -39,3 +39,32 @@ class NotificationEngine:
         except Exception as e:
             logger.error("Notification send failed", error=str(e))
             raise
+    
+    async def send_notifications(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Send a batch of notifications with one provider call"""
+        start_time = datetime.now()
+        
+        try:
+            # Simulate one bulk API call for the whole batch
+            await asyncio.sleep(0.01)
+            
+            results = []
+            for index, data in enumerate(batch):
+                channel = data.get("channel", "email")
+                sent_at = datetime.now()
+                results.append({
+                    "notification_id": f"notif_{sent_at.timestamp()}_{index}",
+                    "status": "sent",
+                    "channel": channel,
+                    "sent_at": sent_at.isoformat()
+                })
+                self.metrics.increment_counter(f"notifications_{channel}")
+            
+            latency = (datetime.now() - start_time).total_seconds() * 1000
+            self.metrics.record_latency("notification_send", latency)
+            
+            return results
+            
+        except Exception as e:
+            logger.error("Bulk notification send failed", error=str(e))
+            raise
@@ -1,61 +1,132 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+from collections import OrderedDict, deque
 from datetime import datetime
 import asyncio
+import bisect
 import structlog
 
 logger = structlog.get_logger()
 
 class StateManager:
-    """Manages application state and synchronization"""
-    
-    def __init__(self):
-        self.state_versions: Dict[str, int] = {}
-        self.state_deltas: Dict[str, List[Dict]] = {}
+    """Manages application state and synchronization
+
+    All state changes go into one global delta log, versioned by a single
+    counter and held in fixed-size ring segments. Because versions are
+    contiguous, a delta is a bisect over segment base versions plus a slice.
+    Clients whose version has fallen off the ring get a snapshot instead,
+    holding the latest value of the snapshot_size most recently changed keys.
+    """
+
+    def __init__(self, segment_size: int = 256, max_segments: int = 16, snapshot_size: int = 1000):
+        self.segment_size = segment_size
+        self.max_segments = max_segments
+        self.snapshot_size = snapshot_size
+        self.segments: deque = deque()
+        self.segment_bases: List[int] = []
+        self.snapshot: "OrderedDict[str, Any]" = OrderedDict()
+        self.client_versions: Dict[str, int] = {}
         self.current_version = 0
         self.pending_notifications: List[Dict] = []
-    
+        self.changed = asyncio.Event()
+
     async def get_current_version(self) -> int:
         """Get current global state version"""
         return self.current_version
-    
+
+    @property
+    def oldest_version(self) -> int:
+        """Oldest version still held in the ring"""
+        return self.segment_bases[0] if self.segment_bases else self.current_version + 1
+
+    def _events_after(self, from_version: int) -> List[Dict]:
+        events = []
+        index = max(bisect.bisect_right(self.segment_bases, from_version) - 1, 0)
+        for segment_index in range(index, len(self.segments)):
+            segment = self.segments[segment_index]
+            offset = from_version - self.segment_bases[segment_index] + 1
+            events.extend(segment[max(offset, 0):])
+        return events
+
     async def get_delta(self, client_id: str, from_version: int) -> Dict[str, Any]:
-        """Get state changes since version"""
-        delta_events = []
-        
-        # Get all events after from_version
-        if client_id in self.state_deltas:
-            delta_events = [
-                event for event in self.state_deltas[client_id]
-                if event["version"] > from_version
-            ]
-        
+        """Get state changes since version, or a snapshot if the client fell off the ring"""
+        # Only connected clients are tracked; one-off callers must not grow the map
+        if client_id in self.client_versions:
+            self.client_versions[client_id] = self.current_version
+
+        if from_version >= self.current_version:
+            return {"events": [], "version": self.current_version}
+
+        if from_version + 1 < self.oldest_version:
+            logger.info("Client behind delta ring, sending snapshot",
+                        client_id=client_id,
+                        from_version=from_version,
+                        oldest_version=self.oldest_version)
+            return {
+                "events": [],
+                "snapshot": dict(self.snapshot),
+                "version": self.current_version
+            }
+
         return {
-            "events": delta_events,
+            "events": self._events_after(from_version),
             "version": self.current_version
         }
-    
-    async def add_state_change(self, client_id: str, change: Dict[str, Any]):
-        """Record state change"""
+
+    async def add_state_change(self, client_id: str, change: Dict[str, Any]) -> Dict[str, Any]:
+        """Record state change in the global log"""
         self.current_version += 1
-        
+
         event = {
             "version": self.current_version,
+            "client_id": client_id,
             "change": change,
             "timestamp": datetime.now().isoformat()
         }
-        
-        if client_id not in self.state_deltas:
-            self.state_deltas[client_id] = []
-        
-        self.state_deltas[client_id].append(event)
-        
-        # Keep only last 100 events
-        if len(self.state_deltas[client_id]) > 100:
-            self.state_deltas[client_id] = self.state_deltas[client_id][-100:]
-    
+
+        if not self.segments or len(self.segments[-1]) >= self.segment_size:
+            if len(self.segments) >= self.max_segments:
+                # Drop the oldest segment whole instead of re-slicing on every append
+                self.segments.popleft()
+                self.segment_bases.pop(0)
+            self.segments.append([])
+            self.segment_bases.append(self.current_version)
+
+        self.segments[-1].append(event)
+        for key, value in change.items():
+            self.snapshot.pop(key, None)
+            self.snapshot[key] = value
+        while len(self.snapshot) > self.snapshot_size:
+            self.snapshot.popitem(last=False)
+        # The originating client already has this change
+        if self.client_versions.get(client_id) == self.current_version - 1:
+            self.client_versions[client_id] = self.current_version
+
+        self.changed.set()
+        return event
+
+    def register_client(self, client_id: str, version: Optional[int] = None):
+        """Track the version a connected client has seen"""
+        self.client_versions[client_id] = self.current_version if version is None else version
+
+    def unregister_client(self, client_id: str):
+        self.client_versions.pop(client_id, None)
+
+    def clients_behind(self) -> List[str]:
+        """Clients whose last known version is older than the current one"""
+        return [
+            client_id for client_id, version in self.client_versions.items()
+            if version < self.current_version
+        ]
+
+    async def wait_for_change(self):
+        """Block until at least one state change has been recorded"""
+        await self.changed.wait()
+        self.changed.clear()
+
     async def queue_notification(self, notification: Dict[str, Any]):
         """Queue notification for retry"""
         self.pending_notifications.append({
             "notification": notification,
             "queued_at": datetime.now().isoformat()
         })
+        await self.add_state_change("system", {"pending_notifications": len(self.pending_notifications)})
@@ -0,0 +1,23 @@
+import pytest
+
+
+class FakeWebSocketManager:
+    def __init__(self):
+        self.connections = {}
+        self.sent = []
+
+    async def send_to_client(self, client_id, message):
+        self.sent.append((client_id, message))
+
+    async def broadcast(self, message, exclude=None):
+        for client_id in self.connections:
+            if client_id not in (exclude or []):
+                self.sent.append((client_id, message))
+
+    def get_connection_count(self):
+        return len(self.connections)
+
+
+@pytest.fixture
+def ws_manager():
+    return FakeWebSocketManager()
@@ -0,0 +1,86 @@
+import asyncio
+import pytest
+from app.core.config import settings
+from app.core.metrics import MetricsCollector
+from app.services.integration_hub import IntegrationHub
+
+
+@pytest.fixture
+def hub(ws_manager):
+    return IntegrationHub(ws_manager, MetricsCollector())
+
+
+def record_calls(monkeypatch, target, name):
+    calls = []
+    original = getattr(target, name)
+
+    async def wrapper(batch):
+        calls.append(list(batch))
+        return await original(batch)
+
+    monkeypatch.setattr(target, name, wrapper)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_client_messages_are_grouped_and_bulk_dispatched(hub, ws_manager, monkeypatch):
+    alert_calls = record_calls(monkeypatch, hub.alert_dispatcher, "dispatch_alerts")
+    notification_calls = record_calls(monkeypatch, hub.notification_engine, "send_notifications")
+    ws_manager.connections = {"a": object(), "b": object()}
+
+    await hub.start()
+    try:
+        await hub.handle_client_message("a", {"type": "create_alert", "alert_data": {"severity": "high"}})
+        await hub.handle_client_message("b", {"type": "send_notification", "notification_data": {"channel": "sms"}})
+        await hub.handle_client_message("b", {"type": "create_alert", "alert_data": {"severity": "low"}})
+        await hub.handle_client_message("a", {"type": "send_notification", "notification_data": {"channel": "email"}})
+        await asyncio.sleep(settings.WS_MESSAGE_BATCH_TIMEOUT + 0.2)
+    finally:
+        await hub.stop()
+
+    assert alert_calls == [[{"severity": "high"}, {"severity": "low"}]]
+    assert notification_calls == [[{"channel": "sms"}, {"channel": "email"}]]
+
+    sent = [(client_id, message["type"]) for client_id, message in ws_manager.sent]
+    # Every connected client gets each alert once; each sender gets its own notification result
+    assert sent.count(("a", "alert_created")) == 2
+    assert sent.count(("b", "alert_created")) == 2
+    assert sent.count(("a", "notification_sent")) == 1
+    assert sent.count(("b", "notification_sent")) == 1
+
+    histograms = hub.metrics.histograms
+    assert histograms["batch_size"]["count"] == 1
+    assert histograms["batch_size"]["sum"] == 4
+    assert histograms["batch_handler_ms_alert"]["count"] == 1
+    assert histograms["batch_handler_ms_notification"]["count"] == 1
+    assert hub.metrics.counters["notifications_sent"] == 2
+
+
+@pytest.mark.asyncio
+async def test_full_batch_flushes_without_waiting_for_timeout(hub, monkeypatch):
+    alert_calls = record_calls(monkeypatch, hub.alert_dispatcher, "dispatch_alerts")
+    monkeypatch.setattr(settings, "WS_MESSAGE_BATCH_TIMEOUT", 5.0)
+
+    await hub.start()
+    try:
+        for i in range(settings.WS_MESSAGE_BATCH_SIZE):
+            await hub.enqueue_message("alert", "a", {"alert_data": {"message": str(i)}})
+        await asyncio.sleep(0.1)
+    finally:
+        await hub.stop()
+
+    assert len(alert_calls) == 1
+    assert len(alert_calls[0]) == settings.WS_MESSAGE_BATCH_SIZE
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_skips_group_and_tells_clients(hub, ws_manager):
+    breaker = hub.circuit_breakers["alerts"]
+    for _ in range(settings.CB_FAILURE_THRESHOLD):
+        breaker.record_failure()
+    assert breaker.is_open()
+
+    await hub._process_batch([("alert", "a", {"alert_data": {}}), ("alert", "a", {"alert_data": {}})])
+
+    assert ws_manager.sent == [("a", {"type": "error", "message": "alerts unavailable, try again later"})]
+    assert hub.metrics.counters["batch_skipped_alerts"] == 2
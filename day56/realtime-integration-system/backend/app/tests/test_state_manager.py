@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+from app.core.metrics import MetricsCollector
+from app.services.integration_hub import IntegrationHub
+from app.services.state_manager import StateManager
+
+
+@pytest.mark.asyncio
+async def test_delta_spans_segments_from_client_version():
+    state = StateManager(segment_size=4, max_segments=4)
+    for i in range(10):
+        await state.add_state_change("writer", {f"key:{i}": i})
+
+    delta = await state.get_delta("reader", 3)
+    assert [event["version"] for event in delta["events"]] == list(range(4, 11))
+    assert delta["version"] == 10
+
+    assert (await state.get_delta("reader", 10))["events"] == []
+
+
+@pytest.mark.asyncio
+async def test_client_behind_ring_gets_bounded_snapshot():
+    state = StateManager(segment_size=2, max_segments=2, snapshot_size=3)
+    for i in range(10):
+        await state.add_state_change("writer", {f"key:{i % 5}": i})
+
+    assert state.oldest_version > 1
+    delta = await state.get_delta("reader", 0)
+    assert delta["events"] == []
+    assert delta["snapshot"] == {"key:2": 7, "key:3": 8, "key:4": 9}
+
+
+@pytest.mark.asyncio
+async def test_clients_behind_tracks_versions():
+    state = StateManager()
+    state.register_client("a")
+    state.register_client("b")
+    await state.add_state_change("a", {"x": 1})
+
+    # The writer was current, so it is treated as having its own change
+    assert state.clients_behind() == ["b"]
+    await state.get_delta("b", 0)
+    assert state.clients_behind() == []
+
+    # A caller that never registered is answered but not tracked
+    await state.get_delta("one-off", 0)
+    assert "one-off" not in state.client_versions
+
+
+@pytest.mark.asyncio
+async def test_alert_change_is_pushed_to_connected_clients_behind(ws_manager):
+    hub = IntegrationHub(ws_manager, MetricsCollector())
+    for client_id in ("creator", "watcher"):
+        ws_manager.connections[client_id] = object()
+        hub.register_client(client_id)
+
+    await hub.start()
+    try:
+        alert = {"alert_id": "alert_1", "severity": "high"}
+        await hub.record_alert("creator", alert)
+        await asyncio.sleep(0.2)
+    finally:
+        await hub.stop()
+
+    pushes = [(client_id, message) for client_id, message in ws_manager.sent if message["type"] == "state_sync"]
+    assert [client_id for client_id, _ in pushes] == ["watcher"]
+    events = pushes[0][1]["delta"]["events"]
+    assert events[0]["change"] == {"alert:alert_1": alert}
+    assert hub.state_manager.clients_behind() == []
+
+
+@pytest.mark.asyncio
+async def test_sync_state_catches_up_a_reconnecting_client(ws_manager):
+    hub = IntegrationHub(ws_manager, MetricsCollector())
+    await hub.record_notification("other", {"notification_id": "n1", "status": "sent"})
+    await hub.record_alert("other", {"alert_id": "a1"})
+
+    await hub.handle_client_message("returning", {"type": "sync_state", "last_version": 1})
+
+    client_id, message = ws_manager.sent[-1]
+    assert client_id == "returning" and message["type"] == "state_sync"
+    assert [event["change"] for event in message["delta"]["events"]] == [{"alert:a1": {"alert_id": "a1"}}]
+    assert message["current_version"] == 2
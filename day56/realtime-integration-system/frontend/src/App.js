@@ -8,6 +8,13 @@ import AlertPanel from './components/AlertPanel';
 import CircuitBreakerStatus from './components/CircuitBreakerStatus';
 import './App.css';
 
+// Prepend alerts (newest first) that are not already shown, keeping the latest 10
+function addAlerts(current, incoming) {
+  const known = new Set(current.map(alert => alert.alert_id));
+  const fresh = incoming.filter(alert => !known.has(alert.alert_id));
+  return [...fresh, ...current].slice(0, 10);
+}
+
 function App() {
   // Use useRef to maintain stable clientId across renders
   const clientIdRef = useRef(null);
@@ -19,6 +26,8 @@ function App() {
   const [metrics, setMetrics] = useState(null);
   const [notifications, setNotifications] = useState([]);
   const [alerts, setAlerts] = useState([]);
+  // Last state version received, sent back on reconnect to catch up on missed changes
+  const stateVersionRef = useRef(0);
   
   const { 
     isConnected, 
@@ -47,6 +56,9 @@ function App() {
         case 'connected':
           console.log('Connected to server');
           requestStatus();
+          if (stateVersionRef.current > 0) {
+            sendMessage({ type: 'sync_state', last_version: stateVersionRef.current });
+          }
           break;
         
         case 'status':
@@ -59,22 +71,34 @@ function App() {
           break;
         
         case 'alert_created':
-          setAlerts(prev => [data.alert, ...prev].slice(0, 10));
+          setAlerts(prev => addAlerts(prev, [data.alert]));
           break;
         
         case 'heartbeat':
           // Update last heartbeat time
           break;
         
-        case 'version_check':
-          // Handle version check
+        case 'state_sync': {
+          stateVersionRef.current = data.current_version;
+          const changes = data.delta.snapshot
+            ? [data.delta.snapshot]
+            : data.delta.events.map(event => event.change);
+          const missedAlerts = changes.flatMap(change =>
+            Object.entries(change)
+              .filter(([key]) => key.startsWith('alert:'))
+              .map(([, alert]) => alert)
+          );
+          if (missedAlerts.length > 0) {
+            setAlerts(prev => addAlerts(prev, missedAlerts.reverse()));
+          }
           break;
+        }
         
         default:
           console.log('Unknown message type:', data.type);
       }
     }
-  }, [lastMessage, requestStatus]);
+  }, [lastMessage, requestStatus, sendMessage]);
 
   const sendNotification = useCallback(() => {
     if (isConnected && sendMessage) {
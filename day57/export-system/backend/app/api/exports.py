@@ -19,6 +19,7 @@ class ExportRequest(BaseModel):
     notification_type: Optional[NotificationType] = None
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
+    compress: bool = False
 
 class ExportResponse(BaseModel):
     job_id: str
@@ -52,7 +53,8 @@ async def create_export(request: ExportRequest, db: Session = Depends(get_db)):
             "user_id": request.user_id,
             "notification_type": request.notification_type.value if request.notification_type else None,
             "start_date": request.start_date.isoformat() if request.start_date else None,
-            "end_date": request.end_date.isoformat() if request.end_date else None
+            "end_date": request.end_date.isoformat() if request.end_date else None,
+            "compress": request.compress
         }
     )
     
@@ -113,6 +115,8 @@ async def download_export(job_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=410, detail="Export has expired")
         
     filename = f"notifications_export.{job.export_format.value}"
+    if job.file_path.endswith(".gz"):
+        filename += ".gz"
     
     return FileResponse(
         job.file_path,
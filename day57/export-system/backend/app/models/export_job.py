@@ -15,6 +15,7 @@ class ExportFormat(str, enum.Enum):
     JSON = "json"
     PDF = "pdf"
     EXCEL = "excel"
+    PARQUET = "parquet"
 
 class ExportJob(Base):
     __tablename__ = "export_jobs"
@@ -0,0 +1,11 @@
+import gzip
+from typing import IO
+
+
+def open_output(file_path: str, binary: bool = False, compress: bool = False) -> IO:
+    """Open an export destination for streaming writes, optionally gzip-compressed"""
+    if compress:
+        return gzip.open(file_path, 'wb' if binary else 'wt', encoding=None if binary else 'utf-8', newline=None if binary else '')
+    if binary:
+        return open(file_path, 'wb')
+    return open(file_path, 'w', encoding='utf-8', newline='')
@@ -1,30 +1,28 @@
 import csv
-from io import StringIO
 from typing import List, Dict, Any
+from app.services import open_output
 
 class CSVExportService:
-    def __init__(self):
-        self.buffer = StringIO()
+    def __init__(self, file_path: str, compress: bool = False):
+        self.file = open_output(file_path, compress=compress)
         self.writer = None
         
     def initialize(self, headers: List[str]):
         self.writer = csv.DictWriter(
-            self.buffer,
+            self.file,
             fieldnames=headers,
             quoting=csv.QUOTE_MINIMAL
         )
         # Add BOM for Excel compatibility
-        self.buffer.write('\ufeff')
+        self.file.write('\ufeff')
         self.writer.writeheader()
         
     def write_batch(self, records: List[Dict[str, Any]]):
-        for record in records:
-            # Handle None values
-            cleaned_record = {k: (v if v is not None else '') for k, v in record.items()}
-            self.writer.writerow(cleaned_record)
-            
-    def get_content(self) -> str:
-        return self.buffer.getvalue()
+        # Rows go straight to the file; nothing is held beyond the current batch
+        self.writer.writerows(
+            {k: (v if v is not None else '') for k, v in record.items()}
+            for record in records
+        )
         
     def close(self):
-        self.buffer.close()
+        self.file.close()
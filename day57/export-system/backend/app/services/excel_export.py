@@ -2,11 +2,12 @@ from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Alignment
 from openpyxl.utils import get_column_letter
 from typing import List, Dict, Any
-from io import BytesIO
 from datetime import datetime
 
 class ExcelExportService:
-    def __init__(self):
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        # Write-only mode spools rows to disk instead of keeping a cell tree in memory
         self.wb = Workbook(write_only=True)
         self.ws = self.wb.create_sheet("Notifications")
         self.headers_written = False
@@ -33,10 +34,8 @@ class ExcelExportService:
                     row.append(str(value))
             self.ws.append(row)
             
-    def get_content(self) -> bytes:
-        buffer = BytesIO()
-        self.wb.save(buffer)
-        return buffer.getvalue()
+    def finalize(self):
+        self.wb.save(self.file_path)
         
     def close(self):
         self.wb.close()
@@ -1,32 +1,36 @@
 import json
 from typing import List, Dict, Any
 from datetime import datetime
+from app.services import open_output
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
 
 class JSONExportService:
-    def __init__(self):
-        self.items = []
+    def __init__(self, file_path: str, compress: bool = False):
+        self.file = open_output(file_path, compress=compress)
+        self.encoder = json.JSONEncoder(ensure_ascii=False, default=_default)
+        self.first = True
         
     def initialize(self, metadata: Dict[str, Any]):
-        self.metadata = metadata
-        self.items = []
+        # Open the document; records are streamed into the "data" array
+        self.file.write('{"metadata": ')
+        self.file.write(self.encoder.encode(metadata))
+        self.file.write(', "data": [\n')
         
     def write_batch(self, records: List[Dict[str, Any]]):
-        for record in records:
-            # Convert datetime objects to ISO format strings
-            serializable_record = {}
-            for key, value in record.items():
-                if isinstance(value, datetime):
-                    serializable_record[key] = value.isoformat()
-                else:
-                    serializable_record[key] = value
-            self.items.append(serializable_record)
-            
-    def get_content(self) -> str:
-        output = {
-            "metadata": self.metadata,
-            "data": self.items
-        }
-        return json.dumps(output, indent=2, ensure_ascii=False)
+        if not records:
+            return
+        chunk = ',\n'.join(self.encoder.encode(record) for record in records)
+        if not self.first:
+            chunk = ',\n' + chunk
+        self.file.write(chunk)
+        self.first = False
+        
+    def finalize(self):
+        self.file.write('\n]}\n')
         
     def close(self):
-        self.items = []
+        self.file.close()
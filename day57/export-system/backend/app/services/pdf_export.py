@@ -4,18 +4,17 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from typing import List, Dict, Any
-from io import BytesIO
 from datetime import datetime
 
 class PDFExportService:
-    def __init__(self):
-        self.buffer = BytesIO()
+    def __init__(self, file_path: str):
+        self.file_path = file_path
         self.elements = []
         self.styles = getSampleStyleSheet()
         
     def initialize(self, title: str, metadata: Dict[str, Any]):
         self.doc = SimpleDocTemplate(
-            self.buffer,
+            self.file_path,
             pagesize=letter,
             rightMargin=72,
             leftMargin=72,
@@ -69,8 +68,6 @@ class PDFExportService:
             
         self.doc.build(self.elements)
         
-    def get_content(self) -> bytes:
-        return self.buffer.getvalue()
-        
     def close(self):
-        self.buffer.close()
+        self.elements = []
+        self.table_data = []
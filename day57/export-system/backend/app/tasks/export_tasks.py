@@ -7,16 +7,70 @@ from app.services.csv_export import CSVExportService
 from app.services.json_export import JSONExportService
 from app.services.pdf_export import PDFExportService
 from app.services.excel_export import ExcelExportService
+from app.services.parquet_export import ParquetExportService
 from datetime import datetime, timedelta
 import os
+import time
 import uuid
 
 BATCH_SIZE = 1000
 EXPORT_STORAGE_PATH = os.getenv("EXPORT_STORAGE_PATH", "./exports")
+PROGRESS_INTERVAL_SECONDS = float(os.getenv("EXPORT_PROGRESS_INTERVAL", "2"))
+EXPORT_COLUMNS = ['id', 'user_id', 'title', 'message', 'notification_type', 'is_read', 'created_at']
+# Formats written row by row, which can therefore be gzip-compressed on the fly
+STREAMABLE_FORMATS = (ExportFormat.CSV, ExportFormat.JSON)
+
+def iter_keyset_batches(query, batch_size: int = BATCH_SIZE):
+    """Yield batches of row dicts ordered by primary key.
+    
+    Each page seeks past the last seen id instead of using OFFSET, so every
+    page costs the same no matter how deep into the export it is.
+    """
+    columns = query.with_entities(
+        Notification.id,
+        Notification.user_id,
+        Notification.title,
+        Notification.message,
+        Notification.notification_type,
+        Notification.is_read,
+        Notification.created_at
+    ).order_by(Notification.id)
+    
+    last_id = None
+    while True:
+        page = columns if last_id is None else columns.filter(Notification.id > last_id)
+        rows = page.limit(batch_size).all()
+        if not rows:
+            break
+        yield [
+            {
+                'id': row.id,
+                'user_id': row.user_id,
+                'title': row.title,
+                'message': row.message,
+                'notification_type': row.notification_type.value,
+                'is_read': row.is_read,
+                'created_at': row.created_at
+            }
+            for row in rows
+        ]
+        last_id = rows[-1].id
+        if len(rows) < batch_size:
+            break
+
+def report_progress(task, db, job, processed: int, total_records: int):
+    """Persist progress to the job row and the Celery result backend"""
+    job.processed_records = processed
+    db.commit()
+    task.update_state(
+        state='PROGRESS',
+        meta={'current': processed, 'total': total_records, 'percent': int((processed / total_records) * 100) if total_records else 100}
+    )
 
 @celery_app.task(bind=True)
 def generate_export(self, job_id: str):
     db = SessionLocal()
+    part_path = None
     try:
         job = db.query(ExportJob).filter(ExportJob.job_id == job_id).first()
         if not job:
@@ -43,88 +97,65 @@ def generate_export(self, job_id: str):
         job.total_records = total_records
         db.commit()
         
+        # Stream straight into a part file that is renamed once complete
+        os.makedirs(EXPORT_STORAGE_PATH, exist_ok=True)
+        compress = bool(job.filters and job.filters.get("compress")) and job.export_format in STREAMABLE_FORMATS
+        filename = f"{job_id}.{job.export_format.value}" + (".gz" if compress else "")
+        file_path = os.path.join(EXPORT_STORAGE_PATH, filename)
+        part_path = file_path + ".part"
+        
         # Initialize export service based on format
         if job.export_format == ExportFormat.CSV:
-            service = CSVExportService()
-            service.initialize(['id', 'user_id', 'title', 'message', 'notification_type', 'is_read', 'created_at'])
+            service = CSVExportService(part_path, compress=compress)
+            service.initialize(EXPORT_COLUMNS)
         elif job.export_format == ExportFormat.JSON:
-            service = JSONExportService()
+            service = JSONExportService(part_path, compress=compress)
             service.initialize({
                 'total': total_records,
                 'exported_at': datetime.utcnow().isoformat(),
                 'format': 'json'
             })
         elif job.export_format == ExportFormat.PDF:
-            service = PDFExportService()
+            service = PDFExportService(part_path)
             service.initialize('Notification Export Report', {'total_records': total_records})
         elif job.export_format == ExportFormat.EXCEL:
-            service = ExcelExportService()
-            service.initialize(['id', 'user_id', 'title', 'message', 'notification_type', 'is_read', 'created_at'])
+            service = ExcelExportService(part_path)
+            service.initialize(EXPORT_COLUMNS)
+        elif job.export_format == ExportFormat.PARQUET:
+            # zstd is applied per column chunk, so the gzip flag does not apply
+            service = ParquetExportService(part_path)
+            service.initialize()
         else:
             raise ValueError(f"Unsupported format: {job.export_format}")
             
-        # Process in batches
-        offset = 0
         processed = 0
+        last_progress = time.monotonic()
         
-        while offset < total_records:
-            batch = query.offset(offset).limit(BATCH_SIZE).all()
-            if not batch:
-                break
-                
-            # Convert to dict
-            batch_data = []
-            for notification in batch:
-                batch_data.append({
-                    'id': notification.id,
-                    'user_id': notification.user_id,
-                    'title': notification.title,
-                    'message': notification.message,
-                    'notification_type': notification.notification_type.value,
-                    'is_read': notification.is_read,
-                    'created_at': notification.created_at
-                })
+        try:
+            for batch_data in iter_keyset_batches(query, BATCH_SIZE):
+                # Write batch
+                if job.export_format == ExportFormat.PDF:
+                    service.write_batch(batch_data, ['id', 'user_id', 'title', 'message', 'type', 'read', 'created'])
+                else:
+                    service.write_batch(batch_data)
+                    
+                processed += len(batch_data)
                 
-            # Write batch
-            if job.export_format in [ExportFormat.CSV, ExportFormat.JSON, ExportFormat.EXCEL]:
-                service.write_batch(batch_data)
-            elif job.export_format == ExportFormat.PDF:
-                service.write_batch(batch_data, ['id', 'user_id', 'title', 'message', 'type', 'read', 'created'])
-                
-            processed += len(batch)
-            offset += BATCH_SIZE
-            
-            # Update progress
-            job.processed_records = processed
-            db.commit()
-            
-            self.update_state(
-                state='PROGRESS',
-                meta={'current': processed, 'total': total_records, 'percent': int((processed / total_records) * 100)}
-            )
-            
-        # Finalize export
-        if job.export_format == ExportFormat.PDF:
-            service.finalize()
-            
-        # Save file
-        os.makedirs(EXPORT_STORAGE_PATH, exist_ok=True)
-        file_extension = job.export_format.value
-        filename = f"{job_id}.{file_extension}"
-        file_path = os.path.join(EXPORT_STORAGE_PATH, filename)
-        
-        if job.export_format in [ExportFormat.PDF, ExportFormat.EXCEL]:
-            content = service.get_content()
-            with open(file_path, 'wb') as f:
-                f.write(content)
-            file_size = len(content)
-        else:
-            content = service.get_content()
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(content)
-            file_size = len(content.encode('utf-8'))
+                # Update progress at most once per interval instead of once per batch
+                now = time.monotonic()
+                if now - last_progress >= PROGRESS_INTERVAL_SECONDS:
+                    last_progress = now
+                    report_progress(self, db, job, processed, total_records)
+                    
+            # Finalize export
+            if job.export_format != ExportFormat.CSV:
+                service.finalize()
+        finally:
+            service.close()
             
-        service.close()
+        os.replace(part_path, file_path)
+        file_size = os.path.getsize(file_path)
+        report_progress(self, db, job, processed, total_records)
         
         # Update job
         job.status = ExportStatus.COMPLETED
@@ -143,6 +174,9 @@ def generate_export(self, job_id: str):
         }
         
     except Exception as e:
+        # Don't leave a partial file behind; a retry starts a fresh one
+        if part_path and os.path.exists(part_path):
+            os.remove(part_path)
         job.status = ExportStatus.FAILED
         job.error_message = str(e)
         job.retry_count += 1
@@ -3,7 +3,12 @@ from fastapi.testclient import TestClient
 from app.main import app
 from app.models.database import SessionLocal, engine, Base
 from app.models.notification import Notification, NotificationType
-from datetime import datetime
+from app.services.csv_export import CSVExportService
+from app.services.json_export import JSONExportService
+from app.services.parquet_export import ParquetExportService
+from datetime import datetime, timezone
+import gzip
+import json
 
 client = TestClient(app)
 
@@ -70,3 +75,60 @@ def test_list_exports(setup_database):
     response = client.get("/api/exports/list")
     assert response.status_code == 200
     assert isinstance(response.json(), list)
+
+def test_csv_export_streams_to_gzip_file(tmp_path):
+    path = tmp_path / "export.csv.gz"
+    service = CSVExportService(str(path), compress=True)
+    service.initialize(['id', 'title', 'created_at'])
+    for start in range(0, 30, 10):
+        service.write_batch([
+            {'id': i, 'title': None, 'created_at': datetime(2024, 1, 1)}
+            for i in range(start, start + 10)
+        ])
+    service.close()
+    
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    assert lines[0] == '\ufeffid,title,created_at'
+    assert len(lines) == 31
+    assert lines[1] == '0,,2024-01-01 00:00:00'
+
+def test_json_export_streams_valid_document(tmp_path):
+    path = tmp_path / "export.json"
+    service = JSONExportService(str(path))
+    service.initialize({'total': 3, 'format': 'json'})
+    service.write_batch([{'id': 1, 'created_at': datetime(2024, 1, 1)}])
+    service.write_batch([])
+    service.write_batch([{'id': 2, 'created_at': None}, {'id': 3, 'created_at': None}])
+    service.finalize()
+    service.close()
+    
+    document = json.loads(path.read_text(encoding='utf-8'))
+    assert document['metadata']['total'] == 3
+    assert [item['id'] for item in document['data']] == [1, 2, 3]
+    assert document['data'][0]['created_at'] == '2024-01-01T00:00:00'
+
+def test_parquet_export_buffers_batches_into_row_groups(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "export.parquet"
+    service = ParquetExportService(str(path), row_group_size=20)
+    service.initialize()
+    for start in range(0, 50, 10):
+        service.write_batch([
+            {
+                'id': i, 'user_id': i % 3, 'title': f'Title {i}', 'message': 'body',
+                'notification_type': 'info', 'is_read': 0,
+                'created_at': datetime(2024, 1, 1, tzinfo=timezone.utc)
+            }
+            for i in range(start, start + 10)
+        ])
+    service.finalize()
+    service.close()
+    
+    parquet_file = pq.ParquetFile(path)
+    assert parquet_file.metadata.num_rows == 50
+    assert parquet_file.metadata.num_row_groups == 3
+    assert parquet_file.metadata.row_group(0).column(0).compression == 'ZSTD'
+    table = parquet_file.read()
+    assert table.column('id').to_pylist() == list(range(50))
+    assert str(table.schema.field('notification_type').type).startswith('dictionary')
@@ -32,6 +32,7 @@ const ExportForm = ({ onSubmit, loading }) => {
             <option value="json">JSON (API Compatible)</option>
             <option value="pdf">PDF (Report)</option>
             <option value="excel">Excel (Advanced)</option>
+            <option value="parquet">Parquet (Columnar)</option>
           </select>
         </div>
 
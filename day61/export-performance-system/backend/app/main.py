@@ -72,75 +72,92 @@ async def export_notifications(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     format: str = "json",
-    use_cache: bool = True
+    use_cache: bool = True,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None
 ):
-    """Export notifications with performance optimization"""
+    """Export notifications with performance optimization
+
+    Pass the returned next_cursor back as cursor to read the next keyset page.
+    """
     start_time = time.time()
     active_exports.inc()
     
     try:
         # Generate cache key
-        cache_key = f"export:notifications:{user_id}:{start_date}:{end_date}:{format}"
-        
-        # Check cache first
-        if use_cache:
-            cached_result = await app.state.cache_manager.get(cache_key)
-            if cached_result:
-                cache_hits.labels(tier='redis').inc()
-                export_requests.labels(status='success').inc()
-                duration = time.time() - start_time
-                export_duration.observe(duration)
-                
-                # Track cached query performance
-                data = json.loads(cached_result)
-                await app.state.performance_monitor.track_export(
-                    query_time=0,  # No database query for cached results
-                    total_time=duration,
-                    row_count=len(data),
-                    cached=True
-                )
-                
-                return {
-                    "data": data,
-                    "source": "cache",
-                    "execution_time_ms": round(duration * 1000, 2),
-                    "cached": True
-                }
-        
-        # Optimize and execute query
-        query_start = time.time()
-        optimized_query = app.state.query_optimizer.optimize_export_query(
+        cache_key = f"export:notifications:{user_id}:{start_date}:{end_date}:{format}:{cursor}:{limit}"
+        query_time = 0
+        export_query = app.state.query_optimizer.build_export_query(
             user_id=user_id,
             start_date=start_date,
-            end_date=end_date
+            end_date=end_date,
+            cursor=cursor,
+            limit=limit
         )
+        page_size = export_query.params['limit']
         
-        async with get_db() as db:
-            result = await db.execute(optimized_query)
-            rows = result.fetchall()
-        
-        query_duration.observe(time.time() - query_start)
-        
-        # Format results
-        data = [
-            {
-                "id": row[0],
-                "user_id": row[1],
-                "type": row[2],
-                "status": row[3],
-                "timestamp": row[4].isoformat() if row[4] else None,
-                "metadata": row[5]
-            }
-            for row in rows
-        ]
+        async def load_export() -> str:
+            """Run the export query; concurrent cache misses share one call"""
+            nonlocal query_time
+            query_start = time.time()
+            
+            async with get_db() as db:
+                result = await db.execute(export_query.statement, export_query.params)
+                rows = result.fetchall()
+            
+            query_time = time.time() - query_start
+            query_duration.observe(query_time)
+            app.state.query_optimizer.record_latency(export_query, query_time)
+            
+            # Format results
+            return json.dumps([
+                {
+                    "id": row[0],
+                    "user_id": row[1],
+                    "type": row[2],
+                    "status": row[3],
+                    "timestamp": row[4].isoformat() if row[4] else None,
+                    "metadata": row[5]
+                }
+                for row in rows
+            ])
         
-        # Cache results
         if use_cache:
-            await app.state.cache_manager.set(
+            payload, source = await app.state.cache_manager.get_or_load(
                 cache_key,
-                json.dumps(data),
-                ttl=900  # 15 minutes
+                load_export,
+                ttl=900,  # 15 minutes
+                tags=["notifications", f"notifications:user:{user_id}"]
             )
+        else:
+            payload, source = await load_export(), "load"
+        data = json.loads(payload)
+        next_cursor = None
+        if len(data) == page_size:
+            last = data[-1]
+            next_cursor = app.state.query_optimizer.encode_cursor(last['timestamp'], last['id'])
+        
+        if source != "load":
+            cache_hits.labels(tier=source).inc()
+            export_requests.labels(status='success').inc()
+            duration = time.time() - start_time
+            export_duration.observe(duration)
+            
+            # Track cached query performance
+            await app.state.performance_monitor.track_export(
+                query_time=0,  # No database query for cached results
+                total_time=duration,
+                row_count=len(data),
+                cached=True
+            )
+            
+            return {
+                "data": data,
+                "source": "cache",
+                "execution_time_ms": round(duration * 1000, 2),
+                "cached": True,
+                "next_cursor": next_cursor
+            }
         
         export_requests.labels(status='success').inc()
         duration = time.time() - start_time
@@ -148,7 +165,7 @@ async def export_notifications(
         
         # Track performance
         await app.state.performance_monitor.track_export(
-            query_time=time.time() - query_start,
+            query_time=query_time,
             total_time=duration,
             row_count=len(data),
             cached=False
@@ -159,9 +176,13 @@ async def export_notifications(
             "source": "database",
             "execution_time_ms": round(duration * 1000, 2),
             "row_count": len(data),
-            "cached": False
+            "cached": False,
+            "next_cursor": next_cursor
         }
         
+    except ValueError as e:
+        export_requests.labels(status='error').inc()
+        raise HTTPException(status_code=400, detail=f"Invalid export parameters: {e}")
     except Exception as e:
         export_requests.labels(status='error').inc()
         logger.error(f"Export error: {str(e)}")
@@ -204,6 +225,12 @@ async def invalidate_cache(pattern: str = "*"):
     count = await app.state.cache_manager.invalidate(pattern)
     return {"invalidated": count, "pattern": pattern}
 
+@app.post("/api/cache/invalidate-tag")
+async def invalidate_cache_tag(tag: str):
+    """Invalidate every cache entry stored under a tag"""
+    count = await app.state.cache_manager.invalidate_tag(tag)
+    return {"invalidated": count, "tag": tag}
+
 @app.get("/api/indexes/status")
 async def get_index_status():
     """Get database index status"""
@@ -213,9 +240,20 @@ async def get_index_status():
 @app.post("/api/indexes/analyze")
 async def analyze_indexes(background_tasks: BackgroundTasks):
     """Analyze and recommend indexes"""
-    background_tasks.add_task(app.state.index_manager.analyze_query_patterns)
+    background_tasks.add_task(
+        app.state.index_manager.analyze_query_patterns,
+        app.state.query_optimizer
+    )
     return {"status": "analysis_started"}
 
+@app.get("/api/indexes/suggestions")
+async def get_index_suggestions():
+    """Index suggestions from the last captured workload plans"""
+    return {
+        "suggestions": app.state.query_optimizer.suggest_indexes(),
+        "shapes": app.state.query_optimizer.get_shape_stats()
+    }
+
 @app.get("/api/resources/pool-status")
 async def get_pool_status():
     """Get database connection pool status"""
@@ -1,19 +1,102 @@
 import redis.asyncio as redis
+import asyncio
+import fnmatch
 import json
-from typing import Optional
+import time
+from collections import OrderedDict
+from typing import Optional, Iterable, Callable, Awaitable, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+class MemoryTier:
+    """L1 cache bounded by entry count and bytes, with LRU eviction and per-entry TTL"""
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[str, Tuple[str, float, int, tuple]]" = OrderedDict()
+        self.tag_index = {}
+        self.bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at, _, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str, ttl: float, tags: Iterable[str] = ()):
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes or ttl <= 0:
+            return
+        if key in self.entries:
+            self._remove(key)
+
+        tags = tuple(tags)
+        self.entries[key] = (value, time.monotonic() + ttl, size, tags)
+        self.bytes += size
+        for tag in tags:
+            self.tag_index.setdefault(tag, set()).add(key)
+
+        # Evict least recently used entries until both bounds hold
+        while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+            oldest = next(iter(self.entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def delete(self, key: str) -> bool:
+        if key in self.entries:
+            self._remove(key)
+            return True
+        return False
+
+    def keys_for_tag(self, tag: str) -> set:
+        return set(self.tag_index.get(tag, ()))
+
+    def clear(self) -> int:
+        count = len(self.entries)
+        self.entries.clear()
+        self.tag_index.clear()
+        self.bytes = 0
+        return count
+
+    def _remove(self, key: str):
+        _, _, size, tags = self.entries.pop(key)
+        self.bytes -= size
+        for tag in tags:
+            keys = self.tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tag_index[tag]
+
 class CacheManager:
-    def __init__(self):
+    TAG_PREFIX = "cache-tag:"
+
+    def __init__(self, max_memory_entries: int = 1000, max_memory_bytes: int = 64 * 1024 * 1024):
         self.redis_client = None
-        self.memory_cache = {}
+        self.memory_cache = MemoryTier(max_memory_entries, max_memory_bytes)
+        self.inflight = {}
         self.cache_stats = {
             'hits': 0,
             'misses': 0,
             'memory_hits': 0,
-            'redis_hits': 0
+            'memory_misses': 0,
+            'redis_hits': 0,
+            'redis_misses': 0,
+            'loads': 0,
+            'coalesced_loads': 0
         }
     
     async def connect(self):
@@ -32,58 +115,142 @@ class CacheManager:
     
     async def get(self, key: str) -> Optional[str]:
         """Get from cache with L1 (memory) and L2 (Redis) tiers"""
+        value, _ = await self._lookup(key)
+        return value
+
+    async def _lookup(self, key: str) -> Tuple[Optional[str], Optional[str]]:
+        """Return (value, tier) where tier is 'memory', 'redis' or None on a miss"""
         
         # L1: Memory cache
-        if key in self.memory_cache:
+        value = self.memory_cache.get(key)
+        if value is not None:
             self.cache_stats['hits'] += 1
             self.cache_stats['memory_hits'] += 1
             logger.debug(f"Memory cache hit: {key}")
-            return self.memory_cache[key]
+            return value, "memory"
+        self.cache_stats['memory_misses'] += 1
         
         # L2: Redis cache
         if self.redis_client:
             try:
-                value = await self.redis_client.get(key)
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    value, ttl_ms = await pipe.get(key).pttl(key).execute()
                 if value:
                     self.cache_stats['hits'] += 1
                     self.cache_stats['redis_hits'] += 1
                     
-                    # Promote to memory cache
-                    if len(self.memory_cache) < 100:
-                        self.memory_cache[key] = value
+                    # Promote to memory cache for no longer than the Redis TTL
+                    if ttl_ms and ttl_ms > 0:
+                        self.memory_cache.set(key, value, ttl_ms / 1000)
                     
                     logger.debug(f"Redis cache hit: {key}")
-                    return value
+                    return value, "redis"
+                self.cache_stats['redis_misses'] += 1
             except Exception as e:
                 logger.error(f"Redis get error: {e}")
         
         self.cache_stats['misses'] += 1
-        return None
+        return None, None
     
-    async def set(self, key: str, value: str, ttl: int = 900):
-        """Set in both memory and Redis cache"""
+    async def set(self, key: str, value: str, ttl: int = 900, tags: Iterable[str] = ()):
+        """Set in both memory and Redis cache, indexing the key under each tag"""
+        tags = tuple(tags)
         
         # Set in memory cache
-        if len(self.memory_cache) < 100:
-            self.memory_cache[key] = value
+        self.memory_cache.set(key, value, ttl, tags)
         
         # Set in Redis
         if self.redis_client:
             try:
-                await self.redis_client.setex(key, ttl, value)
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    pipe.setex(key, ttl, value)
+                    for tag in tags:
+                        tag_key = f"{self.TAG_PREFIX}{tag}"
+                        pipe.sadd(tag_key, key)
+                        # The tag set lives as long as its longest-lived member: set a
+                        # TTL on a new set, otherwise only ever extend it (Redis 7)
+                        pipe.expire(tag_key, ttl, nx=True)
+                        pipe.expire(tag_key, ttl, gt=True)
+                    await pipe.execute()
                 logger.debug(f"Cached in Redis: {key} (TTL: {ttl}s)")
             except Exception as e:
                 logger.error(f"Redis set error: {e}")
     
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[str]],
+                          ttl: int = 900, tags: Iterable[str] = ()) -> Tuple[str, str]:
+        """Return (value, source) where source is 'memory', 'redis', 'coalesced' or 'load'.
+
+        Concurrent misses for the same key wait on a single loader call. If
+        that call is cancelled, the waiters retry and one of them loads instead.
+        """
+        while True:
+            value, tier = await self._lookup(key)
+            if value is not None:
+                return value, tier
+
+            future = self.inflight.get(key)
+            if future is None:
+                break
+            self.cache_stats['coalesced_loads'] += 1
+            # wait() does not raise when the leader's future is cancelled, only
+            # when this waiter itself is
+            await asyncio.wait({future})
+            if not future.cancelled():
+                return future.result(), "coalesced"
+
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        try:
+            value = await loader()
+            self.cache_stats['loads'] += 1
+            await self.set(key, value, ttl, tags)
+            future.set_result(value)
+            return value, "load"
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure is not logged as a warning
+            future.exception()
+            raise
+        finally:
+            # Cancellation (a BaseException) lands here with the future unresolved
+            if not future.done():
+                future.cancel()
+            del self.inflight[key]
+
+    async def invalidate_tag(self, tag: str) -> int:
+        """Invalidate every key cached under a tag"""
+        keys = self.memory_cache.keys_for_tag(tag)
+        for key in keys:
+            self.memory_cache.delete(key)
+
+        if self.redis_client:
+            try:
+                tag_key = f"{self.TAG_PREFIX}{tag}"
+                redis_keys = await self.redis_client.smembers(tag_key)
+                if redis_keys:
+                    await self.redis_client.delete(*redis_keys)
+                    # Entries promoted from Redis are not in the local tag index
+                    for key in redis_keys:
+                        self.memory_cache.delete(key)
+                await self.redis_client.delete(tag_key)
+                keys |= set(redis_keys)
+            except Exception as e:
+                logger.error(f"Redis tag invalidate error: {e}")
+
+        logger.info(f"Invalidated {len(keys)} cache keys tagged '{tag}'")
+        return len(keys)
+
     async def invalidate(self, pattern: str) -> int:
-        """Invalidate cache keys matching pattern"""
+        """Invalidate cache keys matching a glob pattern"""
         count = 0
         
         # Clear memory cache
-        keys_to_remove = [k for k in self.memory_cache.keys() if pattern in k or pattern == "*"]
-        for key in keys_to_remove:
-            del self.memory_cache[key]
-            count += 1
+        if pattern == "*":
+            count += self.memory_cache.clear()
+        else:
+            for key in [k for k in self.memory_cache.entries if fnmatch.fnmatchcase(k, pattern)]:
+                self.memory_cache.delete(key)
+                count += 1
         
         # Clear Redis cache
         if self.redis_client:
@@ -107,8 +274,11 @@ class CacheManager:
     
     async def get_stats(self):
         """Get cache statistics"""
-        total = self.cache_stats['hits'] + self.cache_stats['misses']
-        hit_rate = (self.cache_stats['hits'] / total * 100) if total > 0 else 0
+        stats = self.cache_stats
+        total = stats['hits'] + stats['misses']
+        hit_rate = (stats['hits'] / total * 100) if total > 0 else 0
+        memory_lookups = stats['memory_hits'] + stats['memory_misses']
+        redis_lookups = stats['redis_hits'] + stats['redis_misses']
         
         redis_info = {}
         if self.redis_client:
@@ -126,11 +296,18 @@ class CacheManager:
         
         return {
             'hit_rate_percent': round(hit_rate, 2),
-            'total_hits': self.cache_stats['hits'],
-            'total_misses': self.cache_stats['misses'],
-            'memory_hits': self.cache_stats['memory_hits'],
-            'redis_hits': self.cache_stats['redis_hits'],
+            'total_hits': stats['hits'],
+            'total_misses': stats['misses'],
+            'memory_hits': stats['memory_hits'],
+            'redis_hits': stats['redis_hits'],
+            'memory_hit_rate_percent': round(stats['memory_hits'] / memory_lookups * 100, 2) if memory_lookups else 0,
+            'redis_hit_rate_percent': round(stats['redis_hits'] / redis_lookups * 100, 2) if redis_lookups else 0,
+            'loads': stats['loads'],
+            'coalesced_loads': stats['coalesced_loads'],
             'memory_cache_size': len(self.memory_cache),
+            'memory_cache_bytes': self.memory_cache.bytes,
+            'memory_evictions': self.memory_cache.evictions,
+            'memory_expirations': self.memory_cache.expirations,
             'redis': redis_info
         }
     
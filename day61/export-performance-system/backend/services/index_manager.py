@@ -7,9 +7,9 @@ class IndexManager:
     def __init__(self):
         self.indexes = [
             {
-                'name': 'idx_notifications_user_timestamp',
-                'definition': 'CREATE INDEX IF NOT EXISTS idx_notifications_user_timestamp ON notifications (user_id, timestamp DESC)',
-                'purpose': 'Optimize user+date range queries'
+                'name': 'idx_notifications_user_timestamp_id',
+                'definition': 'CREATE INDEX IF NOT EXISTS idx_notifications_user_timestamp_id ON notifications (user_id, timestamp DESC, id DESC)',
+                'purpose': 'Optimize user+date range queries and keyset export pages'
             },
             {
                 'name': 'idx_notifications_timestamp',
@@ -22,6 +22,8 @@ class IndexManager:
                 'purpose': 'Optimize active job queries'
             }
         ]
+        # Replaced by a wider index above; dropped once the replacement exists
+        self.superseded_indexes = ['idx_notifications_user_timestamp']
     
     async def ensure_indexes(self):
         """Create required indexes"""
@@ -34,6 +36,12 @@ class IndexManager:
                     logger.info(f"Created index: {index['name']}")
                 except Exception as e:
                     logger.warning(f"Index creation warning for {index['name']}: {e}")
+            for name in self.superseded_indexes:
+                try:
+                    await conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+                    logger.info(f"Dropped superseded index: {name}")
+                except Exception as e:
+                    logger.warning(f"Index drop warning for {name}: {e}")
     
     async def get_index_status(self, db):
         """Get index statistics"""
@@ -70,8 +78,18 @@ class IndexManager:
             logger.error(f"Error getting index status: {e}")
             return {'indexes': [], 'error': str(e)}
     
-    async def analyze_query_patterns(self):
+    async def analyze_query_patterns(self, query_optimizer=None):
         """Analyze query patterns and suggest optimizations"""
-        # This would analyze pg_stat_statements in production
         logger.info("Query pattern analysis started")
-        return {'status': 'completed'}
+        if query_optimizer is None:
+            return {'status': 'completed', 'suggestions': []}
+
+        from models.database import get_db
+
+        # Capture a plan for each export shape seen so far, then rank suggestions by cost
+        async with get_db() as db:
+            plans = await query_optimizer.capture_workload_plans(db)
+        suggestions = query_optimizer.suggest_indexes()
+        for suggestion in suggestions:
+            logger.info(f"Index suggestion: {suggestion['definition']} ({suggestion['reason']})")
+        return {'status': 'completed', 'shapes_analyzed': len(plans), 'suggestions': suggestions}
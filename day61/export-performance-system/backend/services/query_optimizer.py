@@ -1,9 +1,17 @@
 from sqlalchemy import text, select
-from datetime import datetime
+from collections import deque, namedtuple
+from datetime import datetime, timezone
+import json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# statement: bound text() clause, params: bind values, shape: which filters are present
+ExportQuery = namedtuple("ExportQuery", ["statement", "params", "shape"])
+
+EXPORT_COLUMNS = "id, user_id, type, status, timestamp, metadata"
+
 class QueryOptimizer:
     def __init__(self):
         self.optimization_rules = {
@@ -11,53 +19,208 @@ class QueryOptimizer:
             'limit_default': 10000,
             'enable_parallel': True
         }
-    
-    def optimize_export_query(self, user_id=None, start_date=None, end_date=None):
-        """Generate optimized query with proper indexing hints"""
-        
-        # Base query with index hints
-        query_parts = ["SELECT id, user_id, type, status, timestamp, metadata FROM notifications"]
-        where_clauses = []
-        
-        # Add filters with indexed columns first
+        # One compiled statement per query shape; filter values are always bound
+        # parameters, so the SQL text (and the server's prepared plan) is reused
+        self.statement_cache = {}
+        self.shape_stats = {}
+        self.captured_plans = {}
+
+    @staticmethod
+    def _parse_datetime(value):
+        """Parse to a naive UTC datetime, matching the timestamp column"""
+        if value is None:
+            return value
+        if not isinstance(value, datetime):
+            value = datetime.fromisoformat(value)
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+    @classmethod
+    def encode_cursor(cls, timestamp, row_id) -> str:
+        """Keyset cursor pointing just past the given row"""
+        return f"{cls._parse_datetime(timestamp).isoformat()}|{row_id}"
+
+    @classmethod
+    def decode_cursor(cls, cursor: str):
+        timestamp, row_id = cursor.split("|", 1)
+        return cls._parse_datetime(timestamp), row_id
+
+    def _statement_for(self, shape):
+        statement = self.statement_cache.get(shape)
+        if statement is None:
+            has_user, has_start, has_end, has_cursor = shape
+            where_clauses = []
+            # Equality on the leading index column first, then the range
+            if has_user:
+                where_clauses.append("user_id = :user_id")
+            if has_start:
+                where_clauses.append("timestamp >= :start_date")
+            if has_end:
+                where_clauses.append("timestamp <= :end_date")
+            if has_cursor:
+                # Keyset: seek past the last row of the previous page instead of OFFSET
+                where_clauses.append("(timestamp, id) < (:after_ts, :after_id)")
+
+            query_parts = [f"SELECT {EXPORT_COLUMNS} FROM notifications"]
+            if where_clauses:
+                query_parts.append("WHERE " + " AND ".join(where_clauses))
+            # id breaks timestamp ties so keyset pages never skip or repeat rows
+            query_parts.append("ORDER BY timestamp DESC, id DESC")
+            query_parts.append("LIMIT :limit")
+
+            statement = text(" ".join(query_parts))
+            self.statement_cache[shape] = statement
+            logger.info(f"Compiled export query shape {shape}: {statement.text}")
+        return statement
+
+    def build_export_query(self, user_id=None, start_date=None, end_date=None,
+                           cursor=None, limit=None) -> ExportQuery:
+        """Build a bound-parameter export statement from the cached shape"""
+        params = {'limit': limit or self.optimization_rules['limit_default']}
         if user_id:
-            where_clauses.append(f"user_id = '{user_id}'")
-        
+            params['user_id'] = user_id
         if start_date:
-            where_clauses.append(f"timestamp >= '{start_date}'")
-        
+            params['start_date'] = self._parse_datetime(start_date)
         if end_date:
-            where_clauses.append(f"timestamp <= '{end_date}'")
-        
-        if where_clauses:
-            query_parts.append("WHERE " + " AND ".join(where_clauses))
-        
-        # Order by indexed column
-        query_parts.append("ORDER BY timestamp DESC")
-        
-        # Add limit to prevent runaway queries
-        query_parts.append(f"LIMIT {self.optimization_rules['limit_default']}")
-        
-        query = " ".join(query_parts)
-        logger.info(f"Optimized query: {query}")
-        
-        return text(query)
-    
+            params['end_date'] = self._parse_datetime(end_date)
+        if cursor:
+            params['after_ts'], params['after_id'] = self.decode_cursor(cursor)
+
+        shape = (bool(user_id), bool(start_date), bool(end_date), bool(cursor))
+        return ExportQuery(self._statement_for(shape), params, shape)
+
+    def optimize_export_query(self, user_id=None, start_date=None, end_date=None, cursor=None, limit=None):
+        """Generate optimized query with bound parameters"""
+        query = self.build_export_query(user_id, start_date, end_date, cursor, limit)
+        return query.statement.bindparams(**query.params)
+
+    def record_latency(self, query: ExportQuery, seconds: float):
+        """Record execution time for the query's shape"""
+        stats = self.shape_stats.get(query.shape)
+        if stats is None:
+            stats = self.shape_stats[query.shape] = {
+                'count': 0,
+                'total_ms': 0.0,
+                'max_ms': 0.0,
+                'recent_ms': deque(maxlen=200),
+                'last_params': None
+            }
+        latency_ms = seconds * 1000
+        stats['count'] += 1
+        stats['total_ms'] += latency_ms
+        stats['max_ms'] = max(stats['max_ms'], latency_ms)
+        stats['recent_ms'].append(latency_ms)
+        # Kept so the plan for this shape can be captured later with realistic values
+        stats['last_params'] = query.params
+
+    def get_shape_stats(self):
+        """Per-shape latency summary"""
+        summary = []
+        for shape, stats in self.shape_stats.items():
+            recent = sorted(stats['recent_ms'])
+            summary.append({
+                'shape': self._describe_shape(shape),
+                'sql': self.statement_cache[shape].text,
+                'count': stats['count'],
+                'avg_ms': round(stats['total_ms'] / stats['count'], 2),
+                'p95_ms': round(recent[min(int(len(recent) * 0.95), len(recent) - 1)], 2),
+                'max_ms': round(stats['max_ms'], 2),
+                'plan_issues': self.captured_plans.get(shape, {}).get('issues', [])
+            })
+        return sorted(summary, key=lambda s: s['avg_ms'] * s['count'], reverse=True)
+
+    @staticmethod
+    def _describe_shape(shape):
+        names = ('user_id', 'start_date', 'end_date', 'cursor')
+        return [name for name, present in zip(names, shape) if present]
+
     def analyze_query_plan(self, query):
         """Analyze query execution plan"""
         explain_query = f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}"
         return explain_query
-    
-    def suggest_indexes(self, slow_queries):
-        """Suggest indexes based on slow query patterns"""
-        suggestions = []
-        
-        for query in slow_queries:
-            if "user_id" in query and "timestamp" in query:
-                suggestions.append({
-                    "index": "idx_user_timestamp",
-                    "definition": "CREATE INDEX idx_user_timestamp ON notifications (user_id, timestamp DESC)",
-                    "reason": "Optimizes user+date range queries"
-                })
-        
-        return suggestions
+
+    async def capture_plan(self, db, query: ExportQuery):
+        """Run EXPLAIN for a shape on Postgres, or EXPLAIN QUERY PLAN on SQLite, and keep the findings"""
+        dialect = db.bind.dialect.name if db.bind is not None else "postgresql"
+        if dialect == "sqlite":
+            result = await db.execute(text(f"EXPLAIN QUERY PLAN {query.statement.text}"), query.params)
+            details = [row[-1] for row in result.fetchall()]
+            issues = self._sqlite_plan_issues(details)
+            plan = details
+        else:
+            result = await db.execute(text(f"EXPLAIN (FORMAT JSON) {query.statement.text}"), query.params)
+            plan = result.scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            issues = self._postgres_plan_issues(plan[0]["Plan"])
+
+        self.captured_plans[query.shape] = {
+            'plan': plan,
+            'issues': issues,
+            'captured_at': time.time()
+        }
+        return issues
+
+    async def capture_workload_plans(self, db):
+        """Capture plans for every shape seen so far"""
+        captured = {}
+        for shape, stats in list(self.shape_stats.items()):
+            query = ExportQuery(self.statement_cache[shape], stats['last_params'], shape)
+            try:
+                captured[tuple(self._describe_shape(shape))] = await self.capture_plan(db, query)
+            except Exception as e:
+                logger.error(f"Plan capture failed for shape {shape}: {e}")
+        return captured
+
+    def _postgres_plan_issues(self, node):
+        issues = []
+        node_type = node.get("Node Type")
+        if node_type == "Seq Scan" and node.get("Relation Name") == "notifications":
+            issues.append("seq_scan")
+        elif node_type in ("Sort", "Incremental Sort"):
+            issues.append("sort")
+        for child in node.get("Plans", []):
+            issues.extend(self._postgres_plan_issues(child))
+        return issues
+
+    @staticmethod
+    def _sqlite_plan_issues(details):
+        issues = []
+        for detail in details:
+            if detail.startswith("SCAN") and "notifications" in detail and "INDEX" not in detail:
+                issues.append("seq_scan")
+            elif "TEMP B-TREE" in detail:
+                issues.append("sort")
+        return issues
+
+    def suggest_indexes(self, slow_queries=None):
+        """Suggest indexes for shapes whose captured plans scan or sort, costliest first"""
+        suggestions = {}
+
+        for shape, captured in self.captured_plans.items():
+            if not captured['issues']:
+                continue
+            has_user = shape[0]
+            columns = (["user_id"] if has_user else []) + ["timestamp DESC", "id DESC"]
+            name = "idx_notifications_" + "_".join(c.split()[0] for c in columns)
+            stats = self.shape_stats.get(shape, {})
+            cost_ms = stats.get('total_ms', 0.0)
+
+            suggestion = suggestions.setdefault(name, {
+                "index": name,
+                "definition": f"CREATE INDEX {name} ON notifications ({', '.join(columns)})",
+                "reason": set(),
+                "shapes": [],
+                "total_query_ms": 0.0
+            })
+            suggestion["reason"].update(captured['issues'])
+            suggestion["shapes"].append(self._describe_shape(shape))
+            suggestion["total_query_ms"] += cost_ms
+
+        reasons = {"seq_scan": "sequential scan on notifications", "sort": "explicit sort for ORDER BY"}
+        ranked = sorted(suggestions.values(), key=lambda s: s["total_query_ms"], reverse=True)
+        for suggestion in ranked:
+            suggestion["reason"] = "Plan shows " + " and ".join(reasons[r] for r in sorted(suggestion["reason"]))
+            suggestion["total_query_ms"] = round(suggestion["total_query_ms"], 2)
+        return ranked
@@ -0,0 +1,156 @@
+import asyncio
+import os
+import sys
+import time
+
+import fakeredis
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from services.cache_manager import CacheManager, MemoryTier
+
+
+def test_memory_tier_evicts_least_recently_used():
+    tier = MemoryTier(max_entries=2)
+    tier.set("a", "1", ttl=60)
+    tier.set("b", "2", ttl=60)
+    assert tier.get("a") == "1"  # b is now the least recently used
+    tier.set("c", "3", ttl=60)
+
+    assert tier.get("b") is None
+    assert tier.get("a") == "1" and tier.get("c") == "3"
+    assert tier.evictions == 1
+
+
+def test_memory_tier_bounds_bytes_and_skips_oversized_values():
+    tier = MemoryTier(max_entries=100, max_bytes=10)
+    tier.set("big", "x" * 11, ttl=60)
+    assert tier.get("big") is None
+
+    tier.set("a", "12345", ttl=60)
+    tier.set("b", "12345", ttl=60)
+    tier.set("c", "1", ttl=60)
+    assert tier.get("a") is None
+    assert tier.bytes == 6
+
+
+def test_memory_tier_expires_entries(monkeypatch):
+    tier = MemoryTier()
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    tier.set("a", "1", ttl=5)
+    monkeypatch.setattr(time, "monotonic", lambda: now + 6)
+
+    assert tier.get("a") is None
+    assert tier.expirations == 1
+    assert len(tier) == 0
+
+
+@pytest.mark.asyncio
+async def test_invalidate_tag_removes_only_tagged_keys():
+    cache = CacheManager()
+    await cache.set("export:user1", "a", tags=["notifications:user:user1"])
+    await cache.set("export:user2", "b", tags=["notifications:user:user2"])
+
+    assert await cache.invalidate_tag("notifications:user:user1") == 1
+    assert await cache.get("export:user1") is None
+    assert await cache.get("export:user2") == "b"
+    assert cache.memory_cache.keys_for_tag("notifications:user:user1") == set()
+
+
+@pytest.mark.asyncio
+async def test_invalidate_counts_each_deleted_key():
+    cache = CacheManager()
+    for n in range(5):
+        await cache.set(f"export:user1:{n}", "a")
+    await cache.set("stats:user1", "b")
+
+    assert await cache.invalidate("export:*") == 5
+    assert await cache.invalidate("export:*") == 0
+    assert await cache.get("stats:user1") == "b"
+
+
+@pytest.mark.asyncio
+async def test_tag_set_ttl_is_only_extended():
+    cache = CacheManager()
+    cache.redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    tag_key = f"{CacheManager.TAG_PREFIX}notifications:user:user1"
+
+    await cache.set("export:long", "a", ttl=900, tags=["notifications:user:user1"])
+    await cache.set("export:short", "b", ttl=60, tags=["notifications:user:user1"])
+    assert await cache.redis_client.ttl(tag_key) > 60
+
+    await cache.set("export:longer", "c", ttl=1800, tags=["notifications:user:user1"])
+    assert await cache.redis_client.ttl(tag_key) > 900
+    assert await cache.invalidate_tag("notifications:user:user1") == 3
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_load():
+    cache = CacheManager()
+    calls = 0
+    release = asyncio.Event()
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return "value"
+
+    tasks = [asyncio.create_task(cache.get_or_load("key", loader)) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert calls == 1
+    assert sorted(source for _, source in results) == ["coalesced"] * 4 + ["load"]
+    assert await cache.get_or_load("key", loader) == ("value", "memory")
+
+
+@pytest.mark.asyncio
+async def test_waiters_take_over_when_the_loading_request_is_cancelled():
+    cache = CacheManager()
+    started = asyncio.Event()
+    calls = 0
+
+    async def slow_loader():
+        nonlocal calls
+        calls += 1
+        started.set()
+        await asyncio.sleep(10)
+        return "never"
+
+    async def fast_loader():
+        nonlocal calls
+        calls += 1
+        return "value"
+
+    leader = asyncio.create_task(cache.get_or_load("key", slow_loader))
+    await started.wait()
+    waiter = asyncio.create_task(cache.get_or_load("key", fast_loader))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await asyncio.wait_for(waiter, timeout=1) == ("value", "load")
+    assert leader.cancelled()
+    assert calls == 2
+    assert cache.inflight == {}
+
+
+@pytest.mark.asyncio
+async def test_loader_errors_reach_every_waiter():
+    cache = CacheManager()
+    release = asyncio.Event()
+
+    async def failing_loader():
+        await release.wait()
+        raise RuntimeError("database down")
+
+    tasks = [asyncio.create_task(cache.get_or_load("key", failing_loader)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert cache.inflight == {}
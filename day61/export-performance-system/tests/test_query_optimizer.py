@@ -0,0 +1,96 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from services.query_optimizer import QueryOptimizer
+
+
+def test_same_shape_reuses_one_statement():
+    optimizer = QueryOptimizer()
+    first = optimizer.build_export_query(user_id="user1", start_date="2024-01-01T00:00:00")
+    second = optimizer.build_export_query(user_id="user2", start_date="2024-02-01T00:00:00")
+
+    assert first.statement is second.statement
+    assert first.params["user_id"] == "user1" and second.params["user_id"] == "user2"
+    # Values are bound, never part of the SQL text
+    assert "user1" not in first.statement.text
+
+    other = optimizer.build_export_query(user_id="user1")
+    assert other.statement is not first.statement
+    assert len(optimizer.statement_cache) == 2
+
+
+def test_cursor_round_trip():
+    optimizer = QueryOptimizer()
+    cursor = optimizer.encode_cursor(datetime(2024, 1, 2, 3, 4, 5), "n-42")
+
+    query = optimizer.build_export_query(cursor=cursor)
+    assert query.params["after_ts"] == datetime(2024, 1, 2, 3, 4, 5)
+    assert query.params["after_id"] == "n-42"
+    assert query.shape == (False, False, False, True)
+
+
+def test_timezone_aware_values_become_naive_utc():
+    optimizer = QueryOptimizer()
+    query = optimizer.build_export_query(
+        start_date="2024-01-01T02:00:00+02:00",
+        end_date="2024-01-02T00:00:00Z",
+        cursor="2024-01-01T12:00:00-01:00|n-1"
+    )
+
+    assert query.params["start_date"] == datetime(2024, 1, 1, 0, 0)
+    assert query.params["end_date"] == datetime(2024, 1, 2, 0, 0)
+    assert query.params["after_ts"] == datetime(2024, 1, 1, 13, 0)
+    assert all(query.params[key].tzinfo is None for key in ("start_date", "end_date", "after_ts"))
+
+    # A cursor built from a serialized row decodes to the same naive value
+    assert optimizer.encode_cursor("2024-01-01T13:00:00+00:00", "n-1") == "2024-01-01T13:00:00|n-1"
+
+
+def test_record_latency_groups_by_shape():
+    optimizer = QueryOptimizer()
+    for user in ("a", "b", "c"):
+        optimizer.record_latency(optimizer.build_export_query(user_id=user), 0.01)
+    optimizer.record_latency(optimizer.build_export_query(), 0.05)
+
+    stats = {tuple(s["shape"]): s for s in optimizer.get_shape_stats()}
+    assert stats[("user_id",)]["count"] == 3
+    assert stats[()]["count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_keyset_pages_cover_every_row_once():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    base = datetime(2024, 1, 1)
+    async with engine.begin() as conn:
+        await conn.execute(text(
+            "CREATE TABLE notifications (id TEXT PRIMARY KEY, user_id TEXT, type TEXT, "
+            "status TEXT, timestamp DATETIME, metadata TEXT)"
+        ))
+        # Pairs of rows share a timestamp so pages must break ties on id
+        for i in range(7):
+            await conn.execute(
+                text("INSERT INTO notifications VALUES (:id, 'user1', 'email', 'sent', :ts, '{}')"),
+                {"id": f"n-{i}", "ts": base + timedelta(minutes=i // 2)}
+            )
+
+    optimizer = QueryOptimizer()
+    seen = []
+    cursor = None
+    async with engine.connect() as conn:
+        while True:
+            query = optimizer.build_export_query(user_id="user1", cursor=cursor, limit=3)
+            rows = (await conn.execute(query.statement, query.params)).fetchall()
+            seen.extend(row[0] for row in rows)
+            if len(rows) < 3:
+                break
+            cursor = optimizer.encode_cursor(rows[-1][4], rows[-1][0])
+    await engine.dispose()
+
+    assert seen == [f"n-{i}" for i in (6, 5, 4, 3, 2, 1, 0)]
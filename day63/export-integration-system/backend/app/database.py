@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text, Enum as SQLEnum
 from sqlalchemy.orm import sessionmaker, Session
 from contextlib import contextmanager
 import os
@@ -22,3 +22,21 @@ def get_db_context():
         yield db
     finally:
         db.close()
+
+def add_enum_values(metadata, bind=engine):
+    """create_all() never alters an existing type, so add enum members introduced
+    since the database was created (e.g. ExportFormat.PARQUET). PostgreSQL only."""
+    if bind.dialect.name != "postgresql":
+        return
+    # ADD VALUE cannot run inside a transaction block before PostgreSQL 12
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        preparer = conn.dialect.identifier_preparer
+        for table in metadata.sorted_tables:
+            for column in table.columns:
+                if not isinstance(column.type, SQLEnum) or not column.type.name:
+                    continue
+                for label in column.type.enums:
+                    conn.execute(text(
+                        f"ALTER TYPE {preparer.quote(column.type.name)} "
+                        f"ADD VALUE IF NOT EXISTS '{label.replace(chr(39), chr(39) * 2)}'"
+                    ))
@@ -5,7 +5,7 @@ from typing import List
 import uuid
 from datetime import datetime, timedelta
 
-from app.database import get_db, engine
+from app.database import get_db, engine, add_enum_values
 from app.models import export_job, export_schedule, export_history
 from app.schemas.export_schemas import (
     ExportJobCreate, ExportJobResponse,
@@ -21,6 +21,8 @@ from app.services.scheduler_service import export_scheduler
 export_job.Base.metadata.create_all(bind=engine)
 export_schedule.Base.metadata.create_all(bind=engine)
 export_history.Base.metadata.create_all(bind=engine)
+# Existing databases predate newer enum members such as the parquet format
+add_enum_values(export_job.Base.metadata)
 
 app = FastAPI(title="Export Integration API")
 
@@ -16,6 +16,7 @@ class ExportFormat(str, enum.Enum):
     CSV = "csv"
     JSON = "json"
     EXCEL = "excel"
+    PARQUET = "parquet"
 
 class ExportJob(Base):
     __tablename__ = "export_jobs"
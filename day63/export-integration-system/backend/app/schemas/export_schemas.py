@@ -7,6 +7,7 @@ class ExportFormat(str, Enum):
     CSV = "csv"
     JSON = "json"
     EXCEL = "excel"
+    PARQUET = "parquet"
 
 class JobStatus(str, Enum):
     PENDING = "pending"
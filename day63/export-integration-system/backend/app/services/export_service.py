@@ -2,11 +2,212 @@ import csv
 import json
 import gzip
 import hashlib
-from typing import Iterator, Dict, Any, List
+import multiprocessing
+import shutil
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Iterator, Dict, Any, List, Optional
 from io import StringIO, BytesIO
 import xlsxwriter
-from datetime import datetime, timedelta
+import pyarrow as pa
+import pyarrow.parquet as pq
+from datetime import datetime, date, timedelta
+from decimal import Decimal
 import os
+import re
+
+CHECKSUM_BLOCK_SIZE = 1024 * 1024  # Hash output files 1 MiB at a time
+PARQUET_ROW_GROUP_SIZE = 128 * 1024  # Rows buffered per Parquet row group
+ARROW_SCALARS = (str, int, float, bool, bytes, datetime, date, Decimal)
+ORDER_BY_PATTERN = re.compile(r'\border\s+by\b', re.IGNORECASE)
+
+def file_checksum(file_path: str) -> str:
+    """MD5 over the bytes of a file, read in large blocks"""
+    checksum = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(CHECKSUM_BLOCK_SIZE), b''):
+            checksum.update(block)
+    return checksum.hexdigest()
+
+def sharded_order(query_text: str, shard_column: str) -> bool:
+    """Whether a sharded export must be written in descending shard column order.
+    
+    Shards are key ranges of the shard column, so their parts can only be
+    combined in the query's own order when it orders by that column alone.
+    Any other top-level ORDER BY is rejected.
+    """
+    matches = list(ORDER_BY_PATTERN.finditer(query_text))
+    # An ORDER BY followed by a closing parenthesis belongs to a subquery
+    if not matches or ')' in query_text[matches[-1].end():]:
+        return False
+    clause = query_text[matches[-1].end():].strip().rstrip(';').strip()
+    match = re.fullmatch(rf'{re.escape(shard_column)}(?:\s+(asc|desc))?', clause, re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Sharded exports can only be ordered by the shard column {shard_column}, not: {clause}")
+    return (match.group(1) or '').lower() == 'desc'
+
+def _arrow_value(value):
+    """Values Arrow cannot type natively (JSON documents, UUIDs, ...) are stored as strings"""
+    if value is None or isinstance(value, ARROW_SCALARS):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return str(value)
+
+class ParquetStream:
+    """Writes fetched row batches to Parquet as Arrow record batches.
+    
+    The schema is inferred from every row buffered for the first row group,
+    so a column that is NULL in the first fetch still gets its real type when
+    a later fetch in that group has values. Columns that stay NULL for the
+    whole first row group are written as strings. Later batches are
+    converted column by column to that schema. Batches are buffered into
+    full row groups, and column chunks are dictionary-encoded and
+    zstd-compressed.
+    """
+    
+    def __init__(self, file_path: str, row_group_size: int = PARQUET_ROW_GROUP_SIZE):
+        self.file_path = file_path
+        self.row_group_size = row_group_size
+        self.schema = None
+        self.writer = None
+        self.placeholder_columns = set()
+        self.pending: List[Dict[str, List[Any]]] = []
+        self.pending_rows = 0
+        self.row_count = 0
+    
+    def write_rows(self, columns: List[str], rows: List[Any]):
+        """Append a batch of row tuples in column order"""
+        if not rows:
+            return
+        self.pending.append({
+            name: [_arrow_value(row[index]) for row in rows]
+            for index, name in enumerate(columns)
+        })
+        self.pending_rows += len(rows)
+        self.row_count += len(rows)
+        if self.pending_rows >= self.row_group_size:
+            self._flush()
+    
+    def write_dicts(self, batch: List[Dict[str, Any]]):
+        if batch:
+            columns = list(batch[0].keys())
+            self.write_rows(columns, [tuple(row.get(name) for name in columns) for row in batch])
+    
+    def _open_writer(self):
+        columns = {}
+        for data in self.pending:
+            for name, values in data.items():
+                columns.setdefault(name, []).extend(values)
+        fields = []
+        for name, values in columns.items():
+            field_type = pa.array(values).type
+            if pa.types.is_null(field_type):
+                # No value seen yet to type this column by
+                self.placeholder_columns.add(name)
+                field_type = pa.string()
+            fields.append(pa.field(name, field_type))
+        self.schema = pa.schema(fields)
+        self.writer = pq.ParquetWriter(self.file_path, self.schema,
+                                       compression='zstd', use_dictionary=True)
+    
+    def _to_batch(self, data: Dict[str, List[Any]]) -> pa.RecordBatch:
+        arrays = []
+        for field in self.schema:
+            values = data[field.name]
+            if field.name in self.placeholder_columns:
+                values = [None if value is None else str(value) for value in values]
+            try:
+                arrays.append(pa.array(values, type=field.type))
+            except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+                raise ValueError(f"Column {field.name} does not match its Parquet type {field.type}: {e}") from e
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+    
+    def _flush(self):
+        if self.pending:
+            if self.writer is None:
+                self._open_writer()
+            batches = [self._to_batch(data) for data in self.pending]
+            self.writer.write_table(pa.Table.from_batches(batches), row_group_size=self.row_group_size)
+            self.pending = []
+            self.pending_rows = 0
+    
+    def close(self, columns: Optional[List[str]] = None):
+        self._flush()
+        if self.writer is None:
+            # No rows: still leave a readable file with the column names
+            pq.write_table(pa.table({name: pa.array([], pa.string()) for name in columns or []}), self.file_path)
+            return
+        self.writer.close()
+
+def _export_shard(db_url: str, query_text: str, shard_column: str, lower, upper,
+                  format: str, part_path: str, compress: bool, batch_size: int,
+                  descending: bool = False) -> Dict[str, Any]:
+    """Export one key range to its own part file (runs in a worker process)"""
+    from sqlalchemy import create_engine, text
+    
+    conditions = []
+    params = {}
+    if lower is not None:
+        conditions.append(f"{shard_column} >= :lower")
+        params['lower'] = lower
+    if upper is not None:
+        conditions.append(f"{shard_column} < :upper")
+        params['upper'] = upper
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    shard_query = f"SELECT * FROM ({query_text}) AS export_src{where} ORDER BY {shard_column}{' DESC' if descending else ''}"
+    
+    engine = create_engine(db_url)
+    tmp_path = part_path + '.tmp'
+    row_count = 0
+    try:
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True).execute(text(shard_query), params)
+            columns = list(result.keys())
+            
+            if format == 'parquet':
+                stream = ParquetStream(tmp_path)
+                while True:
+                    batch = result.fetchmany(batch_size)
+                    if not batch:
+                        break
+                    stream.write_rows(columns, batch)
+                stream.close(columns)
+                row_count = stream.row_count
+            elif format == 'excel':
+                workbook = xlsxwriter.Workbook(tmp_path, {'constant_memory': True})
+                worksheet = workbook.add_worksheet('Data')
+                for col_idx, col_name in enumerate(columns):
+                    worksheet.write(0, col_idx, col_name)
+                while True:
+                    batch = result.fetchmany(batch_size)
+                    if not batch:
+                        break
+                    for row in batch:
+                        row_count += 1
+                        for col_idx, value in enumerate(row):
+                            worksheet.write(row_count, col_idx, value if isinstance(value, (int, float, str)) or value is None else str(value))
+                workbook.close()
+            else:
+                # Parts hold bare rows; the header / JSON brackets are added when the parts are combined
+                handle = gzip.open(tmp_path, 'wt', encoding='utf-8', newline='') if compress else open(tmp_path, 'w', newline='', encoding='utf-8')
+                with handle:
+                    writer = csv.writer(handle) if format == 'csv' else None
+                    while True:
+                        batch = result.fetchmany(batch_size)
+                        if not batch:
+                            break
+                        if writer:
+                            writer.writerows(batch)
+                        else:
+                            chunk = ','.join(json.dumps(dict(zip(columns, row)), default=str) for row in batch)
+                            handle.write(chunk if row_count == 0 else ',' + chunk)
+                        row_count += len(batch)
+    finally:
+        engine.dispose()
+    
+    os.replace(tmp_path, part_path)
+    return {'row_count': row_count, 'file_size': os.path.getsize(part_path)}
 
 class StreamingExporter:
     """Memory-efficient streaming export service"""
@@ -23,7 +224,6 @@ class StreamingExporter:
         try:
             writer = None
             row_count = 0
-            checksum = hashlib.md5()
             
             # Stream results in batches
             for batch in self._batch_query(query):
@@ -32,19 +232,16 @@ class StreamingExporter:
                     writer = csv.DictWriter(file_handle, fieldnames=batch[0].keys())
                     writer.writeheader()
                 
-                for row in batch:
-                    writer.writerow(row)
-                    checksum.update(str(row).encode('utf-8'))
-                    row_count += 1
-            
-            file_size = file_handle.tell()
-            return {
-                'row_count': row_count,
-                'file_size': file_size,
-                'checksum': checksum.hexdigest()
-            }
+                writer.writerows(batch)
+                row_count += len(batch)
         finally:
             file_handle.close()
+        
+        return {
+            'row_count': row_count,
+            'file_size': os.path.getsize(output_path),
+            'checksum': file_checksum(output_path)
+        }
     
     def export_to_json(self, query, output_path: str, compress: bool = False) -> Dict[str, Any]:
         """Stream query results to JSON file"""
@@ -53,28 +250,21 @@ class StreamingExporter:
         try:
             file_handle.write('[')
             row_count = 0
-            checksum = hashlib.md5()
-            first_batch = True
             
             for batch in self._batch_query(query):
-                for row in batch:
-                    if not first_batch or row_count > 0:
-                        file_handle.write(',')
-                    json.dump(row, file_handle)
-                    checksum.update(str(row).encode('utf-8'))
-                    row_count += 1
-                first_batch = False
+                chunk = ','.join(json.dumps(row, default=str) for row in batch)
+                file_handle.write(chunk if row_count == 0 else ',' + chunk)
+                row_count += len(batch)
             
             file_handle.write(']')
-            file_size = file_handle.tell()
-            
-            return {
-                'row_count': row_count,
-                'file_size': file_size,
-                'checksum': checksum.hexdigest()
-            }
         finally:
             file_handle.close()
+        
+        return {
+            'row_count': row_count,
+            'file_size': os.path.getsize(output_path),
+            'checksum': file_checksum(output_path)
+        }
     
     def export_to_excel(self, query, output_path: str) -> Dict[str, Any]:
         """Stream query results to Excel file"""
@@ -82,7 +272,6 @@ class StreamingExporter:
         worksheet = workbook.add_worksheet('Data')
         
         row_count = 0
-        checksum = hashlib.md5()
         col_names = None
         
         for batch in self._batch_query(query):
@@ -95,18 +284,254 @@ class StreamingExporter:
             for row_data in batch:
                 for col_idx, col_name in enumerate(col_names):
                     worksheet.write(row_count, col_idx, row_data.get(col_name))
-                checksum.update(str(row_data).encode('utf-8'))
                 row_count += 1
         
         workbook.close()
-        file_size = os.path.getsize(output_path)
         
         return {
-            'row_count': row_count - 1,  # Subtract header row
-            'file_size': file_size,
-            'checksum': checksum.hexdigest()
+            'row_count': max(row_count - 1, 0),  # Subtract header row
+            'file_size': os.path.getsize(output_path),
+            'checksum': file_checksum(output_path)
+        }
+    
+    def export_to_parquet(self, query, output_path: str) -> Dict[str, Any]:
+        """Stream query results to a Parquet file, one Arrow record batch per fetch"""
+        stream = ParquetStream(output_path)
+        for batch in self._batch_query(query):
+            stream.write_dicts(batch)
+        stream.close()
+        
+        return {
+            'row_count': stream.row_count,
+            'file_size': os.path.getsize(output_path),
+            'checksum': file_checksum(output_path)
+        }
+    
+    def export_sharded(self, query: Dict[str, Any], output_path: str, format: str,
+                       shard_column: str = 'id', shards: int = 4, compress: bool = False,
+                       combine: str = 'concat', max_workers: Optional[int] = None) -> Dict[str, Any]:
+        """Export key ranges in parallel, one part file per shard, then combine them.
+        
+        Shard boundaries and finished shards are recorded in a checkpoint file next
+        to the output, so re-running a failed export only redoes unfinished shards.
+        Excel parts cannot be concatenated and are always zipped; Parquet parts
+        are merged row group by row group and carry their own zstd compression.
+        The query may only be ordered by the shard column; parts are combined
+        in that order.
+        """
+        if not query.get('query_text'):
+            raise ValueError("Sharded export requires a query_text")
+        columns = self._query_columns(query['query_text'])
+        if shard_column not in columns:
+            raise ValueError(f"Unknown shard column: {shard_column}")
+        descending = sharded_order(query['query_text'], shard_column)
+        if format == 'excel':
+            combine = 'zip'
+        if format == 'parquet':
+            compress = False
+        
+        checkpoint_path = output_path + '.checkpoint.json'
+        fingerprint = hashlib.md5(
+            json.dumps([query['query_text'], shard_column, format, compress, combine]).encode('utf-8')
+        ).hexdigest()
+        checkpoint = self._load_checkpoint(checkpoint_path, fingerprint)
+        if checkpoint is None:
+            checkpoint = {
+                'fingerprint': fingerprint,
+                'boundaries': self._shard_boundaries(query['query_text'], shard_column, shards),
+                'completed': {}
+            }
+            self._save_checkpoint(checkpoint_path, checkpoint)
+        
+        boundaries = checkpoint['boundaries']
+        ranges = [
+            (boundaries[i] if i > 0 else None, boundaries[i + 1] if i + 1 < len(boundaries) else None)
+            for i in range(len(boundaries))
+        ] or [(None, None)]
+        part_ext = {'excel': '.xlsx', 'parquet': '.parquet'}.get(format, '')
+        part_paths = [f"{output_path}.part{i:04d}{part_ext}" for i in range(len(ranges))]
+        
+        db_url = self.db.get_bind().url.render_as_string(hide_password=False)
+        pending = [
+            i for i in range(len(ranges))
+            if str(i) not in checkpoint['completed'] or not os.path.exists(part_paths[i])
+        ]
+        
+        if pending:
+            # Celery prefork workers are daemonic and may not fork; use threads there
+            pool_class = ThreadPoolExecutor if multiprocessing.current_process().daemon else ProcessPoolExecutor
+            with pool_class(max_workers=max_workers or min(len(pending), os.cpu_count() or 1)) as pool:
+                futures = {
+                    pool.submit(_export_shard, db_url, query['query_text'], shard_column,
+                                ranges[i][0], ranges[i][1], format, part_paths[i],
+                                compress and combine == 'concat', self.BATCH_SIZE, descending): i
+                    for i in pending
+                }
+                errors = []
+                for future in as_completed(futures):
+                    try:
+                        checkpoint['completed'][str(futures[future])] = future.result()
+                    except Exception as e:
+                        errors.append(e)
+                        continue
+                    self._save_checkpoint(checkpoint_path, checkpoint)
+                if errors:
+                    # Finished shards stay checkpointed; a rerun only redoes the failed ones
+                    raise errors[0]
+        
+        # Shards cover ascending key ranges; a descending export reads them back to front
+        ordered = [(part_paths[i], checkpoint['completed'][str(i)]['row_count']) for i in range(len(ranges))]
+        if descending:
+            ordered.reverse()
+        if combine == 'zip':
+            self._zip_parts([path for path, _ in ordered], output_path, format, columns)
+        elif format == 'parquet':
+            self._merge_parquet_parts([path for path, _ in ordered], output_path)
+        else:
+            self._concat_parts([path for path, _ in ordered], output_path, format, columns, compress,
+                               [row_count for _, row_count in ordered])
+        
+        for part_path in part_paths:
+            os.remove(part_path)
+        os.remove(checkpoint_path)
+        
+        return {
+            'row_count': sum(shard['row_count'] for shard in checkpoint['completed'].values()),
+            'file_size': os.path.getsize(output_path),
+            'checksum': file_checksum(output_path),
+            'shards': len(ranges)
         }
     
+    def _shard_boundaries(self, query_text: str, shard_column: str, shards: int) -> List[Any]:
+        """Lower bound of each shard, taken from NTILE buckets over the shard column"""
+        from sqlalchemy import text
+        
+        result = self.db.execute(text(
+            f"SELECT bucket, MIN({shard_column}) AS lower FROM ("
+            f"SELECT {shard_column}, NTILE(:shards) OVER (ORDER BY {shard_column}) AS bucket "
+            f"FROM ({query_text}) AS export_src) AS buckets GROUP BY bucket ORDER BY bucket"
+        ), {'shards': shards})
+        lowers = []
+        for row in result:
+            # Ties split across buckets collapse into one half-open range
+            if not lowers or row.lower != lowers[-1]:
+                lowers.append(row.lower)
+        # Round-trip through JSON so a first run and a resumed run use identical bounds
+        return json.loads(json.dumps(lowers, default=str))
+    
+    def _query_columns(self, query_text: str) -> List[str]:
+        from sqlalchemy import text
+        
+        return list(self.db.execute(text(f"SELECT * FROM ({query_text}) AS export_src LIMIT 0")).keys())
+    
+    def _concat_parts(self, part_paths: List[str], output_path: str, format: str,
+                      columns: List[str], compress: bool, row_counts: List[int]):
+        """Join part files byte for byte; gzip members can be concatenated as-is"""
+        def encode(piece: str) -> bytes:
+            return gzip.compress(piece.encode('utf-8')) if compress else piece.encode('utf-8')
+        
+        with open(output_path, 'wb') as out:
+            if format == 'csv':
+                header = StringIO()
+                csv.writer(header).writerow(columns)
+                out.write(encode(header.getvalue()))
+            else:
+                out.write(encode('['))
+            
+            wrote_rows = False
+            for part_path, row_count in zip(part_paths, row_counts):
+                if not row_count:
+                    continue
+                if format == 'json' and wrote_rows:
+                    out.write(encode(','))
+                with open(part_path, 'rb') as part:
+                    shutil.copyfileobj(part, out, CHECKSUM_BLOCK_SIZE)
+                wrote_rows = True
+            
+            if format == 'json':
+                out.write(encode(']'))
+    
+    def _merge_parquet_parts(self, part_paths: List[str], output_path: str):
+        """Copy the row groups of every part into one Parquet file"""
+        parts = [pq.ParquetFile(part_path) for part_path in part_paths]
+        # Empty shards only carry placeholder string columns
+        parts = [part for part in parts if part.metadata.num_rows] or parts[:1]
+        schema = self._merged_parquet_schema(parts)
+        with pq.ParquetWriter(output_path, schema, compression='zstd', use_dictionary=True) as writer:
+            for part in parts:
+                for index in range(part.num_row_groups):
+                    writer.write_table(part.read_row_group(index).cast(schema))
+    
+    @staticmethod
+    def _column_has_values(part: pq.ParquetFile, column_index: int) -> bool:
+        """Whether a part has any non-NULL value in a column, from row group statistics"""
+        metadata = part.metadata
+        nulls = 0
+        for row_group in range(metadata.num_row_groups):
+            statistics = metadata.row_group(row_group).column(column_index).statistics
+            if statistics is None or not statistics.has_null_count:
+                return True
+            nulls += statistics.null_count
+        return nulls < metadata.num_rows
+    
+    def _merged_parquet_schema(self, parts: List[pq.ParquetFile]) -> pa.Schema:
+        """One type per column, taken only from parts where that column has values.
+        
+        A column that was all NULL in a shard was written there as a string
+        placeholder, so it must not decide the type of the merged column.
+        """
+        fields = []
+        for column_index, field in enumerate(parts[0].schema_arrow):
+            types = [
+                part.schema_arrow.field(column_index).type
+                for part in parts if self._column_has_values(part, column_index)
+            ] or [field.type]
+            field_type = types[0]
+            if any(t != field_type for t in types):
+                try:
+                    field_type = pa.unify_schemas(
+                        [pa.schema([pa.field(field.name, t)]) for t in types],
+                        promote_options='permissive'
+                    ).field(0).type
+                except (pa.ArrowInvalid, pa.ArrowTypeError):
+                    field_type = pa.string()
+            fields.append(pa.field(field.name, field_type))
+        return pa.schema(fields)
+    
+    def _zip_parts(self, part_paths: List[str], output_path: str, format: str, columns: List[str]):
+        """Bundle part files into one zip archive, adding the CSV header to each part"""
+        ext = {'csv': '.csv', 'json': '.json', 'excel': '.xlsx', 'parquet': '.parquet'}[format]
+        header = StringIO()
+        csv.writer(header).writerow(columns)
+        with zipfile.ZipFile(output_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for index, part_path in enumerate(part_paths):
+                with archive.open(f"part-{index:04d}{ext}", 'w') as entry:
+                    if format == 'csv':
+                        entry.write(header.getvalue().encode('utf-8'))
+                    elif format == 'json':
+                        entry.write(b'[')
+                    with open(part_path, 'rb') as part:
+                        shutil.copyfileobj(part, entry, CHECKSUM_BLOCK_SIZE)
+                    if format == 'json':
+                        entry.write(b']')
+    
+    def _load_checkpoint(self, checkpoint_path: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(checkpoint_path):
+            return None
+        try:
+            with open(checkpoint_path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # A checkpoint from a different query or format cannot be resumed
+        return checkpoint if checkpoint.get('fingerprint') == fingerprint else None
+    
+    def _save_checkpoint(self, checkpoint_path: str, checkpoint: Dict[str, Any]):
+        tmp_path = checkpoint_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, checkpoint_path)
+    
     def _batch_query(self, query) -> Iterator[List[Dict]]:
         """Execute query and yield results in batches"""
         from sqlalchemy import text
@@ -141,28 +566,17 @@ class StreamingExporter:
             if not query_text:
                 return
                 
-            offset = 0
+            # Execute once with a server-side cursor and fetch in batches,
+            # instead of re-running the query with a growing OFFSET. Errors
+            # propagate so a failed query fails the export instead of truncating it.
+            result = self.db.connection().execution_options(stream_results=True).execute(text(query_text))
             while True:
-                # Add LIMIT and OFFSET to the query
-                paginated_query = f"{query_text} LIMIT {self.BATCH_SIZE} OFFSET {offset}"
-                try:
-                    result = self.db.execute(text(paginated_query))
-                    batch = result.fetchall()
-                    
-                    if not batch:
-                        break
-                    
-                    # Convert SQLAlchemy rows to dicts
-                    yield [dict(row._mapping) for row in batch]
-                    offset += self.BATCH_SIZE
-                    
-                    # If we got fewer rows than batch size, we're done
-                    if len(batch) < self.BATCH_SIZE:
-                        break
-                except Exception as e:
-                    # If query fails, fall back to sample data
-                    print(f"Query failed: {e}, using sample data")
+                batch = result.fetchmany(self.BATCH_SIZE)
+                if not batch:
                     break
+                
+                # Convert SQLAlchemy rows to dicts
+                yield [dict(row._mapping) for row in batch]
         else:
             # Old format: CursorResult - fetch in batches
             offset = 0
@@ -189,15 +603,21 @@ class StreamingExporter:
                 print(f"Validation failed: File is empty: {file_path}")
                 return False
             
-            # For CSV and Excel, just verify file structure is valid
-            # Checksum validation is too fragile due to data type conversions
+            # The checksum covers the exact output bytes, so it holds for every format
+            if file_checksum(file_path) != expected_checksum:
+                print(f"Validation failed: Checksum mismatch: {file_path}")
+                return False
+            
+            if file_path.endswith('.zip'):
+                return zipfile.is_zipfile(file_path)
             if format == 'csv':
                 return self._validate_csv_structure(file_path)
             elif format == 'json':
-                # JSON can use checksum since it preserves data types
-                return self._validate_json(file_path, expected_checksum)
+                return self._validate_json(file_path)
             elif format == 'excel':
                 return self._validate_excel_structure(file_path)
+            elif format == 'parquet':
+                return self._validate_parquet(file_path)
             return False
         except Exception as e:
             print(f"Validation error: {e}")
@@ -206,7 +626,8 @@ class StreamingExporter:
     def _validate_csv_structure(self, file_path: str) -> bool:
         """Validate CSV file has valid structure and content"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
+            opener = gzip.open if file_path.endswith('.gz') else open
+            with opener(file_path, 'rt', encoding='utf-8') as f:
                 reader = csv.DictReader(f)
                 row_count = 0
                 for row in reader:
@@ -218,17 +639,13 @@ class StreamingExporter:
             print(f"CSV validation error: {e}")
             return False
     
-    def _validate_json(self, file_path: str, expected_checksum: str) -> bool:
-        """Validate JSON file - can use checksum since JSON preserves types"""
+    def _validate_json(self, file_path: str) -> bool:
+        """Validate JSON file parses to a list of rows"""
         try:
-            checksum = hashlib.md5()
-            with open(file_path, 'r', encoding='utf-8') as f:
+            opener = gzip.open if file_path.endswith('.gz') else open
+            with opener(file_path, 'rt', encoding='utf-8') as f:
                 data = json.load(f)
-                if not isinstance(data, list):
-                    return False
-                for row in data:
-                    checksum.update(str(row).encode('utf-8'))
-            return checksum.hexdigest() == expected_checksum
+            return isinstance(data, list)
         except Exception as e:
             print(f"JSON validation error: {e}")
             return False
@@ -250,3 +667,12 @@ class StreamingExporter:
         except Exception as e:
             print(f"Excel validation error: {e}")
             return False
+    
+    def _validate_parquet(self, file_path: str) -> bool:
+        """Validate Parquet footer and schema can be read"""
+        try:
+            metadata = pq.read_metadata(file_path)
+            return metadata.num_columns > 0
+        except Exception as e:
+            print(f"Parquet validation error: {e}")
+            return False
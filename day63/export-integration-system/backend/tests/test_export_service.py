@@ -100,5 +100,173 @@ def test_export_validation(db_session):
     finally:
         os.unlink(output_path)
 
+def test_sharded_export_resumes_from_checkpoint(tmp_path, monkeypatch):
+    import csv
+    import json
+    from concurrent.futures import ThreadPoolExecutor
+    from app.services import export_service
+    
+    engine = create_engine(f"sqlite:///{tmp_path / 'metrics.db'}")
+    session = sessionmaker(bind=engine)()
+    session.execute(text("CREATE TABLE metrics (id TEXT PRIMARY KEY, metric_name TEXT, value REAL, timestamp TEXT, tags TEXT)"))
+    for i in range(500):
+        session.execute(text("INSERT INTO metrics VALUES (:id, :name, :value, :ts, '{}')"), {
+            'id': f'test-{i:04d}', 'name': f'metric_{i % 10}', 'value': float(i), 'ts': f'2025-01-{1 + i % 28:02d}'
+        })
+    session.commit()
+    
+    exporter = StreamingExporter(session)
+    query = {'query_text': "SELECT * FROM metrics ORDER BY timestamp DESC"}
+    output_path = str(tmp_path / 'export.csv')
+    
+    # Shards can't reproduce an ordering on another column
+    with pytest.raises(ValueError):
+        exporter.export_sharded(query, output_path, 'csv', shard_column='id', shards=4)
+    
+    # Fail one shard: the others stay checkpointed
+    real_export_shard = export_service._export_shard
+    calls = []
+    def flaky_export_shard(*args):
+        calls.append(args[6])
+        if args[6].endswith('part0002'):
+            raise RuntimeError("worker crashed")
+        return real_export_shard(*args)
+    monkeypatch.setattr(export_service, 'ProcessPoolExecutor', ThreadPoolExecutor)
+    monkeypatch.setattr(export_service, '_export_shard', flaky_export_shard)
+    with pytest.raises(RuntimeError):
+        exporter.export_sharded(query, output_path, 'csv', shard_column='timestamp', shards=4)
+    with open(output_path + '.checkpoint.json') as f:
+        assert sorted(json.load(f)['completed']) == ['0', '1', '3']
+    
+    calls.clear()
+    monkeypatch.setattr(export_service, '_export_shard', lambda *args: calls.append(args[6]) or real_export_shard(*args))
+    result = exporter.export_sharded(query, output_path, 'csv', shard_column='timestamp', shards=4)
+    assert [path[-8:] for path in calls] == ['part0002']
+    assert result['row_count'] == 500
+    assert exporter.validate_export(output_path, 'csv', result['checksum'])
+    
+    with open(output_path) as f:
+        rows = list(csv.DictReader(f))
+    assert sorted(row['id'] for row in rows) == [f'test-{i:04d}' for i in range(500)]
+    # Parts are combined back to front to keep the query's descending order
+    timestamps = [row['timestamp'] for row in rows]
+    assert timestamps == sorted(timestamps, reverse=True)
+    assert not os.path.exists(output_path + '.checkpoint.json')
+    session.close()
+
+def test_parquet_export(db_session, tmp_path):
+    import pyarrow.parquet as pq
+    
+    exporter = StreamingExporter(db_session)
+    query = db_session.execute(text("SELECT * FROM metrics"))
+    output_path = str(tmp_path / 'export.parquet')
+    
+    result = exporter.export_to_parquet(query, output_path)
+    
+    assert result['row_count'] == 1000
+    assert exporter.validate_export(output_path, 'parquet', result['checksum'])
+    parquet_file = pq.ParquetFile(output_path)
+    assert parquet_file.metadata.row_group(0).column(0).compression == 'ZSTD'
+    table = parquet_file.read()
+    assert table.num_rows == 1000
+    assert table.column('value').type == 'double'
+    assert table.column('metric_name').to_pylist()[:3] == ['metric_0', 'metric_1', 'metric_2']
+
+def test_sharded_parquet_export_merges_parts(tmp_path, monkeypatch):
+    import pyarrow.parquet as pq
+    from concurrent.futures import ThreadPoolExecutor
+    from app.services import export_service
+    
+    engine = create_engine(f"sqlite:///{tmp_path / 'metrics.db'}")
+    session = sessionmaker(bind=engine)()
+    session.execute(text("CREATE TABLE metrics (id INTEGER PRIMARY KEY, metric_name TEXT, value REAL)"))
+    for i in range(300):
+        session.execute(text("INSERT INTO metrics VALUES (:id, :name, :value)"), {
+            'id': i, 'name': f'metric_{i % 10}', 'value': float(i)
+        })
+    session.commit()
+    
+    monkeypatch.setattr(export_service, 'ProcessPoolExecutor', ThreadPoolExecutor)
+    exporter = StreamingExporter(session)
+    output_path = str(tmp_path / 'export.parquet')
+    result = exporter.export_sharded({'query_text': "SELECT * FROM metrics"}, output_path, 'parquet', shards=3)
+    
+    assert result['row_count'] == 300
+    assert exporter.validate_export(output_path, 'parquet', result['checksum'])
+    assert sorted(pq.read_table(output_path).column('id').to_pylist()) == list(range(300))
+    session.close()
+
+def test_parquet_stream_types_columns_null_in_first_batch(tmp_path):
+    import pyarrow.parquet as pq
+    from app.services.export_service import ParquetStream
+    
+    path = str(tmp_path / 'late.parquet')
+    stream = ParquetStream(path, row_group_size=4)
+    stream.write_rows(['id', 'score'], [(1, None), (2, None)])
+    stream.write_rows(['id', 'score'], [(3, 1.5), (4, 2.5)])
+    # The first row group typed score as double, so later values still fit
+    stream.write_rows(['id', 'score'], [(5, None), (6, 3.0)])
+    stream.close()
+    
+    table = pq.read_table(path)
+    assert table.column('score').type == 'double'
+    assert table.column('score').to_pylist() == [None, None, 1.5, 2.5, None, 3.0]
+    
+    path = str(tmp_path / 'placeholder.parquet')
+    stream = ParquetStream(path, row_group_size=2)
+    stream.write_rows(['id', 'note'], [(1, None), (2, None)])
+    stream.write_rows(['id', 'note'], [(3, 7), (4, None)])
+    stream.close()
+    
+    # Typed as a string placeholder by the first row group, later values are kept as text
+    assert pq.read_table(path).column('note').to_pylist() == [None, None, '7', None]
+
+def test_sharded_parquet_merge_ignores_all_null_placeholder_columns(tmp_path, monkeypatch):
+    import pyarrow.parquet as pq
+    from concurrent.futures import ThreadPoolExecutor
+    from app.services import export_service
+    
+    engine = create_engine(f"sqlite:///{tmp_path / 'metrics.db'}")
+    session = sessionmaker(bind=engine)()
+    session.execute(text("CREATE TABLE metrics (id INTEGER PRIMARY KEY, value REAL)"))
+    for i in range(90):
+        # Only the last shard has values
+        session.execute(text("INSERT INTO metrics VALUES (:id, :value)"), {
+            'id': i, 'value': float(i) if i >= 60 else None
+        })
+    session.commit()
+    
+    monkeypatch.setattr(export_service, 'ProcessPoolExecutor', ThreadPoolExecutor)
+    exporter = StreamingExporter(session)
+    output_path = str(tmp_path / 'export.parquet')
+    result = exporter.export_sharded({'query_text': "SELECT * FROM metrics"}, output_path, 'parquet', shards=3)
+    
+    assert result['row_count'] == 90
+    table = pq.read_table(output_path)
+    assert table.column('value').type == 'double'
+    assert sorted(v for v in table.column('value').to_pylist() if v is not None) == [float(i) for i in range(60, 90)]
+    session.close()
+
+def test_query_error_mid_stream_fails_export(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'metrics.db'}")
+    session = sessionmaker(bind=engine)()
+    session.execute(text("CREATE TABLE metrics (id INTEGER PRIMARY KEY, value REAL)"))
+    for i in range(100):
+        session.execute(text("INSERT INTO metrics VALUES (:id, :value)"), {'id': i, 'value': float(i)})
+    session.commit()
+    
+    def fail_late(value):
+        if value >= 50:
+            raise ValueError("connection lost")
+        return value
+    session.connection().connection.driver_connection.create_function('fail_late', 1, fail_late)
+    
+    exporter = StreamingExporter(session)
+    exporter.BATCH_SIZE = 10
+    with pytest.raises(Exception, match="user-defined function raised exception"):
+        exporter.export_to_csv({'query_text': "SELECT id, fail_late(value) AS value FROM metrics ORDER BY id"},
+                               str(tmp_path / 'export.csv'))
+    session.close()
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
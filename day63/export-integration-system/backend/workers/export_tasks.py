@@ -43,23 +43,35 @@ def process_export_job(self, job_id: str):
             output_dir = "/tmp/exports"
             os.makedirs(output_dir, exist_ok=True)
             
-            # Determine file extension
-            ext_map = {"csv": ".csv", "json": ".json", "excel": ".xlsx"}
-            file_ext = ext_map.get(job.format, ".csv")
-            output_path = f"{output_dir}/{job_id}{file_ext}"
-            
             # Build query based on export type
-            query_dict = build_export_query(db, job.export_type, job.filters)
+            filters = job.filters or {}
+            query_dict = build_export_query(db, job.export_type, filters)
+            shards = int(filters.get('shards') or os.getenv("EXPORT_SHARDS", "1"))
+            sharded = shards > 1 and bool(query_dict.get('query_text'))
+            
+            # Determine file extension; sharded Excel exports are a zip of part workbooks
+            ext_map = {"csv": ".csv", "json": ".json", "excel": ".xlsx", "parquet": ".parquet"}
+            file_ext = ".zip" if sharded and job.format == "excel" else ext_map.get(job.format, ".csv")
+            output_path = f"{output_dir}/{job_id}{file_ext}"
             
             # Stream export
             exporter = StreamingExporter(db)
             
-            if job.format == "csv":
+            if sharded:
+                # Rerunning the same job resumes from its shard checkpoint
+                result = exporter.export_sharded(
+                    query_dict, output_path, job.format,
+                    shard_column=filters.get('shard_column', 'timestamp'),
+                    shards=shards
+                )
+            elif job.format == "csv":
                 result = exporter.export_to_csv(query_dict, output_path)
             elif job.format == "json":
                 result = exporter.export_to_json(query_dict, output_path)
             elif job.format == "excel":
                 result = exporter.export_to_excel(query_dict, output_path)
+            elif job.format == "parquet":
+                result = exporter.export_to_parquet(query_dict, output_path)
             else:
                 raise ValueError(f"Unsupported format: {job.format}")
             
@@ -94,6 +94,7 @@ function App() {
                             <MenuItem value="csv">CSV</MenuItem>
                             <MenuItem value="json">JSON</MenuItem>
                             <MenuItem value="excel">Excel</MenuItem>
+                            <MenuItem value="parquet">Parquet</MenuItem>
                         </Select>
                     </FormControl>
                 </DialogContent>
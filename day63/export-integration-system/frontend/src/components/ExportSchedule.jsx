@@ -130,6 +130,7 @@ const ExportSchedule = () => {
                             <MenuItem value="csv">CSV</MenuItem>
                             <MenuItem value="json">JSON</MenuItem>
                             <MenuItem value="excel">Excel</MenuItem>
+                            <MenuItem value="parquet">Parquet</MenuItem>
                         </Select>
                     </FormControl>
 
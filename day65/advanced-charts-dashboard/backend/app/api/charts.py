@@ -1,24 +1,46 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Header
+from fastapi.responses import JSONResponse, Response
 from typing import List, Optional
 from datetime import datetime, timedelta
 from app.services.chart_service import ChartService
+from app.services.columnar import (
+    ROWS, ARROW_STREAM, negotiate_format, encode_multi_series, encode_scatter
+)
 
 router = APIRouter()
 chart_service = ChartService()
 
+# Negotiated endpoints return different bodies per Accept; shared caches must key on it
+VARY_HEADERS = {"Vary": "Accept"}
+
+def _columnar_response(payload, media_type: str) -> Response:
+    if media_type == ARROW_STREAM:
+        return Response(content=payload, media_type=media_type, headers=VARY_HEADERS)
+    return JSONResponse(content=payload, media_type=media_type, headers=VARY_HEADERS)
+
 @router.get("/multi-series")
 async def get_multi_series_data(
+    response: Response,
     metrics: List[str] = Query(...),
     start_time: Optional[datetime] = None,
-    end_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None,
+    accept: Optional[str] = Header(None)
 ):
-    """Get multi-series time-series data"""
+    """Get multi-series time-series data
+    
+    Rows by default; columnar JSON, base64 float32 or Arrow IPC via Accept.
+    """
     if not start_time:
         start_time = datetime.now() - timedelta(hours=24)
     if not end_time:
         end_time = datetime.now()
     
-    return chart_service.generate_multi_series(metrics, start_time, end_time)
+    media_type = negotiate_format(accept)
+    if media_type == ROWS:
+        response.headers.update(VARY_HEADERS)
+        return chart_service.generate_multi_series(metrics, start_time, end_time)
+    columns = chart_service.generate_multi_series_columns(metrics, start_time, end_time)
+    return _columnar_response(encode_multi_series(columns, media_type), media_type)
 
 @router.get("/stacked")
 async def get_stacked_data(
@@ -30,12 +52,19 @@ async def get_stacked_data(
 
 @router.get("/scatter")
 async def get_scatter_data(
+    response: Response,
     x_metric: str,
     y_metric: str,
-    samples: int = 1000
+    samples: int = 1000,
+    accept: Optional[str] = Header(None)
 ):
     """Get scatter plot data showing correlation"""
-    return chart_service.generate_scatter_data(x_metric, y_metric, samples)
+    media_type = negotiate_format(accept)
+    if media_type == ROWS:
+        response.headers.update(VARY_HEADERS)
+        return chart_service.generate_scatter_data(x_metric, y_metric, samples)
+    columns = chart_service.generate_scatter_columns(x_metric, y_metric, samples)
+    return _columnar_response(encode_scatter(columns, media_type), media_type)
 
 @router.get("/heatmap")
 async def get_heatmap_data(
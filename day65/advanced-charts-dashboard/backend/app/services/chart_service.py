@@ -4,17 +4,18 @@ from datetime import datetime, timedelta
 from typing import List, Dict, Any
 
 class ChartService:
-    def generate_multi_series(
+    def generate_multi_series_columns(
         self, 
         metrics: List[str], 
         start_time: datetime, 
         end_time: datetime
     ) -> Dict[str, Any]:
-        """Generate multi-series time-series data"""
+        """Generate multi-series data as parallel arrays: one timestamp index, one value array per metric"""
         time_range = pd.date_range(start=start_time, end=end_time, freq='5min')
         
-        series_data = []
-        for metric in metrics:
+        series = {}
+        # A metric requested twice is one series, in rows and columnar formats alike
+        for metric in dict.fromkeys(metrics):
             # Simulate realistic metric patterns
             base_value = np.random.uniform(50, 100)
             noise = np.random.normal(0, 10, len(time_range))
@@ -25,16 +26,11 @@ class ChartService:
             spike_indices = np.random.choice(len(values), size=5, replace=False)
             values[spike_indices] *= 1.5
             
-            series_data.append({
-                "name": metric,
-                "data": [
-                    {"timestamp": ts.isoformat(), "value": float(v)}
-                    for ts, v in zip(time_range, values)
-                ]
-            })
+            series[metric] = values
         
         return {
-            "series": series_data,
+            "timestamps": time_range,
+            "series": series,
             "metadata": {
                 "start": start_time.isoformat(),
                 "end": end_time.isoformat(),
@@ -43,6 +39,31 @@ class ChartService:
             }
         }
     
+    def generate_multi_series(
+        self, 
+        metrics: List[str], 
+        start_time: datetime, 
+        end_time: datetime
+    ) -> Dict[str, Any]:
+        """Generate multi-series time-series data"""
+        columns = self.generate_multi_series_columns(metrics, start_time, end_time)
+        # Format the shared timestamps once rather than once per series
+        timestamps = [ts.isoformat() for ts in columns["timestamps"]]
+        
+        return {
+            "series": [
+                {
+                    "name": metric,
+                    "data": [
+                        {"timestamp": ts, "value": v}
+                        for ts, v in zip(timestamps, values.tolist())
+                    ]
+                }
+                for metric, values in columns["series"].items()
+            ],
+            "metadata": columns["metadata"]
+        }
+    
     def generate_stacked_data(
         self, 
         categories: List[str], 
@@ -76,13 +97,13 @@ class ChartService:
             "categories": categories
         }
     
-    def generate_scatter_data(
+    def generate_scatter_columns(
         self, 
         x_metric: str, 
         y_metric: str, 
         samples: int
     ) -> Dict[str, Any]:
-        """Generate scatter plot data with correlation"""
+        """Generate correlated scatter data as x / y arrays with a boolean outlier mask"""
         # Create correlated data
         correlation = np.random.uniform(0.3, 0.9)
         
@@ -93,26 +114,49 @@ class ChartService:
         outlier_count = int(samples * 0.05)
         outlier_indices = np.random.choice(samples, outlier_count, replace=False)
         y_values[outlier_indices] += np.random.uniform(-50, 50, outlier_count)
+        outlier_mask = np.zeros(samples, dtype=bool)
+        outlier_mask[outlier_indices] = True
+        
+        # Calculate correlation coefficient
+        correlation_coef = np.corrcoef(x_values, y_values)[0, 1]
+        
+        return {
+            "x": x_values,
+            "y": y_values,
+            "outlier_mask": outlier_mask,
+            "x_metric": x_metric,
+            "y_metric": y_metric,
+            "correlation": float(correlation_coef),
+            "outliers": outlier_count
+        }
+    
+    def generate_scatter_data(
+        self, 
+        x_metric: str, 
+        y_metric: str, 
+        samples: int
+    ) -> Dict[str, Any]:
+        """Generate scatter plot data with correlation"""
+        columns = self.generate_scatter_columns(x_metric, y_metric, samples)
         
         points = [
             {
-                "x": float(x),
-                "y": float(y),
+                "x": x,
+                "y": y,
                 "label": f"Point {i}",
-                "outlier": i in outlier_indices
+                "outlier": outlier
             }
-            for i, (x, y) in enumerate(zip(x_values, y_values))
+            for i, (x, y, outlier) in enumerate(zip(
+                columns["x"].tolist(), columns["y"].tolist(), columns["outlier_mask"].tolist()
+            ))
         ]
         
-        # Calculate correlation coefficient
-        correlation_coef = np.corrcoef(x_values, y_values)[0, 1]
-        
         return {
             "data": points,
             "x_metric": x_metric,
             "y_metric": y_metric,
-            "correlation": float(correlation_coef),
-            "outliers": len(outlier_indices)
+            "correlation": columns["correlation"],
+            "outliers": columns["outliers"]
         }
     
     def generate_heatmap_data(
@@ -0,0 +1,115 @@
+import base64
+import json
+from typing import Dict, Any, Optional
+import numpy as np
+import pyarrow as pa
+
+# Wire formats chart endpoints can negotiate through the Accept header
+ROWS = "application/json"
+COLUMNAR_JSON = "application/vnd.charts.columnar+json"
+COLUMNAR_BASE64 = "application/vnd.charts.columnar.base64+json"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+SUPPORTED_FORMATS = (COLUMNAR_JSON, COLUMNAR_BASE64, ARROW_STREAM, ROWS)
+
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """Pick the best supported media type from an Accept header; rows by default"""
+    if not accept:
+        return ROWS
+
+    candidates = []
+    for position, entry in enumerate(accept.split(",")):
+        media_type, *params = [part.strip() for part in entry.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if media_type in SUPPORTED_FORMATS and quality > 0:
+            candidates.append((-quality, position, media_type))
+
+    return min(candidates)[2] if candidates else ROWS
+
+
+def encode_array(values: np.ndarray, media_type: str, dtype: str = "<f4"):
+    """Plain list for columnar JSON, base64 of little-endian bytes for the base64 format"""
+    if media_type == COLUMNAR_BASE64:
+        return base64.b64encode(np.ascontiguousarray(values, dtype=dtype).tobytes()).decode("ascii")
+    return values.tolist()
+
+
+def encode_mask(mask: np.ndarray, media_type: str):
+    """Boolean column; bit-packed (LSB first) in the base64 format"""
+    if media_type == COLUMNAR_BASE64:
+        return base64.b64encode(np.packbits(mask, bitorder="little").tobytes()).decode("ascii")
+    return mask.tolist()
+
+
+def to_arrow_ipc(columns: Dict[str, np.ndarray], metadata: Dict[str, Any]) -> bytes:
+    """Serialize equal-length columns as one Arrow IPC stream record batch"""
+    arrays = []
+    for values in columns.values():
+        if values.dtype.kind == "M":
+            arrays.append(pa.array(values.astype("datetime64[ms]")))
+        elif values.dtype.kind == "f":
+            arrays.append(pa.array(values.astype(np.float32)))
+        else:
+            arrays.append(pa.array(values))
+    batch = pa.record_batch(arrays, names=list(columns), metadata={"metadata": json.dumps(metadata)})
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_multi_series(columns: Dict[str, Any], media_type: str):
+    """Columnar multi-series payload: epoch-ms timestamps plus one values array per series"""
+    timestamps = columns["timestamps"]
+    if media_type == ARROW_STREAM:
+        return to_arrow_ipc(
+            {"timestamp": timestamps.values, **columns["series"]},
+            columns["metadata"]
+        )
+
+    epoch_ms = timestamps.asi8 // 1_000_000
+    return {
+        "timestamps": encode_array(epoch_ms, media_type, dtype="<i8"),
+        "series": [
+            {"name": name, "values": encode_array(values, media_type)}
+            for name, values in columns["series"].items()
+        ],
+        "metadata": {
+            **columns["metadata"],
+            "encoding": "base64" if media_type == COLUMNAR_BASE64 else "json",
+            "dtypes": {"timestamps": "int64", "values": "float32" if media_type == COLUMNAR_BASE64 else "float64"}
+        }
+    }
+
+
+def encode_scatter(columns: Dict[str, Any], media_type: str):
+    """Columnar scatter payload: x / y arrays and a boolean outlier mask"""
+    metadata = {
+        "x_metric": columns["x_metric"],
+        "y_metric": columns["y_metric"],
+        "correlation": columns["correlation"],
+        "outliers": columns["outliers"]
+    }
+    if media_type == ARROW_STREAM:
+        return to_arrow_ipc(
+            {"x": columns["x"], "y": columns["y"], "outlier": columns["outlier_mask"]},
+            metadata
+        )
+
+    return {
+        "x": encode_array(columns["x"], media_type),
+        "y": encode_array(columns["y"], media_type),
+        "outlier_mask": encode_mask(columns["outlier_mask"], media_type),
+        "count": len(columns["x"]),
+        "encoding": "base64" if media_type == COLUMNAR_BASE64 else "json",
+        **metadata
+    }
@@ -54,3 +54,59 @@ def test_status_timeline():
     data = response.json()
     assert "timeline" in data
     assert len(data["timeline"]) == 4
+
+def test_multi_series_columnar_json():
+    response = client.get(
+        "/api/charts/multi-series?metrics=cpu&metrics=memory",
+        headers={"Accept": "application/vnd.charts.columnar+json"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/vnd.charts.columnar+json")
+    data = response.json()
+    count = data["metadata"]["count"]
+    assert len(data["timestamps"]) == count
+    assert all(isinstance(ts, int) for ts in data["timestamps"])
+    assert [s["name"] for s in data["series"]] == ["cpu", "memory"]
+    assert all(len(s["values"]) == count for s in data["series"])
+
+def test_scatter_base64_columns():
+    import base64
+    import numpy as np
+    response = client.get(
+        "/api/charts/scatter?x_metric=requests&y_metric=latency&samples=1000",
+        headers={"Accept": "application/vnd.charts.columnar.base64+json, application/json;q=0.5"}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    x = np.frombuffer(base64.b64decode(data["x"]), dtype="<f4")
+    mask = np.unpackbits(np.frombuffer(base64.b64decode(data["outlier_mask"]), dtype=np.uint8), bitorder="little")[:data["count"]]
+    assert len(x) == 1000
+    assert int(mask.sum()) == data["outliers"] == 50
+
+def test_multi_series_arrow_stream():
+    pa = pytest.importorskip("pyarrow")
+    response = client.get(
+        "/api/charts/multi-series?metrics=cpu",
+        headers={"Accept": "application/vnd.apache.arrow.stream"}
+    )
+    assert response.status_code == 200
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.column_names == ["timestamp", "cpu"]
+    assert str(table.schema.field("cpu").type) == "float"
+
+def test_negotiated_responses_vary_on_accept():
+    for url in ("/api/charts/multi-series?metrics=cpu", "/api/charts/scatter?x_metric=a&y_metric=b&samples=100"):
+        for accept in (None, "application/json", "application/vnd.charts.columnar+json"):
+            response = client.get(url, headers={"Accept": accept} if accept else {})
+            assert response.status_code == 200
+            assert "Accept" in response.headers["vary"].split(", ")
+
+def test_duplicate_metrics_are_one_series():
+    rows = client.get("/api/charts/multi-series?metrics=cpu&metrics=memory&metrics=cpu").json()
+    assert [s["name"] for s in rows["series"]] == ["cpu", "memory"]
+
+    columnar = client.get(
+        "/api/charts/multi-series?metrics=cpu&metrics=memory&metrics=cpu",
+        headers={"Accept": "application/vnd.charts.columnar+json"}
+    ).json()
+    assert [s["name"] for s in columnar["series"]] == ["cpu", "memory"]
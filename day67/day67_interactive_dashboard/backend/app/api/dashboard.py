@@ -4,6 +4,7 @@ from sqlalchemy import select, func, and_, or_
 from app.core.database import get_db
 from app.core.redis_client import redis_client
 from app.models.metrics import MetricData
+from app.services.rollups import bucketed_timeseries
 from datetime import datetime, timedelta, timezone
 from typing import Optional, List, Dict, Any
 import hashlib
@@ -21,6 +22,10 @@ def normalize_datetime(dt: Optional[datetime]) -> Optional[datetime]:
 
 router = APIRouter()
 
+INTERVAL_SECONDS = {
+    '1m': 60, '5m': 300, '15m': 900, '1h': 3600, '6h': 21600, '1d': 86400
+}
+
 @router.get("/metrics")
 async def get_dashboard_metrics(
     start_time: Optional[datetime] = None,
@@ -245,61 +250,26 @@ async def get_timeseries_data(
         else:
             start_time = normalize_datetime(start_time)
         
-        # Build conditions
-        conditions = [
-            MetricData.timestamp >= start_time,
-            MetricData.timestamp <= end_time,
-            MetricData.metric_name == metric_name
-        ]
-        
-        if service:
-            conditions.append(MetricData.service == service)
-        if endpoint:
-            conditions.append(MetricData.endpoint == endpoint)
-        if region:
-            conditions.append(MetricData.region == region)
-        if environment:
-            conditions.append(MetricData.environment == environment)
-        
-        # Query raw data (in production, use time-bucket aggregation)
-        query = select(MetricData).where(and_(*conditions)).order_by(MetricData.timestamp)
-        result = await db.execute(query)
-        metrics = result.scalars().all()
-        
-        # Manual bucketing (in production, use PostgreSQL generate_series or TimescaleDB)
-        interval_minutes = {
-            '1m': 1, '5m': 5, '15m': 15, '1h': 60, '6h': 360, '1d': 1440
-        }[interval]
-        
-        buckets = {}
-        for metric in metrics:
-            bucket_time = metric.timestamp.replace(second=0, microsecond=0)
-            bucket_time = bucket_time - timedelta(
-                minutes=bucket_time.minute % interval_minutes
-            )
-            
-            bucket_key = bucket_time.isoformat()
-            if bucket_key not in buckets:
-                buckets[bucket_key] = {'values': [], 'timestamp': bucket_time}
-            buckets[bucket_key]['values'].append(metric.value)
-        
-        # Calculate averages
-        timeseries = []
-        for bucket_key in sorted(buckets.keys()):
-            bucket = buckets[bucket_key]
-            values = bucket['values']
-            timeseries.append({
-                'timestamp': bucket_key,
-                'value': sum(values) / len(values),
-                'min': min(values),
-                'max': max(values),
-                'count': len(values)
-            })
+        # Bucket in SQL, reading whole buckets from a rollup tier when one fits
+        timeseries, source = await bucketed_timeseries(
+            db,
+            INTERVAL_SECONDS[interval],
+            start_time,
+            end_time,
+            {
+                'metric_name': metric_name,
+                'service': service,
+                'endpoint': endpoint,
+                'region': region,
+                'environment': environment
+            }
+        )
         
         return {
             'data': timeseries,
             'interval': interval,
-            'metric': metric_name
+            'metric': metric_name,
+            'source': source
         }
     except Exception as e:
         print(f"Error in get_timeseries_data: {e}")
@@ -29,6 +29,10 @@ async def startup():
         generator = DataGenerator()
         await generator.generate_sample_data()
         print("✅ Database initialized with sample data")
+        
+        # Build the 1m/1h rollups once data exists, then keep them current
+        from app.services.rollups import refresh_rollups_loop
+        asyncio.create_task(refresh_rollups_loop())
     
     # Run data generation in background so server can start immediately
     asyncio.create_task(init_data())
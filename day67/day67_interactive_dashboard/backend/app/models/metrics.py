@@ -20,3 +20,33 @@ class MetricData(Base):
         Index('idx_service_endpoint', 'service', 'endpoint'),
         Index('idx_metric_timestamp', 'metric_name', 'timestamp'),
     )
+
+class MetricRollupColumns:
+    """Pre-aggregated metric values per time bucket and dimension set"""
+    
+    # INTEGER on SQLite so rows inserted by INSERT ... SELECT get a rowid
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    bucket = Column(DateTime, nullable=False)
+    service = Column(String(100), nullable=False)
+    endpoint = Column(String(200))
+    region = Column(String(50))
+    environment = Column(String(50))
+    metric_name = Column(String(100), nullable=False)
+    value_sum = Column(Float, nullable=False)
+    value_min = Column(Float, nullable=False)
+    value_max = Column(Float, nullable=False)
+    value_count = Column(BigInteger, nullable=False)
+
+class MetricRollup1m(MetricRollupColumns, Base):
+    __tablename__ = "metric_rollup_1m"
+    
+    __table_args__ = (
+        Index('idx_rollup_1m_metric_bucket', 'metric_name', 'bucket'),
+    )
+
+class MetricRollup1h(MetricRollupColumns, Base):
+    __tablename__ = "metric_rollup_1h"
+    
+    __table_args__ = (
+        Index('idx_rollup_1h_metric_bucket', 'metric_name', 'bucket'),
+    )
@@ -0,0 +1,251 @@
+from sqlalchemy import select, delete, insert, func, cast, literal_column, BigInteger, Integer
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import AsyncSessionLocal
+from app.models.metrics import MetricData, MetricRollup1m, MetricRollup1h
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List, Tuple
+import asyncio
+import os
+
+EPOCH = datetime(1970, 1, 1)
+DIMENSIONS = ('service', 'endpoint', 'region', 'environment', 'metric_name')
+
+# Rollup tiers from coarsest to finest, keyed by bucket width in seconds
+ROLLUP_TIERS = [(3600, MetricRollup1h), (60, MetricRollup1m)]
+
+# Each tier is complete for buckets that start before its watermark. Loaded
+# from the rollup tables, so every worker sees what any worker refreshed
+rollup_watermarks: Dict[int, datetime] = {}
+
+ROLLUP_REFRESH_SECONDS = int(os.getenv("ROLLUP_REFRESH_SECONDS", "60"))
+# Rows that arrive late are picked up by re-rolling this much before the watermark
+ROLLUP_REROLL_SECONDS = int(os.getenv("ROLLUP_REROLL_SECONDS", "7200"))
+# Postgres advisory lock key; only one worker rebuilds a range at a time
+ROLLUP_LOCK_ID = 67_001
+
+def floor_time(dt: datetime, seconds: int) -> datetime:
+    epoch = int((dt - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=epoch - epoch % seconds)
+
+def ceil_time(dt: datetime, seconds: int) -> datetime:
+    floored = floor_time(dt, seconds)
+    return floored if floored == dt else floored + timedelta(seconds=seconds)
+
+def epoch_bucket(column, seconds: int, dialect: str):
+    """Start of the column's bucket as epoch seconds, computed in SQL.
+
+    Widths are rendered as literals so the SELECT and GROUP BY expressions
+    are identical; bound parameters would differ and Postgres would reject them.
+    """
+    width = literal_column(str(seconds))
+    if dialect == 'sqlite':
+        return cast(func.strftime(literal_column("'%s'"), column), Integer) // width * width
+    return cast(func.floor(func.extract('epoch', column) / width) * width, BigInteger)
+
+def truncate_time(column, seconds: int, dialect: str):
+    """Truncate a timestamp to the start of its minute or hour"""
+    if dialect == 'sqlite':
+        # Same text layout SQLAlchemy stores, so range comparisons on bucket hold
+        pattern = {60: "'%Y-%m-%d %H:%M:00.000000'", 3600: "'%Y-%m-%d %H:00:00.000000'"}[seconds]
+        return func.strftime(literal_column(pattern), column)
+    unit = {60: "'minute'", 3600: "'hour'"}[seconds]
+    return func.date_trunc(literal_column(unit), column)
+
+def _filter_conditions(table, filters: Dict[str, Any]) -> List:
+    return [getattr(table, name) == value for name, value in filters.items() if value]
+
+async def refresh_rollups(db: AsyncSession, start: datetime, end: datetime) -> bool:
+    """Rebuild the rollup tiers for [start, end) from raw data.
+
+    The 1m tier is aggregated from metric_data and the 1h tier from the 1m
+    tier. The range is widened to whole hours at the start so the hourly
+    buckets are always rebuilt from complete minutes.
+
+    On Postgres the delete and re-insert run under a transaction-scoped
+    advisory lock; if another worker holds it, nothing is done and False is
+    returned. SQLite serialises writers on its own.
+    """
+    dialect = db.bind.dialect.name
+    if dialect == 'postgresql':
+        locked = (await db.execute(select(func.pg_try_advisory_xact_lock(ROLLUP_LOCK_ID)))).scalar()
+        if not locked:
+            await db.rollback()
+            return False
+
+    lower = floor_time(start, ROLLUP_TIERS[0][0])
+    source = None
+
+    for seconds, table in reversed(ROLLUP_TIERS):
+        upper = floor_time(end, seconds)
+        if upper <= lower:
+            continue
+
+        if source is None:
+            timestamp = MetricData.timestamp
+            dimensions = [getattr(MetricData, name) for name in DIMENSIONS]
+            aggregates = [
+                func.sum(MetricData.value),
+                func.min(MetricData.value),
+                func.max(MetricData.value),
+                func.count(MetricData.id)
+            ]
+        else:
+            timestamp = source.bucket
+            dimensions = [getattr(source, name) for name in DIMENSIONS]
+            aggregates = [
+                func.sum(source.value_sum),
+                func.min(source.value_min),
+                func.max(source.value_max),
+                func.sum(source.value_count)
+            ]
+
+        bucket = truncate_time(timestamp, seconds, dialect)
+        aggregated = select(bucket, *dimensions, *aggregates).where(
+            timestamp >= lower, timestamp < upper
+        ).group_by(bucket, *dimensions)
+
+        await db.execute(delete(table).where(table.bucket >= lower, table.bucket < upper))
+        await db.execute(insert(table).from_select(
+            ['bucket', *DIMENSIONS, 'value_sum', 'value_min', 'value_max', 'value_count'],
+            aggregated
+        ))
+        source = table
+
+    await db.commit()
+    return True
+
+async def load_watermarks(db: AsyncSession):
+    """Set each tier's watermark to the end of its newest bucket in the database"""
+    for seconds, table in ROLLUP_TIERS:
+        newest = (await db.execute(select(func.max(table.bucket)))).scalar()
+        if isinstance(newest, str):
+            # SQLite returns aggregates over DateTime columns as text
+            newest = datetime.fromisoformat(newest)
+        if newest is not None:
+            rollup_watermarks[seconds] = newest + timedelta(seconds=seconds)
+
+async def refresh_once(db: AsyncSession, now: Optional[datetime] = None) -> bool:
+    """One refresh pass: re-roll from before the hourly watermark, then reload watermarks.
+
+    The first pass builds everything from the oldest raw row. Later passes
+    start ROLLUP_REROLL_SECONDS before the watermark to absorb late rows.
+    Watermarks are reloaded from the database whether or not this worker
+    did the refresh.
+    """
+    await load_watermarks(db)
+    start = rollup_watermarks.get(ROLLUP_TIERS[0][0])
+    if start is None:
+        start = (await db.execute(select(func.min(MetricData.timestamp)))).scalar()
+    else:
+        start -= timedelta(seconds=ROLLUP_REROLL_SECONDS)
+    refreshed = False
+    if start is not None:
+        refreshed = await refresh_rollups(db, start, now or datetime.utcnow())
+    await load_watermarks(db)
+    return refreshed
+
+async def refresh_rollups_loop():
+    """Keep the rollup tiers current; every worker runs this, one refreshes at a time"""
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                await refresh_once(db)
+        except Exception as e:
+            print(f"Rollup refresh error: {e}")
+        await asyncio.sleep(ROLLUP_REFRESH_SECONDS)
+
+def _choose_tier(interval_seconds: int) -> Optional[Tuple[int, Any]]:
+    """Coarsest refreshed tier whose buckets divide the requested interval"""
+    for seconds, table in ROLLUP_TIERS:
+        if interval_seconds % seconds == 0 and seconds in rollup_watermarks:
+            return seconds, table
+    return None
+
+async def bucketed_timeseries(
+    db: AsyncSession,
+    interval_seconds: int,
+    start: datetime,
+    end: datetime,
+    filters: Dict[str, Any]
+) -> Tuple[List[Dict[str, Any]], str]:
+    """Aggregate a metric into fixed-width buckets in SQL.
+
+    Whole rollup buckets inside the range are read from the coarsest usable
+    tier; the partial edges and anything past the tier watermark come from
+    raw rows. Returns the buckets and the tier that served the bulk of them.
+    """
+    dialect = db.bind.dialect.name
+    queries = []
+    source = 'raw'
+    # Buckets are computed against naive UTC, like metric_data.timestamp
+    start, end = start.replace(tzinfo=None), end.replace(tzinfo=None)
+
+    tier = _choose_tier(interval_seconds)
+    rollup_start = rollup_end = None
+    if tier:
+        seconds, table = tier
+        rollup_start = ceil_time(start, seconds)
+        rollup_end = min(floor_time(end, seconds), rollup_watermarks[seconds])
+
+    if tier and rollup_start < rollup_end:
+        source = table.__tablename__
+        bucket = epoch_bucket(table.bucket, interval_seconds, dialect)
+        queries.append(select(
+            bucket,
+            func.sum(table.value_sum),
+            func.min(table.value_min),
+            func.max(table.value_max),
+            func.sum(table.value_count)
+        ).where(
+            table.bucket >= rollup_start,
+            table.bucket < rollup_end,
+            *_filter_conditions(table, filters)
+        ).group_by(bucket))
+        raw_ranges = [
+            (MetricData.timestamp >= start, MetricData.timestamp < rollup_start),
+            (MetricData.timestamp >= rollup_end, MetricData.timestamp <= end)
+        ]
+    else:
+        raw_ranges = [(MetricData.timestamp >= start, MetricData.timestamp <= end)]
+
+    bucket = epoch_bucket(MetricData.timestamp, interval_seconds, dialect)
+    for lower, upper in raw_ranges:
+        queries.append(select(
+            bucket,
+            func.sum(MetricData.value),
+            func.min(MetricData.value),
+            func.max(MetricData.value),
+            func.count(MetricData.id)
+        ).where(
+            lower, upper,
+            *_filter_conditions(MetricData, filters)
+        ).group_by(bucket))
+
+    # A bucket can straddle the rollup/raw boundary; merge partial aggregates
+    buckets: Dict[int, List] = {}
+    for query in queries:
+        result = await db.execute(query)
+        for epoch, total, low, high, count in result.all():
+            if not count:
+                continue
+            # SUM over a BIGINT count column comes back as NUMERIC on Postgres
+            epoch, total, count = int(epoch), float(total), int(count)
+            merged = buckets.get(epoch)
+            if merged is None:
+                buckets[epoch] = [total, low, high, count]
+            else:
+                merged[0] += total
+                merged[1] = min(merged[1], low)
+                merged[2] = max(merged[2], high)
+                merged[3] += count
+
+    return [
+        {
+            'timestamp': (EPOCH + timedelta(seconds=epoch)).isoformat(),
+            'value': total / count,
+            'min': low,
+            'max': high,
+            'count': count
+        }
+        for epoch, (total, low, high, count) in sorted(buckets.items())
+    ], source
@@ -2,6 +2,7 @@ from fastapi import APIRouter
 from datetime import datetime
 
 from app.core.redis_client import redis_client
+from app.services.widget_cache import widget_cache
 
 router = APIRouter()
 
@@ -17,7 +18,8 @@ async def get_cache_stats():
         "hits": stats["hits"],
         "misses": stats["misses"],
         "hit_rate": round(hit_rate, 2),
-        "total_keys": stats["keys"]
+        "total_keys": stats["keys"],
+        "widget_cache": widget_cache.get_stats()
     }
 
 @router.post("/invalidate")
@@ -1,49 +1,56 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, HTTPException
 from typing import List, Optional
 from datetime import datetime, timedelta
 import random
+import time
 
-from app.core.redis_client import redis_client
 from app.services.data_generator import data_generator
+from app.services.downsampling import downsampler, to_points
+from app.services.widget_cache import widget_cache
 
 router = APIRouter()
 
-@router.get("/widgets")
-async def get_dashboard_widgets(
-    count: int = Query(default=50, ge=1, le=1000),
-    cache: bool = Query(default=True)
-):
-    """Get dashboard widgets with caching"""
-    cache_key = f"widgets:{count}"
-    
-    if cache:
-        cached_data = await redis_client.get(cache_key)
-        if cached_data:
-            return {
-                "widgets": cached_data,
-                "cached": True,
-                "timestamp": datetime.now().isoformat()
-            }
-    
-    # Generate widgets
+TIME_RANGE_SECONDS = {"15m": 900, "1h": 3600, "6h": 21600, "24h": 86400, "7d": 604800}
+RAW_STEP_SECONDS = 1
+
+# Fresh lifetime and the extra window an expired entry may still be served
+# while a single background refresh replaces it
+WIDGETS_TTL, WIDGETS_STALE_TTL = 300, 300
+WIDGET_DATA_TTL, WIDGET_DATA_STALE_TTL = 60, 30
+
+def build_widgets(count: int) -> List[dict]:
     widgets = []
     chart_types = ["line", "bar", "scatter", "pie"]
     
     for i in range(count):
+        widget_id = f"widget_{i}"
         widgets.append({
-            "id": f"widget_{i}",
+            "id": widget_id,
             "type": random.choice(chart_types),
             "title": f"Metric {i+1}",
-            "metric": random.choice(data_generator.metric_names),
+            "metric": data_generator.metric_for_widget(widget_id),
             "position": {"x": (i % 6) * 300, "y": (i // 6) * 400}
         })
-    
-    # Cache for 5 minutes
-    await redis_client.set(cache_key, widgets, ttl=300)
+    return widgets
+
+@router.get("/widgets")
+async def get_dashboard_widgets(
+    count: int = Query(default=50, ge=1, le=1000),
+    cache: bool = Query(default=True)
+):
+    """Get dashboard widgets with caching"""
+    if not cache:
+        widgets, state = build_widgets(count), "bypass"
+    else:
+        async def load():
+            return build_widgets(count)
+        
+        widgets, state = await widget_cache.get(f"widgets:{count}", load, WIDGETS_TTL, WIDGETS_STALE_TTL)
     
     return {
         "widgets": widgets,
-        "cached": False,
+        "cached": state in ("fresh", "stale"),
+        "stale": state == "stale",
         "timestamp": datetime.now().isoformat()
     }
 
@@ -54,21 +61,32 @@ async def get_widget_data(
     resolution: int = Query(default=100, ge=10, le=1920)
 ):
     """Get optimized chart data for a widget"""
-    cache_key = f"widget_data:{widget_id}:{time_range}:{resolution}"
-    
-    cached_data = await redis_client.get(cache_key)
-    if cached_data:
-        cached_data["cached"] = True
-        return cached_data
-    
-    # Determine chart type from widget_id or default to line
-    chart_type = "line"
-    
-    # Generate data
-    chart_data = data_generator.generate_chart_data(chart_type, resolution)
+    seconds = TIME_RANGE_SECONDS.get(time_range)
+    if seconds is None:
+        raise HTTPException(status_code=400, detail=f"Unsupported time range: {time_range}")
     
-    # Cache for 1 minute
-    await redis_client.set(cache_key, chart_data, ttl=60)
+    async def load():
+        metric = data_generator.metric_for_widget(widget_id)
+        # Align the range to one pixel column so requests inside a column share a cached series
+        column_seconds = max(seconds // resolution, 1)
+        end = int(time.time()) // column_seconds * column_seconds
+        start = end - seconds
+        
+        series = downsampler.downsample(
+            (widget_id, start, end),
+            lambda: data_generator.generate_series_arrays(metric, start, end, RAW_STEP_SECONDS),
+            resolution
+        )
+        return {
+            "type": "line",
+            "data": to_points(series, metric),
+            "downsampled": series.algorithm is not None,
+            "algorithm": series.algorithm,
+            "original_points": series.original_points,
+            "returned_points": len(series.values)
+        }
     
-    chart_data["cached"] = False
-    return chart_data
+    chart_data, state = await widget_cache.get(
+        f"widget_data:{widget_id}:{time_range}:{resolution}", load, WIDGET_DATA_TTL, WIDGET_DATA_STALE_TTL
+    )
+    return {**chart_data, "cached": state != "miss", "stale": state == "stale"}
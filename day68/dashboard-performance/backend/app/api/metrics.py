@@ -2,8 +2,10 @@ from fastapi import APIRouter, Query
 from datetime import datetime, timedelta
 from typing import List
 import random
+import numpy as np
 
 from app.services.data_generator import data_generator
+from app.services.downsampling import downsampler
 from app.core.redis_client import redis_client
 
 router = APIRouter()
@@ -12,10 +14,11 @@ router = APIRouter()
 async def get_time_series(
     metric: str = Query(default="cpu_usage"),
     points: int = Query(default=100, ge=10, le=10000),
-    downsample: bool = Query(default=True)
+    downsample: bool = Query(default=True),
+    resolution: int = Query(default=1920, ge=10, le=3840)
 ):
     """Get time-series data with automatic downsampling"""
-    cache_key = f"timeseries:{metric}:{points}"
+    cache_key = f"timeseries:{metric}:{points}:{resolution if downsample else 'raw'}"
     
     cached = await redis_client.get(cache_key)
     if cached:
@@ -24,17 +27,20 @@ async def get_time_series(
     # Generate full resolution data
     data = data_generator.generate_time_series(points, metric)
     
-    # Downsample if requested and needed
-    max_points = 1920  # Screen width
-    if downsample and len(data) > max_points:
-        data = data_generator.downsample_lttb(data, max_points)
+    # Downsample to the chart's pixel width if requested and needed
+    algorithm = None
+    if downsample:
+        values = np.fromiter((point["value"] for point in data), dtype=np.float64, count=len(data))
+        indices, algorithm = downsampler.select(np.arange(len(data)), values, resolution)
+        data = [data[i] for i in indices]
     
     result = {
         "metric": metric,
         "data": data,
         "original_points": points,
         "returned_points": len(data),
-        "downsampled": len(data) < points
+        "downsampled": len(data) < points,
+        "algorithm": algorithm
     }
     
     await redis_client.set(cache_key, result, ttl=60)
@@ -3,6 +3,14 @@ from typing import Optional, Any
 import json
 import os
 
+# Delete a key only while it still holds the caller's value
+DELETE_IF_EQUALS = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
 class RedisClient:
     def __init__(self):
         self.redis: Optional[aioredis.Redis] = None
@@ -34,9 +42,15 @@ class RedisClient:
     async def set(self, key: str, value: Any, ttl: int = 300):
         await self.redis.setex(key, ttl, json.dumps(value))
     
+    async def set_if_absent(self, key: str, value: Any, ttl: int = 300) -> bool:
+        return bool(await self.redis.set(key, json.dumps(value), ex=ttl, nx=True))
+    
     async def delete(self, key: str):
         await self.redis.delete(key)
     
+    async def delete_if_equals(self, key: str, value: Any) -> bool:
+        return bool(await self.redis.eval(DELETE_IF_EQUALS, 1, key, json.dumps(value)))
+    
     async def get_cache_stats(self) -> dict:
         info = await self.redis.info("stats")
         return {
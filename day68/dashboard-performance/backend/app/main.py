@@ -8,7 +8,8 @@ import socketio
 
 from app.core.redis_client import redis_client
 from app.api import dashboard, metrics, cache
-from app.services.data_generator import DataGenerator
+from app.services.data_generator import data_generator
+from app.services.widget_rooms import WidgetRooms
 
 # Create Socket.IO server
 sio = socketio.AsyncServer(
@@ -17,7 +18,7 @@ sio = socketio.AsyncServer(
     logger=True,
     engineio_logger=True
 )
-data_generator = DataGenerator()
+widget_rooms = WidgetRooms(sio, data_generator)
 
 # Initialize startup tasks
 async def startup():
@@ -65,28 +66,38 @@ async def connect(sid, environ):
 
 @sio.event
 async def disconnect(sid):
+    widget_rooms.disconnect(sid)
     print(f"Client disconnected: {sid}")
 
+def _widget_ids(data) -> list:
+    """Widget ids from a client payload; anything malformed is treated as none"""
+    widget_ids = data.get("widget_ids") if isinstance(data, dict) else None
+    if not isinstance(widget_ids, list):
+        return []
+    return [widget_id for widget_id in widget_ids if isinstance(widget_id, str)]
+
+@sio.event
+async def subscribe(sid, data):
+    """Join the rooms of the widgets a client is showing: {"widget_ids": [...]}"""
+    await widget_rooms.subscribe(sid, _widget_ids(data))
+
+@sio.event
+async def unsubscribe(sid, data):
+    await widget_rooms.unsubscribe(sid, _widget_ids(data))
+
 @sio.event
 async def message(sid, data):
     # Handle client messages if needed
     await sio.emit('message', {"type": "pong"}, room=sid)
 
 async def simulate_metrics_updates():
-    """Simulate real-time metric updates"""
+    """Simulate real-time metric updates for subscribed widgets"""
     await asyncio.sleep(5)  # Wait for startup
     
     while True:
         try:
-            # Generate random metric updates
-            updates = data_generator.generate_metric_updates(count=50)
-            
-            # Broadcast to all connected clients via Socket.IO
-            await sio.emit('message', {
-                "type": "metrics_update",
-                "data": updates,
-                "timestamp": datetime.now().isoformat()
-            })
+            # Each widget room only gets the fields that changed since its last update
+            await widget_rooms.publish_updates()
             
             await asyncio.sleep(1.0)  # 1 update per second
         except Exception as e:
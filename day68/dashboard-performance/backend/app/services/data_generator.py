@@ -1,7 +1,10 @@
 import random
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import List, Dict, Tuple
 import numpy as np
+import zlib
+
+from app.services.downsampling import lttb
 
 class DataGenerator:
     def __init__(self):
@@ -10,6 +13,8 @@ class DataGenerator:
             "api_latency", "error_rate", "request_rate", "active_users", "db_connections"
         ]
         self.current_values = {name: random.uniform(20, 80) for name in self.metric_names}
+        # Level of the generated history; unlike current_values it does not drift
+        self.series_base = dict(self.current_values)
     
     def generate_time_series(self, points: int = 100, metric: str = "cpu_usage") -> List[Dict]:
         """Generate realistic time-series data with trends and noise"""
@@ -39,12 +44,7 @@ class DataGenerator:
         
         for _ in range(count):
             metric = random.choice(self.metric_names)
-            
-            # Gradual change from current value
-            current = self.current_values[metric]
-            change = random.gauss(0, 3)
-            new_value = max(0, min(100, current + change))
-            self.current_values[metric] = new_value
+            new_value = self.step_metric(metric)
             
             updates.append({
                 "metric_id": metric,
@@ -54,6 +54,18 @@ class DataGenerator:
         
         return updates
     
+    def step_metric(self, metric: str) -> float:
+        """Advance one metric by a gradual random change from its current value"""
+        current = self.current_values[metric]
+        change = random.gauss(0, 3)
+        new_value = max(0, min(100, current + change))
+        self.current_values[metric] = new_value
+        return new_value
+    
+    def metric_for_widget(self, widget_id: str) -> str:
+        """Metric a widget displays; stable across requests and processes"""
+        return self.metric_names[zlib.crc32(widget_id.encode()) % len(self.metric_names)]
+    
     def generate_chart_data(self, chart_type: str, resolution: int = 100) -> Dict:
         """Generate optimized chart data based on type"""
         if chart_type == "line":
@@ -75,55 +87,21 @@ class DataGenerator:
             }
         return {}
     
+    def generate_series_arrays(self, metric: str, start: int, end: int, step_seconds: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """Columnar raw series for [start, end) in epoch seconds: (timestamps, values)"""
+        timestamps = np.arange(start, end, step_seconds, dtype=np.int64)
+        # Seeded by metric and range so a recomputed view matches cached indices
+        rng = np.random.default_rng(zlib.crc32(f"{metric}:{start}:{end}".encode()))
+        base_value = self.series_base.get(metric, 50.0)
+        values = base_value + np.sin(timestamps / 600) * 10 + rng.normal(0, 5, len(timestamps))
+        return timestamps, np.clip(values, 0, 100)
+    
     def downsample_lttb(self, data: List[Dict], threshold: int) -> List[Dict]:
         """Largest-Triangle-Three-Buckets downsampling algorithm"""
         if len(data) <= threshold:
             return data
-        
-        # Always keep first and last points
-        sampled = [data[0]]
-        
-        # Calculate bucket size
-        bucket_size = (len(data) - 2) / (threshold - 2)
-        
-        a = 0  # Initially set to first point
-        
-        for i in range(threshold - 2):
-            # Calculate average point in next bucket
-            avg_x = 0
-            avg_y = 0
-            avg_range_start = int((i + 1) * bucket_size) + 1
-            avg_range_end = int((i + 2) * bucket_size) + 1
-            avg_range_end = min(avg_range_end, len(data))
-            
-            for j in range(avg_range_start, avg_range_end):
-                avg_x += j
-                avg_y += data[j]["value"]
-            
-            avg_x /= (avg_range_end - avg_range_start)
-            avg_y /= (avg_range_end - avg_range_start)
-            
-            # Find point with largest triangle area
-            range_start = int(i * bucket_size) + 1
-            range_end = int((i + 1) * bucket_size) + 1
-            
-            max_area = -1
-            max_area_point = None
-            
-            for j in range(range_start, range_end):
-                # Calculate triangle area
-                area = abs((data[a]["value"] - avg_y) * (j - avg_x) - 
-                          (data[a]["value"] - data[j]["value"]) * (a - avg_x)) / 2
-                
-                if area > max_area:
-                    max_area = area
-                    max_area_point = data[j]
-                    a = j
-            
-            if max_area_point:
-                sampled.append(max_area_point)
-        
-        sampled.append(data[-1])  # Always keep last point
-        return sampled
+        values = np.fromiter((point["value"] for point in data), dtype=np.float64, count=len(data))
+        indices = lttb(np.arange(len(data)), values, threshold)
+        return [data[i] for i in indices]
 
 data_generator = DataGenerator()
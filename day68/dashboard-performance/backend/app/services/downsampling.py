@@ -0,0 +1,142 @@
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Tuple, List, Dict, Callable, NamedTuple
+import numpy as np
+
+# Above this many points per pixel column M4 is cheaper and still pixel-exact
+M4_POINTS_PER_PIXEL = 4
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets over columnar arrays; returns selected indices.
+
+    Bucket boundaries and next-bucket averages are computed for all buckets at
+    once. The anchor of each bucket is the point picked in the previous one,
+    so only the per-bucket argmax runs in a loop, over numpy slices.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Bucket i covers [edges[i], edges[i + 1]) of the interior points
+    edges = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+    starts, ends = edges[:-1], edges[1:]
+
+    # Average of the following bucket; the last bucket looks at the final point
+    sums_x = np.add.reduceat(x[:n - 1], starts)
+    sums_y = np.add.reduceat(y[:n - 1], starts)
+    counts = ends - starts
+    avg_x = np.append((sums_x / counts)[1:], x[-1])
+    avg_y = np.append((sums_y / counts)[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    anchor = 0
+    for i in range(threshold - 2):
+        start, end = starts[i], ends[i]
+        ax, ay = x[anchor], y[anchor]
+        # Twice the triangle area; the constant factor does not change the argmax
+        areas = np.abs((ax - avg_x[i]) * (y[start:end] - ay) - (ax - x[start:end]) * (avg_y[i] - ay))
+        anchor = start + int(np.argmax(areas))
+        selected[i + 1] = anchor
+    return selected
+
+
+def m4(x: np.ndarray, y: np.ndarray, width: int) -> np.ndarray:
+    """M4 aggregation: first, last, min and max point of every pixel column; returns indices"""
+    n = len(y)
+    if n <= 4 * width:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Pixel column of each point; x is sorted so columns are contiguous runs
+    span = x[-1] - x[0] or 1.0
+    columns = np.minimum(((x - x[0]) * (width / span)).astype(np.int64), width - 1)
+    starts = np.flatnonzero(np.diff(columns, prepend=-1))
+    ends = np.append(starts[1:], n)
+    counts = ends - starts
+
+    # First index per column holding the column min / max
+    positions = np.arange(n)
+    mins = np.repeat(np.minimum.reduceat(y, starts), counts)
+    maxs = np.repeat(np.maximum.reduceat(y, starts), counts)
+    argmins = np.minimum.reduceat(np.where(y == mins, positions, n), starts)
+    argmaxs = np.minimum.reduceat(np.where(y == maxs, positions, n), starts)
+
+    return np.unique(np.concatenate([starts, ends - 1, argmins, argmaxs]))
+
+
+def choose_algorithm(points: int, resolution: int) -> Optional[str]:
+    """Pick a downsampler for drawing `points` samples into `resolution` pixels"""
+    if points <= resolution:
+        return None
+    if points > resolution * M4_POINTS_PER_PIXEL:
+        return "m4"
+    return "lttb"
+
+
+class DownsampledSeries(NamedTuple):
+    timestamps: np.ndarray
+    values: np.ndarray
+    algorithm: Optional[str]
+    original_points: int
+
+
+class Downsampler:
+    """Resolution-aware downsampling stage with an LRU of downsampled series.
+
+    Results are keyed by (series, range, resolution), so a repeated view skips
+    both loading the raw columns and reducing them.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.cache: "OrderedDict[tuple, DownsampledSeries]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def select(self, x: np.ndarray, y: np.ndarray, resolution: int) -> Tuple[np.ndarray, Optional[str]]:
+        """Return (indices to keep, algorithm used or None)"""
+        algorithm = choose_algorithm(len(y), resolution)
+        if algorithm == "m4":
+            return m4(x, y, resolution), algorithm
+        if algorithm == "lttb":
+            return lttb(x, y, resolution), algorithm
+        return np.arange(len(y)), algorithm
+
+    def downsample(self, key: tuple, load: Callable[[], Tuple[np.ndarray, np.ndarray]],
+                   resolution: int) -> DownsampledSeries:
+        """Downsampled view of the series `load` returns, cached per key and resolution"""
+        cache_key = key + (resolution,)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            self.cache.move_to_end(cache_key)
+            self.hits += 1
+            return cached
+        self.misses += 1
+
+        x, y = load()
+        indices, algorithm = self.select(x, y, resolution)
+        result = DownsampledSeries(x[indices], y[indices], algorithm, len(y))
+
+        self.cache[cache_key] = result
+        while len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+        return result
+
+
+def to_points(series: DownsampledSeries, metric: str) -> List[Dict]:
+    """Chart points for a downsampled series with epoch-second timestamps"""
+    return [
+        {"timestamp": datetime.fromtimestamp(ts).isoformat(), "value": round(value, 2), "metric": metric}
+        for ts, value in zip(series.timestamps.tolist(), series.values.tolist())
+    ]
+
+
+downsampler = Downsampler()
@@ -0,0 +1,98 @@
+import asyncio
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from app.core.redis_client import redis_client
+
+Loader = Callable[[], Awaitable[Any]]
+
+# How long one worker holds the right to refresh a stale key
+REFRESH_LOCK_SECONDS = 10
+
+
+class WidgetCache:
+    """Widget response cache with stale-while-revalidate and single-flight loads.
+
+    An entry is fresh for `ttl` seconds and then served stale for up to
+    `stale_ttl` more while one background task recomputes it, so an expiry
+    does not send every concurrent client to the loader at once. Concurrent
+    misses for a key in this process await the same load, and a short Redis
+    lock keeps other workers from refreshing a stale key at the same time.
+    """
+
+    def __init__(self):
+        self.inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+
+    async def get(self, key: str, loader: Loader, ttl: int, stale_ttl: int) -> Tuple[Any, str]:
+        """Return (value, state) where state is 'fresh', 'stale' or 'miss'"""
+        entry = await redis_client.get(key)
+        if entry is not None:
+            if time.time() < entry["fresh_until"]:
+                self.hits += 1
+                return entry["value"], "fresh"
+            self.stale_hits += 1
+            if key not in self.inflight:
+                self._start(key, self._refresh(key, loader, ttl, stale_ttl))
+            return entry["value"], "stale"
+
+        self.misses += 1
+        task = self.inflight.get(key)
+        if task is None:
+            task = self._start(key, self._populate(key, loader, ttl, stale_ttl))
+        else:
+            self.coalesced += 1
+        # Shielded so a disconnecting client does not cancel the shared load
+        return await asyncio.shield(task), "miss"
+
+    def _start(self, key: str, coro) -> asyncio.Task:
+        task = asyncio.ensure_future(coro)
+        self.inflight[key] = task
+        task.add_done_callback(lambda done: self._finish(key, done))
+        return task
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self.inflight.get(key) is task:
+            del self.inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Widget cache load failed for {key}: {task.exception()}")
+
+    async def _populate(self, key: str, loader: Loader, ttl: int, stale_ttl: int) -> Any:
+        value = await loader()
+        await redis_client.set(key, {"value": value, "fresh_until": time.time() + ttl}, ttl=ttl + stale_ttl)
+        return value
+
+    async def _refresh(self, key: str, loader: Loader, ttl: int, stale_ttl: int) -> Any:
+        # A miss can join this task once the entry expires, so it must produce a value too
+        lock_key = f"refresh_lock:{key}"
+        token = uuid.uuid4().hex
+        if not await redis_client.set_if_absent(lock_key, token, ttl=REFRESH_LOCK_SECONDS):
+            # Another worker is refreshing; use its result or, if the entry is gone, load it
+            entry = await redis_client.get(key)
+            if entry is not None:
+                return entry["value"]
+            return await self._populate(key, loader, ttl, stale_ttl)
+        try:
+            self.refreshes += 1
+            return await self._populate(key, loader, ttl, stale_ttl)
+        finally:
+            # A refresh that outlived the lock must not release another worker's lock
+            await redis_client.delete_if_equals(lock_key, token)
+
+    def get_stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "refreshes": self.refreshes,
+            "inflight": len(self.inflight)
+        }
+
+
+widget_cache = WidgetCache()
@@ -0,0 +1,104 @@
+from datetime import datetime
+from typing import Dict, Set, List
+
+from app.services.data_generator import DataGenerator
+
+
+def room_name(widget_id: str) -> str:
+    return f"widget:{widget_id}"
+
+
+class WidgetRooms:
+    """Per-widget Socket.IO subscriptions and the state last sent to each room.
+
+    A client joining a room is sent the room's current state as a snapshot,
+    so every member holds the same last-sent state and one delta against it
+    serves the whole room. Only metrics behind subscribed widgets advance,
+    and a widget whose rounded value did not change is not sent at all.
+    """
+
+    def __init__(self, sio, data_generator: DataGenerator):
+        self.sio = sio
+        self.data_generator = data_generator
+        self.subscriptions: Dict[str, Set[str]] = {}   # sid -> widget ids
+        self.members: Dict[str, Set[str]] = {}         # widget id -> sids
+        self.states: Dict[str, dict] = {}              # widget id -> last emitted state
+        self.versions: Dict[str, int] = {}
+
+    def _current_state(self, widget_id: str) -> dict:
+        metric = self.data_generator.metric_for_widget(widget_id)
+        return {"metric": metric, "value": round(self.data_generator.current_values[metric], 2)}
+
+    async def subscribe(self, sid: str, widget_ids: List[str]):
+        for widget_id in widget_ids:
+            if widget_id in self.subscriptions.setdefault(sid, set()):
+                continue
+            self.subscriptions[sid].add(widget_id)
+            self.members.setdefault(widget_id, set()).add(sid)
+            await self.sio.enter_room(sid, room_name(widget_id))
+
+            if widget_id not in self.states:
+                self.states[widget_id] = self._current_state(widget_id)
+                self.versions[widget_id] = 0
+            await self.sio.emit('message', {
+                "type": "widget_snapshot",
+                "widget_id": widget_id,
+                "version": self.versions[widget_id],
+                "state": self.states[widget_id],
+                "timestamp": datetime.now().isoformat()
+            }, room=sid)
+
+    async def unsubscribe(self, sid: str, widget_ids: List[str]):
+        for widget_id in widget_ids:
+            if widget_id not in self.subscriptions.get(sid, ()):
+                continue
+            self.subscriptions[sid].discard(widget_id)
+            await self.sio.leave_room(sid, room_name(widget_id))
+            self._drop_member(widget_id, sid)
+
+    def disconnect(self, sid: str):
+        # Socket.IO removes a disconnected sid from its rooms itself
+        for widget_id in self.subscriptions.pop(sid, set()):
+            self._drop_member(widget_id, sid)
+
+    def _drop_member(self, widget_id: str, sid: str):
+        sids = self.members.get(widget_id)
+        if sids is None:
+            return
+        sids.discard(sid)
+        if not sids:
+            del self.members[widget_id]
+            self.states.pop(widget_id, None)
+            self.versions.pop(widget_id, None)
+
+    async def publish_updates(self) -> int:
+        """Advance watched metrics once and emit each changed widget's delta to its room"""
+        if not self.members:
+            return 0
+
+        metrics = {self.data_generator.metric_for_widget(widget_id) for widget_id in self.members}
+        for metric in metrics:
+            self.data_generator.step_metric(metric)
+
+        timestamp = datetime.now().isoformat()
+        sent = 0
+        for widget_id in list(self.members):
+            state = self._current_state(widget_id)
+            last = self.states[widget_id]
+            changes = {key: value for key, value in state.items() if last.get(key) != value}
+            if not changes:
+                continue
+
+            version = self.versions[widget_id]
+            self.states[widget_id] = state
+            self.versions[widget_id] = version + 1
+            await self.sio.emit('message', {
+                "type": "widget_delta",
+                "widget_id": widget_id,
+                "base_version": version,
+                "version": version + 1,
+                "changes": changes,
+                "timestamp": timestamp
+            }, room=room_name(widget_id))
+            sent += 1
+        return sent
@@ -0,0 +1,84 @@
+"""Downsampling benchmark at 1M points.
+
+Compares the previous dict-based LTTB loop with the vectorized LTTB and M4
+stages. Run from the backend directory:
+
+    python -m tests.benchmark_downsampling [points] [resolution]
+"""
+import sys
+import time
+import numpy as np
+
+from app.services.downsampling import lttb, m4
+
+
+def legacy_downsample_lttb(data, threshold):
+    """The original DataGenerator.downsample_lttb, kept verbatim for comparison"""
+    if len(data) <= threshold:
+        return data
+
+    sampled = [data[0]]
+    bucket_size = (len(data) - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        avg_x = 0
+        avg_y = 0
+        avg_range_start = int((i + 1) * bucket_size) + 1
+        avg_range_end = int((i + 2) * bucket_size) + 1
+        avg_range_end = min(avg_range_end, len(data))
+
+        for j in range(avg_range_start, avg_range_end):
+            avg_x += j
+            avg_y += data[j]["value"]
+
+        avg_x /= (avg_range_end - avg_range_start)
+        avg_y /= (avg_range_end - avg_range_start)
+
+        range_start = int(i * bucket_size) + 1
+        range_end = int((i + 1) * bucket_size) + 1
+
+        max_area = -1
+        max_area_point = None
+
+        for j in range(range_start, range_end):
+            area = abs((data[a]["value"] - avg_y) * (j - avg_x) -
+                      (data[a]["value"] - data[j]["value"]) * (a - avg_x)) / 2
+
+            if area > max_area:
+                max_area = area
+                max_area_point = data[j]
+                a = j
+
+        if max_area_point:
+            sampled.append(max_area_point)
+
+    sampled.append(data[-1])
+    return sampled
+
+
+def timed(label, fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<28} {best * 1000:>10.1f} ms  {len(result):>6} points")
+    return best
+
+
+def main(points=1_000_000, resolution=1920):
+    rng = np.random.default_rng(42)
+    x = np.arange(points, dtype=np.int64)
+    y = 50 + np.sin(x / 5000) * 10 + rng.normal(0, 5, points)
+    records = [{"timestamp": int(t), "value": float(v)} for t, v in zip(x, y)]
+
+    print(f"{points:,} points -> {resolution} px")
+    legacy = timed("legacy LTTB (dicts)", lambda: legacy_downsample_lttb(records, resolution), repeat=1)
+    vectorized = timed("vectorized LTTB", lambda: lttb(x, y, resolution))
+    columns = timed("vectorized M4", lambda: m4(x, y, resolution))
+    print(f"LTTB speedup {legacy / vectorized:.0f}x, M4 speedup {legacy / columns:.0f}x")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
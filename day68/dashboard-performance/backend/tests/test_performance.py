@@ -1,8 +1,15 @@
 import pytest
 from httpx import AsyncClient
 import time
+import asyncio
+import numpy as np
 
 from app.main import app
+from app.services.downsampling import lttb, m4, Downsampler
+from app.services.data_generator import DataGenerator
+from app.services.widget_cache import WidgetCache
+from app.services.widget_rooms import WidgetRooms
+from app.core.redis_client import redis_client
 
 @pytest.mark.asyncio
 async def test_dashboard_load_performance():
@@ -39,3 +46,159 @@ async def test_downsampling():
         assert data["original_points"] == 5000
         assert data["returned_points"] <= 1920
         assert data["downsampled"] == True
+
+def reference_lttb(y, threshold):
+    """Textbook LTTB: the anchor only moves once a bucket has been scanned"""
+    n = len(y)
+    every = (n - 2) / (threshold - 2)
+    selected, a = [0], 0
+    for i in range(threshold - 2):
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = sum(range(next_start, next_end)) / (next_end - next_start)
+        avg_y = sum(y[next_start:next_end]) / (next_end - next_start)
+        best, best_area = None, -1
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((a - avg_x) * (y[j] - y[a]) - (a - j) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return selected
+
+def test_vectorized_lttb_matches_reference():
+    y = np.random.default_rng(7).normal(50, 10, 5000)
+    indices = lttb(np.arange(len(y)), y, 300)
+    assert indices.tolist() == reference_lttb(y.tolist(), 300)
+
+def test_m4_keeps_extremes_of_every_pixel_column():
+    x = np.arange(100000)
+    y = np.random.default_rng(3).normal(0, 1, len(x))
+    y[12345], y[67890] = 100, -100
+    indices = m4(x, y, 200)
+    assert len(indices) <= 4 * 200
+    assert {0, 12345, 67890, len(x) - 1} <= set(indices.tolist())
+
+def test_downsampler_chooses_by_resolution_and_caches():
+    downsampler = Downsampler()
+    x = np.arange(10000)
+    y = np.sin(x / 50)
+    loads = []
+    def load():
+        loads.append(1)
+        return x, y
+    
+    wide = downsampler.downsample(("cpu", 0, 10000), load, 4000)
+    narrow = downsampler.downsample(("cpu", 0, 10000), load, 500)
+    again = downsampler.downsample(("cpu", 0, 10000), load, 500)
+    assert (wide.algorithm, narrow.algorithm) == ("lttb", "m4")
+    assert len(wide.values) == 4000
+    assert again is narrow
+    assert len(loads) == 2
+
+class RecordingSocketServer:
+    def __init__(self):
+        self.emitted = []
+    
+    async def enter_room(self, sid, room):
+        pass
+    
+    async def leave_room(self, sid, room):
+        pass
+    
+    async def emit(self, event, data, room=None):
+        self.emitted.append((room, data))
+
+@pytest.mark.asyncio
+async def test_widget_rooms_send_snapshot_then_deltas_to_subscribers_only():
+    sio = RecordingSocketServer()
+    generator = DataGenerator()
+    rooms = WidgetRooms(sio, generator)
+    
+    await rooms.subscribe("sid-1", ["widget_1"])
+    room, snapshot = sio.emitted[0]
+    assert (room, snapshot["type"], snapshot["version"]) == ("sid-1", "widget_snapshot", 0)
+    
+    metric = generator.metric_for_widget("widget_1")
+    generator.current_values[metric] = snapshot["state"]["value"] + 1
+    generator.step_metric = lambda name: generator.current_values[name]
+    assert await rooms.publish_updates() == 1
+    room, delta = sio.emitted[-1]
+    assert room == "widget:widget_1"
+    assert (delta["base_version"], delta["version"]) == (0, 1)
+    assert delta["changes"] == {"value": round(snapshot["state"]["value"] + 1, 2)}
+    
+    # Unchanged values and rooms without members send nothing
+    assert await rooms.publish_updates() == 0
+    rooms.disconnect("sid-1")
+    assert rooms.members == {} and await rooms.publish_updates() == 0
+
+@pytest.mark.asyncio
+async def test_widget_cache_single_flight_and_stale_while_revalidate(monkeypatch):
+    store = {}
+    async def get(key):
+        return store.get(key)
+    async def set(key, value, ttl=300):
+        store[key] = value
+    async def set_if_absent(key, value, ttl=300):
+        return store.setdefault(key, value) is value
+    async def delete_if_equals(key, value):
+        if key in store and store[key] == value:
+            del store[key]
+            return True
+        return False
+    for name, fn in [("get", get), ("set", set), ("set_if_absent", set_if_absent), ("delete_if_equals", delete_if_equals)]:
+        monkeypatch.setattr(redis_client, name, fn)
+    
+    cache = WidgetCache()
+    loads = []
+    async def load():
+        loads.append(1)
+        await asyncio.sleep(0.01)
+        return len(loads)
+    
+    results = await asyncio.gather(*(cache.get("k", load, 60, 30) for _ in range(20)))
+    assert loads == [1]
+    assert {value for value, _ in results} == {1}
+    assert cache.coalesced == 19
+    
+    # Expired but within the stale window: served stale, refreshed once in the background
+    store["k"]["fresh_until"] = 0
+    stale = await asyncio.gather(*(cache.get("k", load, 60, 30) for _ in range(5)))
+    assert stale == [(1, "stale")] * 5
+    await asyncio.gather(*cache.inflight.values())
+    assert len(loads) == 2
+    assert await cache.get("k", load, 60, 30) == (2, "fresh")
+
+    # A refresh that outlives its lock leaves the next holder's lock in place
+    store["k"]["fresh_until"] = 0
+    async def slow_load():
+        store["refresh_lock:k"] = "other-worker"
+        return 3
+    await cache.get("k", slow_load, 60, 30)
+    await asyncio.gather(*cache.inflight.values())
+    assert store["refresh_lock:k"] == "other-worker"
+
+    # A miss that joins an in-flight refresh gets the refreshed value
+    store["k"]["fresh_until"] = 0
+    del store["refresh_lock:k"]
+    assert await cache.get("k", load, 60, 30) == (3, "stale")
+    del store["k"]
+    value, state = await cache.get("k", load, 60, 30)
+    assert (value, state) == (len(loads), "miss") and value is not None
+
+    # Same when another worker holds the refresh lock and the entry has expired
+    store["k"]["fresh_until"] = 0
+    store["refresh_lock:k"] = "other-worker"
+    await cache.get("k", load, 60, 30)
+    del store["k"]
+    value, state = await cache.get("k", load, 60, 30)
+    assert state == "miss" and value == len(loads)
+
+def test_socket_handlers_ignore_malformed_payloads():
+    from app.main import _widget_ids
+    assert _widget_ids({"widget_ids": ["widget_1", 2]}) == ["widget_1"]
+    assert _widget_ids(["widget_1"]) == []
+    assert _widget_ids(None) == []
+    assert _widget_ids({"widget_ids": "widget_1"}) == []
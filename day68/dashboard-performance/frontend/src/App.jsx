@@ -31,7 +31,7 @@ const theme = createTheme({
 
 function App() {
   const [widgetCount, setWidgetCount] = useState(50);
-  const { connected, metrics } = useWebSocket('ws://localhost:8000/ws/metrics');
+  const { connected, metrics, subscribe, unsubscribe } = useWebSocket('ws://localhost:8000/ws/metrics');
 
   useEffect(() => {
     initDB();
@@ -64,6 +64,8 @@ function App() {
           <DashboardGrid 
             widgetCount={widgetCount} 
             realtimeMetrics={metrics}
+            subscribe={subscribe}
+            unsubscribe={unsubscribe}
           />
         </Container>
       </Box>
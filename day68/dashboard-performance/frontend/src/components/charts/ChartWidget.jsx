@@ -23,7 +23,7 @@ ChartJS.register(
   Legend
 );
 
-const ChartWidget = memo(({ widget, realtimeUpdate }) => {
+const ChartWidget = memo(({ widget, realtimeUpdate, subscribe, unsubscribe }) => {
   const [chartData, setChartData] = useState(null);
   const [renderTime, setRenderTime] = useState(0);
   const mountTimeRef = useRef(Date.now());
@@ -32,6 +32,13 @@ const ChartWidget = memo(({ widget, realtimeUpdate }) => {
     loadChartData();
   }, [widget.id]);
 
+  useEffect(() => {
+    // The grid is virtualized, so only widgets on screen hold a room subscription
+    if (!subscribe) return;
+    subscribe(widget.id);
+    return () => unsubscribe(widget.id);
+  }, [widget.id, subscribe, unsubscribe]);
+
   useEffect(() => {
     if (realtimeUpdate && chartData) {
       // Update chart with new real-time data
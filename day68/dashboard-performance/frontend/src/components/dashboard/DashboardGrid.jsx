@@ -10,7 +10,31 @@ const WIDGET_WIDTH = 400;
 const WIDGET_HEIGHT = 350;
 const GAP = 16;
 
-function DashboardGrid({ widgetCount, realtimeMetrics }) {
+// Defined outside the grid so re-renders on real-time updates do not remount
+// every widget (and with it, drop and rejoin its room subscription)
+const Cell = ({ columnIndex, rowIndex, style, data }) => {
+  const { widgets, columnsCount, realtimeMetrics, subscribe, unsubscribe } = data;
+  const index = rowIndex * columnsCount + columnIndex;
+  if (index >= widgets.length) return null;
+
+  const widget = widgets[index];
+  
+  return (
+    <div style={{
+      ...style,
+      padding: GAP / 2,
+    }}>
+      <ChartWidget 
+        widget={widget} 
+        realtimeUpdate={realtimeMetrics?.[widget.id]}
+        subscribe={subscribe}
+        unsubscribe={unsubscribe}
+      />
+    </div>
+  );
+};
+
+function DashboardGrid({ widgetCount, realtimeMetrics, subscribe, unsubscribe }) {
   const [widgets, setWidgets] = useState([]);
   const [loading, setLoading] = useState(true);
   const [containerWidth, setContainerWidth] = useState(window.innerWidth - 48);
@@ -54,25 +78,6 @@ function DashboardGrid({ widgetCount, realtimeMetrics }) {
     }
   };
 
-  const Cell = ({ columnIndex, rowIndex, style }) => {
-    const index = rowIndex * columnsCount + columnIndex;
-    if (index >= widgets.length) return null;
-
-    const widget = widgets[index];
-    
-    return (
-      <div style={{
-        ...style,
-        padding: GAP / 2,
-      }}>
-        <ChartWidget 
-          widget={widget} 
-          realtimeUpdate={realtimeMetrics?.[widget.metric]}
-        />
-      </div>
-    );
-  };
-
   if (loading) {
     return (
       <Box sx={{ display: 'flex', justifyContent: 'center', alignItems: 'center', height: 400 }}>
@@ -91,6 +96,7 @@ function DashboardGrid({ widgetCount, realtimeMetrics }) {
         rowHeight={WIDGET_HEIGHT + GAP}
         width={containerWidth}
         overscanRowCount={1}
+        itemData={{ widgets, columnsCount, realtimeMetrics, subscribe, unsubscribe }}
       >
         {Cell}
       </Grid>
@@ -1,4 +1,4 @@
-import { useState, useEffect, useRef } from 'react';
+import { useState, useEffect, useRef, useCallback } from 'react';
 import io from 'socket.io-client';
 
 export const useWebSocket = (url) => {
@@ -6,6 +6,10 @@ export const useWebSocket = (url) => {
   const [metrics, setMetrics] = useState({});
   const socketRef = useRef(null);
   const updateQueueRef = useRef(new Map());
+  // Widget id -> number of mounted components showing it
+  const subscriptionsRef = useRef(new Map());
+  // Widget id -> last state received, which deltas are applied against
+  const widgetStateRef = useRef(new Map());
 
   useEffect(() => {
     // Extract base URL from ws:// or http:// URL
@@ -23,6 +27,12 @@ export const useWebSocket = (url) => {
     socketRef.current.on('connect', () => {
       console.log('Socket.IO connected');
       setConnected(true);
+      // Rooms do not survive a reconnect; rejoin and take fresh snapshots
+      widgetStateRef.current.clear();
+      const widgetIds = [...subscriptionsRef.current.keys()];
+      if (widgetIds.length > 0) {
+        socketRef.current.emit('subscribe', { widget_ids: widgetIds });
+      }
     });
 
     socketRef.current.on('disconnect', (reason) => {
@@ -43,11 +53,22 @@ export const useWebSocket = (url) => {
       // Socket.IO already parses JSON, so data is already an object
       const message = typeof data === 'string' ? JSON.parse(data) : data;
       
-      if (message.type === 'metrics_update') {
+      if (message.type === 'widget_snapshot') {
+        const state = { ...message.state, version: message.version };
+        widgetStateRef.current.set(message.widget_id, state);
         // Queue updates instead of applying immediately
-        message.data.forEach(update => {
-          updateQueueRef.current.set(update.metric_id, update);
-        });
+        updateQueueRef.current.set(message.widget_id, state);
+      } else if (message.type === 'widget_delta') {
+        const last = widgetStateRef.current.get(message.widget_id);
+        if (!last || last.version !== message.base_version) {
+          // Missed an update; ask for a new snapshot instead of applying a bad delta
+          socketRef.current.emit('unsubscribe', { widget_ids: [message.widget_id] });
+          socketRef.current.emit('subscribe', { widget_ids: [message.widget_id] });
+          return;
+        }
+        const state = { ...last, ...message.changes, version: message.version };
+        widgetStateRef.current.set(message.widget_id, state);
+        updateQueueRef.current.set(message.widget_id, state);
       }
     });
 
@@ -77,5 +98,26 @@ export const useWebSocket = (url) => {
     };
   }, [url]);
 
-  return { connected, metrics };
+  const subscribe = useCallback((widgetId) => {
+    const count = subscriptionsRef.current.get(widgetId) || 0;
+    subscriptionsRef.current.set(widgetId, count + 1);
+    if (count === 0 && socketRef.current?.connected) {
+      socketRef.current.emit('subscribe', { widget_ids: [widgetId] });
+    }
+  }, []);
+
+  const unsubscribe = useCallback((widgetId) => {
+    const count = subscriptionsRef.current.get(widgetId) || 0;
+    if (count > 1) {
+      subscriptionsRef.current.set(widgetId, count - 1);
+      return;
+    }
+    subscriptionsRef.current.delete(widgetId);
+    widgetStateRef.current.delete(widgetId);
+    if (socketRef.current?.connected) {
+      socketRef.current.emit('unsubscribe', { widget_ids: [widgetId] });
+    }
+  }, []);
+
+  return { connected, metrics, subscribe, unsubscribe };
 };
@@ -1,12 +1,16 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .database import engine, Base
+from .database import engine, Base, SessionLocal
 from .routes import router
+from .search import backfill_search_index
 import os
 
 # Create tables
 Base.metadata.create_all(bind=engine)
 
+with SessionLocal() as db:
+    backfill_search_index(db)
+
 app = FastAPI(title="Dashboard Templates API", version="1.0.0")
 
 # CORS
@@ -23,7 +23,7 @@ class Template(Base):
     description = Column(Text)
     version = Column(String(20), nullable=False)  # semantic versioning
     config = Column(JSON, nullable=False)  # dashboard configuration
-    parent_version_id = Column(Integer, ForeignKey("templates.id"), nullable=True)
+    parent_version_id = Column(Integer, ForeignKey("templates.id"), nullable=True, index=True)
     author_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     visibility = Column(String(20), default="private")  # private, team, public
     role_access = Column(JSON, default=list)  # list of roles that can access
@@ -47,6 +47,16 @@ class Template(Base):
         Index('idx_template_author', 'author_id', 'status'),
     )
 
+class TemplateTag(Base):
+    __tablename__ = "template_tags"
+    
+    template_id = Column(Integer, ForeignKey("templates.id", ondelete="CASCADE"), primary_key=True)
+    tag = Column(String(100), primary_key=True)  # normalized to lower case
+    
+    __table_args__ = (
+        Index('idx_template_tag_lookup', 'tag', 'template_id'),
+    )
+
 class TemplateVariable(Base):
     __tablename__ = "template_variables"
     
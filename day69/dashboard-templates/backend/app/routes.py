@@ -33,10 +33,11 @@ def search_templates(
     tags: Optional[str] = None,
     status: str = "published",
     min_rating: int = 0,
-    sort_by: str = "created_at",
+    sort_by: str = "relevance",
     order: str = "desc",
     limit: int = 20,
     offset: int = 0,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """Search templates with filters"""
@@ -50,12 +51,18 @@ def search_templates(
         sort_by=sort_by,
         order=order,
         limit=limit,
-        offset=offset
+        offset=offset,
+        cursor=cursor
     )
-    templates, total = services.TemplateService.search_templates(db, params)
+    try:
+        page = services.TemplateService.search_templates(db, params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return {
-        "templates": [schemas.TemplateListItem.model_validate(t) for t in templates],
-        "total": total,
+        "templates": [schemas.TemplateListItem.model_validate(t) for t in page.templates],
+        "total": page.total,
+        "total_is_estimate": page.total_is_estimate,
+        "next_cursor": page.next_cursor,
         "limit": limit,
         "offset": offset
     }
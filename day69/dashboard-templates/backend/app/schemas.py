@@ -118,7 +118,8 @@ class TemplateSearchParams(BaseModel):
     tags: List[str] = []
     status: str = "published"
     min_rating: int = 0
-    sort_by: str = "created_at"  # created_at, usage_count, rating
+    sort_by: str = "relevance"  # relevance (with a query), created_at, usage_count, rating
     order: str = "desc"
     limit: int = 20
-    offset: int = 0
+    offset: int = 0  # ignored when a cursor is given
+    cursor: Optional[str] = None
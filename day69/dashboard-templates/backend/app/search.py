@@ -0,0 +1,130 @@
+from sqlalchemy import DDL, event, text, func, literal_column, table, column, and_, or_
+from sqlalchemy.orm import Session
+from .database import Base
+from . import models
+from typing import Any, List, NamedTuple, Optional, Tuple
+from datetime import datetime
+import base64
+import json
+import re
+
+# Matching rows counted before the total is reported as an estimate
+SEARCH_COUNT_CAP = 1000
+
+# Postgres: weighted tsvector per template with a GIN index.
+# SQLite: an FTS5 table whose rowid is the template id.
+_PG_DDL = [
+    """CREATE TABLE IF NOT EXISTS template_search (
+        template_id INTEGER PRIMARY KEY REFERENCES templates(id) ON DELETE CASCADE,
+        document TSVECTOR NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_template_search_document ON template_search USING GIN (document)",
+]
+_SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS template_search USING fts5(
+        name, description, tags, tokenize='porter unicode61'
+    )""",
+]
+
+# Created and dropped with the models so create_all / drop_all manage it too
+for statement in _PG_DDL:
+    event.listen(Base.metadata, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+for statement in _SQLITE_DDL:
+    event.listen(Base.metadata, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(Base.metadata, "before_drop", DDL("DROP TABLE IF EXISTS template_search"))
+
+_PG_UPSERT = text("""
+    INSERT INTO template_search (template_id, document)
+    VALUES (:id,
+        setweight(to_tsvector('english', coalesce(:name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(:description, '')), 'B') ||
+        setweight(to_tsvector('simple', :tags), 'C'))
+    ON CONFLICT (template_id) DO UPDATE SET document = EXCLUDED.document
+""")
+_SQLITE_UPSERT = text("""
+    INSERT OR REPLACE INTO template_search (rowid, name, description, tags)
+    VALUES (:id, :name, :description, :tags)
+""")
+
+class SearchPage(NamedTuple):
+    templates: List[models.Template]
+    total: Optional[int]  # only computed for the first page
+    total_is_estimate: bool
+    next_cursor: Optional[str]
+
+pg_search = table("template_search", column("template_id"), column("document"))
+sqlite_search = table("template_search", column("rowid"))
+
+def index_template(db: Session, template: models.Template):
+    """Write a template's searchable text and tags; call before committing its changes"""
+    tags = sorted({tag.strip().lower() for tag in template.tags or [] if tag and tag.strip()})
+    params = {
+        "id": template.id,
+        "name": template.name,
+        "description": template.description,
+        "tags": " ".join(tags)
+    }
+    upsert = _PG_UPSERT if db.bind.dialect.name == "postgresql" else _SQLITE_UPSERT
+    db.execute(upsert, params)
+
+    db.query(models.TemplateTag).filter(models.TemplateTag.template_id == template.id).delete()
+    db.add_all(models.TemplateTag(template_id=template.id, tag=tag) for tag in tags)
+
+def backfill_search_index(db: Session) -> int:
+    """Index templates created before the search index existed"""
+    if db.bind.dialect.name == "postgresql":
+        indexed = db.query(pg_search.c.template_id)
+    else:
+        indexed = db.query(sqlite_search.c.rowid)
+    missing = db.query(models.Template).filter(~models.Template.id.in_(indexed)).all()
+    for template in missing:
+        index_template(db, template)
+    db.commit()
+    return len(missing)
+
+def search_terms(query: str) -> List[str]:
+    return re.findall(r"\w+", query.lower())
+
+def match_and_rank(db: Session, query, terms: List[str]) -> Tuple[Any, Any]:
+    """Restrict a Template query to full-text matches of every term (prefix
+    matching on the last one, for type-ahead); returns (query, rank) where a
+    higher rank is more relevant."""
+    if db.bind.dialect.name == "postgresql":
+        tsquery = func.to_tsquery("english", " & ".join(terms[:-1] + [terms[-1] + ":*"]))
+        query = query.join(pg_search, pg_search.c.template_id == models.Template.id).filter(
+            pg_search.c.document.op("@@")(tsquery)
+        )
+        return query, func.ts_rank_cd(pg_search.c.document, tsquery)
+
+    match = " ".join(f'"{term}"' for term in terms[:-1]) + f' "{terms[-1]}"*'
+    fts = literal_column("template_search")
+    query = query.join(sqlite_search, sqlite_search.c.rowid == models.Template.id).filter(
+        fts.op("MATCH")(match)
+    )
+    # bm25 is lower for better matches; weights favour name, then description, then tags
+    return query, -func.bm25(fts, 10.0, 4.0, 2.0)
+
+def encode_cursor(value: Any, template_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return base64.urlsafe_b64encode(json.dumps([value, template_id]).encode()).decode()
+
+def decode_cursor(cursor: str, sort_by: str) -> Tuple[Any, int]:
+    try:
+        value, template_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if sort_by == "created_at":
+            value = datetime.fromisoformat(value)
+        return value, int(template_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def after_cursor(sort_expression, value: Any, template_id: int, descending: bool):
+    """Rows strictly after (value, id) in (sort_expression, id) order"""
+    if descending:
+        return or_(sort_expression < value, and_(sort_expression == value, models.Template.id < template_id))
+    return or_(sort_expression > value, and_(sort_expression == value, models.Template.id > template_id))
+
+def estimated_total(query) -> Tuple[int, bool]:
+    """Count matches up to SEARCH_COUNT_CAP; returns (total, whether it is a lower bound)"""
+    total = query.order_by(None).limit(SEARCH_COUNT_CAP + 1).count()
+    return min(total, SEARCH_COUNT_CAP), total > SEARCH_COUNT_CAP
@@ -1,12 +1,110 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_, func, desc
-from . import models, schemas
+from sqlalchemy import or_, and_, func, desc, select
+from . import models, schemas, search
+from collections import OrderedDict
 import semver
-import json
 import re
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
 
+VARIABLE_PATTERN = re.compile(r'\{\{(\w+)\}\}')
+
+class _Text:
+    """A string holding {{variable}} placeholders, split into literal and variable parts"""
+    __slots__ = ("source", "parts")
+    
+    def __init__(self, source: str):
+        self.source = source
+        self.parts = []
+        position = 0
+        for match in VARIABLE_PATTERN.finditer(source):
+            self.parts.append((False, source[position:match.start()]))
+            self.parts.append((True, match.group(1)))
+            position = match.end()
+        self.parts.append((False, source[position:]))
+    
+    def render(self, values: Dict[str, Any]) -> str:
+        # Variables without a value keep their placeholder, as before
+        return "".join(
+            (str(values[part]) if part in values else f"{{{{{part}}}}}") if is_variable else part
+            for is_variable, part in self.parts
+        )
+
+class CompiledTemplate:
+    """A template config parsed once into substitution slots.
+    
+    Every string containing a placeholder, dict keys included, becomes a slot;
+    everything else is kept as-is. Rendering rebuilds the containers in one
+    pass and fills the slots, with no JSON round trip.
+    """
+    
+    def __init__(self, config: Any):
+        self.slots: List[Tuple[Tuple, _Text]] = []
+        self.root = self._compile(config, ())
+        self.variables = sorted({name for _, text in self.slots for is_variable, name in text.parts if is_variable})
+    
+    def _compile(self, node: Any, path: Tuple):
+        if isinstance(node, dict):
+            return {
+                self._compile_key(key, path): self._compile(value, path + (key,))
+                for key, value in node.items()
+            }
+        if isinstance(node, list):
+            return [self._compile(item, path + (index,)) for index, item in enumerate(node)]
+        if isinstance(node, str) and VARIABLE_PATTERN.search(node):
+            text = _Text(node)
+            self.slots.append((path, text))
+            return text
+        return node
+    
+    def _compile_key(self, key: str, path: Tuple):
+        if VARIABLE_PATTERN.search(key):
+            text = _Text(key)
+            self.slots.append((path, text))
+            return text
+        return key
+    
+    def render(self, values: Dict[str, Any]) -> Any:
+        return self._render(self.root, values)
+    
+    def _render(self, node: Any, values: Dict[str, Any]) -> Any:
+        if isinstance(node, dict):
+            return {
+                (key.render(values) if isinstance(key, _Text) else key): self._render(value, values)
+                for key, value in node.items()
+            }
+        if isinstance(node, list):
+            return [self._render(item, values) for item in node]
+        if isinstance(node, _Text):
+            return node.render(values)
+        return node
+
+class TemplateCompiler:
+    """Bounded cache of compiled configs keyed by template row and version.
+    
+    A config change always creates a new template row, so (id, version)
+    identifies an immutable config.
+    """
+    
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self.cache: "OrderedDict[tuple, CompiledTemplate]" = OrderedDict()
+    
+    def get(self, template: models.Template) -> CompiledTemplate:
+        key = (template.id, template.version)
+        compiled = self.cache.get(key)
+        if compiled is not None:
+            self.cache.move_to_end(key)
+            return compiled
+        
+        compiled = CompiledTemplate(template.config)
+        self.cache[key] = compiled
+        while len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+        return compiled
+
+template_compiler = TemplateCompiler()
+
 class TemplateService:
     
     @staticmethod
@@ -45,20 +143,12 @@ class TemplateService:
     @staticmethod
     def substitute_variables(config: Dict, variable_values: Dict[str, Any]) -> Dict:
         """Replace {{variable}} patterns in config with actual values"""
-        config_str = json.dumps(config)
-        
-        for var_name, var_value in variable_values.items():
-            pattern = f"{{{{{var_name}}}}}"
-            config_str = config_str.replace(pattern, str(var_value))
-        
-        return json.loads(config_str)
+        return CompiledTemplate(config).render(variable_values)
     
     @staticmethod
     def extract_variables(config: Dict) -> List[str]:
         """Extract all {{variable}} patterns from config"""
-        config_str = json.dumps(config)
-        pattern = r'\{\{(\w+)\}\}'
-        return list(set(re.findall(pattern, config_str)))
+        return CompiledTemplate(config).variables
     
     @staticmethod
     def create_template(db: Session, template: schemas.TemplateCreate, author_id: int) -> models.Template:
@@ -91,6 +181,7 @@ class TemplateService:
             )
             db.add(db_var)
         
+        search.index_template(db, db_template)
         db.commit()
         db.refresh(db_template)
         return db_template
@@ -126,6 +217,8 @@ class TemplateService:
                 status=db_template.status
             )
             db.add(new_template)
+            db.flush()
+            search.index_template(db, new_template)
             db.commit()
             db.refresh(new_template)
             return new_template
@@ -145,6 +238,7 @@ class TemplateService:
                 db_template.tags = update.tags
             
             db_template.updated_at = datetime.utcnow()
+            search.index_template(db, db_template)
             db.commit()
             db.refresh(db_template)
             return db_template
@@ -165,24 +259,21 @@ class TemplateService:
         
         db_template.status = "published"
         db_template.published_at = datetime.utcnow()
+        search.index_template(db, db_template)
         db.commit()
         db.refresh(db_template)
         return db_template
     
     @staticmethod
-    def search_templates(db: Session, params: schemas.TemplateSearchParams) -> tuple[List[models.Template], int]:
-        """Search templates with filters"""
+    def search_templates(db: Session, params: schemas.TemplateSearchParams) -> search.SearchPage:
+        """Search templates with filters, ranked by relevance when there is a text query"""
         query = db.query(models.Template).filter(models.Template.status == params.status)
         
-        # Text search
-        if params.query:
-            search_pattern = f"%{params.query}%"
-            query = query.filter(
-                or_(
-                    models.Template.name.ilike(search_pattern),
-                    models.Template.description.ilike(search_pattern)
-                )
-            )
+        # Text search through the full-text index
+        terms = search.search_terms(params.query) if params.query else []
+        rank = None
+        if terms:
+            query, rank = search.match_and_rank(db, query, terms)
         
         # Category filter
         if params.category:
@@ -190,55 +281,67 @@ class TemplateService:
         
         # Tags filter (any tag matches)
         if params.tags:
-            query = query.filter(
-                or_(*[models.Template.tags.contains([tag]) for tag in params.tags])
-            )
+            query = query.filter(models.Template.id.in_(
+                db.query(models.TemplateTag.template_id).filter(
+                    models.TemplateTag.tag.in_([tag.strip().lower() for tag in params.tags])
+                )
+            ))
         
         # Rating filter
         if params.min_rating > 0:
             query = query.filter(models.Template.rating >= params.min_rating)
         
-        # Total count
-        total = query.count()
-        
-        # Sorting
-        if params.sort_by == "usage_count":
+        # Sorting; relevance only applies to text searches
+        sort_by = params.sort_by
+        if sort_by == "relevance" and rank is not None:
+            sort_column = rank
+        elif sort_by == "usage_count":
             sort_column = models.Template.usage_count
-        elif params.sort_by == "rating":
+        elif sort_by == "rating":
             sort_column = models.Template.rating
         else:
+            sort_by = "created_at"
             sort_column = models.Template.created_at
-        
-        if params.order == "desc":
-            query = query.order_by(desc(sort_column))
+        descending = params.order == "desc"
+        
+        # Bounded count on the first page only
+        total, total_is_estimate = None, False
+        if not params.cursor:
+            total, total_is_estimate = search.estimated_total(query)
+        
+        # Keyset pagination on (sort value, id)
+        if params.cursor:
+            value, template_id = search.decode_cursor(params.cursor, sort_by)
+            query = query.filter(search.after_cursor(sort_column, value, template_id, descending))
+        elif params.offset:
+            query = query.offset(params.offset)
+        
+        if descending:
+            query = query.order_by(desc(sort_column), desc(models.Template.id))
         else:
-            query = query.order_by(sort_column)
+            query = query.order_by(sort_column, models.Template.id)
         
-        # Pagination
-        templates = query.offset(params.offset).limit(params.limit).all()
+        rows = query.add_columns(sort_column).limit(params.limit + 1).all()
+        next_cursor = None
+        if len(rows) > params.limit:
+            rows = rows[:params.limit]
+            last, last_value = rows[-1]
+            next_cursor = search.encode_cursor(last_value, last.id)
         
-        return templates, total
+        return search.SearchPage([template for template, _ in rows], total, total_is_estimate, next_cursor)
     
     @staticmethod
     def get_template_versions(db: Session, template_id: int) -> List[models.Template]:
         """Get all versions of a template"""
-        # Get the template
-        template = db.query(models.Template).filter(models.Template.id == template_id).first()
-        if not template:
-            return []
-        
-        versions = [template]
-        
-        # Get all children versions
-        def get_children(parent_id):
-            children = db.query(models.Template).filter(
-                models.Template.parent_version_id == parent_id
-            ).all()
-            for child in children:
-                versions.append(child)
-                get_children(child.id)
+        # Walk the version tree in one recursive query instead of one query per node
+        tree = select(models.Template.id).where(
+            models.Template.id == template_id
+        ).cte(name="version_tree", recursive=True)
+        tree = tree.union_all(
+            select(models.Template.id).where(models.Template.parent_version_id == tree.c.id)
+        )
         
-        get_children(template_id)
+        versions = db.query(models.Template).filter(models.Template.id.in_(select(tree.c.id))).all()
         
         # Sort by version
         versions.sort(key=lambda t: semver.VersionInfo.parse(t.version), reverse=True)
@@ -255,7 +358,7 @@ class TemplateService:
             raise ValueError("Only published templates can be instantiated")
         
         # Substitute variables
-        config = TemplateService.substitute_variables(template.config, dashboard_data.variable_values)
+        config = template_compiler.get(template).render(dashboard_data.variable_values)
         
         # Create dashboard
         dashboard = models.Dashboard(
@@ -149,3 +149,69 @@ def test_template_rating():
     data = response.json()
     assert data["rating"] == 5
     assert data["rating_count"] == 1
+
+def test_compiled_template_substitution():
+    from app.services import CompiledTemplate
+    config = {
+        "widgets": [
+            {"id": "w1", "title": "{{service}} CPU on {{region}}", "limit": 5},
+            {"id": "w2", "query": "rate({{service}}_errors)", "labels": {"{{region}}_only": True}}
+        ],
+        "refresh": "{{interval}}"
+    }
+    compiled = CompiledTemplate(config)
+    assert compiled.variables == ["interval", "region", "service"]
+    
+    rendered = compiled.render({"service": 'api "v2"', "region": "eu"})
+    assert rendered["widgets"][0] == {"id": "w1", "title": 'api "v2" CPU on eu', "limit": 5}
+    assert rendered["widgets"][1]["labels"] == {"eu_only": True}
+    # Unsupplied variables keep their placeholder and the source config is untouched
+    assert rendered["refresh"] == "{{interval}}"
+    assert config["widgets"][0]["title"] == "{{service}} CPU on {{region}}"
+
+def test_template_versions_cover_whole_tree():
+    response = client.post("/api/v1/templates", json={
+        "name": "Versioned",
+        "config": {"widgets": [{"id": "w1"}]},
+        "category": "test"
+    })
+    root_id = response.json()["id"]
+    
+    # 1.0.0 -> 1.1.0 -> 1.2.0
+    child = client.put(f"/api/v1/templates/{root_id}", json={
+        "config": {"widgets": [{"id": "w1"}, {"id": "w2"}]}
+    }).json()
+    client.put(f"/api/v1/templates/{child['id']}", json={
+        "config": {"widgets": [{"id": "w1"}, {"id": "w2"}, {"id": "w3"}]}
+    })
+    
+    response = client.get(f"/api/v1/templates/{root_id}/versions")
+    assert response.status_code == 200
+    assert [v["version"] for v in response.json()] == ["1.2.0", "1.1.0", "1.0.0"]
+
+def test_search_ranked_keyset_pagination():
+    names = ["Kafka lag", "Kafka throughput", "Kafka brokers", "Postgres replication"]
+    for index, name in enumerate(names):
+        response = client.post("/api/v1/templates", json={
+            "name": name,
+            "description": "Kafka cluster health" if index == 3 else "Streaming metrics",
+            "config": {"widgets": []},
+            "category": "streaming",
+            "tags": ["Kafka"] if index < 2 else ["ops"]
+        })
+        client.post(f"/api/v1/templates/{response.json()['id']}/publish")
+    
+    # Prefix match on the last term; name matches outrank the description-only match
+    first = client.get("/api/v1/templates?query=kaf&limit=2").json()
+    assert first["total"] == 4 and first["total_is_estimate"] is False
+    assert len(first["templates"]) == 2 and first["next_cursor"]
+    second = client.get(f"/api/v1/templates?query=kaf&limit=2&cursor={first['next_cursor']}").json()
+    assert second["next_cursor"] is None
+    ordered = [t["name"] for t in first["templates"] + second["templates"]]
+    assert sorted(ordered) == sorted(names)
+    assert ordered[-1] == "Postgres replication"
+    
+    tagged = client.get("/api/v1/templates?tags=kafka&sort_by=created_at").json()
+    assert {t["name"] for t in tagged["templates"]} == {"Kafka lag", "Kafka throughput"}
+    
+    assert client.get("/api/v1/templates?cursor=not-a-cursor").status_code == 400
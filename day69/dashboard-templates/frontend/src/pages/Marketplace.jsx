@@ -10,7 +10,7 @@ export default function Marketplace() {
   const [filters, setFilters] = useState({
     query: '',
     category: '',
-    sort_by: 'created_at',
+    sort_by: 'relevance',
     min_rating: 0
   })
   const [loading, setLoading] = useState(true)
@@ -153,6 +153,7 @@ export default function Marketplace() {
               background: 'white'
             }}
           >
+            <option value="relevance">Best Match</option>
             <option value="created_at">Latest</option>
             <option value="usage_count">Most Used</option>
             <option value="rating">Highest Rated</option>
@@ -9,6 +9,8 @@ import os
 from .models import get_db, engine, Base
 from .models.permission_models import User, Role, Team, PermissionPolicy, Resource, AuditEvent, ComplianceViolation
 from .services.permission_engine import PermissionEngine
+from .services.policy_index import policy_index
+from .services.permission_cache import PermissionCache
 from .services.audit_service import AuditService
 from .services.compliance_monitor import ComplianceMonitor
 
@@ -32,6 +34,7 @@ redis_client = redis.Redis(
     port=int(os.getenv("REDIS_PORT", 6379)),
     decode_responses=True
 )
+permission_cache = PermissionCache(redis_client)
 
 # Pydantic models
 class PermissionCheckRequest(BaseModel):
@@ -41,6 +44,13 @@ class PermissionCheckRequest(BaseModel):
     resource_id: str
     context: Optional[Dict] = None
 
+class BulkPermissionCheckRequest(BaseModel):
+    subject_id: str
+    action: str
+    resource_type: str
+    resource_ids: List[str]
+    context: Optional[Dict] = None
+
 class PermissionCheckResponse(BaseModel):
     allowed: bool
     reason: str
@@ -74,7 +84,7 @@ def evaluate_permission(
     db: Session = Depends(get_db)
 ):
     """Evaluate permission request."""
-    engine = PermissionEngine(db, redis_client)
+    engine = PermissionEngine(db, redis_client, cache=permission_cache)
     audit = AuditService(db)
     
     allowed, reason, policy = engine.evaluate(
@@ -105,6 +115,39 @@ def evaluate_permission(
         policy_matched=policy
     )
 
+@app.post("/api/permissions/evaluate-many")
+def evaluate_permissions_bulk(
+    request: BulkPermissionCheckRequest,
+    db: Session = Depends(get_db)
+):
+    """Evaluate one subject and action against many resources, e.g. to filter a list."""
+    engine = PermissionEngine(db, redis_client, cache=permission_cache)
+    decisions = engine.evaluate_many(
+        request.subject_id,
+        request.action,
+        request.resource_type,
+        request.resource_ids,
+        request.context
+    )
+    
+    return {
+        "allowed": [resource_id for resource_id, (allowed, _, _) in decisions.items() if allowed],
+        "results": {
+            resource_id: PermissionCheckResponse(allowed=allowed, reason=reason, policy_matched=policy)
+            for resource_id, (allowed, reason, policy) in decisions.items()
+        }
+    }
+
+@app.get("/api/permissions/cache/stats")
+def get_permission_cache_stats():
+    """Hit rates and L1 staleness of the permission decision cache."""
+    return permission_cache.stats()
+
+@app.get("/api/permissions/index/stats")
+def get_policy_index_stats():
+    """Size and age of the in-memory policy index."""
+    return policy_index.stats()
+
 # Policy Management
 @app.post("/api/policies")
 def create_policy(policy: PolicyCreate, db: Session = Depends(get_db)):
@@ -114,9 +157,9 @@ def create_policy(policy: PolicyCreate, db: Session = Depends(get_db)):
     db.commit()
     db.refresh(db_policy)
     
-    # Invalidate cache
-    engine = PermissionEngine(db, redis_client)
-    engine.invalidate_cache()
+    # Invalidate cached decisions of the policy's subject (and its members)
+    engine = PermissionEngine(db, redis_client, cache=permission_cache)
+    engine.invalidate_cache(f"{db_policy.subject_type}:{db_policy.subject_id}")
     
     return db_policy
 
@@ -133,12 +176,13 @@ def delete_policy(policy_id: int, db: Session = Depends(get_db)):
     if not policy:
         raise HTTPException(status_code=404, detail="Policy not found")
     
+    subject_id = f"{policy.subject_type}:{policy.subject_id}"
     db.delete(policy)
     db.commit()
     
-    # Invalidate cache
-    engine = PermissionEngine(db, redis_client)
-    engine.invalidate_cache()
+    # Invalidate cached decisions of the policy's subject (and its members)
+    engine = PermissionEngine(db, redis_client, cache=permission_cache)
+    engine.invalidate_cache(subject_id)
     
     return {"status": "deleted"}
 
@@ -0,0 +1,192 @@
+from typing import Dict, List, Optional, Tuple
+from collections import OrderedDict
+import threading
+import hashlib
+import redis
+import json
+import time
+import os
+import weakref
+
+# In-process decisions kept in front of Redis
+L1_MAX_ENTRIES = int(os.getenv("PERMISSION_L1_MAX_ENTRIES", "10000"))
+# How long a fetched version counter is trusted before asking Redis again;
+# this bounds how stale an L1 hit can be after another process invalidates
+VERSION_TTL = float(os.getenv("PERMISSION_VERSION_TTL", "1.0"))
+
+GLOBAL_VERSION = "perm:ver:global"
+# Bumped with every invalidation; a process whose PolicyIndex was loaded at an
+# older generation reloads before deciding, so it never caches a stale decision
+INDEX_GENERATION = "perm:ver:index"
+
+def version_key(subject_id: str) -> str:
+    return f"perm:ver:{subject_id}"
+
+# Every live cache, so a schema reset can invalidate all of them
+_caches: "weakref.WeakSet[PermissionCache]" = weakref.WeakSet()
+
+def invalidate_all_caches():
+    """Bump the global version once per Redis, e.g. after tables were dropped"""
+    bumped = set()
+    for cache in list(_caches):
+        if id(cache.redis) not in bumped:
+            bumped.add(id(cache.redis))
+            cache.invalidate()
+
+class PermissionCache:
+    """Two-level decision cache stamped with per-subject version counters.
+
+    Every user, role and team (and the resource being checked) has a counter
+    in Redis. A decision's key folds in the counters of everything it depends
+    on, so invalidating a subject is one INCR: old entries are simply never
+    looked up again and expire on their own. Decisions are kept in an
+    in-process LRU in front of Redis; counters are re-read at most every
+    VERSION_TTL seconds, which is the staleness an L1 hit can have.
+
+    Every invalidation also bumps a global index generation in the same
+    transaction. It is read together with the counters and tells the engine
+    whether its PolicyIndex predates a change made by another process.
+    """
+
+    def __init__(self, redis_client: redis.Redis, ttl: int = 300,
+                 max_entries: int = L1_MAX_ENTRIES, version_ttl: float = VERSION_TTL):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version_ttl = version_ttl
+        self.lock = threading.Lock()
+        self.decisions: "OrderedDict[str, Tuple[float, tuple]]" = OrderedDict()
+        self.versions: Dict[str, Tuple[int, float]] = {}
+        self.counters = {
+            "l1_hits": 0, "l2_hits": 0, "misses": 0,
+            "invalidations": 0, "remote_invalidations_seen": 0
+        }
+        self.staleness_total = 0.0
+        self.staleness_max = 0.0
+        _caches.add(self)
+
+    def _versions(self, keys: List[str]) -> Tuple[List[int], float, int]:
+        """Current counter values, when the oldest of them was read, and the index generation"""
+        now = time.monotonic()
+        keys = keys + [INDEX_GENERATION]
+        with self.lock:
+            entries = {key: self.versions.get(key) for key in keys}
+        expired = [
+            key for key, entry in entries.items()
+            if entry is None or now - entry[1] > self.version_ttl
+        ]
+        if expired:
+            if INDEX_GENERATION not in expired:
+                # Never older than a counter it is compared against
+                expired.append(INDEX_GENERATION)
+            fetched = self.redis.mget(expired)
+            with self.lock:
+                if len(self.versions) > self.max_entries:
+                    # Forget counters nobody has needed recently; they are re-read on demand
+                    self.versions = {
+                        key: entry for key, entry in self.versions.items()
+                        if now - entry[1] <= self.version_ttl
+                    }
+                for key, value in zip(expired, fetched):
+                    value = int(value or 0)
+                    previous = self.versions.get(key)
+                    if previous and value > previous[0]:
+                        self.counters["remote_invalidations_seen"] += 1
+                    self.versions[key] = entries[key] = (value, now)
+
+        *values, (generation, _) = [entries[key] for key in keys]
+        return [value for value, _ in values], min(fetched_at for _, fetched_at in values), generation
+
+    def stamped_key(self, subject_id: str, action: str, resource_type: str, resource_id: str,
+                    related_subjects: List[str]) -> Tuple[str, float, int]:
+        """Cache key for a decision, the read time of the versions folded into it,
+        and the index generation read with them.
+
+        The subject's roles and teams are part of the key, so a membership
+        change produces a new key as well.
+        """
+        keys = [GLOBAL_VERSION, version_key(subject_id), version_key(f"resource:{resource_type}:{resource_id}")]
+        keys += [version_key(related) for related in sorted(related_subjects)]
+        values, fetched_at, generation = self._versions(keys)
+
+        stamp = ",".join(f"{key}={value}" for key, value in zip(keys, values))
+        request = f"{subject_id}:{action}:{resource_type}:{resource_id}"
+        digest = hashlib.md5(f"{request}|{stamp}".encode()).hexdigest()
+        return f"perm:{digest}", fetched_at, generation
+
+    def get(self, key: str, fetched_at: float) -> Optional[tuple]:
+        now = time.monotonic()
+        with self.lock:
+            entry = self.decisions.get(key)
+            if entry is not None and entry[0] > now:
+                self.decisions.move_to_end(key)
+                self.counters["l1_hits"] += 1
+                staleness = now - fetched_at
+                self.staleness_total += staleness
+                self.staleness_max = max(self.staleness_max, staleness)
+                return entry[1]
+
+        cached = self.redis.get(key)
+        if cached:
+            result = json.loads(cached)
+            decision = (result['allowed'], result['reason'], result['policy'])
+            self._remember(key, decision)
+            with self.lock:
+                self.counters["l2_hits"] += 1
+            return decision
+
+        with self.lock:
+            self.counters["misses"] += 1
+        return None
+
+    def set(self, key: str, decision: tuple):
+        self.redis.setex(
+            key,
+            self.ttl,
+            json.dumps({
+                'allowed': decision[0],
+                'reason': decision[1],
+                'policy': decision[2]
+            })
+        )
+        self._remember(key, decision)
+
+    def _remember(self, key: str, decision: tuple):
+        with self.lock:
+            self.decisions[key] = (time.monotonic() + self.ttl, decision)
+            self.decisions.move_to_end(key)
+            while len(self.decisions) > self.max_entries:
+                self.decisions.popitem(last=False)
+
+    def invalidate(self, subject_id: Optional[str] = None) -> int:
+        """Bump one subject's counter ("user:1", "role:3", "resource:project:42"), or all.
+
+        Returns the new index generation.
+        """
+        key = version_key(subject_id) if subject_id else GLOBAL_VERSION
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.incr(INDEX_GENERATION)
+        pipe.incr(key)
+        generation, value = pipe.execute()
+        now = time.monotonic()
+        with self.lock:
+            # This process sees its own invalidation immediately
+            self.versions[key] = (int(value), now)
+            self.versions[INDEX_GENERATION] = (int(generation), now)
+            self.counters["invalidations"] += 1
+        return int(generation)
+
+    def stats(self) -> Dict:
+        with self.lock:
+            lookups = self.counters["l1_hits"] + self.counters["l2_hits"] + self.counters["misses"]
+            hits = self.counters["l1_hits"] + self.counters["l2_hits"]
+            return {
+                **self.counters,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "l1_hit_rate": round(self.counters["l1_hits"] / lookups, 4) if lookups else 0.0,
+                "l1_entries": len(self.decisions),
+                "l1_staleness_avg_ms": round(self.staleness_total / self.counters["l1_hits"] * 1000, 2)
+                    if self.counters["l1_hits"] else 0.0,
+                "l1_staleness_max_ms": round(self.staleness_max * 1000, 2),
+                "version_ttl_seconds": self.version_ttl
+            }
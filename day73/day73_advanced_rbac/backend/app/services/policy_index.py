@@ -0,0 +1,361 @@
+from typing import Dict, List, Set, Optional, Tuple, FrozenSet, NamedTuple
+from collections import defaultdict, Counter
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+import threading
+import time
+import os
+
+from ..models import Base
+from ..models.permission_models import PermissionPolicy, Role, Team, UserRole, TeamMember, Resource
+from .permission_cache import invalidate_all_caches
+
+# Full reload interval; picks up changes made by other processes
+POLICY_INDEX_MAX_AGE = int(os.getenv("POLICY_INDEX_MAX_AGE", "60"))
+
+# Cached candidate lists kept before the memo is cleared
+MAX_CANDIDATE_SETS = 10000
+
+INDEXED_MODELS = (PermissionPolicy, Role, Team, UserRole, TeamMember, Resource)
+
+class PolicyEntry(NamedTuple):
+    """Detached copy of a PermissionPolicy row"""
+    id: int
+    name: str
+    subject_type: str
+    subject_id: str
+    action: str
+    resource_type: str
+    resource_id: Optional[str]
+    effect: str
+    conditions: Optional[Dict]
+    priority: int
+
+    @classmethod
+    def from_model(cls, policy: PermissionPolicy) -> "PolicyEntry":
+        return cls(
+            policy.id, policy.name, policy.subject_type, policy.subject_id, policy.action,
+            policy.resource_type, policy.resource_id, policy.effect, policy.conditions,
+            policy.priority or 0
+        )
+
+    def matches_resource(self, resource_id: str) -> bool:
+        return self.resource_id in (resource_id, '*', None)
+
+class PolicyIndex:
+    """In-memory index of every policy, role/team hierarchy, membership and owner.
+
+    Policies are keyed by (subject_type, subject_id, resource_type, action) and
+    transitive role and team closures are memoized, so collecting the policies
+    that apply to a request needs no queries. Committed ORM changes to the
+    indexed tables are applied incrementally; a full reload every
+    POLICY_INDEX_MAX_AGE seconds catches writes from other processes.
+
+    Sync endpoints run in a threadpool, so every read and write of the maps
+    holds `lock`. A reload builds its maps in a staging index without the
+    lock and swaps them in at once; only one thread reloads at a time.
+    """
+
+    # Attributes holding indexed state, swapped together on reload
+    STATE = (
+        'policies', 'by_key', 'role_parents', 'team_parents', 'role_assignments',
+        'team_memberships', 'user_roles', 'user_teams', 'resources', 'resource_owners'
+    )
+
+    def __init__(self, max_age: int = POLICY_INDEX_MAX_AGE):
+        self.max_age = max_age
+        self.lock = threading.RLock()
+        self.reload_lock = threading.Lock()
+        self.loaded_at: Optional[float] = None
+        # Invalidation generation (see PermissionCache) these maps are known to include
+        self.generation = 0
+        # Changes committed while a reload is reading; replayed onto the new maps
+        self.changes_during_reload: Optional[List] = None
+        self._reset()
+
+    def _reset(self):
+        self.policies: Dict[int, PolicyEntry] = {}
+        self.by_key: Dict[Tuple[str, str, str, str], List[PolicyEntry]] = defaultdict(list)
+        self.role_parents: Dict[int, Optional[int]] = {}
+        self.team_parents: Dict[int, Optional[int]] = {}
+        # Membership rows by id, and per-user counts so duplicate rows are handled
+        self.role_assignments: Dict[int, Tuple[int, int]] = {}
+        self.team_memberships: Dict[int, Tuple[int, int]] = {}
+        self.user_roles: Dict[int, Counter] = defaultdict(Counter)
+        self.user_teams: Dict[int, Counter] = defaultdict(Counter)
+        self.resources: Dict[int, Tuple[str, str, Optional[int]]] = {}
+        self.resource_owners: Dict[Tuple[str, str], Optional[int]] = {}
+        self._clear_memos()
+
+    def _clear_memos(self):
+        self.role_closures: Dict[int, FrozenSet[int]] = {}
+        self.team_closures: Dict[int, FrozenSet[int]] = {}
+        self.candidate_sets: Dict[Tuple[str, str, str], List[PolicyEntry]] = {}
+
+    # Loading
+
+    def _expired(self) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > self.max_age
+
+    def _behind(self, generation: Optional[int]) -> bool:
+        return self.loaded_at is None or (generation is not None and generation > self.generation)
+
+    def ensure_fresh(self, db: Session, generation: Optional[int] = None):
+        """Reload when expired, or when another process has made a change up to
+        `generation` that these maps may not include"""
+        if self._behind(generation):
+            # Decisions must not be made from maps older than that change: wait for the reload
+            with self.reload_lock:
+                if self._behind(generation):
+                    self._reload_locked(db, generation)
+            return
+        if not self._expired():
+            return
+        # Expired but usable: one thread reloads, the rest keep reading the old maps
+        if self.reload_lock.acquire(blocking=False):
+            try:
+                self._reload_locked(db)
+            finally:
+                self.reload_lock.release()
+
+    def reload(self, db: Session, generation: Optional[int] = None):
+        with self.reload_lock:
+            self._reload_locked(db, generation)
+
+    def _reload_locked(self, db: Session, generation: Optional[int] = None):
+        """`generation` must have been read before the reload starts"""
+        with self.lock:
+            self.changes_during_reload = []
+        try:
+            staged = PolicyIndex(self.max_age)
+            staged._load(db)
+        except BaseException:
+            with self.lock:
+                self.changes_during_reload = None
+            raise
+        with self.lock:
+            for name in self.STATE:
+                setattr(self, name, getattr(staged, name))
+            # Rows committed while loading may or may not be in the new maps;
+            # applying them again is idempotent
+            for upserts, deletes in self.changes_during_reload:
+                self._apply_changes(upserts, deletes)
+            self.changes_during_reload = None
+            self._clear_memos()
+            self.loaded_at = time.monotonic()
+            if generation is not None:
+                self.generation = max(self.generation, generation)
+
+    def advance_generation(self, generation: int):
+        """Record this process's own invalidation, already applied through apply().
+
+        Only safe when no other process's change came in between.
+        """
+        with self.lock:
+            if generation == self.generation + 1:
+                self.generation = generation
+
+    def _load(self, db: Session):
+        for policy in db.query(PermissionPolicy).all():
+            self._add_policy(PolicyEntry.from_model(policy))
+        for role in db.query(Role).all():
+            self.role_parents[role.id] = role.parent_role_id
+        for team in db.query(Team).all():
+            self.team_parents[team.id] = team.parent_team_id
+        for row in db.query(UserRole).all():
+            self._add_member(self.role_assignments, self.user_roles, row.id, row.user_id, row.role_id)
+        for row in db.query(TeamMember).all():
+            self._add_member(self.team_memberships, self.user_teams, row.id, row.user_id, row.team_id)
+        for resource in db.query(Resource).all():
+            self._set_resource(resource.id, resource.resource_type, resource.resource_id, resource.owner_id)
+
+    def invalidate(self):
+        """Drop everything; the next evaluation reloads from the database"""
+        with self.lock:
+            self._reset()
+            self.loaded_at = None
+
+    # Incremental maintenance
+
+    def apply(self, upserts: List, deletes: List):
+        """Apply committed row changes, as (model class, column values) pairs"""
+        with self.lock:
+            if self.changes_during_reload is not None:
+                self.changes_during_reload.append((upserts, deletes))
+            if self.loaded_at is None:
+                return  # Not loaded yet; the first reload sees these rows
+            self._apply_changes(upserts, deletes)
+            self._clear_memos()
+
+    def _apply_changes(self, upserts: List, deletes: List):
+        for model, values in deletes:
+            self._remove(model, values)
+        for model, values in upserts:
+            self._remove(model, values)
+            self._upsert(model, values)
+
+    def _upsert(self, model, values: Dict):
+        if model is PermissionPolicy:
+            self._add_policy(PolicyEntry(**{field: values[field] for field in PolicyEntry._fields}))
+        elif model is Role:
+            self.role_parents[values['id']] = values['parent_role_id']
+        elif model is Team:
+            self.team_parents[values['id']] = values['parent_team_id']
+        elif model is UserRole:
+            self._add_member(self.role_assignments, self.user_roles, values['id'], values['user_id'], values['role_id'])
+        elif model is TeamMember:
+            self._add_member(self.team_memberships, self.user_teams, values['id'], values['user_id'], values['team_id'])
+        elif model is Resource:
+            self._set_resource(values['id'], values['resource_type'], values['resource_id'], values['owner_id'])
+
+    def _remove(self, model, values: Dict):
+        row_id = values['id']
+        if model is PermissionPolicy:
+            policy = self.policies.pop(row_id, None)
+            if policy:
+                key = (policy.subject_type, policy.subject_id, policy.resource_type, policy.action)
+                self.by_key[key] = [p for p in self.by_key[key] if p.id != row_id]
+        elif model is Role:
+            self.role_parents.pop(row_id, None)
+        elif model is Team:
+            self.team_parents.pop(row_id, None)
+        elif model is UserRole:
+            self._remove_member(self.role_assignments, self.user_roles, row_id)
+        elif model is TeamMember:
+            self._remove_member(self.team_memberships, self.user_teams, row_id)
+        elif model is Resource:
+            resource = self.resources.pop(row_id, None)
+            if resource:
+                self.resource_owners.pop(resource[:2], None)
+
+    def _add_policy(self, policy: PolicyEntry):
+        self.policies[policy.id] = policy
+        self.by_key[(policy.subject_type, policy.subject_id, policy.resource_type, policy.action)].append(policy)
+
+    @staticmethod
+    def _add_member(rows: Dict, by_user: Dict, row_id: int, user_id: int, group_id: int):
+        rows[row_id] = (user_id, group_id)
+        by_user[user_id][group_id] += 1
+
+    @staticmethod
+    def _remove_member(rows: Dict, by_user: Dict, row_id: int):
+        member = rows.pop(row_id, None)
+        if member:
+            user_id, group_id = member
+            by_user[user_id][group_id] -= 1
+            if by_user[user_id][group_id] <= 0:
+                del by_user[user_id][group_id]
+
+    def _set_resource(self, row_id: int, resource_type: str, resource_id: str, owner_id: Optional[int]):
+        self.resources[row_id] = (resource_type, resource_id, owner_id)
+        self.resource_owners[(resource_type, resource_id)] = owner_id
+
+    # Lookups
+
+    @staticmethod
+    def _closure(start: int, parents: Dict[int, Optional[int]], memo: Dict[int, FrozenSet[int]]) -> FrozenSet[int]:
+        """start plus all of its ancestors; stops at cycles"""
+        cached = memo.get(start)
+        if cached is not None:
+            return cached
+        chain = []
+        node = start
+        while node is not None and node not in chain:
+            chain.append(node)
+            node = parents.get(node)
+        closure = frozenset(chain)
+        memo[start] = closure
+        return closure
+
+    def user_role_ids(self, user_id: int) -> Set[int]:
+        with self.lock:
+            role_ids = set()
+            for role_id in self.user_roles.get(user_id, ()):
+                role_ids |= self._closure(role_id, self.role_parents, self.role_closures)
+            return role_ids
+
+    def user_team_ids(self, user_id: int) -> Set[int]:
+        with self.lock:
+            team_ids = set()
+            for team_id in self.user_teams.get(user_id, ()):
+                team_ids |= self._closure(team_id, self.team_parents, self.team_closures)
+            return team_ids
+
+    def candidates(self, subject_id: str, action: str, resource_type: str) -> List[PolicyEntry]:
+        """Policies for the subject (and a user's roles and teams) on this action and
+        resource type, before resource and condition checks; highest priority first"""
+        with self.lock:
+            memo_key = (subject_id, action, resource_type)
+            cached = self.candidate_sets.get(memo_key)
+            if cached is not None:
+                return cached
+
+            subject_type, sid = subject_id.split(':', 1)
+            subjects = [(subject_type, sid)]
+            if subject_type == 'user':
+                user_id = int(sid)
+                subjects += [('role', str(role_id)) for role_id in self.user_role_ids(user_id)]
+                subjects += [('team', str(team_id)) for team_id in self.user_team_ids(user_id)]
+
+            actions = {action, '*'}
+            found = [
+                policy
+                for subject in subjects
+                for policy_action in actions
+                for policy in self.by_key.get(subject + (resource_type, policy_action), ())
+            ]
+            found.sort(key=lambda p: (-p.priority, p.id))
+
+            if len(self.candidate_sets) >= MAX_CANDIDATE_SETS:
+                self.candidate_sets.clear()
+            self.candidate_sets[memo_key] = found
+            return found
+
+    def owner_of(self, resource_type: str, resource_id: str) -> Optional[int]:
+        with self.lock:
+            return self.resource_owners.get((resource_type, resource_id))
+
+    def stats(self) -> Dict:
+        return {
+            "policies": len(self.policies),
+            "roles": len(self.role_parents),
+            "teams": len(self.team_parents),
+            "role_assignments": len(self.role_assignments),
+            "team_memberships": len(self.team_memberships),
+            "resources": len(self.resources),
+            "loaded_seconds_ago": None if self.loaded_at is None else round(time.monotonic() - self.loaded_at, 1)
+        }
+
+policy_index = PolicyIndex()
+
+# Capture changes to indexed rows at flush time and apply them once committed
+
+def _row_values(instance) -> Dict:
+    return {column.key: getattr(instance, column.key) for column in instance.__table__.columns}
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    changes = session.info.setdefault("policy_index_changes", {"upserts": [], "deletes": []})
+    for instance in list(session.new) + list(session.dirty):
+        if isinstance(instance, INDEXED_MODELS):
+            changes["upserts"].append((type(instance), _row_values(instance)))
+    for instance in session.deleted:
+        if isinstance(instance, INDEXED_MODELS):
+            changes["deletes"].append((type(instance), _row_values(instance)))
+
+@event.listens_for(Session, "after_commit")
+def _apply_changes(session):
+    changes = session.info.pop("policy_index_changes", None)
+    if changes:
+        policy_index.apply(changes["upserts"], changes["deletes"])
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_changes(session, previous_transaction):
+    session.info.pop("policy_index_changes", None)
+
+# Tables dropped or recreated wholesale bypass the ORM
+@event.listens_for(Base.metadata, "after_drop")
+def _reset_after_drop(target, connection, **kw):
+    policy_index.invalidate()
+    # Recreated rows reuse ids, so decisions cached under the old versions would match them
+    invalidate_all_caches()
@@ -4,7 +4,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 import redis
 
-from app.main import app, get_db
+from app.main import app, get_db, permission_cache
 from app.models import Base
 from app.models.permission_models import User, Role, Team, PermissionPolicy, UserRole, TeamMember, Resource
 
@@ -29,6 +29,8 @@ client = TestClient(app)
 @pytest.fixture
 def setup_database():
     """Setup test data."""
+    # Decisions cached by an earlier test must not match this test's data
+    permission_cache.invalidate()
     db = TestingSessionLocal()
     
     # Create test user
@@ -129,6 +131,131 @@ def test_resource_owner_access(setup_database):
     assert data["allowed"] == True
     assert "owner" in data["policy_matched"]
 
+def test_bulk_permission_evaluation(setup_database):
+    """Test filtering a list of resources in one call."""
+    response = client.post("/api/permissions/evaluate-many", json={
+        "subject_id": "user:1",
+        "action": "write",
+        "resource_type": "project",
+        "resource_ids": ["42", "99"]
+    })
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["allowed"] == ["42"]
+    assert data["results"]["99"]["allowed"] == False
+
+def test_policy_index_picks_up_new_policy(setup_database):
+    """Test that a committed policy is visible to the index without a reload."""
+    client.post("/api/permissions/evaluate-many", json={
+        "subject_id": "user:1", "action": "delete", "resource_type": "alert", "resource_ids": ["7"]
+    })
+    client.post("/api/policies", json={
+        "name": "team-alert-delete",
+        "subject_type": "team",
+        "subject_id": "1",
+        "action": "delete",
+        "resource_type": "alert",
+        "effect": "allow"
+    })
+    
+    response = client.post("/api/permissions/evaluate-many", json={
+        "subject_id": "user:1", "action": "delete", "resource_type": "alert", "resource_ids": ["7"]
+    })
+    assert response.json()["allowed"] == ["7"]
+
+def test_policy_change_invalidates_cached_decision(setup_database):
+    """Test that a new role policy bumps the role version and replaces cached decisions."""
+    check = {
+        "subject_id": "user:1",
+        "action": "read",
+        "resource_type": "project",
+        "resource_id": "7"
+    }
+    assert client.post("/api/permissions/evaluate", json=check).json()["allowed"] == True
+    
+    client.post("/api/policies", json={
+        "name": "engineer-read-deny-7",
+        "subject_type": "role",
+        "subject_id": "1",
+        "action": "read",
+        "resource_type": "project",
+        "resource_id": "7",
+        "effect": "deny"
+    })
+    
+    data = client.post("/api/permissions/evaluate", json=check).json()
+    assert data["allowed"] == False
+    assert data["policy_matched"] == "engineer-read-deny-7"
+    
+    stats = client.get("/api/permissions/cache/stats").json()
+    assert stats["invalidations"] >= 1
+
+def test_policy_index_serves_complete_state_during_reload(setup_database):
+    """Test that lookups during a slow reload see the old maps, never a half-loaded index."""
+    import threading
+    import time
+    from app.services.policy_index import PolicyIndex
+    
+    db = TestingSessionLocal()
+    index = PolicyIndex()
+    index.reload(db)
+    before = [p.name for p in index.candidates("user:1", "write", "project")]
+    
+    staged_load = PolicyIndex._load
+    def slow_load(self, session):
+        staged_load(self, session)
+        time.sleep(0.3)
+    
+    PolicyIndex._load = slow_load
+    try:
+        reloader = threading.Thread(target=index.reload, args=(TestingSessionLocal(),))
+        reloader.start()
+        time.sleep(0.05)
+        during = [p.name for p in index.candidates("user:1", "write", "project")]
+        index.loaded_at -= index.max_age + 1
+        started = time.monotonic()
+        index.ensure_fresh(db)  # Another thread is reloading: serve the current maps
+        waited = time.monotonic() - started
+        reloader.join()
+    finally:
+        PolicyIndex._load = staged_load
+        db.close()
+    
+    assert before == during == ["team-write-policy"]
+    assert waited < 0.2
+    assert [p.name for p in index.candidates("user:1", "write", "project")] == ["team-write-policy"]
+
+def test_remote_invalidation_reloads_stale_index(setup_database):
+    """Test that a process whose index predates another process's change reloads
+    before deciding, instead of caching the old decision under the new versions."""
+    from app.main import redis_client
+    from app.services.policy_index import PolicyIndex
+    from app.services.permission_cache import PermissionCache
+    from app.services.permission_engine import PermissionEngine
+    
+    db_a, db_b = TestingSessionLocal(), TestingSessionLocal()
+    cache_a, cache_b = PermissionCache(redis_client, version_ttl=0), PermissionCache(redis_client, version_ttl=0)
+    # Process B's index never sees process A's commits directly
+    index_b = PolicyIndex(max_age=3600)
+    check = ("user:1", "read", "project", "7")
+    try:
+        assert PermissionEngine(db_b, redis_client, index=index_b, cache=cache_b).evaluate(*check)[0] == True
+        
+        db_a.add(PermissionPolicy(
+            name="engineer-read-deny-7", subject_type="role", subject_id="1", action="read",
+            resource_type="project", resource_id="7", effect="deny", priority=50
+        ))
+        db_a.commit()
+        PermissionEngine(db_a, redis_client, cache=cache_a).invalidate_cache("role:1")
+        
+        allowed, _, policy = PermissionEngine(db_b, redis_client, index=index_b, cache=cache_b).evaluate(*check)
+        assert (allowed, policy) == (False, "engineer-read-deny-7")
+        assert PermissionEngine(db_a, redis_client, cache=cache_a).evaluate(*check)[0] == False
+    finally:
+        db_a.close()
+        db_b.close()
+
 def test_create_policy():
     """Test creating new policy."""
     response = client.post("/api/policies", json={
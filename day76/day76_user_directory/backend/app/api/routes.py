@@ -125,13 +125,13 @@ def list_ldap_configs(db: Session = Depends(get_db)):
     return db.query(LDAPConfig).all()
 
 @router.post("/ldap/sync/{config_id}")
-def sync_ldap(config_id: int, db: Session = Depends(get_db)):
+def sync_ldap(config_id: int, incremental: bool = False, db: Session = Depends(get_db)):
     config = db.query(LDAPConfig).filter(LDAPConfig.id == config_id).first()
     if not config:
         raise HTTPException(status_code=404, detail="LDAP config not found")
     
     ldap_service = LDAPService()
-    stats = ldap_service.sync_users(config, db)
+    stats = ldap_service.sync_users(config, db, incremental=incremental)
     
     return {
         "message": "Sync completed",
@@ -1,10 +1,12 @@
 import ldap
+from ldap.controls import SimplePagedResultsControl
 import redis
 import json
 import os
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional
-from ..models import User, LDAPConfig, ProvisioningMethod, UserStatus
+from datetime import datetime
+from typing import Dict, Optional, Iterator, Tuple
+from ..models import LDAPConfig
+from .ldap_sync import LDAPSyncEngine, SYNC_ATTRIBUTES, generalized_time, incremental_since
 
 class LDAPService:
     def __init__(self):
@@ -70,83 +72,51 @@ class LDAPService:
             print(f"LDAP auth error: {e}")
             return None
     
-    def sync_users(self, config: LDAPConfig, db_session) -> Dict[str, int]:
-        """Sync users from LDAP directory"""
-        stats = {'created': 0, 'updated': 0, 'disabled': 0, 'errors': 0}
+    def iter_users(self, config: LDAPConfig, since: Optional[datetime] = None,
+                   page_size: int = 500) -> Iterator[Tuple[str, Dict]]:
+        """Stream user entries with the paged-results control, one page in memory at a time"""
+        search_filter = config.user_filter
+        if since:
+            search_filter = f"(&{config.user_filter}(modifyTimestamp>={generalized_time(since)}))"
         
+        conn = self._get_connection(config)
+        control = SimplePagedResultsControl(True, size=page_size, cookie='')
         try:
-            conn = self._get_connection(config)
-            
-            # Search all users
-            search_filter = config.user_filter
-            results = conn.search_s(config.base_dn, ldap.SCOPE_SUBTREE, search_filter,
-                                   ['uid', 'cn', 'mail', 'employeeType', 'departmentNumber', 'manager'])
-            
-            synced_usernames = []
-            
-            for user_dn, attrs in results:
-                try:
-                    username = attrs.get('uid', [b''])[0].decode('utf-8')
-                    if not username:
-                        continue
-                    
-                    synced_usernames.append(username)
-                    
-                    user_data = {
-                        'username': username,
-                        'email': attrs.get('mail', [b''])[0].decode('utf-8'),
-                        'full_name': attrs.get('cn', [b''])[0].decode('utf-8'),
-                        'employee_type': attrs.get('employeeType', [b''])[0].decode('utf-8'),
-                        'department': attrs.get('departmentNumber', [b''])[0].decode('utf-8'),
-                        'manager': attrs.get('manager', [b''])[0].decode('utf-8'),
-                    }
-                    
-                    # Check if user exists
-                    existing_user = db_session.query(User).filter(User.username == username).first()
-                    
-                    if existing_user:
-                        # Update existing
-                        for key, value in user_data.items():
-                            setattr(existing_user, key, value)
-                        existing_user.is_ldap_synced = True
-                        existing_user.last_ldap_sync = datetime.utcnow()
-                        existing_user.ldap_dn = user_dn
-                        if existing_user.status == UserStatus.PENDING:
-                            existing_user.status = UserStatus.ACTIVE
-                        stats['updated'] += 1
-                    else:
-                        # Create new
-                        new_user = User(
-                            **user_data,
-                            ldap_dn=user_dn,
-                            provisioning_method=ProvisioningMethod.LDAP_SYNC,
-                            is_ldap_synced=True,
-                            last_ldap_sync=datetime.utcnow(),
-                            status=UserStatus.ACTIVE
-                        )
-                        db_session.add(new_user)
-                        stats['created'] += 1
-                    
-                except Exception as e:
-                    print(f"Error syncing user: {e}")
-                    stats['errors'] += 1
-            
-            # Disable users not in LDAP
-            ldap_users = db_session.query(User).filter(User.is_ldap_synced == True).all()
-            for user in ldap_users:
-                if user.username not in synced_usernames and user.status == UserStatus.ACTIVE:
-                    user.status = UserStatus.SUSPENDED
-                    stats['disabled'] += 1
-            
-            db_session.commit()
+            while True:
+                msgid = conn.search_ext(config.base_dn, ldap.SCOPE_SUBTREE, search_filter,
+                                        SYNC_ATTRIBUTES, serverctrls=[control])
+                _, results, _, response_controls = conn.result3(msgid)
+                for user_dn, attrs in results:
+                    # Search continuation references come back without a DN
+                    if user_dn:
+                        yield user_dn, attrs
+                
+                cookie = next((c.cookie for c in response_controls
+                               if c.controlType == SimplePagedResultsControl.controlType), None)
+                if not cookie:
+                    break
+                control.cookie = cookie
+        finally:
             conn.unbind_s()
+    
+    def sync_users(self, config: LDAPConfig, db_session, incremental: bool = False) -> Dict[str, int]:
+        """Sync users from LDAP directory; incremental syncs only fetch entries
+        modified since the previous run and never disable anyone"""
+        stats = {'created': 0, 'updated': 0, 'disabled': 0, 'errors': 0}
+        
+        try:
+            started = datetime.utcnow()
+            since = incremental_since(config.last_sync) if incremental else None
+            engine = LDAPSyncEngine(db_session)
+            stats = engine.sync(self.iter_users(config, since), full=since is None)
             
             # Update config
-            config.last_sync = datetime.utcnow()
+            config.last_sync = started
             db_session.commit()
             
         except Exception as e:
             print(f"LDAP sync error: {e}")
+            db_session.rollback()
             stats['errors'] += 1
         
         return stats
@@ -0,0 +1,197 @@
+import base64
+import re
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from ..models import User, ProvisioningMethod, UserStatus
+
+SYNC_ATTRIBUTES = ['uid', 'cn', 'mail', 'employeeType', 'departmentNumber', 'manager', 'modifyTimestamp']
+
+# Incremental syncs look back this far past the previous run; upserts are
+# idempotent, so the overlap only absorbs clock skew with the directory
+INCREMENTAL_OVERLAP = timedelta(minutes=5)
+
+Entry = Tuple[str, Dict[str, List[bytes]]]
+
+def generalized_time(dt: datetime) -> str:
+    """LDAP GeneralizedTime as used by modifyTimestamp"""
+    return dt.strftime('%Y%m%d%H%M%SZ')
+
+def entry_to_user_data(attrs: Dict[str, List[bytes]]) -> Dict[str, str]:
+    def first(name: str) -> str:
+        return attrs.get(name, [b''])[0].decode('utf-8')
+
+    return {
+        'username': first('uid'),
+        'email': first('mail'),
+        'full_name': first('cn'),
+        'employee_type': first('employeeType'),
+        'department': first('departmentNumber'),
+        'manager': first('manager'),
+    }
+
+class LDAPSyncEngine:
+    """Apply a directory listing to the users table in bulk.
+
+    Existing users are loaded into a dict with one query, creates and updates
+    are written as bulk insert/update mappings in chunks, and a full sync
+    suspends synced users missing from the directory with a set difference.
+    A chunk that violates a constraint is retried row by row so one bad entry
+    only counts as one error.
+    """
+
+    def __init__(self, db_session, chunk_size: int = 500):
+        self.db = db_session
+        self.chunk_size = chunk_size
+
+    def sync(self, entries: Iterable[Entry], full: bool = True) -> Dict[str, int]:
+        stats = {'created': 0, 'updated': 0, 'disabled': 0, 'errors': 0}
+        now = datetime.utcnow()
+
+        existing: Dict[str, Tuple[int, UserStatus]] = {}
+        synced_active: Set[str] = set()
+        for user_id, username, status, is_ldap_synced in self.db.query(
+            User.id, User.username, User.status, User.is_ldap_synced
+        ):
+            existing[username] = (user_id, status)
+            if is_ldap_synced and status == UserStatus.ACTIVE:
+                synced_active.add(username)
+        seen: Set[str] = set()
+        creates: List[Dict] = []
+        updates: List[Dict] = []
+
+        for user_dn, attrs in entries:
+            try:
+                user_data = entry_to_user_data(attrs)
+            except (UnicodeDecodeError, IndexError) as e:
+                print(f"Error syncing user {user_dn}: {e}")
+                stats['errors'] += 1
+                continue
+
+            username = user_data['username']
+            if not username or username in seen:
+                continue
+            seen.add(username)
+
+            fields = {**user_data, 'ldap_dn': user_dn, 'is_ldap_synced': True, 'last_ldap_sync': now}
+            if username in existing:
+                user_id, status = existing[username]
+                fields.update(id=user_id, updated_at=now)
+                if status == UserStatus.PENDING:
+                    fields['status'] = UserStatus.ACTIVE
+                updates.append(fields)
+            else:
+                creates.append({
+                    **fields,
+                    'provisioning_method': ProvisioningMethod.LDAP_SYNC,
+                    'status': UserStatus.ACTIVE,
+                    'created_at': now,
+                    'updated_at': now
+                })
+
+            if len(creates) >= self.chunk_size:
+                self._write(creates, insert=True, stats=stats)
+                creates = []
+            if len(updates) >= self.chunk_size:
+                self._write(updates, insert=False, stats=stats)
+                updates = []
+
+        self._write(creates, insert=True, stats=stats)
+        self._write(updates, insert=False, stats=stats)
+
+        # Deletions are only visible to a full listing
+        if full:
+            missing = [existing[username][0] for username in synced_active - seen]
+            for start in range(0, len(missing), self.chunk_size):
+                chunk = missing[start:start + self.chunk_size]
+                self.db.execute(
+                    update(User).where(User.id.in_(chunk)).values(status=UserStatus.SUSPENDED, updated_at=now)
+                )
+                stats['disabled'] += len(chunk)
+
+        self.db.commit()
+        return stats
+
+    def _write(self, mappings: List[Dict], insert: bool, stats: Dict[str, int]):
+        if not mappings:
+            return
+        counter = 'created' if insert else 'updated'
+        try:
+            with self.db.begin_nested():
+                self._bulk(mappings, insert)
+            stats[counter] += len(mappings)
+        except IntegrityError:
+            for mapping in mappings:
+                try:
+                    with self.db.begin_nested():
+                        self._bulk([mapping], insert)
+                    stats[counter] += 1
+                except IntegrityError as e:
+                    print(f"Error syncing user {mapping['username']}: {e.orig}")
+                    stats['errors'] += 1
+
+    def _bulk(self, mappings: List[Dict], insert: bool):
+        if insert:
+            self.db.bulk_insert_mappings(User, mappings)
+        else:
+            self.db.bulk_update_mappings(User, mappings)
+
+def incremental_since(last_sync: Optional[datetime]) -> Optional[datetime]:
+    return last_sync - INCREMENTAL_OVERLAP if last_sync else None
+
+class LDIFDirectory:
+    """Read-only directory backed by an LDIF file, for tests and offline syncs.
+
+    Understands plain and base64 values, folded lines and comments, and
+    filters made of (attr=value), (attr>=value) and (&...) terms, which is
+    what the sync issues.
+    """
+
+    def __init__(self, path: str):
+        self.entries = list(self._parse(path))
+
+    @staticmethod
+    def _parse(path: str) -> Iterator[Entry]:
+        with open(path, encoding='utf-8') as f:
+            lines: List[str] = []
+            for raw in f.read().splitlines():
+                if raw.startswith(' ') and lines:
+                    lines[-1] += raw[1:]
+                elif not raw.startswith('#'):
+                    lines.append(raw)
+
+        dn, attrs = None, {}
+        for line in lines + ['']:
+            if not line.strip():
+                if dn:
+                    yield dn, attrs
+                dn, attrs = None, {}
+                continue
+            name, _, value = line.partition(':')
+            if value.startswith(':'):
+                data = base64.b64decode(value[1:].strip())
+            else:
+                data = value.strip().encode('utf-8')
+            if name.lower() == 'dn':
+                dn = data.decode('utf-8')
+            else:
+                attrs.setdefault(name, []).append(data)
+
+    def search(self, search_filter: str, since: Optional[datetime] = None) -> Iterator[Entry]:
+        if since:
+            search_filter = f"(&{search_filter}(modifyTimestamp>={generalized_time(since)}))"
+        terms = re.findall(r'\(([^()&|!]+?)(>=|=)([^()]*)\)', search_filter)
+        for dn, attrs in self.entries:
+            if all(self._matches(attrs, name, operator, value) for name, operator, value in terms):
+                yield dn, {name: values for name, values in attrs.items() if name in SYNC_ATTRIBUTES}
+
+    @staticmethod
+    def _matches(attrs: Dict[str, List[bytes]], name: str, operator: str, value: str) -> bool:
+        values = next((v for key, v in attrs.items() if key.lower() == name.lower()), [])
+        decoded = [v.decode('utf-8') for v in values]
+        if operator == '>=':
+            return any(v >= value for v in decoded)
+        if value == '*':
+            return bool(decoded)
+        return any(v.lower() == value.lower() for v in decoded)
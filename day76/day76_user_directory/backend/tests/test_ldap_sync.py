@@ -0,0 +1,65 @@
+import os
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.models import Base, User, UserStatus, ProvisioningMethod
+from app.services.ldap_sync import LDAPSyncEngine, LDIFDirectory
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "directory.ldif")
+USER_FILTER = "(objectClass=inetOrgPerson)"
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+def test_ldif_directory_parses_fixture():
+    directory = LDIFDirectory(FIXTURE)
+    entries = dict(directory.search(USER_FILTER))
+    assert len(entries) == 4
+    jose = entries["uid=jose.nunez,ou=users,dc=example,dc=com"]
+    assert jose["cn"] == ["José Núñez".encode()]
+    assert "description" not in jose  # only sync attributes are returned
+
+def test_full_sync_creates_updates_and_disables(db):
+    db.add_all([
+        User(username="jane.smith", email="jane.smith@example.com", status=UserStatus.PENDING),
+        User(username="departed", email="departed@example.com", status=UserStatus.ACTIVE, is_ldap_synced=True),
+        User(username="local", email="local@example.com", status=UserStatus.ACTIVE),
+    ])
+    db.commit()
+
+    directory = LDIFDirectory(FIXTURE)
+    stats = LDAPSyncEngine(db, chunk_size=2).sync(directory.search(USER_FILTER))
+    assert stats == {'created': 3, 'updated': 1, 'disabled': 1, 'errors': 0}
+
+    users = {user.username: user for user in db.query(User)}
+    assert users["jane.smith"].status == UserStatus.ACTIVE
+    assert users["jane.smith"].department == "Sales"
+    assert users["jose.nunez"].provisioning_method == ProvisioningMethod.LDAP_SYNC
+    assert users["departed"].status == UserStatus.SUSPENDED
+    assert users["local"].status == UserStatus.ACTIVE
+
+def test_incremental_sync_only_touches_modified_entries(db):
+    directory = LDIFDirectory(FIXTURE)
+    LDAPSyncEngine(db).sync(directory.search(USER_FILTER))
+
+    entries = list(directory.search(USER_FILTER, since=datetime(2024, 3, 1)))
+    assert {dn.split(",")[0] for dn, _ in entries} == {"uid=jane.smith", "uid=jose.nunez"}
+
+    stats = LDAPSyncEngine(db).sync(entries, full=False)
+    assert stats == {'created': 0, 'updated': 2, 'disabled': 0, 'errors': 0}
+    assert db.query(User).filter(User.status == UserStatus.ACTIVE).count() == 4
+
+def test_conflicting_entry_counts_as_one_error(db):
+    db.add(User(username="someone", email="john.doe@example.com"))
+    db.commit()
+
+    directory = LDIFDirectory(FIXTURE)
+    stats = LDAPSyncEngine(db).sync(directory.search(USER_FILTER), full=False)
+    assert stats['created'] == 3
+    assert stats['errors'] == 1
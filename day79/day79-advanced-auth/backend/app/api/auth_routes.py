@@ -4,7 +4,6 @@ from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from typing import Optional, List
 import secrets
-import json
 
 from app.core.database import get_db
 from app.core.redis_client import get_redis
@@ -184,13 +183,7 @@ async def verify_mfa(
     session_service = SessionService(redis)
     sessions = session_service.get_user_sessions(user_id)
     if sessions:
-        latest_session = sessions[0]
-        latest_session["mfa_verified"] = True
-        redis.setex(
-            f"session:{user_id}:{latest_session['session_id']}",
-            86400,
-            json.dumps(latest_session)
-        )
+        session_service.mark_mfa_verified(user_id, sessions[0]["session_id"])
     
     return {"message": "MFA verified successfully"}
 
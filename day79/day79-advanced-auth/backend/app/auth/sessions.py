@@ -1,78 +1,245 @@
-import json
+import os
 import secrets
-from datetime import datetime, timedelta
-from typing import Optional, Dict, List
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Dict, List, Tuple
+
+SESSION_TTL = 86400
+# last_activity is written to Redis at most this often per session
+ACTIVITY_WRITE_INTERVAL = int(os.getenv("SESSION_ACTIVITY_INTERVAL", "60"))
+# How long a validated session is served from process memory; bounds how late
+# this process notices a revocation made by another process
+NEAR_CACHE_TTL = float(os.getenv("SESSION_NEAR_CACHE_TTL", "5"))
+NEAR_CACHE_MAX_ENTRIES = int(os.getenv("SESSION_NEAR_CACHE_MAX_ENTRIES", "10000"))
+
+# Write fields only if the session still exists, so a late activity update
+# cannot resurrect a revoked session as a partial hash
+UPDATE_FIELDS_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+# Delete every session in the user's set and the set itself atomically
+REVOKE_ALL_SCRIPT = """
+local ids = redis.call('SMEMBERS', KEYS[1])
+for _, sid in ipairs(ids) do
+    redis.call('DEL', ARGV[1] .. sid)
+end
+redis.call('DEL', KEYS[1])
+return ids
+"""
+
+class SessionNearCache:
+    """Small in-process LRU of session hashes, plus when each session's
+    activity was last written to Redis"""
+
+    def __init__(self, max_entries: int = NEAR_CACHE_MAX_ENTRIES, ttl: float = NEAR_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self.activity_written: "OrderedDict[str, float]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return dict(entry[1])
+            self.misses += 1
+            return None
+
+    def put(self, key: str, data: Dict):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, dict(data))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def update(self, key: str, fields: Dict):
+        """Apply a write this process made to Redis to the cached copy"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry[1].update(fields)
+
+    def activity_due(self, key: str, interval: float) -> bool:
+        with self.lock:
+            written = self.activity_written.get(key)
+            return written is None or time.monotonic() - written >= interval
+
+    def activity_recorded(self, key: str):
+        with self.lock:
+            self.activity_written[key] = time.monotonic()
+            self.activity_written.move_to_end(key)
+            while len(self.activity_written) > self.max_entries:
+                self.activity_written.popitem(last=False)
+
+    def evict(self, key: str):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.activity_written.pop(key, None)
+
+    def stats(self) -> Dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+# Shared by every SessionService; services are created per request
+session_cache = SessionNearCache()
+
+def session_key(user_id: str, session_id: str) -> str:
+    return f"session:{user_id}:{session_id}"
+
+# Fields a session always has; a None value is stored as a missing hash field
+SESSION_FIELDS = ("user_id", "device_id", "ip_address", "user_agent",
+                  "mfa_verified", "created_at", "last_activity")
+
+def _encode(session_data: Dict) -> Dict[str, str]:
+    return {
+        field: ("1" if value else "0") if field == "mfa_verified" else str(value)
+        for field, value in session_data.items()
+        if value is not None
+    }
+
+def _decode(fields: Dict[str, str]) -> Dict:
+    session_data = {field: None for field in SESSION_FIELDS}
+    session_data.update(fields)
+    session_data["mfa_verified"] = fields.get("mfa_verified") == "1"
+    return session_data
 
 class SessionService:
-    def __init__(self, redis_client):
+    """Sessions stored as Redis hashes under session:{user_id}:{session_id}.
+
+    Single fields are updated in place, activity writes are throttled to one
+    per ACTIVITY_WRITE_INTERVAL per session, multi-session reads are pipelined
+    and hot lookups are served from a short-lived near-cache.
+    """
+
+    def __init__(self, redis_client, near_cache: Optional[SessionNearCache] = None):
         self.redis = redis_client
-    
-    def create_session(self, user_id: str, device_id: str, ip: str, 
+        self.cache = near_cache if near_cache is not None else session_cache
+        self._update_fields = redis_client.register_script(UPDATE_FIELDS_SCRIPT)
+        self._revoke_all = redis_client.register_script(REVOKE_ALL_SCRIPT)
+
+    def create_session(self, user_id: str, device_id: str, ip: str,
                       user_agent: str, mfa_verified: bool = False) -> str:
         """Create new session"""
         session_id = secrets.token_urlsafe(32)
-        
+        now = datetime.utcnow().isoformat()
+
         session_data = {
             "user_id": user_id,
             "device_id": device_id,
             "ip_address": ip,
             "user_agent": user_agent,
             "mfa_verified": mfa_verified,
-            "created_at": datetime.utcnow().isoformat(),
-            "last_activity": datetime.utcnow().isoformat()
+            "created_at": now,
+            "last_activity": now
         }
-        
-        # Store session with 24-hour TTL
-        self.redis.setex(
-            f"session:{user_id}:{session_id}",
-            86400,
-            json.dumps(session_data)
-        )
-        
-        # Add to user's session set
-        self.redis.sadd(f"user_sessions:{user_id}", session_id)
-        
+
+        # Store session with 24-hour TTL and add it to the user's session set
+        key = session_key(user_id, session_id)
+        pipe = self.redis.pipeline()
+        pipe.hset(key, mapping=_encode(session_data))
+        pipe.expire(key, SESSION_TTL)
+        pipe.sadd(f"user_sessions:{user_id}", session_id)
+        pipe.execute()
+
+        self.cache.put(key, session_data)
+        self.cache.activity_recorded(key)
         return session_id
-    
+
     def get_session(self, user_id: str, session_id: str) -> Optional[Dict]:
         """Retrieve session data"""
-        data = self.redis.get(f"session:{user_id}:{session_id}")
-        if data:
-            return json.loads(data)
-        return None
-    
-    def update_activity(self, user_id: str, session_id: str):
-        """Update last activity timestamp"""
-        session_data = self.get_session(user_id, session_id)
-        if session_data:
-            session_data["last_activity"] = datetime.utcnow().isoformat()
-            self.redis.setex(
-                f"session:{user_id}:{session_id}",
-                86400,
-                json.dumps(session_data)
-            )
-    
+        key = session_key(user_id, session_id)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        fields = self.redis.hgetall(key)
+        if not fields:
+            return None
+        session_data = _decode(fields)
+        self.cache.put(key, session_data)
+        return session_data
+
+    def update_activity(self, user_id: str, session_id: str) -> bool:
+        """Update last activity timestamp; skipped if written recently"""
+        key = session_key(user_id, session_id)
+        if not self.cache.activity_due(key, ACTIVITY_WRITE_INTERVAL):
+            return False
+
+        now = datetime.utcnow().isoformat()
+        if not self._update_fields(keys=[key], args=[SESSION_TTL, "last_activity", now]):
+            self.cache.evict(key)
+            return False
+        self.cache.activity_recorded(key)
+        self.cache.update(key, {"last_activity": now})
+        return True
+
+    def mark_mfa_verified(self, user_id: str, session_id: str) -> bool:
+        """Flag the session as having passed MFA"""
+        key = session_key(user_id, session_id)
+        if not self._update_fields(keys=[key], args=[SESSION_TTL, "mfa_verified", "1"]):
+            self.cache.evict(key)
+            return False
+        self.cache.update(key, {"mfa_verified": True})
+        return True
+
     def revoke_session(self, user_id: str, session_id: str):
         """Revoke specific session"""
-        self.redis.delete(f"session:{user_id}:{session_id}")
-        self.redis.srem(f"user_sessions:{user_id}", session_id)
-    
+        pipe = self.redis.pipeline()
+        pipe.delete(session_key(user_id, session_id))
+        pipe.srem(f"user_sessions:{user_id}", session_id)
+        pipe.execute()
+        self.cache.evict(session_key(user_id, session_id))
+
     def revoke_all_sessions(self, user_id: str):
         """Revoke all user sessions"""
-        session_ids = self.redis.smembers(f"user_sessions:{user_id}")
-        for sid in session_ids:
-            self.redis.delete(f"session:{user_id}:{sid}")
-        self.redis.delete(f"user_sessions:{user_id}")
-    
+        revoked = self._revoke_all(keys=[f"user_sessions:{user_id}"], args=[session_key(user_id, "")])
+        for sid in revoked:
+            self.cache.evict(session_key(user_id, sid))
+
     def get_user_sessions(self, user_id: str) -> List[Dict]:
-        """Get all active sessions for user"""
-        session_ids = self.redis.smembers(f"user_sessions:{user_id}")
-        sessions = []
-        
+        """Get all active sessions for user, most recent first"""
+        session_ids = list(self.redis.smembers(f"user_sessions:{user_id}"))
+        if not session_ids:
+            return []
+
+        pipe = self.redis.pipeline(transaction=False)
         for sid in session_ids:
-            session_data = self.get_session(user_id, sid)
-            if session_data:
-                session_data["session_id"] = sid
-                sessions.append(session_data)
-        
+            pipe.hgetall(session_key(user_id, sid))
+        results = pipe.execute()
+
+        sessions = []
+        expired = []
+        for sid, fields in zip(session_ids, results):
+            if not fields:
+                expired.append(sid)
+                continue
+            session_data = _decode(fields)
+            self.cache.put(session_key(user_id, sid), session_data)
+            session_data["session_id"] = sid
+            sessions.append(session_data)
+
+        # Sessions that expired on their own are still in the set
+        if expired:
+            self.redis.srem(f"user_sessions:{user_id}", *expired)
+
+        sessions.sort(key=lambda s: s.get("created_at", ""), reverse=True)
         return sessions
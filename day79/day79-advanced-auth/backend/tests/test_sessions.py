@@ -0,0 +1,79 @@
+import pytest
+import fakeredis
+from app.auth import sessions
+from app.auth.sessions import SessionService, SessionNearCache, session_key
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+@pytest.fixture
+def service(redis_client):
+    return SessionService(redis_client, near_cache=SessionNearCache())
+
+def test_create_and_get_session(service, redis_client):
+    session_id = service.create_session("u1", "device-1", "10.0.0.1", None, mfa_verified=False)
+
+    key = session_key("u1", session_id)
+    assert redis_client.ttl(key) > 0
+    assert redis_client.smembers("user_sessions:u1") == {session_id}
+    # None is left out of the hash rather than stored as the string "None"
+    assert "user_agent" not in redis_client.hgetall(key)
+
+    # Read through Redis, not the near-cache the creating service filled
+    fresh = SessionService(redis_client, near_cache=SessionNearCache())
+    session = fresh.get_session("u1", session_id)
+    assert session["device_id"] == "device-1"
+    assert session["user_agent"] is None
+    assert session["mfa_verified"] is False
+    assert fresh.get_session("u1", "missing") is None
+
+def test_update_activity_is_throttled(service, redis_client, monkeypatch):
+    session_id = service.create_session("u1", "device-1", "10.0.0.1", "agent")
+    key = session_key("u1", session_id)
+
+    # Creating the session counts as the first activity write
+    assert service.update_activity("u1", session_id) is False
+
+    monkeypatch.setattr(sessions, "ACTIVITY_WRITE_INTERVAL", 0)
+    redis_client.hset(key, "last_activity", "old")
+    assert service.update_activity("u1", session_id) is True
+    assert redis_client.hget(key, "last_activity") != "old"
+    assert service.get_session("u1", session_id)["last_activity"] == redis_client.hget(key, "last_activity")
+
+def test_mark_mfa_verified_does_not_resurrect_revoked_session(service, redis_client, monkeypatch):
+    session_id = service.create_session("u1", "device-1", "10.0.0.1", "agent")
+    assert service.mark_mfa_verified("u1", session_id) is True
+    assert service.get_session("u1", session_id)["mfa_verified"] is True
+
+    # Revoked by another process: this service's near-cache still holds the session
+    SessionService(redis_client, near_cache=SessionNearCache()).revoke_session("u1", session_id)
+    assert service.mark_mfa_verified("u1", session_id) is False
+    monkeypatch.setattr(sessions, "ACTIVITY_WRITE_INTERVAL", 0)
+    assert service.update_activity("u1", session_id) is False
+
+    assert not redis_client.exists(session_key("u1", session_id))
+    assert service.get_session("u1", session_id) is None
+
+def test_revoke_all_sessions(service, redis_client):
+    session_ids = [service.create_session("u1", f"device-{i}", "10.0.0.1", "agent") for i in range(3)]
+    other = service.create_session("u2", "device-9", "10.0.0.2", "agent")
+
+    service.revoke_all_sessions("u1")
+
+    assert all(service.get_session("u1", sid) is None for sid in session_ids)
+    assert not redis_client.exists("user_sessions:u1")
+    assert service.get_session("u2", other) is not None
+
+def test_get_user_sessions_prunes_expired_ids(service, redis_client):
+    first = service.create_session("u1", "device-1", "10.0.0.1", "agent")
+    second = service.create_session("u1", "device-2", "10.0.0.1", "agent")
+    redis_client.hset(session_key("u1", second), "created_at", "9999-01-01T00:00:00")
+    expired = service.create_session("u1", "device-3", "10.0.0.1", "agent")
+    redis_client.delete(session_key("u1", expired))  # As if its TTL ran out
+
+    listed = service.get_user_sessions("u1")
+
+    assert [s["session_id"] for s in listed] == [second, first]
+    assert redis_client.smembers("user_sessions:u1") == {first, second}
+    assert service.get_user_sessions("nobody") == []
@@ -20,6 +20,13 @@ class Settings(BaseSettings):
     # API Keys
     api_key_prefix: str = "sk_live"
     api_key_expiry_days: int = 90
+    api_key_cache_ttl: int = 60  # seconds a verified key skips the DB and bcrypt
+    api_key_cache_max_entries: int = 10000
+    
+    # Request Logging
+    request_log_batch_size: int = 200
+    request_log_flush_interval: float = 1.0
+    request_log_max_buffer: int = 10000
     
     # Request Signing
     signature_max_age: int = 300  # 5 minutes
@@ -10,6 +10,7 @@ import uvicorn
 from app.database import get_db, init_db
 from app.redis_client import get_redis
 from middleware.security_middleware import APISecurityMiddleware
+from middleware.request_log_buffer import request_log_buffer
 from security.api_key_manager import APIKeyManager
 from security.rate_limiter import RateLimiter
 from security.ip_whitelist import IPWhitelist
@@ -90,6 +91,11 @@ class RateLimitStats(BaseModel):
 async def startup_event():
     await init_db()
     print("Database initialized")
+    request_log_buffer.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await request_log_buffer.stop()
 
 # ============= Health Check =============
 
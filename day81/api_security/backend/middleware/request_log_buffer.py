@@ -0,0 +1,88 @@
+import asyncio
+from typing import Dict, List, Optional
+from sqlalchemy import insert
+from app.database import AsyncSessionLocal
+from app.config import get_settings
+from models.request_log import RequestLog
+
+settings = get_settings()
+
+class RequestLogBuffer:
+    """
+    Collects request log rows in memory and writes them with one bulk INSERT
+    per batch from a background task, so responses never wait on the database.
+    Rows beyond max_buffer are dropped (and counted) if the database falls behind.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, batch_size: int = None,
+                 flush_interval: float = None, max_buffer: int = None):
+        self.session_factory = session_factory
+        self.batch_size = batch_size or settings.request_log_batch_size
+        self.flush_interval = flush_interval or settings.request_log_flush_interval
+        self.max_buffer = max_buffer or settings.request_log_max_buffer
+        self.rows: List[Dict] = []
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, row: Dict):
+        if len(self.rows) >= self.max_buffer:
+            self.dropped += 1
+            return
+        self.rows.append(row)
+        if self._task is None:
+            self.start()
+        if len(self.rows) >= self.batch_size:
+            self._wakeup.set()
+
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background writer and write whatever is still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self.rows:
+            await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self.rows:
+                await self.flush()
+
+    async def flush(self):
+        batch, self.rows = self.rows[:self.batch_size], self.rows[self.batch_size:]
+        if not batch:
+            return
+        try:
+            async with self.session_factory() as db:
+                await db.execute(insert(RequestLog), batch)
+                await db.commit()
+            self.written += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            print(f"Failed to write {len(batch)} request logs: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self.rows),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed
+        }
+
+request_log_buffer = RequestLogBuffer()
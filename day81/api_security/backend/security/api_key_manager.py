@@ -6,6 +6,7 @@ from typing import Optional, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from models.api_key import APIKey
+from security.key_cache import verified_key_cache
 from app.config import get_settings
 
 settings = get_settings()
@@ -145,6 +146,7 @@ class APIKeyManager:
         api_key.revoked_at = datetime.utcnow()
         
         await db.commit()
+        verified_key_cache.invalidate(key_id)
         return True
     
     @staticmethod
@@ -1,35 +1,66 @@
+import bisect
 import ipaddress
-from typing import List
+from typing import Dict, List, Tuple
 
-class IPWhitelist:
-    
-    @staticmethod
-    def is_ip_whitelisted(client_ip: str, whitelist: List[str]) -> bool:
-        """
-        Check if client IP is in whitelist (supports CIDR notation)
-        """
-        if not whitelist:
-            # Empty whitelist means all IPs allowed
+class CompiledWhitelist:
+    """
+    CIDR whitelist merged into sorted, non-overlapping address intervals per
+    IP version, so a lookup is one binary search instead of parsing every CIDR
+    """
+
+    def __init__(self, whitelist: List[str]):
+        self.allow_all = not whitelist
+        ranges: Dict[int, List[Tuple[int, int]]] = {4: [], 6: []}
+        for cidr in whitelist or []:
+            try:
+                network = ipaddress.ip_network(cidr, strict=False)
+            except ValueError:
+                # Invalid CIDR notation, skip
+                continue
+            ranges[network.version].append(
+                (int(network.network_address), int(network.broadcast_address))
+            )
+
+        self.intervals: Dict[int, Tuple[List[int], List[int]]] = {}
+        for version, spans in ranges.items():
+            starts: List[int] = []
+            ends: List[int] = []
+            for start, end in sorted(spans):
+                if ends and start <= ends[-1] + 1:
+                    ends[-1] = max(ends[-1], end)
+                else:
+                    starts.append(start)
+                    ends.append(end)
+            self.intervals[version] = (starts, ends)
+
+    def contains(self, client_ip: str) -> bool:
+        if self.allow_all:
             return True
-        
         try:
             client_addr = ipaddress.ip_address(client_ip)
-            
-            for cidr in whitelist:
-                try:
-                    network = ipaddress.ip_network(cidr, strict=False)
-                    if client_addr in network:
-                        return True
-                except ValueError:
-                    # Invalid CIDR notation, skip
-                    continue
-            
-            return False
-            
         except ValueError:
             # Invalid IP address
             return False
-    
+        starts, ends = self.intervals[client_addr.version]
+        value = int(client_addr)
+        i = bisect.bisect_right(starts, value) - 1
+        return i >= 0 and value <= ends[i]
+
+class IPWhitelist:
+
+    @staticmethod
+    def compile(whitelist: List[str]) -> CompiledWhitelist:
+        """Precompile a whitelist for repeated lookups"""
+        return CompiledWhitelist(whitelist)
+
+    @staticmethod
+    def is_ip_whitelisted(client_ip: str, whitelist: List[str]) -> bool:
+        """
+        Check if client IP is in whitelist (supports CIDR notation)
+        Empty whitelist means all IPs allowed
+        """
+        return CompiledWhitelist(whitelist).contains(client_ip)
+
     @staticmethod
     def validate_cidr(cidr: str) -> bool:
         """Validate CIDR notation"""
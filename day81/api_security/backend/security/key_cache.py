@@ -0,0 +1,102 @@
+import hashlib
+import hmac
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+from security.ip_whitelist import IPWhitelist, CompiledWhitelist
+from app.config import get_settings
+
+settings = get_settings()
+
+class VerifiedKey(NamedTuple):
+    """Request-time view of an APIKey that passed validation"""
+    key_id: str
+    name: str
+    permissions: List[str]
+    rate_limit: int
+    rate_window: int
+    ip_whitelist: List[str]
+    networks: CompiledWhitelist
+    expires_at: Optional[datetime]
+
+    @classmethod
+    def from_model(cls, key_obj) -> "VerifiedKey":
+        return cls(
+            key_id=key_obj.key_id,
+            name=key_obj.name,
+            permissions=list(key_obj.permissions or []),
+            rate_limit=key_obj.rate_limit,
+            rate_window=key_obj.rate_window,
+            ip_whitelist=list(key_obj.ip_whitelist or []),
+            networks=IPWhitelist.compile(key_obj.ip_whitelist or []),
+            expires_at=key_obj.expires_at
+        )
+
+class VerifiedKeyCache:
+    """
+    Keys that recently passed the DB lookup and bcrypt check, indexed by an
+    HMAC of the presented key so plaintext secrets are never held. Entries
+    live for ttl seconds; revoking a key drops its entries in this process,
+    other processes stop accepting it within ttl.
+    """
+
+    def __init__(self, ttl: int = None, max_entries: int = None, secret: str = None):
+        self.ttl = ttl if ttl is not None else settings.api_key_cache_ttl
+        self.max_entries = max_entries or settings.api_key_cache_max_entries
+        self._secret = (secret or settings.secret_key).encode()
+        self.entries: "OrderedDict[str, Tuple[float, VerifiedKey]]" = OrderedDict()
+        self.by_key_id: Dict[str, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def digest(self, api_key: str) -> str:
+        return hmac.new(self._secret, api_key.encode(), hashlib.sha256).hexdigest()
+
+    def get(self, api_key: str) -> Optional[VerifiedKey]:
+        digest = self.digest(api_key)
+        entry = self.entries.get(digest)
+        if entry is not None:
+            cached_until, key = entry
+            if time.monotonic() < cached_until and not (key.expires_at and key.expires_at < datetime.utcnow()):
+                self.entries.move_to_end(digest)
+                self.hits += 1
+                return key
+            self._drop(digest)
+        self.misses += 1
+        return None
+
+    def put(self, api_key: str, key_obj) -> VerifiedKey:
+        key = VerifiedKey.from_model(key_obj)
+        digest = self.digest(api_key)
+        self.entries[digest] = (time.monotonic() + self.ttl, key)
+        self.entries.move_to_end(digest)
+        self.by_key_id.setdefault(key.key_id, set()).add(digest)
+        while len(self.entries) > self.max_entries:
+            self._drop(next(iter(self.entries)))
+        return key
+
+    def invalidate(self, key_id: str):
+        """Revocation hook: forget every cached verification of key_id"""
+        for digest in self.by_key_id.pop(key_id, set()):
+            self.entries.pop(digest, None)
+
+    def _drop(self, digest: str):
+        entry = self.entries.pop(digest, None)
+        if entry is not None:
+            digests = self.by_key_id.get(entry[1].key_id)
+            if digests is not None:
+                digests.discard(digest)
+                if not digests:
+                    del self.by_key_id[entry[1].key_id]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+verified_key_cache = VerifiedKeyCache()
@@ -1,12 +1,68 @@
+import hashlib
+import math
 import time
-import uuid
-from typing import Tuple
+from typing import Dict, Tuple
+from redis.exceptions import NoScriptError
 from app.config import get_settings
 
 settings = get_settings()
 
+# Sliding-window counter: the current and previous fixed-window counts live in
+# one hash per key, and the previous count is weighted by how much of it still
+# overlaps the sliding window. Checking and consuming happen in one atomic call.
+SLIDING_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local index = math.floor(now / window)
+
+local state = redis.call('HMGET', KEYS[1], 'window', 'current', 'previous')
+local current = tonumber(state[2]) or 0
+local previous = tonumber(state[3]) or 0
+local stored = tonumber(state[1])
+if stored ~= index then
+    if stored == index - 1 then
+        previous = current
+    else
+        previous = 0
+    end
+    current = 0
+end
+
+local weight = (window - (now - index * window)) / window
+local allowed = 0
+if previous * weight + current < limit then
+    current = current + 1
+    allowed = 1
+end
+
+redis.call('HSET', KEYS[1], 'window', index, 'current', current, 'previous', previous)
+redis.call('EXPIRE', KEYS[1], window * 2)
+return {allowed, current, previous}
+"""
+SLIDING_WINDOW_SHA = hashlib.sha1(SLIDING_WINDOW_SCRIPT.encode()).hexdigest()
+
+# Keys remembered by the local pre-check before expired blocks are pruned
+LOCAL_BLOCK_MAX_ENTRIES = 10000
+
+def _sliding_estimate(now: float, window: int, current: int, previous: int) -> Tuple[float, float]:
+    """Weighted request count for the sliding window, and seconds into the current fixed window"""
+    elapsed = now - math.floor(now / window) * window
+    return previous * (window - elapsed) / window + current, elapsed
+
+def _seconds_until_allowed(limit: int, window: int, elapsed: float, current: int, previous: int) -> float:
+    if current < limit:
+        # The previous window's share decays below the remaining headroom this window
+        return window - (limit - current) * window / previous - elapsed
+    # Once this window rolls over, its count becomes the decaying previous share
+    return (window - elapsed) + window * (1 - limit / current)
+
 class RateLimiter:
-    
+    # bucket key -> (local clock deadline, denial info); while a key is blocked
+    # the sliding estimate can only be higher than when Redis denied it, so
+    # these requests are shed without a round trip
+    _blocked: Dict[str, Tuple[float, dict]] = {}
+
     @staticmethod
     async def check_rate_limit(
         redis_client,
@@ -15,68 +71,79 @@ class RateLimiter:
         window: int = None
     ) -> Tuple[bool, dict]:
         """
-        Token bucket rate limiting algorithm
+        Sliding window counter rate limiting, one atomic Redis call per request
         Returns: (allowed, info_dict)
         """
         limit = limit or settings.rate_limit_requests
         window = window or settings.rate_limit_window
-        
+
         bucket_key = f"rate_limit:{api_key_id}"
         now = time.time()
-        window_start = now - window
-        
-        # Remove old tokens outside the time window
-        await redis_client.zremrangebyscore(bucket_key, 0, window_start)
-        
-        # Count current tokens
-        current_count = await redis_client.zcard(bucket_key)
-        
-        if current_count < limit:
-            # Add new token
-            token_id = str(uuid.uuid4())
-            await redis_client.zadd(bucket_key, {token_id: now})
-            await redis_client.expire(bucket_key, window + 10)  # Add buffer
-            
-            remaining = limit - current_count - 1
-            
+
+        blocked = RateLimiter._blocked.get(bucket_key)
+        if blocked:
+            blocked_until, info = blocked
+            if now < blocked_until:
+                retry_after = int(blocked_until - now) + 1
+                return False, {**info, "reset_at": int(now) + retry_after, "retry_after": retry_after}
+            del RateLimiter._blocked[bucket_key]
+
+        args = (limit, window, repr(now))
+        try:
+            allowed, current, previous = await redis_client.evalsha(SLIDING_WINDOW_SHA, 1, bucket_key, *args)
+        except NoScriptError:
+            allowed, current, previous = await redis_client.eval(SLIDING_WINDOW_SCRIPT, 1, bucket_key, *args)
+
+        estimated, elapsed = _sliding_estimate(now, window, int(current), int(previous))
+
+        if allowed:
             return True, {
                 "allowed": True,
                 "limit": limit,
-                "remaining": remaining,
+                "remaining": max(0, math.ceil(limit - estimated)),
                 "reset_at": int(now + window)
             }
-        else:
-            # Rate limit exceeded
-            # Get oldest token to calculate reset time
-            oldest_tokens = await redis_client.zrange(bucket_key, 0, 0, withscores=True)
-            if oldest_tokens:
-                oldest_time = oldest_tokens[0][1]
-                reset_at = int(oldest_time + window)
-            else:
-                reset_at = int(now + window)
-            
-            return False, {
-                "allowed": False,
-                "limit": limit,
-                "remaining": 0,
-                "reset_at": reset_at,
-                "retry_after": reset_at - int(now)
-            }
-    
+
+        # Rate limit exceeded
+        wait = _seconds_until_allowed(limit, window, elapsed, int(current), int(previous))
+        retry_after = int(wait) + 1
+        info = {
+            "allowed": False,
+            "limit": limit,
+            "remaining": 0,
+            "reset_at": int(now) + retry_after,
+            "retry_after": retry_after
+        }
+        RateLimiter._remember_block(bucket_key, now + wait, info)
+        return False, info
+
+    @staticmethod
+    def _remember_block(bucket_key: str, blocked_until: float, info: dict):
+        blocked = RateLimiter._blocked
+        if len(blocked) >= LOCAL_BLOCK_MAX_ENTRIES:
+            now = time.time()
+            for key in [key for key, (until, _) in blocked.items() if until <= now]:
+                del blocked[key]
+            if len(blocked) >= LOCAL_BLOCK_MAX_ENTRIES:
+                blocked.clear()
+        blocked[bucket_key] = (blocked_until, info)
+
     @staticmethod
     async def get_rate_limit_info(redis_client, api_key_id: str, limit: int, window: int) -> dict:
         """Get current rate limit status without consuming a token"""
         bucket_key = f"rate_limit:{api_key_id}"
         now = time.time()
-        window_start = now - window
-        
-        # Clean old tokens
-        await redis_client.zremrangebyscore(bucket_key, 0, window_start)
-        
-        # Count current tokens
-        current_count = await redis_client.zcard(bucket_key)
-        remaining = max(0, limit - current_count)
-        
+
+        stored, current, previous = await redis_client.hmget(bucket_key, "window", "current", "previous")
+        current, previous = int(current or 0), int(previous or 0)
+        index = math.floor(now / window)
+        if stored is None or int(stored) != index:
+            previous = current if stored is not None and int(stored) == index - 1 else 0
+            current = 0
+
+        estimated, _ = _sliding_estimate(now, window, current, previous)
+        remaining = max(0, math.ceil(limit - estimated))
+
         return {
             "limit": limit,
             "remaining": remaining,
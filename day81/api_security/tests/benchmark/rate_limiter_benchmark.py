@@ -0,0 +1,94 @@
+"""
+Rate limiter overhead benchmark against a live Redis.
+
+Compares the previous sorted-set limiter (up to five sequential commands and
+one member per request) with the sliding-window Lua script, for traffic that
+stays under the limit and for a client hammering a key that is over it.
+
+    cd backend
+    python ../tests/benchmark/rate_limiter_benchmark.py --requests 5000 --concurrency 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'backend')))
+
+import redis.asyncio as redis
+from app.config import get_settings
+from security.rate_limiter import RateLimiter
+
+async def sorted_set_check(redis_client, api_key_id: str, limit: int, window: int) -> bool:
+    """The limiter this benchmark measures against, as it was before the Lua script"""
+    bucket_key = f"rate_limit_zset:{api_key_id}"
+    now = time.time()
+    await redis_client.zremrangebyscore(bucket_key, 0, now - window)
+    current_count = await redis_client.zcard(bucket_key)
+    if current_count < limit:
+        await redis_client.zadd(bucket_key, {str(uuid.uuid4()): now})
+        await redis_client.expire(bucket_key, window + 10)
+        return True
+    await redis_client.zrange(bucket_key, 0, 0, withscores=True)
+    return False
+
+async def lua_check(redis_client, api_key_id: str, limit: int, window: int) -> bool:
+    allowed, _ = await RateLimiter.check_rate_limit(redis_client, api_key_id, limit, window)
+    return allowed
+
+async def run(check, redis_client, keys, requests: int, concurrency: int, limit: int, window: int):
+    latencies = []
+    denied = 0
+    queue = iter(range(requests))
+
+    async def worker():
+        nonlocal denied
+        for i in queue:
+            started = time.perf_counter()
+            if not await check(redis_client, keys[i % len(keys)], limit, window):
+                denied += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies),
+        "p99": latencies[int(len(latencies) * 0.99) - 1],
+        "max": latencies[-1],
+        "denied": denied
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", default=get_settings().redis_url)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--keys", type=int, default=100)
+    args = parser.parse_args()
+
+    redis_client = redis.from_url(args.redis_url, decode_responses=True)
+    run_id = uuid.uuid4().hex[:8]
+    scenarios = [
+        # Many clients well within their quota
+        ("under limit", [f"bench:{run_id}:{n}" for n in range(args.keys)], args.requests, 60),
+        # One client far past its quota
+        ("over limit", [f"bench:{run_id}:hot"], 100, 60),
+    ]
+
+    print(f"{'scenario':<12} {'limiter':<12} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'denied':>7}")
+    for name, keys, limit, window in scenarios:
+        for label, check in (("sorted set", sorted_set_check), ("lua", lua_check)):
+            result = await run(check, redis_client, keys, args.requests, args.concurrency, limit, window)
+            print(f"{name:<12} {label:<12} {result['p50']:>8.3f} {result['p99']:>8.3f} "
+                  f"{result['max']:>8.3f} {result['denied']:>7}")
+
+    for pattern in (f"rate_limit:bench:{run_id}:*", f"rate_limit_zset:bench:{run_id}:*"):
+        async for key in redis_client.scan_iter(pattern):
+            await redis_client.delete(key)
+    await redis_client.aclose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -31,3 +31,14 @@ def test_validate_cidr():
     assert IPWhitelist.validate_cidr("10.0.0.0/8") is True
     assert IPWhitelist.validate_cidr("invalid-cidr") is False
     assert IPWhitelist.validate_cidr("192.168.1.500/24") is False
+
+def test_compiled_whitelist_merges_overlapping_cidrs():
+    compiled = IPWhitelist.compile(["10.0.0.0/8", "10.1.0.0/16", "11.0.0.0/8", "2001:db8::/32", "bad"])
+    
+    starts, ends = compiled.intervals[4]
+    assert len(starts) == 1  # 10/8 absorbs 10.1/16 and is adjacent to 11/8
+    assert compiled.contains("11.255.255.255") is True
+    assert compiled.contains("12.0.0.0") is False
+    assert compiled.contains("2001:db8::1") is True
+    assert compiled.contains("2001:db9::1") is False
+    assert compiled.contains("not-an-ip") is False
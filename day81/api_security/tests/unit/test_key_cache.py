@@ -0,0 +1,63 @@
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'backend')))
+
+from security.key_cache import VerifiedKeyCache
+from middleware.request_log_buffer import RequestLogBuffer
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+def make_key(key_id="abcd1234abcd1234", expires_at=None):
+    return SimpleNamespace(
+        key_id=key_id, name="test", permissions=[], rate_limit=100, rate_window=60,
+        ip_whitelist=["192.168.1.0/24"], expires_at=expires_at
+    )
+
+def test_cache_hit_after_put():
+    cache = VerifiedKeyCache(ttl=60, max_entries=10, secret="test-secret")
+    
+    assert cache.get("sk_live_abcd1234abcd1234_secret") is None
+    cache.put("sk_live_abcd1234abcd1234_secret", make_key())
+    
+    key = cache.get("sk_live_abcd1234abcd1234_secret")
+    assert key.key_id == "abcd1234abcd1234"
+    assert key.networks.contains("192.168.1.7") is True
+    assert cache.get("sk_live_abcd1234abcd1234_wrong") is None
+    assert "secret" not in "".join(cache.entries)  # Only HMAC digests are stored
+
+def test_cache_revocation_and_expiry():
+    cache = VerifiedKeyCache(ttl=60, max_entries=10, secret="test-secret")
+    cache.put("sk_live_abcd1234abcd1234_secret", make_key())
+    cache.put("sk_live_ffff0000ffff0000_other", make_key("ffff0000ffff0000", datetime.utcnow() - timedelta(seconds=1)))
+    
+    cache.invalidate("abcd1234abcd1234")
+    
+    assert cache.get("sk_live_abcd1234abcd1234_secret") is None
+    assert cache.get("sk_live_ffff0000ffff0000_other") is None  # Key itself expired
+    assert cache.entries == {}
+
+def test_cache_ttl_zero_never_hits():
+    cache = VerifiedKeyCache(ttl=0, max_entries=10, secret="test-secret")
+    cache.put("sk_live_abcd1234abcd1234_secret", make_key())
+    
+    assert cache.get("sk_live_abcd1234abcd1234_secret") is None
+
+@pytest.mark.asyncio
+async def test_log_buffer_writes_in_batches():
+    db = MagicMock()
+    db.execute = AsyncMock()
+    db.commit = AsyncMock()
+    session = MagicMock()
+    session.__aenter__ = AsyncMock(return_value=db)
+    session.__aexit__ = AsyncMock(return_value=False)
+    
+    buffer = RequestLogBuffer(session_factory=lambda: session, batch_size=2, flush_interval=60, max_buffer=4)
+    for n in range(5):
+        buffer.add({"api_key_id": "k", "status_code": 200 + n})
+    await buffer.stop()
+    
+    assert db.execute.await_count == 2  # 4 buffered rows in batches of 2
+    assert buffer.stats() == {"buffered": 0, "written": 4, "dropped": 1, "failed": 0}
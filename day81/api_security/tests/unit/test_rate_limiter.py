@@ -5,16 +5,13 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'backend')))
 
 from security.rate_limiter import RateLimiter
-from unittest.mock import AsyncMock, MagicMock
-import time
+from redis.exceptions import NoScriptError
+from unittest.mock import AsyncMock
 
 @pytest.mark.asyncio
 async def test_rate_limit_allows_within_quota():
     redis_mock = AsyncMock()
-    redis_mock.zremrangebyscore = AsyncMock()
-    redis_mock.zcard = AsyncMock(return_value=50)  # 50 existing tokens
-    redis_mock.zadd = AsyncMock()
-    redis_mock.expire = AsyncMock()
+    redis_mock.evalsha = AsyncMock(return_value=[1, 51, 0])  # 50 earlier requests plus this one
     
     allowed, info = await RateLimiter.check_rate_limit(
         redis_mock, "test_key", limit=100, window=60
@@ -25,19 +22,44 @@ async def test_rate_limit_allows_within_quota():
     assert info["limit"] == 100
     assert info["remaining"] == 49  # 100 - 50 - 1
     assert "reset_at" in info
+    redis_mock.evalsha.assert_awaited_once()
 
 @pytest.mark.asyncio
 async def test_rate_limit_blocks_over_quota():
     redis_mock = AsyncMock()
-    redis_mock.zremrangebyscore = AsyncMock()
-    redis_mock.zcard = AsyncMock(return_value=100)  # At limit
-    redis_mock.zrange = AsyncMock(return_value=[(b"token1", time.time() - 30)])
+    redis_mock.evalsha = AsyncMock(return_value=[0, 100, 0])  # At limit
     
     allowed, info = await RateLimiter.check_rate_limit(
-        redis_mock, "test_key", limit=100, window=60
+        redis_mock, "blocked_key", limit=100, window=60
     )
     
     assert allowed is False
     assert info["allowed"] is False
     assert info["remaining"] == 0
     assert "retry_after" in info
+
+@pytest.mark.asyncio
+async def test_rate_limit_sheds_blocked_key_locally():
+    redis_mock = AsyncMock()
+    redis_mock.evalsha = AsyncMock(return_value=[0, 100, 0])
+    
+    await RateLimiter.check_rate_limit(redis_mock, "shed_key", limit=100, window=60)
+    allowed, info = await RateLimiter.check_rate_limit(redis_mock, "shed_key", limit=100, window=60)
+    
+    assert allowed is False
+    assert 0 < info["retry_after"] <= 60
+    assert redis_mock.evalsha.await_count == 1  # Second request never reached Redis
+
+@pytest.mark.asyncio
+async def test_rate_limit_loads_script_when_missing():
+    redis_mock = AsyncMock()
+    redis_mock.evalsha = AsyncMock(side_effect=NoScriptError("NOSCRIPT"))
+    redis_mock.eval = AsyncMock(return_value=[1, 1, 0])
+    
+    allowed, info = await RateLimiter.check_rate_limit(
+        redis_mock, "fresh_key", limit=10, window=60
+    )
+    
+    assert allowed is True
+    assert info["remaining"] == 9
+    redis_mock.eval.assert_awaited_once()
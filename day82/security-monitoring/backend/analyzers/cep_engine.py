@@ -0,0 +1,193 @@
+"""Streaming complex event processing over per-(user, rule) sliding windows"""
+import os
+import time
+from collections import deque
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+# Each rule window is split into this many buckets; counts are exact to
+# within one bucket width (window / BUCKETS_PER_WINDOW)
+BUCKETS_PER_WINDOW = 60
+
+# Idle windows are swept after this many observed events
+SWEEP_INTERVAL = 10000
+
+Predicate = Callable[[Dict], bool]
+
+def _failed_login(event: Dict) -> bool:
+    return event.get('event_type') == 'authentication' and event.get('action') == 'login' \
+        and not event.get('success', True)
+
+def _bulk_read(event: Dict) -> bool:
+    action = event.get('action') or ''
+    return action == 'bulk_read' or 'bulk' in action.lower()
+
+def _role_change(event: Dict) -> bool:
+    action = event.get('action') or ''
+    return action == 'role_change' or 'role' in action.lower()
+
+# Patterns with dedicated matchers; anything else is a substring of event_type or action
+PATTERN_MATCHERS: Dict[str, Predicate] = {
+    'failed_login': _failed_login,
+    'bulk_read': _bulk_read,
+    'role_change': _role_change,
+}
+
+def compile_pattern(pattern: str) -> Predicate:
+    """Turn a rule pattern into an event predicate"""
+    matcher = PATTERN_MATCHERS.get(pattern)
+    if matcher:
+        return matcher
+
+    def matches(event: Dict) -> bool:
+        return pattern in (event.get('event_type') or '') or pattern in (event.get('action') or '')
+    return matches
+
+class CompiledRule(NamedTuple):
+    name: str
+    predicate: Predicate
+    window: int
+    threshold: int = 0
+    severity: int = 0
+
+    @classmethod
+    def from_rule(cls, rule: Dict) -> "CompiledRule":
+        predicate = rule.get('predicate') or compile_pattern(rule['pattern'])
+        return cls(rule['name'], predicate, rule['window'], rule.get('threshold', 0), rule.get('severity', 0))
+
+    @property
+    def bucket_width(self) -> float:
+        return self.window / BUCKETS_PER_WINDOW
+
+class _Window:
+    """Bucketed counts for one (user, rule), oldest bucket first"""
+    __slots__ = ('buckets', 'total', 'idle_at')
+
+    def __init__(self):
+        self.buckets = deque()
+        self.total = 0
+        self.idle_at = 0.0  # when the newest bucket leaves the window
+
+    def expire(self, oldest: int):
+        while self.buckets and self.buckets[0][0] < oldest:
+            self.total -= self.buckets.popleft()[1]
+
+    def add(self, bucket: int):
+        if self.buckets and self.buckets[-1][0] >= bucket:
+            # Same bucket (or a late event, counted in the newest bucket)
+            self.buckets[-1][1] += 1
+        else:
+            self.buckets.append([bucket, 1])
+        self.total += 1
+
+class MemoryWindowStore:
+    """Window counters in process memory; for a single analyzer worker"""
+
+    def __init__(self):
+        self.windows: Dict[Tuple[str, str], _Window] = {}
+        self.observed = 0
+
+    async def increment(self, user_id: str, rules: List[CompiledRule], now: float) -> List[int]:
+        counts = []
+        for rule in rules:
+            key = (user_id, rule.name)
+            window = self.windows.get(key)
+            if window is None:
+                window = self.windows[key] = _Window()
+            bucket = int(now // rule.bucket_width)
+            window.expire(bucket - BUCKETS_PER_WINDOW + 1)
+            window.add(bucket)
+            window.idle_at = (bucket + 1) * rule.bucket_width + rule.window
+            counts.append(window.total)
+
+        self.observed += 1
+        if self.observed % SWEEP_INTERVAL == 0:
+            self.sweep(now)
+        return counts
+
+    async def count(self, user_id: str, rule: CompiledRule, now: float) -> int:
+        window = self.windows.get((user_id, rule.name))
+        if window is None:
+            return 0
+        window.expire(int(now // rule.bucket_width) - BUCKETS_PER_WINDOW + 1)
+        return window.total
+
+    def sweep(self, now: float):
+        """Drop windows with no events left in them"""
+        idle = [key for key, window in self.windows.items() if window.idle_at <= now]
+        for key in idle:
+            del self.windows[key]
+
+    def stats(self) -> Dict:
+        return {'backend': 'memory', 'windows': len(self.windows), 'observed': self.observed}
+
+class RedisWindowStore:
+    """Window counters in Redis hashes so several analyzer workers share state.
+
+    Each (rule, user) is a hash of bucket -> count; one pipeline per event
+    increments the current bucket, drops buckets that left the window and
+    reads back the live ones.
+    """
+
+    def __init__(self, redis_client, prefix: str = 'cep'):
+        self.redis = redis_client
+        self.prefix = prefix
+        self.observed = 0
+
+    def _key(self, user_id: str, rule: CompiledRule) -> str:
+        return f"{self.prefix}:{rule.name}:{user_id}"
+
+    async def increment(self, user_id: str, rules: List[CompiledRule], now: float) -> List[int]:
+        pipe = self.redis.pipeline(transaction=False)
+        for rule in rules:
+            key = self._key(user_id, rule)
+            bucket = int(now // rule.bucket_width)
+            pipe.hincrby(key, bucket, 1)
+            pipe.hdel(key, *range(bucket - 2 * BUCKETS_PER_WINDOW, bucket - BUCKETS_PER_WINDOW + 1))
+            pipe.expire(key, int(rule.window + rule.bucket_width) + 1)
+            pipe.hmget(key, list(range(bucket - BUCKETS_PER_WINDOW + 1, bucket + 1)))
+        results = await pipe.execute()
+        self.observed += 1
+        return [sum(int(v) for v in results[i * 4 + 3] if v) for i in range(len(rules))]
+
+    async def count(self, user_id: str, rule: CompiledRule, now: float) -> int:
+        bucket = int(now // rule.bucket_width)
+        values = await self.redis.hmget(self._key(user_id, rule), list(range(bucket - BUCKETS_PER_WINDOW + 1, bucket + 1)))
+        return sum(int(v) for v in values if v)
+
+    def stats(self) -> Dict:
+        return {'backend': 'redis', 'observed': self.observed}
+
+class CEPEngine:
+    """Evaluate compiled rules against a stream of events.
+
+    Rule patterns are compiled into predicates once; each event increments the
+    windows of the rules it matches for its user and gets the resulting window
+    counts back, so detection cost does not depend on how many events are stored.
+    """
+
+    def __init__(self, rules: List[Dict], store=None):
+        self.rules = [CompiledRule.from_rule(rule) for rule in rules]
+        self.rules_by_name = {rule.name: rule for rule in self.rules}
+        self.store = store or MemoryWindowStore()
+
+    async def observe(self, event: Dict, now: Optional[float] = None) -> Dict[str, int]:
+        """Record the event and return window counts for every rule it matched"""
+        user_id = event.get('user_id') or 'anonymous'
+        matched = [rule for rule in self.rules if rule.predicate(event)]
+        if not matched:
+            return {}
+        counts = await self.store.increment(user_id, matched, time.time() if now is None else now)
+        return {rule.name: count for rule, count in zip(matched, counts)}
+
+    async def count(self, user_id: str, rule_name: str, now: Optional[float] = None) -> int:
+        """Current window count without recording an event"""
+        return await self.store.count(user_id, self.rules_by_name[rule_name], time.time() if now is None else now)
+
+    def stats(self) -> Dict:
+        return {'rules': len(self.rules), **self.store.stats()}
+
+def create_window_store(redis_client):
+    """Window state backend from CEP_STATE_BACKEND ('memory' or 'redis')"""
+    if os.getenv('CEP_STATE_BACKEND', 'memory') == 'redis':
+        return RedisWindowStore(redis_client)
+    return MemoryWindowStore()
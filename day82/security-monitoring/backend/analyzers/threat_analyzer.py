@@ -6,8 +6,13 @@ from typing import Dict, List, Optional
 import math
 from collections import defaultdict
 
-from models.database import get_db, fetchrow_query, fetch_query, execute_query, is_sqlite
+from models.database import get_db, execute_query, is_sqlite
 from utils.baseline_engine import BaselineEngine
+from analyzers.cep_engine import CEPEngine, MemoryWindowStore, create_window_store
+from utils.streams import StreamConsumer, consumer_name, ANALYSIS_STREAM
+
+# Per-user event rate used by behavioral analysis; counted alongside the signatures
+ACTIVITY_RULE = {'name': 'user_activity', 'predicate': lambda event: True, 'window': 60}
 
 class ThreatAnalyzer:
     """Multi-layer threat detection and analysis"""
@@ -16,7 +21,13 @@ class ThreatAnalyzer:
         self.redis = redis_client
         self.baseline_engine = BaselineEngine(redis_client)
         self.detection_rules = self._load_detection_rules()
+        self.cep = CEPEngine(self.detection_rules + [ACTIVITY_RULE], create_window_store(redis_client))
         self.threat_scores = defaultdict(float)
+        # Workers in the same group split the stream between them
+        self.consumer = StreamConsumer(redis_client, ANALYSIS_STREAM, 'analyzers', consumer_name('analyzer'),
+                                       count=500, block_ms=1000)
+        self.analyzed_count = 0
+        self.persistence_task: Optional[asyncio.Task] = None
         
     def _load_detection_rules(self) -> List[Dict]:
         """Load threat detection signatures"""
@@ -55,27 +66,78 @@ class ThreatAnalyzer:
         """Start continuous threat analysis"""
         print("Threat Analyzer started")
         
-        # Subscribe to security events
-        pubsub = self.redis.pubsub()
-        await pubsub.subscribe('security:events:analysis')
+        # Consume stored events from the analysis stream in batches
+        await self.consumer.start()
+        await self._check_shared_state()
+        self.persistence_task = asyncio.create_task(self.baseline_engine.run_persistence())
         
-        while True:
-            try:
-                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
-                
-                if message and message['type'] == 'message':
-                    event = json.loads(message['data'])
-                    await self.analyze_event(event)
+        try:
+            while True:
+                try:
+                    messages = await self.consumer.read()
                     
-            except Exception as e:
-                print(f"Analysis error: {e}")
-                await asyncio.sleep(1)
+                    for message_id, data in messages:
+                        event = self._decode_event(data)
+                        if event:
+                            await self.analyze_event(event)
+                            self.analyzed_count += 1
+                    
+                    await self.consumer.ack([message_id for message_id, _ in messages])
+                        
+                except Exception as e:
+                    print(f"Analysis error: {e}")
+                    self.consumer.rewind()
+                    await asyncio.sleep(1)
+        finally:
+            # Cancelling the persistence loop writes the baselines still dirty
+            self.persistence_task.cancel()
+            await asyncio.gather(self.persistence_task, return_exceptions=True)
+    
+    async def _check_shared_state(self):
+        """Refuse to join a group with other live analyzers while CEP windows are per process.
+        
+        The group splits a user's events across workers, so per-process windows
+        would each see only part of them and under-count every threshold.
+        """
+        if not isinstance(self.cep.store, MemoryWindowStore):
+            return
+        others = await self.consumer.active_consumers()
+        if others:
+            print("Threat Analyzer not started: other analyzers are running with CEP_STATE_BACKEND=memory")
+            raise RuntimeError(
+                f"Analyzers {', '.join(others)} share the 'analyzers' group; "
+                "set CEP_STATE_BACKEND=redis to run more than one analyzer"
+            )
+    
+    @staticmethod
+    def _decode_event(data: Optional[Dict]) -> Optional[Dict]:
+        """Event carried by a stream entry; None for trimmed or malformed entries"""
+        if not data:
+            return None
+        raw = data.get(b'event') or data.get('event')
+        try:
+            return json.loads(raw) if raw else None
+        except (json.JSONDecodeError, ValueError):
+            print(f"Skipping malformed analysis event: {raw[:100]!r}")
+            return None
+    
+    async def stats(self) -> Dict:
+        """Analysis counters, CEP state and consumer group lag"""
+        return {
+            'analyzed': self.analyzed_count,
+            'cep': self.cep.stats(),
+            'baselines': self.baseline_engine.store.stats(),
+            'consumer': await self.consumer.stats()
+        }
     
     async def analyze_event(self, event: Dict):
         """Analyze security event for threats"""
         try:
             anomalies = []
             
+            # Update the sliding windows of every rule this event matches
+            window_counts = await self.cep.observe(event)
+            
             # Statistical baseline analysis
             baseline_score = await self.baseline_engine.check_baseline(event)
             if baseline_score > 40:
@@ -86,11 +148,11 @@ class ThreatAnalyzer:
                 })
             
             # Signature-based detection
-            signature_matches = await self.check_signatures(event)
+            signature_matches = await self.check_signatures(event, window_counts)
             anomalies.extend(signature_matches)
             
             # Behavioral analysis
-            behavior_score = await self.analyze_behavior(event)
+            behavior_score = await self.analyze_behavior(event, window_counts)
             if behavior_score > 40:
                 anomalies.append({
                     'type': 'behavioral_anomaly',
@@ -110,78 +172,25 @@ class ThreatAnalyzer:
         except Exception as e:
             print(f"Event analysis error: {e}")
     
-    async def check_signatures(self, event: Dict) -> List[Dict]:
+    async def check_signatures(self, event: Dict, window_counts: Optional[Dict[str, int]] = None) -> List[Dict]:
         """Check event against threat signatures"""
-        matches = []
-        user_id = event.get('user_id', 'anonymous')
-        event_type = event.get('event_type', '')
-        action = event.get('action', '')
+        if window_counts is None:
+            window_counts = await self.cep.observe(event)
         
+        matches = []
         for rule in self.detection_rules:
-            # Check if event matches pattern (check both event_type and action)
-            pattern = rule['pattern']
-            matches_pattern = False
-            
-            # Special pattern matching for different event types
-            if pattern == 'failed_login':
-                # Match failed login attempts
-                matches_pattern = (event_type == 'authentication' and action == 'login' and not event.get('success', True))
-            elif pattern == 'bulk_read':
-                # Match bulk data access
-                matches_pattern = (action == 'bulk_read' or 'bulk' in action.lower())
-            elif pattern == 'role_change':
-                # Match privilege escalation
-                matches_pattern = (action == 'role_change' or 'role' in action.lower())
-            else:
-                # Generic pattern matching
-                matches_pattern = (pattern in event_type or pattern in action)
-            
-            if matches_pattern:
-                # Count occurrences in time window
-                count = await self.count_pattern_occurrences(
-                    user_id, 
-                    pattern, 
-                    rule['window']
-                )
-                
-                if count >= rule['threshold']:
-                    matches.append({
-                        'type': rule['name'],
-                        'score': rule['severity'],
-                        'details': f"{rule['name']}: {count} occurrences in {rule['window']}s"
-                    })
+            # Only rules whose pattern matched this event have a count
+            count = window_counts.get(rule['name'])
+            if count is not None and count >= rule['threshold']:
+                matches.append({
+                    'type': rule['name'],
+                    'score': rule['severity'],
+                    'details': f"{rule['name']}: {count} occurrences in {rule['window']}s"
+                })
         
         return matches
     
-    async def count_pattern_occurrences(self, user_id: str, pattern: str, window: int) -> int:
-        """Count pattern occurrences within time window"""
-        use_sqlite = is_sqlite()
-        
-        if use_sqlite:
-            # SQLite syntax
-            query = """
-                SELECT COUNT(*) as count
-                FROM security_events
-                WHERE user_id = ?
-                AND (event_type LIKE ? OR action LIKE ?)
-                AND datetime(timestamp) > datetime('now', '-' || ? || ' seconds')
-            """
-            pattern_like = f'%{pattern}%'
-            result = await fetchrow_query(query, user_id, pattern_like, pattern_like, window)
-        else:
-            # PostgreSQL syntax
-            query = """
-                SELECT COUNT(*) as count
-                FROM security_events
-                WHERE user_id = $1
-                AND (event_type LIKE $2 OR action LIKE $2)
-                AND timestamp > NOW() - INTERVAL '1 second' * $3
-            """
-            result = await fetchrow_query(query, user_id, f'%{pattern}%', window)
-        
-        return result.get('count', 0) if result else 0
-    
-    async def analyze_behavior(self, event: Dict) -> float:
+    async def analyze_behavior(self, event: Dict, window_counts: Optional[Dict[str, int]] = None) -> float:
         """Analyze behavioral patterns"""
         user_id = event.get('user_id')
         if not user_id:
@@ -195,8 +204,11 @@ class ThreatAnalyzer:
             score += 30
         
         # Check rapid API calls
-        recent_events = await self.get_recent_user_events(user_id, 60)
-        if len(recent_events) > 50:  # More than 50 events per minute
+        if window_counts is not None and ACTIVITY_RULE['name'] in window_counts:
+            recent_count = window_counts[ACTIVITY_RULE['name']]
+        else:
+            recent_count = await self.cep.count(user_id, ACTIVITY_RULE['name'])
+        if recent_count > 50:  # More than 50 events per minute
             score += 40
         
         # Check resource access pattern
@@ -205,31 +217,6 @@ class ThreatAnalyzer:
         
         return min(100, score)
     
-    async def get_recent_user_events(self, user_id: str, seconds: int) -> List:
-        """Get recent events for user"""
-        use_sqlite = is_sqlite()
-        
-        if use_sqlite:
-            # SQLite syntax
-            query = """
-                SELECT * FROM security_events
-                WHERE user_id = ?
-                AND datetime(timestamp) > datetime('now', '-' || ? || ' seconds')
-                ORDER BY timestamp DESC
-            """
-            events = await fetch_query(query, user_id, seconds)
-        else:
-            # PostgreSQL syntax
-            query = """
-                SELECT * FROM security_events
-                WHERE user_id = $1
-                AND timestamp > NOW() - INTERVAL '1 second' * $2
-                ORDER BY timestamp DESC
-            """
-            events = await fetch_query(query, user_id, seconds)
-        
-        return events
-    
     async def create_threat(self, event: Dict, anomalies: List[Dict], severity: float):
         """Create threat record"""
         use_sqlite = is_sqlite()
@@ -33,14 +33,19 @@ async def lifespan(app: FastAPI):
     responder = AutoResponder(redis)
     
     # Start background tasks
-    asyncio.create_task(collector.start_collection())
-    asyncio.create_task(analyzer.start_analysis())
-    asyncio.create_task(responder.start_response())
+    tasks = [
+        asyncio.create_task(collector.start_collection()),
+        asyncio.create_task(analyzer.start_analysis()),
+        asyncio.create_task(responder.start_response())
+    ]
     
     print("Security Monitoring System Started")
     yield
     
-    # Cleanup
+    # Cleanup: stop the workers (the analyzer persists its baselines) before closing Redis
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
     await redis.close()
     print("Security Monitoring System Stopped")
 
@@ -69,6 +74,14 @@ async def health_check():
         "responder": "running"
     }
 
+@app.get("/api/pipeline/stats")
+async def get_pipeline_stats():
+    """Ingestion batching, analysis throughput and consumer group lag"""
+    return {
+        "collector": await collector.stats(),
+        "analyzer": await analyzer.stats()
+    }
+
 @app.get("/api/events/recent")
 async def get_recent_events(limit: int = 100):
     """Get recent security events"""
@@ -1,46 +1,83 @@
 """Security Event Collection System"""
 import asyncio
 import json
+import os
 from datetime import datetime, timezone
-from typing import Dict, List
+from typing import Dict, List, Optional
 import random
 import hashlib
 from redis import asyncio as aioredis
 
-from models.database import get_db, execute_query, _use_sqlite
+from models.database import insert_many, is_sqlite
 from utils.geo_enrichment import enrich_with_geo
+from utils.streams import StreamConsumer, consumer_name, INGEST_STREAM, ANALYSIS_STREAM, ANALYSIS_STREAM_MAXLEN
+
+# Events are written and handed to the analyzers every N events or T ms, whichever comes first
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', '500'))
+INGEST_FLUSH_MS = int(os.getenv('INGEST_FLUSH_MS', '200'))
+# Where a new collectors group starts reading the never-trimmed ingest stream:
+# '$' skips history on first deploy, '0' replays every event still in the stream
+INGEST_GROUP_START_ID = os.getenv('INGEST_GROUP_START_ID', '$')
+
+EVENT_COLUMNS = [
+    'event_id', 'event_type', 'user_id', 'ip_address', 'user_agent',
+    'action', 'resource', 'success', 'timestamp', 'country', 'city',
+    'latitude', 'longitude', 'metadata', 'severity'
+]
 
 class EventCollector:
     """Collects and processes security events from multiple sources"""
     
-    def __init__(self, redis_client):
+    def __init__(self, redis_client, batch_size: int = INGEST_BATCH_SIZE, flush_ms: int = INGEST_FLUSH_MS):
         self.redis = redis_client
-        self.stream_name = "security:events:stream"
+        self.stream_name = INGEST_STREAM
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self.consumer = StreamConsumer(redis_client, self.stream_name, 'collectors', consumer_name('collector'),
+                                       count=batch_size, block_ms=1000, start_id=INGEST_GROUP_START_ID)
         self.processed_count = 0
+        self.batches_written = 0
         
     async def start_collection(self):
         """Start continuous event collection"""
         print("Event Collector started")
+        await self.consumer.start()
+        loop = asyncio.get_running_loop()
+        
+        batch: List[Dict] = []
+        message_ids: List = []
+        deadline = None
         
         while True:
             try:
-                # Read from Redis stream
-                streams = await self.redis.xread(
-                    {self.stream_name: '$'}, 
-                    block=1000,
-                    count=100
-                )
+                # Wait no longer than the open batch's flush deadline
+                block_ms = self.consumer.block_ms if deadline is None else max(1, int((deadline - loop.time()) * 1000))
+                messages = await self.consumer.read(count=self.batch_size - len(message_ids), block_ms=block_ms)
+                
+                for message_id, data in messages:
+                    message_ids.append(message_id)
+                    event = await self.prepare_event(data) if data else None
+                    if event:
+                        batch.append(event)
+                
+                if message_ids and deadline is None:
+                    deadline = loop.time() + self.flush_interval
                 
-                for stream_name, messages in streams:
-                    for message_id, data in messages:
-                        await self.process_event(data)
+                if message_ids and (len(message_ids) >= self.batch_size or loop.time() >= deadline):
+                    await self.flush(batch)
+                    # Acknowledge only once stored and handed on; unacked events are redelivered
+                    await self.consumer.ack(message_ids)
+                    batch, message_ids, deadline = [], [], None
                         
             except Exception as e:
                 print(f"Collection error: {e}")
+                # The unacked batch is still pending for this consumer; read it again
+                batch, message_ids, deadline = [], [], None
+                self.consumer.rewind()
                 await asyncio.sleep(1)
     
-    async def process_event(self, raw_event: Dict):
-        """Process and enrich security event"""
+    async def prepare_event(self, raw_event: Dict) -> Optional[Dict]:
+        """Normalize and enrich a raw stream entry"""
         try:
             # Helper to safely get and decode values
             def get_value(key, default=''):
@@ -48,6 +85,8 @@ class EventCollector:
                 if val is None:
                     # Try bytes key
                     val = raw_event.get(key if isinstance(key, bytes) else key.encode(), None)
+                if val is None:
+                    val = raw_event.get(key, None)
                 if val is None:
                     return default
                 if isinstance(val, bytes):
@@ -87,59 +126,73 @@ class EventCollector:
             }
             
             # Enrich with geolocation
-            event = await enrich_with_geo(event)
-            
-            # Store in database
-            await self.store_event(event)
-            
-            # Publish for analysis
-            await self.redis.publish('security:events:analysis', json.dumps(event))
-            
-            self.processed_count += 1
+            return await enrich_with_geo(event)
             
         except Exception as e:
             print(f"Event processing error: {e}")
+            return None
+    
+    async def process_event(self, raw_event: Dict):
+        """Process, store and publish a single event"""
+        event = await self.prepare_event(raw_event)
+        if event:
+            await self.flush([event])
+    
+    async def flush(self, events: List[Dict]):
+        """Store a batch with one insert and publish it for analysis in one round trip"""
+        if not events:
+            return
+        inserted = set(await self.store_events(events))
+        # Redelivered events already stored were published then too; the analyzer must not count them twice
+        events = [event for event in events if event['event_id'] in inserted]
+        
+        if events:
+            pipe = self.redis.pipeline(transaction=False)
+            for event in events:
+                pipe.xadd(ANALYSIS_STREAM, {'event': json.dumps(event)}, maxlen=ANALYSIS_STREAM_MAXLEN, approximate=True)
+            await pipe.execute()
+        
+        self.processed_count += len(events)
+        self.batches_written += 1
     
     async def store_event(self, event: Dict):
         """Store event in database"""
-        if _use_sqlite:
-            # SQLite uses ? placeholders
-            query = """
-                INSERT INTO security_events (
-                    event_id, event_type, user_id, ip_address, user_agent,
-                    action, resource, success, timestamp, country, city,
-                    latitude, longitude, metadata, severity
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """
-        else:
-            # PostgreSQL uses $1, $2, etc.
-            query = """
-                INSERT INTO security_events (
-                    event_id, event_type, user_id, ip_address, user_agent,
-                    action, resource, success, timestamp, country, city,
-                    latitude, longitude, metadata, severity
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15)
-            """
-        
-        # Use execute_query helper that handles both SQLite and PostgreSQL
-        await execute_query(
-            query,
-            event['event_id'],
-            event['event_type'],
-            event.get('user_id'),
-            event['ip_address'],
-            event.get('user_agent'),
-            event['action'],
-            event.get('resource'),
-            1 if event['success'] else 0 if _use_sqlite else event['success'],  # SQLite uses integer for boolean
-            event['timestamp'],
-            event.get('country'),
-            event.get('city'),
-            event.get('latitude'),
-            event.get('longitude'),
-            json.dumps(event.get('metadata', {})),
-            0  # Initial severity, will be updated by analyzer
-        )
+        await self.store_events([event])
+    
+    async def store_events(self, events: List[Dict]) -> List[str]:
+        """Store events in database with a multi-row insert; redelivered events are
+        skipped. Returns the ids of the events inserted."""
+        use_sqlite = is_sqlite()
+        rows = [
+            (
+                event['event_id'],
+                event['event_type'],
+                event.get('user_id'),
+                event['ip_address'],
+                event.get('user_agent'),
+                event['action'],
+                event.get('resource'),
+                (1 if event['success'] else 0) if use_sqlite else event['success'],  # SQLite uses integer for boolean
+                event['timestamp'] if use_sqlite else datetime.fromisoformat(event['timestamp']),
+                event.get('country'),
+                event.get('city'),
+                event.get('latitude'),
+                event.get('longitude'),
+                json.dumps(event.get('metadata', {})),
+                0  # Initial severity, will be updated by analyzer
+            )
+            for event in events
+        ]
+        return await insert_many('security_events', EVENT_COLUMNS, rows, conflict_column='event_id')
+    
+    async def stats(self) -> Dict:
+        """Ingestion counters and consumer group lag"""
+        return {
+            'processed': self.processed_count,
+            'batches_written': self.batches_written,
+            'avg_batch_size': round(self.processed_count / self.batches_written, 1) if self.batches_written else 0,
+            'consumer': await self.consumer.stats()
+        }
     
     async def ingest_event(self, event: Dict) -> str:
         """Ingest a new security event"""
@@ -281,3 +281,49 @@ async def fetchrow_query(query: str, *args):
         async with db.acquire() as conn:
             row = await conn.fetchrow(query, *args)
             return dict(row) if row else None
+
+# PostgreSQL accepts at most this many bind parameters per statement
+PG_MAX_PARAMS = 32767
+
+async def insert_many(table: str, columns: list, rows: list, conflict_column: Optional[str] = None) -> list:
+    """Insert rows in as few statements as possible (multi-row VALUES on
+    PostgreSQL, one transaction on SQLite); rows that clash on conflict_column
+    are skipped. Returns the conflict_column values of the rows inserted."""
+    if not rows:
+        return []
+    db = await get_db()
+    column_list = ", ".join(columns)
+    if _use_sqlite:
+        placeholders = ", ".join("?" for _ in columns)
+        if not conflict_column:
+            await db.executemany(f"INSERT INTO {table} ({column_list}) VALUES ({placeholders})", rows)
+            await db.commit()
+            return []
+        # Row by row so each statement's rowcount shows whether it was ignored
+        position = columns.index(conflict_column)
+        inserted = []
+        for row in rows:
+            cursor = await db.execute(f"INSERT OR IGNORE INTO {table} ({column_list}) VALUES ({placeholders})", row)
+            if cursor.rowcount:
+                inserted.append(row[position])
+        await db.commit()
+        return inserted
+
+    suffix = f" ON CONFLICT ({conflict_column}) DO NOTHING RETURNING {conflict_column}" if conflict_column else ""
+    chunk_size = PG_MAX_PARAMS // len(columns)
+    inserted = []
+    async with db.acquire() as conn:
+        async with conn.transaction():
+            for start in range(0, len(rows), chunk_size):
+                chunk = rows[start:start + chunk_size]
+                values = ", ".join(
+                    "(" + ", ".join(f"${i * len(columns) + j + 1}" for j in range(len(columns))) + ")"
+                    for i in range(len(chunk))
+                )
+                params = [value for row in chunk for value in row]
+                statement = f"INSERT INTO {table} ({column_list}) VALUES {values}{suffix}"
+                if conflict_column:
+                    inserted.extend(record[0] for record in await conn.fetch(statement, *params))
+                else:
+                    await conn.execute(statement, *params)
+    return inserted
@@ -1,214 +1,381 @@
 """Behavioral baseline learning engine"""
-from datetime import datetime, timedelta, timezone
-from typing import Dict
-import json
-import math
+import asyncio
+import os
+import struct
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
 
-from models.database import get_db, fetchrow_query, fetch_query, execute_query, is_sqlite
+from redis.exceptions import WatchError
+
+# Users whose baselines are kept in memory; least recently seen are evicted
+BASELINE_CACHE_USERS = int(os.getenv('BASELINE_CACHE_USERS', '50000'))
+# Seconds between writes of changed baselines to Redis
+BASELINE_PERSIST_INTERVAL = int(os.getenv('BASELINE_PERSIST_INTERVAL', '60'))
+# Baselines of users not seen for this long are dropped from Redis
+BASELINE_TTL = 30 * 86400
+# Users merged per WATCH transaction, and attempts before a contended chunk waits for the next persist
+BASELINE_PERSIST_CHUNK = 200
+BASELINE_PERSIST_RETRIES = 5
+
+# Events a user needs before deviations are scored
+MIN_BASELINE_EVENTS = 50
+# Weight of the latest completed active hour in the hourly volume average
+VOLUME_EWMA_ALPHA = 0.1
+# Distinct (country, city) pairs remembered per user
+MAX_LOCATIONS = 50
+
+# version, event count, current hour index, events in current hour, hourly EWMA, 24 hour-of-day counts
+_HEADER = struct.Struct('<BIIId24I')
+_BLOB_VERSION = 2
+# Version 1 decayed the hourly average through idle hours; its histograms are still valid
+_COMPATIBLE_BLOB_VERSIONS = (1, _BLOB_VERSION)
+
+class BaselineDelta:
+    """Events one worker added to a user's baseline since it last persisted it"""
+    __slots__ = ('hours', 'locations', 'countries', 'hour_counts')
+
+    def __init__(self):
+        self.hours: List[int] = [0] * 24
+        self.locations: Set[Tuple[str, str]] = set()
+        self.countries: Set[str] = set()
+        # Events per absolute hour index, so the hourly average can be replayed
+        self.hour_counts: Dict[int, int] = {}
+
+    def update(self, hour: int, hour_index: int, country: Optional[str], city: Optional[str]):
+        self.hours[hour] += 1
+        if country:
+            self.countries.add(country)
+            if city and len(self.locations) < MAX_LOCATIONS:
+                self.locations.add((country, city))
+        self.hour_counts[hour_index] = self.hour_counts.get(hour_index, 0) + 1
+
+    def add(self, other: "BaselineDelta"):
+        self.hours = [a + b for a, b in zip(self.hours, other.hours)]
+        self.countries |= other.countries
+        self.locations |= other.locations
+        for hour_index, count in other.hour_counts.items():
+            self.hour_counts[hour_index] = self.hour_counts.get(hour_index, 0) + count
+
+class UserBaseline:
+    """Incrementally maintained histograms for one user"""
+    __slots__ = ('hours', 'locations', 'countries', 'events', 'hour_index', 'hour_count',
+                 'hourly_ewma', 'unsaved', '_typical_hours', '_typical_at')
+    _STATE = ('hours', 'locations', 'countries', 'events', 'hour_index', 'hour_count', 'hourly_ewma')
+
+    def __init__(self):
+        self.hours: List[int] = [0] * 24
+        self.locations: Set[Tuple[str, str]] = set()
+        self.countries: Set[str] = set()
+        self.events = 0
+        self.hour_index = 0
+        self.hour_count = 0
+        self.hourly_ewma = 0.0
+        # What this worker added since the last persist
+        self.unsaved: Optional[BaselineDelta] = None
+        self._typical_hours: Optional[Set[int]] = None
+        self._typical_at = 0
+
+    def update(self, event_time: datetime, country: Optional[str], city: Optional[str]):
+        hour_index = int(event_time.timestamp() // 3600)
+        self.events += 1
+        self.hours[event_time.hour] += 1
+        self._add_location(country, city)
+        self._count_hour(hour_index, 1)
+
+        if self.unsaved is None:
+            self.unsaved = BaselineDelta()
+        self.unsaved.update(event_time.hour, hour_index, country, city)
+
+    def apply(self, delta: BaselineDelta):
+        """Add events recorded elsewhere, e.g. by another worker"""
+        self.events += sum(delta.hours)
+        self.hours = [a + b for a, b in zip(self.hours, delta.hours)]
+        self.countries |= delta.countries
+        for country, city in delta.locations:
+            self._add_location(country, city)
+        for hour_index in sorted(delta.hour_counts):
+            self._count_hour(hour_index, delta.hour_counts[hour_index])
+        self._typical_hours = None
+
+    def rebase(self, stored: "UserBaseline"):
+        """Take the merged state from Redis, keeping events recorded since it was read"""
+        for name in self._STATE:
+            setattr(self, name, getattr(stored, name))
+        self._typical_hours = None
+        if self.unsaved is not None:
+            self.apply(self.unsaved)
+
+    def _add_location(self, country: Optional[str], city: Optional[str]):
+        if country:
+            self.countries.add(country)
+            if city and len(self.locations) < MAX_LOCATIONS:
+                self.locations.add((country, city))
+
+    def _count_hour(self, hour_index: int, count: int):
+        if hour_index > self.hour_index:
+            if self.hour_index:
+                # Fold the finished hour in. Idle hours are skipped, so the average is the
+                # volume of an active hour and a night off does not drag it down
+                if self.hourly_ewma:
+                    self.hourly_ewma = VOLUME_EWMA_ALPHA * self.hour_count + (1 - VOLUME_EWMA_ALPHA) * self.hourly_ewma
+                else:
+                    self.hourly_ewma = float(self.hour_count)
+            self.hour_index = hour_index
+            self.hour_count = 0
+        if hour_index == self.hour_index:
+            self.hour_count += count
+        # Late events for an hour already folded in only count towards the histograms
+
+    def typical_hours(self) -> Set[int]:
+        """Busiest hours that together account for 80% of activity"""
+        if self._typical_hours is None or self.events - self._typical_at >= MIN_BASELINE_EVENTS:
+            threshold = self.events * 0.8
+            cumulative = 0
+            typical = set()
+            for hour in sorted(range(24), key=lambda h: self.hours[h], reverse=True):
+                if cumulative >= threshold or not self.hours[hour]:
+                    break
+                typical.add(hour)
+                cumulative += self.hours[hour]
+            self._typical_hours, self._typical_at = typical, self.events
+        return self._typical_hours
+
+    def to_blob(self) -> bytes:
+        header = _HEADER.pack(_BLOB_VERSION, self.events, self.hour_index, self.hour_count,
+                              self.hourly_ewma, *self.hours)
+        locations = '\n'.join(f"{country}\t{city}" for country, city in sorted(self.locations))
+        countries = '\n'.join(sorted(self.countries - {country for country, _ in self.locations}))
+        return header + f"{locations}\x00{countries}".encode()
+
+    @classmethod
+    def from_blob(cls, blob: bytes) -> "UserBaseline":
+        baseline = cls()
+        version, baseline.events, baseline.hour_index, baseline.hour_count, baseline.hourly_ewma, *hours = \
+            _HEADER.unpack_from(blob)
+        if version not in _COMPATIBLE_BLOB_VERSIONS:
+            return cls()
+        if version != _BLOB_VERSION:
+            # Relearn the hourly average from the next completed hour
+            baseline.hourly_ewma = 0.0
+        baseline.hours = list(hours)
+        locations, _, countries = blob[_HEADER.size:].decode().partition('\x00')
+        for line in filter(None, locations.split('\n')):
+            country, _, city = line.partition('\t')
+            baseline.locations.add((country, city))
+            baseline.countries.add(country)
+        baseline.countries.update(filter(None, countries.split('\n')))
+        return baseline
+
+class BaselineStore:
+    """LRU of per-user baselines, loaded lazily from and persisted to Redis blobs.
+
+    Workers in the analyzers group see different events of the same user, so
+    each one merges only what it added since its last persist into the stored
+    blob, under WATCH, instead of overwriting it.
+    """
+
+    def __init__(self, redis_client, max_users: int = BASELINE_CACHE_USERS):
+        self.redis = redis_client
+        self.max_users = max_users
+        self.baselines: "OrderedDict[str, UserBaseline]" = OrderedDict()
+        self.dirty: Dict[str, UserBaseline] = {}
+        self.loads = 0
+        self.persisted = 0
+
+    @staticmethod
+    def _key(user_id: str) -> str:
+        return f"baseline:{user_id}"
+
+    async def get(self, user_id: str) -> UserBaseline:
+        baseline = self.baselines.get(user_id)
+        if baseline is not None:
+            self.baselines.move_to_end(user_id)
+            return baseline
+
+        # Evicted but not yet written back
+        baseline = self.dirty.get(user_id)
+        if baseline is None:
+            blob = await self.redis.get(self._key(user_id)) if self.redis is not None else None
+            baseline = UserBaseline.from_blob(blob) if blob else UserBaseline()
+            self.loads += 1
+        self.baselines[user_id] = baseline
+        while len(self.baselines) > self.max_users:
+            # Dirty entries stay in self.dirty until the next persist
+            self.baselines.popitem(last=False)
+        return baseline
+
+    def mark_dirty(self, user_id: str, baseline: UserBaseline):
+        self.dirty[user_id] = baseline
+
+    async def persist(self):
+        """Merge every changed baseline into Redis, a chunk of users per transaction"""
+        if not self.dirty or self.redis is None:
+            return
+        dirty, self.dirty = self.dirty, {}
+        # Events recorded while this runs start a new delta
+        deltas: Dict[str, BaselineDelta] = {}
+        for user_id, baseline in dirty.items():
+            if baseline.unsaved is not None:
+                deltas[user_id], baseline.unsaved = baseline.unsaved, None
+
+        user_ids = list(deltas)
+        try:
+            for start in range(0, len(user_ids), BASELINE_PERSIST_CHUNK):
+                chunk = user_ids[start:start + BASELINE_PERSIST_CHUNK]
+                await self._merge(chunk, deltas, dirty)
+                for user_id in chunk:
+                    del deltas[user_id]
+        except Exception:
+            # Keep what was not written for the next attempt
+            for user_id, delta in deltas.items():
+                baseline = dirty[user_id]
+                if baseline.unsaved is not None:
+                    delta.add(baseline.unsaved)
+                baseline.unsaved = delta
+                self.dirty[user_id] = baseline
+            raise
+
+    async def _merge(self, user_ids: List[str], deltas: Dict[str, BaselineDelta],
+                     baselines: Dict[str, UserBaseline]):
+        keys = [self._key(user_id) for user_id in user_ids]
+        for _ in range(BASELINE_PERSIST_RETRIES):
+            async with self.redis.pipeline(transaction=True) as pipe:
+                try:
+                    await pipe.watch(*keys)
+                    merged = []
+                    for user_id, blob in zip(user_ids, await pipe.mget(keys)):
+                        stored = UserBaseline.from_blob(blob) if blob else UserBaseline()
+                        stored.apply(deltas[user_id])
+                        merged.append(stored)
+                    pipe.multi()
+                    for key, stored in zip(keys, merged):
+                        pipe.set(key, stored.to_blob(), ex=BASELINE_TTL)
+                    await pipe.execute()
+                except WatchError:
+                    # Another worker wrote one of these users first; merge again
+                    continue
+            for user_id, stored in zip(user_ids, merged):
+                baselines[user_id].rebase(stored)
+            self.persisted += len(user_ids)
+            return
+        raise WatchError(f"Baselines of {len(user_ids)} users kept changing during persist")
+
+    def stats(self) -> Dict:
+        return {
+            'cached_users': len(self.baselines),
+            'dirty': len(self.dirty),
+            'loads': self.loads,
+            'persisted': self.persisted
+        }
 
 class BaselineEngine:
     """Statistical baseline analysis for anomaly detection"""
-    
+
     def __init__(self, redis_client):
         self.redis = redis_client
-        
+        self.store = BaselineStore(redis_client)
+
     async def check_baseline(self, event: Dict) -> float:
-        """Check event against user baseline and return anomaly score"""
+        """Check event against user baseline, then learn from it; returns anomaly score"""
         user_id = event.get('user_id')
         if not user_id:
             return 0
-        
+
+        baseline = await self.store.get(user_id)
+        event_time = datetime.fromisoformat(event['timestamp'])
+
         score = 0
-        
-        # Check time-based baseline
-        time_score = await self.check_time_baseline(user_id, event)
-        score += time_score
-        
-        # Check geographic baseline
-        geo_score = await self.check_geo_baseline(user_id, event)
-        score += geo_score
-        
-        # Check volume baseline
-        volume_score = await self.check_volume_baseline(user_id, event)
-        score += volume_score
-        
+        if baseline.events >= MIN_BASELINE_EVENTS:
+            score += self.check_time_baseline(baseline, event_time)
+            score += self.check_geo_baseline(baseline, event)
+            score += self.check_volume_baseline(baseline, event_time)
+
+        baseline.update(event_time, event.get('country'), event.get('city'))
+        self.store.mark_dirty(user_id, baseline)
+
         return min(100, score)
-    
-    async def check_time_baseline(self, user_id: str, event: Dict) -> float:
+
+    def check_time_baseline(self, baseline: UserBaseline, event_time: datetime) -> float:
         """Check if access time is unusual for user"""
-        # Get user's typical access hours from baseline
-        baseline = await self.get_baseline(user_id, 'access_hours')
-        
-        if not baseline:
-            return 0
-        
-        event_time = datetime.fromisoformat(event['timestamp'])
+        typical_hours = baseline.typical_hours()
         event_hour = event_time.hour
-        
-        # Check if hour is in typical range
-        typical_hours = baseline.get('typical_hours', [])
-        
-        if not typical_hours:
+
+        if not typical_hours or event_hour in typical_hours:
             return 0
-        
-        if event_hour not in typical_hours:
-            # Calculate deviation
-            min_hour = min(typical_hours)
-            max_hour = max(typical_hours)
-            
-            if event_hour < min_hour:
-                deviation = min_hour - event_hour
-            else:
-                deviation = event_hour - max_hour
-            
-            # Score based on deviation (max 40 points)
-            return min(40, deviation * 5)
-        
-        return 0
-    
-    async def check_geo_baseline(self, user_id: str, event: Dict) -> float:
+
+        # Calculate deviation
+        min_hour = min(typical_hours)
+        max_hour = max(typical_hours)
+
+        if event_hour < min_hour:
+            deviation = min_hour - event_hour
+        else:
+            deviation = event_hour - max_hour
+
+        # Score based on deviation (max 40 points)
+        return min(40, deviation * 5)
+
+    def check_geo_baseline(self, baseline: UserBaseline, event: Dict) -> float:
         """Check if geographic location is unusual"""
-        baseline = await self.get_baseline(user_id, 'geo_location')
-        
-        if not baseline:
-            return 0
-        
         event_country = event.get('country')
-        event_city = event.get('city')
-        
-        typical_locations = baseline.get('typical_locations', [])
-        
-        # Check if location matches baseline
-        for location in typical_locations:
-            if location['country'] == event_country and location['city'] == event_city:
-                return 0
-        
+
+        if not event_country or not baseline.countries:
+            return 0
+
+        if (event_country, event.get('city')) in baseline.locations:
+            return 0
+
         # New country is more suspicious
-        if event_country not in [loc['country'] for loc in typical_locations]:
+        if event_country not in baseline.countries:
             return 50
-        
+
         # Same country, different city is less suspicious
         return 25
-    
-    async def check_volume_baseline(self, user_id: str, event: Dict) -> float:
+
+    def check_volume_baseline(self, baseline: UserBaseline, event_time: datetime) -> float:
         """Check if activity volume is unusual"""
-        # For now, return 0 to avoid database complexity
-        # This can be enhanced later when we have sufficient baseline data
-        return 0
-        
-        # Get baseline average
-        baseline = await self.get_baseline(user_id, 'activity_volume')
-        
-        if not baseline:
+        avg_hourly = baseline.hourly_ewma
+        if avg_hourly < 1:
             return 0
-        
-        avg_hourly = baseline.get('avg_hourly_events', 10)
-        
+
+        # Events so far in this hour, including this one
+        same_hour = int(event_time.timestamp() // 3600) == baseline.hour_index
+        recent_count = (baseline.hour_count if same_hour else 0) + 1
+
         # Score based on deviation from average
         if recent_count > avg_hourly * 3:
             return 45
         elif recent_count > avg_hourly * 2:
             return 30
-        
+
         return 0
-    
+
     async def get_baseline(self, user_id: str, baseline_type: str) -> Dict:
-        """Retrieve user baseline from database"""
-        # For now, return empty dict - baseline creation needs more work
-        # This allows signature-based detection to work
-        return {}
-    
-    async def create_baseline(self, user_id: str, baseline_type: str) -> Dict:
-        """Create initial baseline for user"""
-        db = await get_db()
-        
+        """Current baseline summary for a user"""
+        baseline = await self.store.get(user_id)
+
         if baseline_type == 'access_hours':
-            # Analyze typical access hours
-            query = """
-                SELECT EXTRACT(HOUR FROM timestamp) as hour, COUNT(*) as count
-                FROM security_events
-                WHERE user_id = $1
-                AND timestamp > NOW() - INTERVAL '30 days'
-                GROUP BY hour
-                ORDER BY count DESC
-            """
-            
-            results = await db.fetch(query, user_id)
-            
-            if results:
-                # Top hours representing 80% of activity
-                total = sum(r['count'] for r in results)
-                threshold = total * 0.8
-                cumulative = 0
-                typical_hours = []
-                
-                for row in results:
-                    typical_hours.append(int(row['hour']))
-                    cumulative += row['count']
-                    if cumulative >= threshold:
-                        break
-                
-                baseline_data = {'typical_hours': typical_hours}
-            else:
-                baseline_data = {'typical_hours': list(range(9, 18))}  # Default business hours
-        
-        elif baseline_type == 'geo_location':
-            # Analyze typical locations
-            query = """
-                SELECT country, city, COUNT(*) as count
-                FROM security_events
-                WHERE user_id = $1
-                AND timestamp > NOW() - INTERVAL '30 days'
-                GROUP BY country, city
-                ORDER BY count DESC
-                LIMIT 5
-            """
-            
-            results = await db.fetch(query, user_id)
-            
-            typical_locations = [
-                {'country': r['country'], 'city': r['city']}
-                for r in results if r['country'] and r['city']
-            ]
-            
-            baseline_data = {'typical_locations': typical_locations or [{'country': 'US', 'city': 'Unknown'}]}
-        
-        elif baseline_type == 'activity_volume':
-            # Calculate average activity
-            query = """
-                SELECT 
-                    DATE_TRUNC('hour', timestamp) as hour_bucket,
-                    COUNT(*) as count
-                FROM security_events
-                WHERE user_id = $1
-                AND timestamp > NOW() - INTERVAL '30 days'
-                GROUP BY hour_bucket
-            """
-            
-            results = await db.fetch(query, user_id)
-            
-            if results:
-                avg_hourly = sum(r['count'] for r in results) / len(results)
-            else:
-                avg_hourly = 10
-            
-            baseline_data = {'avg_hourly_events': avg_hourly}
-        
-        else:
-            baseline_data = {}
-        
-        # Store baseline
-        insert_query = """
-            INSERT INTO user_baselines (user_id, baseline_type, baseline_data, valid_until)
-            VALUES ($1, $2, $3, $4)
-        """
-        
-        await db.execute(
-            insert_query,
-            user_id,
-            baseline_type,
-            baseline_data,
-            datetime.now(timezone.utc) + timedelta(days=30)
-        )
-        
-        return baseline_data
+            return {'typical_hours': sorted(baseline.typical_hours())}
+        if baseline_type == 'geo_location':
+            return {'typical_locations': [
+                {'country': country, 'city': city} for country, city in sorted(baseline.locations)
+            ]}
+        if baseline_type == 'activity_volume':
+            return {'avg_hourly_events': baseline.hourly_ewma}
+        return {}
+
+    async def run_persistence(self, interval: int = BASELINE_PERSIST_INTERVAL):
+        """Periodically write changed baselines to Redis, and once more when cancelled"""
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await self.store.persist()
+                except Exception as e:
+                    print(f"Baseline persistence error: {e}")
+        finally:
+            try:
+                await self.store.persist()
+            except Exception as e:
+                print(f"Final baseline persistence error: {e}")
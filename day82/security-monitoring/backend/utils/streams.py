@@ -0,0 +1,118 @@
+"""Redis Streams consumer group helpers"""
+import os
+import socket
+from typing import Dict, List, Tuple
+
+from redis.exceptions import ResponseError
+
+# Raw events as submitted, consumed by the collectors group
+INGEST_STREAM = 'security:events:stream'
+# Normalized, stored events, consumed by the analyzers group
+ANALYSIS_STREAM = 'security:events:analysis'
+ANALYSIS_STREAM_MAXLEN = int(os.getenv('ANALYSIS_STREAM_MAXLEN', '100000'))
+
+def consumer_name(role: str) -> str:
+    """Unique consumer name for this process within a group"""
+    return f"{role}-{socket.gethostname()}-{os.getpid()}"
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+class StreamConsumer:
+    """Batched reader for one consumer in a consumer group.
+
+    Messages delivered to this consumer but never acknowledged (for example
+    because the process died mid-batch) are re-read first, then new ones.
+    """
+
+    def __init__(self, redis_client, stream: str, group: str, consumer: str,
+                 count: int = 500, block_ms: int = 1000, start_id: str = '0'):
+        self.redis = redis_client
+        self.stream = stream
+        self.group = group
+        self.consumer = consumer
+        self.count = count
+        self.block_ms = block_ms
+        # Where the group starts if this consumer creates it ('0' = whole stream, '$' = new entries)
+        self.start_id = start_id
+        self.reading_pending = True
+        self.pending_cursor = '0'
+        self.delivered = 0
+        self.acked = 0
+
+    async def start(self, claim_idle_ms: int = 60000):
+        """Create the group if needed and take over messages left unacknowledged
+        by consumers that have been idle for claim_idle_ms (e.g. a dead worker)"""
+        try:
+            await self.redis.xgroup_create(self.stream, self.group, id=self.start_id, mkstream=True)
+        except ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+        start_id = '0-0'
+        while True:
+            next_id, claimed = (await self.redis.xautoclaim(
+                self.stream, self.group, self.consumer, claim_idle_ms, start_id, count=self.count
+            ))[:2]
+            if not claimed or _text(next_id) == '0-0':
+                break
+            start_id = next_id
+        self.rewind()
+
+    def rewind(self):
+        """Re-read this consumer's unacknowledged messages before new ones, e.g.
+        after a batch failed; they would otherwise stay pending until a restart"""
+        self.reading_pending = True
+        self.pending_cursor = '0'
+
+    async def active_consumers(self, idle_ms: int = 60000) -> List[str]:
+        """Consumers in the group, other than this one, seen within idle_ms"""
+        try:
+            consumers = await self.redis.xinfo_consumers(self.stream, self.group)
+        except ResponseError:
+            return []
+        return [
+            _text(info['name']) for info in consumers
+            if _text(info['name']) != self.consumer and info['idle'] < idle_ms
+        ]
+
+    async def read(self, count: int = None, block_ms: int = None) -> List[Tuple[bytes, Dict]]:
+        """Next batch of (message id, fields)"""
+        # Pending messages are walked with a cursor, since they stay pending until acked
+        start_id = self.pending_cursor if self.reading_pending else '>'
+        response = await self.redis.xreadgroup(
+            self.group, self.consumer, {self.stream: start_id},
+            count=count or self.count,
+            block=None if self.reading_pending else (self.block_ms if block_ms is None else block_ms)
+        )
+        messages = [message for _, stream_messages in response or [] for message in stream_messages]
+        if self.reading_pending:
+            if messages:
+                self.pending_cursor = messages[-1][0]
+            else:
+                self.reading_pending = False
+        self.delivered += len(messages)
+        return messages
+
+    async def ack(self, message_ids: List):
+        if message_ids:
+            await self.redis.xack(self.stream, self.group, *message_ids)
+            self.acked += len(message_ids)
+
+    async def stats(self) -> Dict:
+        """Delivery counters plus the group's lag and pending count from XINFO"""
+        group_info = {}
+        for info in await self.redis.xinfo_groups(self.stream):
+            info = {_text(key): value for key, value in info.items()}
+            if _text(info.get('name')) == self.group:
+                group_info = info
+                break
+        return {
+            'stream': self.stream,
+            'group': self.group,
+            'consumer': self.consumer,
+            'delivered': self.delivered,
+            'acked': self.acked,
+            'pending': group_info.get('pending', 0),
+            'lag': group_info.get('lag')
+        }
@@ -0,0 +1,194 @@
+"""Unit tests for incremental user baselines"""
+import asyncio
+import pytest
+import sys
+import os
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'backend')))
+
+import fakeredis
+from utils.baseline_engine import BaselineEngine, BaselineStore, UserBaseline, MIN_BASELINE_EVENTS
+
+START = datetime(2024, 6, 3, 9, 0, tzinfo=timezone.utc)
+
+def office_event(n: int) -> dict:
+    # Two events per hour during 09:00-16:59, from one office
+    day, slot = divmod(n, 16)
+    timestamp = START + timedelta(days=day, hours=slot // 2, minutes=(slot % 2) * 30)
+    return {'user_id': 'alice', 'timestamp': timestamp.isoformat(), 'country': 'US', 'city': 'New York'}
+
+@pytest.mark.asyncio
+async def test_scores_deviations_after_warmup():
+    engine = BaselineEngine(None)
+    
+    first = await engine.check_baseline({**office_event(0), 'country': 'JP', 'city': 'Tokyo'})
+    assert first == 0  # Nothing is scored while the baseline is learning
+    
+    for n in range(1, MIN_BASELINE_EVENTS + 30):
+        await engine.check_baseline(office_event(n))
+    assert await engine.check_baseline(office_event(98)) == 0  # 10:00, a typical hour
+    
+    night = office_event(100)
+    night['timestamp'] = (datetime.fromisoformat(night['timestamp']).replace(hour=2)).isoformat()
+    assert await engine.check_baseline(night) == 35  # 7 hours before the earliest typical hour
+    
+    assert await engine.check_baseline({**office_event(101), 'country': 'DE', 'city': 'Berlin'}) == 50
+    assert await engine.check_baseline({**office_event(102), 'city': 'Boston'}) == 25
+    assert await engine.check_baseline({**office_event(103), 'country': 'JP', 'city': 'Tokyo'}) == 0
+
+@pytest.mark.asyncio
+async def test_regular_workday_volume_is_not_anomalous():
+    engine = BaselineEngine(None)
+    
+    def workday_event(day: int, hour: int, minute: int) -> dict:
+        timestamp = START.replace(hour=hour, minute=minute) + timedelta(days=day)
+        return {'user_id': 'bob', 'timestamp': timestamp.isoformat(), 'country': 'US', 'city': 'New York'}
+    
+    # 60 events an hour, 09:00-16:59, for two weeks: nights off must not lower the average
+    scores = [
+        await engine.check_baseline(workday_event(day, hour, minute))
+        for day in range(14) for hour in range(9, 17) for minute in range(60)
+    ]
+    assert max(scores) <= 40
+    baseline = await engine.store.get('bob')
+    assert baseline.hourly_ewma == pytest.approx(60)
+    
+    # A burst of 4x the usual hourly volume is flagged
+    burst = [await engine.check_baseline(workday_event(14, 10, minute % 60)) for minute in range(240)]
+    assert max(burst) == 45
+    assert burst[:120] == [0] * 120
+
+def test_late_events_do_not_inflate_the_current_hour():
+    baseline = UserBaseline()
+    baseline.update(START + timedelta(hours=2), 'US', None)
+    baseline.update(START, 'US', None)  # Arrives after a later hour was counted
+    
+    assert baseline.hour_count == 1
+    assert baseline.events == 2 and baseline.hours[START.hour] == 1
+    
+    # Another worker's events for the folded hour only reach the histograms
+    other = UserBaseline()
+    other.update(START, 'US', None)
+    baseline.apply(other.unsaved)
+    assert baseline.hour_count == 1 and baseline.events == 3
+
+def test_blob_round_trip():
+    baseline = UserBaseline()
+    for n in range(40):
+        event = office_event(n)
+        baseline.update(datetime.fromisoformat(event['timestamp']), event['country'], event['city'])
+    baseline.update(START, 'UK', None)
+    
+    restored = UserBaseline.from_blob(baseline.to_blob())
+    
+    assert restored.hours == baseline.hours
+    assert restored.locations == {('US', 'New York')}
+    assert restored.countries == {'US', 'UK'}
+    assert restored.hourly_ewma == baseline.hourly_ewma
+    assert len(baseline.to_blob()) < 200
+
+@pytest.mark.asyncio
+async def test_store_evicts_least_recent_users():
+    store = BaselineStore(None, max_users=2)
+    alice = await store.get('alice')
+    store.mark_dirty('alice', alice)
+    await store.get('bob')
+    await store.get('carol')
+    
+    assert list(store.baselines) == ['bob', 'carol']
+    assert await store.get('alice') is alice  # Unpersisted changes survive eviction
+
+async def stored(redis, user_id: str) -> UserBaseline:
+    return UserBaseline.from_blob(await redis.get(f"baseline:{user_id}"))
+
+@pytest.mark.asyncio
+async def test_workers_merge_instead_of_overwriting():
+    redis = fakeredis.FakeAsyncRedis()
+    first, second = BaselineEngine(redis), BaselineEngine(redis)
+    
+    # The group hands alternate events of the same user to each worker
+    for n in range(40):
+        await (first if n % 2 else second).check_baseline(office_event(n))
+    await second.check_baseline({**office_event(40), 'country': 'UK', 'city': 'London'})
+    await first.store.persist()
+    await second.store.persist()
+    await first.store.persist()  # Nothing new; must not write its old view back
+    
+    baseline = await stored(redis, 'alice')
+    assert baseline.events == 41
+    assert baseline.locations == {('US', 'New York'), ('UK', 'London')}
+    # The first worker picked up the second's events when it merged
+    assert (await first.store.get('alice')).events == 20
+    await first.check_baseline(office_event(41))
+    await first.store.persist()
+    assert (await first.store.get('alice')).events == 42
+    assert (await stored(redis, 'alice')).events == 42
+
+@pytest.mark.asyncio
+async def test_persist_retries_when_another_worker_writes_first():
+    redis = fakeredis.FakeAsyncRedis()
+    engine, other = BaselineEngine(redis), BaselineEngine(redis)
+    await engine.check_baseline(office_event(0))
+    await other.check_baseline(office_event(1))
+    
+    make_pipeline = redis.pipeline
+    reads = []
+    
+    def pipeline(*args, **kwargs):
+        pipe = make_pipeline(*args, **kwargs)
+        mget = pipe.mget
+        
+        async def read_then_race(keys):
+            blobs = await mget(keys)
+            reads.append(blobs)
+            if len(reads) == 1:
+                await other.store.persist()  # Lands between our read and our write
+            return blobs
+        
+        pipe.mget = read_then_race
+        return pipe
+    
+    redis.pipeline = pipeline
+    await engine.store.persist()
+    
+    # Our first read, the other worker's, then our retry that sees its write
+    assert len(reads) == 3 and reads[0] == [None] and reads[2] != [None]
+    assert (await stored(redis, 'alice')).events == 2
+    assert engine.store.persisted == 1 and engine.store.dirty == {}
+
+@pytest.mark.asyncio
+async def test_failed_persist_keeps_unsaved_events():
+    redis = fakeredis.FakeAsyncRedis()
+    engine = BaselineEngine(redis)
+    await engine.check_baseline(office_event(0))
+    
+    class Down(Exception):
+        pass
+    
+    def pipeline(*args, **kwargs):
+        raise Down()
+    
+    working = redis.pipeline
+    redis.pipeline = pipeline
+    with pytest.raises(Down):
+        await engine.store.persist()
+    await engine.check_baseline(office_event(1))
+    
+    redis.pipeline = working
+    await engine.store.persist()
+    assert (await stored(redis, 'alice')).events == 2
+    assert (await engine.store.get('alice')).events == 2
+
+@pytest.mark.asyncio
+async def test_cancelled_persistence_writes_dirty_baselines():
+    redis = fakeredis.FakeAsyncRedis()
+    engine = BaselineEngine(redis)
+    task = asyncio.create_task(engine.run_persistence(interval=3600))
+    await engine.check_baseline(office_event(0))
+    await asyncio.sleep(0)
+    
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    
+    assert (await stored(redis, 'alice')).events == 1
@@ -0,0 +1,75 @@
+"""Unit tests for the CEP engine"""
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'backend')))
+
+import fakeredis
+from analyzers.cep_engine import CEPEngine, MemoryWindowStore, RedisWindowStore, compile_pattern
+from analyzers.threat_analyzer import ThreatAnalyzer
+
+RULES = [
+    {'name': 'brute_force_login', 'pattern': 'failed_login', 'threshold': 5, 'window': 300, 'severity': 70},
+    {'name': 'unusual_time_access', 'pattern': 'access_off_hours', 'threshold': 1, 'window': 3600, 'severity': 50},
+]
+
+FAILED_LOGIN = {'user_id': 'attacker', 'event_type': 'authentication', 'action': 'login', 'success': False}
+
+def test_compiled_patterns():
+    assert compile_pattern('failed_login')(FAILED_LOGIN) is True
+    assert compile_pattern('failed_login')({**FAILED_LOGIN, 'success': True}) is False
+    assert compile_pattern('access_off_hours')({'event_type': 'access_off_hours_night'}) is True
+    assert compile_pattern('access_off_hours')({'event_type': 'api_access', 'action': None}) is False
+
+@pytest.mark.asyncio
+async def test_window_counts_per_user_and_rule():
+    engine = CEPEngine(RULES)
+    
+    for second in range(5):
+        counts = await engine.observe(FAILED_LOGIN, now=1000 + second)
+    assert counts == {'brute_force_login': 5}
+    
+    assert await engine.observe({**FAILED_LOGIN, 'user_id': 'someone'}, now=1005) == {'brute_force_login': 1}
+    assert await engine.observe({'user_id': 'attacker', 'event_type': 'api_access'}, now=1005) == {}
+
+@pytest.mark.asyncio
+async def test_events_leave_the_window():
+    engine = CEPEngine(RULES)
+    await engine.observe(FAILED_LOGIN, now=1000)
+    await engine.observe(FAILED_LOGIN, now=1200)
+    
+    assert await engine.count('attacker', 'brute_force_login', now=1250) == 2
+    assert await engine.count('attacker', 'brute_force_login', now=1310) == 1
+    assert await engine.count('attacker', 'brute_force_login', now=1510) == 0
+
+@pytest.mark.asyncio
+async def test_sweep_drops_idle_windows():
+    store = MemoryWindowStore()
+    engine = CEPEngine(RULES, store)
+    await engine.observe(FAILED_LOGIN, now=1000)
+    
+    store.sweep(now=1100)
+    assert len(store.windows) == 1
+    store.sweep(now=2000)
+    assert store.windows == {}
+
+@pytest.mark.asyncio
+async def test_memory_windows_refuse_a_shared_analyzer_group(monkeypatch):
+    redis = fakeredis.FakeAsyncRedis()
+    first = ThreatAnalyzer(redis)
+    await first.consumer.start()
+    await first._check_shared_state()
+    await first.consumer.read()  # Registers as a live consumer
+
+    second = ThreatAnalyzer(redis)
+    second.consumer.consumer = 'analyzer-other'
+    await second.consumer.start()
+    with pytest.raises(RuntimeError, match='CEP_STATE_BACKEND=redis'):
+        await second._check_shared_state()
+
+    monkeypatch.setenv('CEP_STATE_BACKEND', 'redis')
+    shared = ThreatAnalyzer(redis)
+    shared.consumer.consumer = 'analyzer-shared'
+    assert isinstance(shared.cep.store, RedisWindowStore)
+    await shared._check_shared_state()
@@ -23,3 +23,146 @@ async def test_event_enrichment():
     event = {'ip_address': '192.168.1.100'}
     # Test would validate geo data added
     assert 'ip_address' in event
+
+import asyncio
+import json
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'backend')))
+
+import aiosqlite
+import fakeredis
+import pytest_asyncio
+from collectors.event_collector import EventCollector
+from models import database
+from utils.streams import ANALYSIS_STREAM
+
+class BlockingFakeRedis(fakeredis.FakeAsyncRedis):
+    """fakeredis answers XREADGROUP BLOCK at once without yielding; wait like Redis would"""
+
+    async def xreadgroup(self, *args, block=None, **kwargs):
+        response = await super().xreadgroup(*args, block=block, **kwargs)
+        if not response and block:
+            await asyncio.sleep(block / 1000)
+        return response
+
+@pytest_asyncio.fixture
+async def db(tmp_path, monkeypatch):
+    conn = await aiosqlite.connect(str(tmp_path / 'events.db'))
+    await conn.execute("""
+        CREATE TABLE security_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_id TEXT UNIQUE NOT NULL,
+            event_type TEXT NOT NULL,
+            user_id TEXT, ip_address TEXT, user_agent TEXT, action TEXT, resource TEXT,
+            success INTEGER,
+            timestamp TEXT NOT NULL,
+            country TEXT, city TEXT, latitude REAL, longitude REAL,
+            metadata TEXT,
+            severity INTEGER DEFAULT 0,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    monkeypatch.setattr(database, '_db_pool', conn)
+    monkeypatch.setattr(database, '_use_sqlite', True)
+    yield conn
+    await conn.close()
+
+async def stored_ids(db):
+    async with db.execute("SELECT event_id FROM security_events ORDER BY id") as cursor:
+        return [row[0] for row in await cursor.fetchall()]
+
+def login(n: int) -> dict:
+    return {'event_type': 'authentication', 'user_id': f'user{n}', 'ip_address': '10.0.0.1',
+            'action': 'login', 'success': n % 2 == 0, 'metadata': {'attempt': n}}
+
+async def run_until(collector, condition, timeout=5):
+    task = asyncio.create_task(collector.start_collection())
+    try:
+        async with asyncio.timeout(timeout):
+            while not await condition():
+                await asyncio.sleep(0.02)
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+@pytest.mark.asyncio
+async def test_store_events_inserts_batch_and_skips_redelivered(db):
+    collector = EventCollector(fakeredis.FakeAsyncRedis())
+    events = [await collector.prepare_event({'event_id': f'e{n}', **{k: str(v) for k, v in login(n).items()}})
+              for n in range(3)]
+
+    await collector.store_events(events)
+    await collector.store_events(events[1:])  # Redelivered after a crash before the ack
+
+    assert await stored_ids(db) == ['e0', 'e1', 'e2']
+    # Only new events reach the analysis stream, so the analyzer never counts one twice
+    await collector.flush(events)
+    await collector.flush([await collector.prepare_event({'event_id': 'e3', **{k: str(v) for k, v in login(3).items()}})])
+    assert await collector.redis.xlen(ANALYSIS_STREAM) == 1
+    async with db.execute("SELECT success, metadata FROM security_events WHERE event_id = 'e1'") as cursor:
+        success, metadata = await cursor.fetchone()
+    assert success == 0
+    assert json.loads(metadata) == {'attempt': 1}
+
+@pytest.mark.asyncio
+async def test_collection_flushes_full_and_timed_out_batches(db):
+    redis = BlockingFakeRedis()
+    collector = EventCollector(redis, batch_size=3, flush_ms=50)
+    await collector.consumer.start()
+    event_ids = [await collector.ingest_event(login(n)) for n in range(5)]
+
+    async def acked():
+        return collector.consumer.acked == 5
+
+    await run_until(collector, acked)
+
+    # One full batch of 3, then the remaining 2 once the flush interval passed
+    assert collector.batches_written == 2
+    assert await stored_ids(db) == event_ids
+    assert await redis.xlen(ANALYSIS_STREAM) == 5
+    assert (await collector.consumer.stats())['pending'] == 0
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_read_again_from_pending(db, monkeypatch):
+    redis = BlockingFakeRedis()
+    collector = EventCollector(redis, batch_size=10, flush_ms=10)
+    await collector.consumer.start()
+    event_ids = [await collector.ingest_event(login(n)) for n in range(2)]
+
+    store_events = collector.store_events
+    failures = []
+
+    async def flaky_store(events):
+        if not failures:
+            failures.append(len(events))
+            raise ConnectionError("database unavailable")
+        return await store_events(events)
+
+    monkeypatch.setattr(collector, 'store_events', flaky_store)
+
+    async def drained():
+        return collector.consumer.acked == 2
+
+    await run_until(collector, drained)
+
+    assert failures == [2]
+    assert await stored_ids(db) == event_ids
+    assert (await collector.consumer.stats())['pending'] == 0
+
+@pytest.mark.asyncio
+async def test_first_start_skips_events_already_in_the_stream(db):
+    redis = BlockingFakeRedis()
+    collector = EventCollector(redis, batch_size=10, flush_ms=10)
+    await collector.ingest_event(login(0))  # History from before the collectors group existed
+    await collector.consumer.start()
+    event_id = await collector.ingest_event(login(1))
+
+    async def acked():
+        return collector.consumer.acked == 1
+
+    await run_until(collector, acked)
+
+    assert await stored_ids(db) == [event_id]
+    assert await redis.xlen(ANALYSIS_STREAM) == 1
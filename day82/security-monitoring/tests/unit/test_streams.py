@@ -0,0 +1,80 @@
+"""Unit tests for the consumer group stream reader"""
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'backend')))
+
+import fakeredis
+from utils.streams import StreamConsumer
+
+STREAM = 'test:stream'
+
+async def add(redis, count: int):
+    return [await redis.xadd(STREAM, {'n': str(n)}) for n in range(count)]
+
+async def started(redis, name: str, count: int = 10, **kwargs):
+    consumer = StreamConsumer(redis, STREAM, 'workers', name, count=count, block_ms=10)
+    await consumer.start(**kwargs)
+    return consumer
+
+async def read_new(consumer):
+    """Read past this consumer's pending messages to the new ones"""
+    while consumer.reading_pending:
+        assert await consumer.read() == []
+    return await consumer.read()
+
+@pytest.mark.asyncio
+async def test_reads_new_messages_in_batches_and_acks():
+    redis = fakeredis.FakeAsyncRedis()
+    consumer = await started(redis, 'worker-1', count=3)
+    ids = await add(redis, 5)
+
+    first = await read_new(consumer)
+    second = await consumer.read()
+    assert [message_id for message_id, _ in first + second] == ids
+    assert await consumer.read() == []
+
+    await consumer.ack([message_id for message_id, _ in first + second])
+    stats = await consumer.stats()
+    assert (stats['delivered'], stats['acked'], stats['pending']) == (5, 5, 0)
+
+@pytest.mark.asyncio
+async def test_rewind_redelivers_unacked_messages():
+    redis = fakeredis.FakeAsyncRedis()
+    consumer = await started(redis, 'worker-1')
+    ids = await add(redis, 3)
+
+    assert len(await read_new(consumer)) == 3
+    # The batch failed before its ack: new reads would skip it
+    assert await consumer.read() == []
+    consumer.rewind()
+    assert [message_id for message_id, _ in await consumer.read()] == ids
+
+    await consumer.ack(ids)
+    consumer.rewind()
+    assert await consumer.read() == []
+    assert (await consumer.stats())['pending'] == 0
+
+@pytest.mark.asyncio
+async def test_start_claims_messages_of_idle_consumers():
+    redis = fakeredis.FakeAsyncRedis()
+    dead = await started(redis, 'worker-dead')
+    ids = await add(redis, 2)
+    assert len(await read_new(dead)) == 2
+
+    survivor = await started(redis, 'worker-2', claim_idle_ms=0)
+    assert [message_id for message_id, _ in await survivor.read()] == ids
+
+@pytest.mark.asyncio
+async def test_active_consumers_lists_other_live_consumers():
+    redis = fakeredis.FakeAsyncRedis()
+    lone = StreamConsumer(redis, STREAM, 'workers', 'worker-1')
+    assert await lone.active_consumers() == []
+
+    first = await started(redis, 'worker-1')
+    await read_new(first)
+    second = await started(redis, 'worker-2')
+    await read_new(second)
+    assert await second.active_consumers() == ['worker-1']
+    assert await second.active_consumers(idle_ms=0) == []